@@ -3,14 +3,29 @@
 Script de surveillance automatique qui détecte les fichiers JPG dans /tmp/photos
 et les transfère immédiatement via FTP vers le serveur configuré.
 Utilise le script lftp_send_photos.sh en mode fichier unique pour les transferts.
+Un fichier est pris en charge dès la fin de son écriture (inotify IN_CLOSE_WRITE
+ou IN_MOVED_TO), sans attente; stabilité de la taille en repli sans inotify.
+Les fichiers passent par une file bornée (un seul exemplaire par chemin) vers
+un groupe de workers: la surveillance n'exécute jamais les transferts.
+Un fichier en échec est repris avec un délai croissant, puis mis en
+quarantaine après system.max_retries tentatives.
+Seul incoming/ est surveillé; chaque fichier passe ensuite par ready/,
+uploading/ puis done/ (rename atomique, un seul worker par fichier).
 """
 import os
 import time
+import threading
 import subprocess
 import logging
 import json
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+
+from camera_session import CameraError, create_camera_session
+from camera_index import create_camera_index
+from upload_ledger import create_upload_ledger
+from photo_watch import PhotoWatcher
+from upload_queue import UploadQueue, UploadWorkers, RetryBackoff
+from spool import INCOMING, READY, UPLOADING, DONE, QUARANTINE, create_spool
+from retention import create_retention_manager
 
 # Configuration
 CONFIG_FILE = "/home/server01/projet_ftp/Projet_FTP/config.json"
@@ -46,68 +61,133 @@ def load_config():
 config = load_config()
 LOCAL_DIR = config.get('camera', {}).get('download_path', '/tmp/photos')
 
-# Gestionnaire d'événements pour nouveaux fichiers
-class NewPhotoHandler(FileSystemEventHandler):
-    def __init__(self):
+# Index des objets de l'appareil et session libgphoto2 (None sans python-gphoto2)
+camera_index = create_camera_index(config)
+camera_session = create_camera_session(config)
+# Registre des contenus déjà transférés (None si la déduplication est désactivée)
+upload_ledger = create_upload_ledger(config)
+# Une seule opération à la fois sur l'appareil (session partagée ou gphoto2)
+camera_lock = threading.Lock()
+# Dossier local par états; l'index caméra suit chaque déplacement
+spool = create_spool(config)
+spool.listeners.append(lambda old, new: new and camera_index.rename_local(old, new))
+# Quotas d'âge et d'octets du dossier local (photos transférées supprimées en premier)
+retention = create_retention_manager(config, spool)
+
+def is_jpg_name(name):
+    """Vérifie si le nom correspond à une image JPG ou à un fichier sans extension."""
+    if name.startswith('.'):
+        return False
+    _, ext = os.path.splitext(name.lower())
+    return ext in ('.jpg', '.jpeg', '')
+
+# Gestionnaire des fichiers terminés signalés par la surveillance du dossier
+class NewPhotoHandler:
+    def __init__(self, transfer_queue=None, retries=None, worker_count=2):
         self.processing = set()  # Garde la trace des fichiers en cours de traitement
+        self.lock = threading.Lock()
+        # File bornée entre la surveillance et les workers de transfert
+        self.transfer_queue = transfer_queue or UploadQueue(maxsize=100)
+        self.workers = UploadWorkers(self.transfer_queue, self._process, worker_count)
+        # Échecs répétés: reprise espacée puis quarantaine
+        self.retries = retries or RetryBackoff()
         
-    def on_created(self, event):
-        # Ignorer les événements de répertoire
-        if event.is_directory:
+    def on_completed(self, path):
+        """Fichier entièrement écrit dans incoming/: pris en charge s'il est encore là"""
+        if self._is_jpg_file(path):
+            ready_path = spool.claim(path, READY)
+            if ready_path:
+                self._enqueue(ready_path)
+    
+    def _enqueue(self, path):
+        """Met le fichier en file s'il est à tenter; bloque la surveillance tant que la file est pleine"""
+        if not self.retries.due(path):
             return
-            
-        # Vérifier s'il s'agit d'un fichier JPG
-        if self._is_jpg_file(event.src_path):
-            self._handle_new_jpg(event.src_path)
+        if not self.workers.submit(path):
+            logger.debug(f"{os.path.basename(path)} déjà en attente de transfert")
+    
+    def start_workers(self):
+        """Démarre les workers de transfert"""
+        self.workers.start()
+    
+    def stop_workers(self):
+        """Arrête les workers (transferts en cours terminés)"""
+        self.workers.stop()
     
-    def on_modified(self, event):
-        # Certains systèmes génèrent un événement modified après created
-        if event.is_directory or event.src_path in self.processing:
+    def _process(self, path):
+        """Transfère un fichier de la file (exécuté par un worker)"""
+        # ready/ -> uploading/: un seul worker par fichier
+        uploading_path = spool.claim(path, UPLOADING)
+        if not uploading_path:
             return
-            
-        # Vérifier s'il s'agit d'un fichier JPG
-        if self._is_jpg_file(event.src_path):
-            self._handle_new_jpg(event.src_path)
+        transferred = False
+        try:
+            transferred = self._handle_new_jpg(uploading_path)
+        except Exception as e:
+            logger.error(f"Erreur lors du traitement de {path}: {e}")
+        if transferred:
+            self.retries.success(path)
+            spool.claim(uploading_path, DONE)
+        elif self.retries.failure(path):
+            # Trop d'échecs: le fichier n'est plus repris automatiquement
+            logger.error(f"Transfert abandonné après {self.retries.max_attempts} tentatives, "
+                         f"quarantaine: {os.path.basename(path)}")
+            spool.claim(uploading_path, QUARANTINE)
+        else:
+            # Remis en attente dans ready/, repris après le délai de reprise
+            spool.claim(uploading_path, READY)
     
     def _is_jpg_file(self, path):
-        """Vérifie si le fichier est une image JPG ou un fichier sans extension."""
-        # Vérifier l'extension
-        _, ext = os.path.splitext(path.lower())
-        if ext in ['.jpg', '.jpeg'] or ext == '':
-            # Vérifier qu'il s'agit bien d'un fichier complet (pas en cours d'écriture)
-            # Une façon simple est de vérifier si la taille reste stable pendant un court délai
-            try:
-                size1 = os.path.getsize(path)
-                time.sleep(0.5)  # Attendre un peu
-                size2 = os.path.getsize(path)
-                return size1 == size2 and size1 > 0
-            except (FileNotFoundError, OSError):
-                return False
-        return False
+        """Vérifie si le fichier terminé est une image JPG non vide ou un fichier sans extension."""
+        if not is_jpg_name(os.path.basename(path)):
+            return False
+        try:
+            return os.path.getsize(path) > 0
+        except OSError:
+            return False
     
     def _handle_new_jpg(self, jpg_path):
-        """Gère un nouveau fichier JPG détecté."""
+        """Gère un nouveau fichier JPG détecté; retourne True si le fichier est transféré."""
         # Éviter de traiter plusieurs fois
-        if jpg_path in self.processing:
-            return
+        with self.lock:
+            if jpg_path in self.processing:
+                return False
+            self.processing.add(jpg_path)
         
         try:
-            self.processing.add(jpg_path)
             
             filename = os.path.basename(jpg_path)
             logger.info(f"Nouveau fichier JPG détecté: {filename}")
             
-            # Attendre que le fichier soit complètement écrit
-            time.sleep(1)
+            # Contenu déjà transféré (sous ce nom ou un autre): pas de transfert
+            duplicate = None
+            if upload_ledger:
+                upload_ledger.load()
+                duplicate = upload_ledger.find_uploaded(jpg_path)
+                if duplicate:
+                    logger.info(f"Contenu déjà transféré ({duplicate}), transfert ignoré: {filename}")
             
             # Transférer le fichier via FTP
-            if self._transfer_file(jpg_path):
+            if duplicate or self._transfer_file(jpg_path):
+                if upload_ledger and not duplicate:
+                    remote_dir = config.get('ftp', {}).get('directory', '/')
+                    upload_ledger.record(jpg_path, os.path.join(remote_dir, filename))
+                    upload_ledger.save()
+                
+                # Mémoriser le transfert dans l'index caméra
+                camera_index.load()
+                if camera_index.mark_uploaded(jpg_path):
+                    camera_index.save()
+                
                 # Supprimer la photo de l'appareil photo après transfert
-                delete_photo_from_camera(filename)
+                with camera_lock:
+                    delete_photo_from_camera(filename, jpg_path)
+                return True
+            return False
         finally:
             # Retirer de la liste des traitements en cours
-            if jpg_path in self.processing:
-                self.processing.remove(jpg_path)
+            with self.lock:
+                self.processing.discard(jpg_path)
     
     def _transfer_file(self, file_path):
         """Transfère un fichier via FTP en utilisant le script lftp_send_jpg.sh."""
@@ -139,8 +219,42 @@ class NewPhotoHandler(FileSystemEventHandler):
             logger.error(f"Erreur lors du transfert de {filename}: {e}")
             return False
 
-def delete_photo_from_camera(filename):
+def delete_photo_with_session(filename, local_path=None):
+    """Supprimer une photo de l'appareil en la retrouvant dans l'index caméra"""
+    try:
+        with camera_session:
+            if not camera_session.is_open:
+                logger.warning("Appareil photo non accessible pour la suppression")
+                return False
+            
+            camera_index.load()
+            entry = camera_index.find_by_local_path(local_path) if local_path else None
+            if entry is None:
+                entry = camera_index.find_by_name(filename)
+            if entry is None:
+                # Objet pas encore indexé: listage incrémental puis nouvelle recherche
+                camera_index.refresh(camera_session)
+                entry = camera_index.find_by_name(filename)
+            
+            if entry is None or not entry['on_camera']:
+                logger.info(f"Photo {filename} non trouvée sur l'appareil photo (déjà supprimée?)")
+                return True
+            
+            camera_session.delete(entry)
+            camera_index.mark_deleted(entry)
+            camera_index.save()
+            logger.info(f"Photo {entry['name']} supprimée de l'appareil photo")
+            return True
+            
+    except CameraError as e:
+        logger.warning(f"Échec suppression {filename} de l'appareil: {e}")
+        return False
+
+def delete_photo_from_camera(filename, local_path=None):
     """Supprimer une photo spécifique de l'appareil photo"""
+    if camera_session:
+        return delete_photo_with_session(filename, local_path)
+    
     try:
         # Extraire le nom de base sans extension pour la recherche
         base_name = os.path.splitext(filename)[0]
@@ -188,40 +302,46 @@ def delete_photo_from_camera(filename):
 
 def main():
     """Point d'entrée principal du script."""
-    # S'assurer que le répertoire de surveillance existe
-    os.makedirs(LOCAL_DIR, exist_ok=True)
+    # Transferts interrompus remis en attente, écritures interrompues supprimées
+    spool.recover()
     
     # S'assurer que le répertoire de logs existe
     os.makedirs('/home/server01/projet_ftp/Projet_FTP/logs', exist_ok=True)
     
-    logger.info(f"Démarrage surveillance auto-transfert JPG dans {LOCAL_DIR}")
+    logger.info(f"Démarrage surveillance auto-transfert JPG dans {spool.dir(INCOMING)}")
     logger.info(f"Configuration: {config}")
     
-    # Créer l'observateur et le gestionnaire
-    event_handler = NewPhotoHandler()
-    observer = Observer()
-    observer.schedule(event_handler, LOCAL_DIR, recursive=False)
+    # Créer la surveillance et le gestionnaire
+    # Fichiers existants signalés au démarrage, puis chaque fichier dès la fin de son écriture
+    system_config = config.get('system', {})
+    check_interval = system_config.get('check_interval', 5)
+    retries = RetryBackoff(max_attempts=system_config.get('max_retries', 3),
+                           base_delay=system_config.get('transfer_retry_delay', check_interval))
+    event_handler = NewPhotoHandler(UploadQueue(maxsize=system_config.get('transfer_queue_size', 100)),
+                                    retries, system_config.get('transfer_workers', 2))
+    event_handler.start_workers()
+    observer = PhotoWatcher(spool.dir(INCOMING), event_handler.on_completed,
+                            interval=check_interval,
+                            use_inotify=config.get('system', {}).get('inotify', True),
+                            accept=is_jpg_name)
     observer.start()
     
-    # Vérifier les fichiers existants au démarrage
-    logger.info("Vérification des fichiers JPG existants...")
-    for filename in os.listdir(LOCAL_DIR):
-        file_path = os.path.join(LOCAL_DIR, filename)
-        if os.path.isfile(file_path) and event_handler._is_jpg_file(file_path):
-            logger.info(f"Fichier JPG existant trouvé: {filename}")
-            event_handler._handle_new_jpg(file_path)
-    
     try:
-        # Garder le script en cours d'exécution
+        # Photos en attente dans ready/ (démarrage, échecs de transfert) reprises
+        # périodiquement, chacune après son délai de reprise
         while True:
-            time.sleep(1)
+            for path in spool.list(READY):
+                if event_handler._is_jpg_file(path):
+                    event_handler._enqueue(path)
+            retention.enforce()
+            time.sleep(check_interval)
     except KeyboardInterrupt:
         logger.info("Arrêt demandé par l'utilisateur")
     except Exception as e:
         logger.error(f"Erreur inattendue: {e}")
     finally:
         observer.stop()
-        observer.join()
+        event_handler.stop_workers()
 
 if __name__ == "__main__":
     main()
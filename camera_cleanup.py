@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Suppression des photos de l'appareil après transfert confirmé
+Tous les objets dont l'upload est confirmé dans l'index caméra sont
+supprimés par lots, dans la session libgphoto2 déjà ouverte
+"""
+
+import time
+import logging
+from typing import Dict, Any, List, Optional
+
+from camera_session import CameraError, CameraSession
+from camera_index import CameraIndex
+
+logger = logging.getLogger('CameraCleanup')
+
+
+class CameraCleaner:
+    """Supprime de l'appareil les objets transférés, par lots"""
+
+    def __init__(self, session: CameraSession, index: CameraIndex, batch_size: int = 50):
+        self.session = session
+        self.index = index
+        self.batch_size = max(1, batch_size)
+
+    def run(self, entries: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Supprime tous les objets transférés encore présents sur l'appareil
+        Chaque objet est revérifié (taille, date) juste avant sa suppression:
+        une autre photo du même nom est réindexée comme nouvel objet et conservée
+        entries remplace cette sélection (vidage complet demandé explicitement);
+        l'état de transfert des objets n'est jamais modifié
+        """
+        stats = {'deleted': 0, 'failed': 0, 'skipped': 0, 'duration': 0.0}
+        verify = entries is None
+        if entries is None:
+            entries = self.index.pending_deletions()
+        if not entries:
+            return stats
+
+        start = time.time()
+        logger.info(f"Suppression de {len(entries)} photo(s) de l'appareil...")
+
+        for offset in range(0, len(entries), self.batch_size):
+            batch = entries[offset:offset + self.batch_size]
+            # Le verrou de session est tenu pour tout le lot, puis relâché
+            # pour laisser passer l'ingestion entre deux lots
+            with self.session.lock:
+                if not self.session.ensure_open():
+                    logger.warning("Appareil photo non accessible, suppression reportée")
+                    break
+                for entry in batch:
+                    try:
+                        if verify and not self._still_same(entry):
+                            stats['skipped'] += 1
+                            continue
+                        self.session.delete(entry)
+                        self.index.mark_deleted(entry)
+                        stats['deleted'] += 1
+                    except CameraError as e:
+                        stats['failed'] += 1
+                        logger.warning(f"Impossible de supprimer {entry['name']}: {e}")
+                        if not self.session.is_open:
+                            break
+            self.index.save()
+
+        if stats['skipped']:
+            logger.info(f"{stats['skipped']} photo(s) remplacée(s) sur l'appareil, conservée(s)")
+        stats['duration'] = time.time() - start
+        logger.info(f"{stats['deleted']}/{len(entries)} photo(s) supprimée(s) de l'appareil "
+                    f"en {stats['duration']:.1f}s")
+        return stats
+
+    def _still_same(self, entry: Dict[str, Any]) -> bool:
+        """
+        Vérifie que l'objet de l'appareil est bien la photo transférée
+        (appelé sous le verrou de session); sinon il est réindexé en attente
+        """
+        info = self.session.file_info(entry['folder'], entry['name'])
+        if (info.get('size'), info.get('mtime')) == (entry['size'], entry['mtime']):
+            return True
+        logger.warning(f"{entry['name']}: autre photo du même nom sur l'appareil, non supprimée")
+        self.index.add(entry['folder'], entry['name'], info.get('size'), info.get('mtime'))
+        return False
+
+
+def create_camera_cleaner(config: Dict[str, Any], session: CameraSession,
+                          index: CameraIndex) -> CameraCleaner:
+    """Factory function pour créer l'étape de suppression configurée"""
+    batch_size = config.get('camera', {}).get('delete_batch_size', 50)
+    return CameraCleaner(session, index, batch_size=batch_size)
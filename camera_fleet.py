@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Ingestion simultanée de plusieurs appareils photo
+Chaque boîtier détecté a son propre port USB, sa propre session, son index
+et son thread d'ingestion. Les fichiers sont préfixés par l'identifiant du
+boîtier (DSC_0001 de deux boîtiers ne peuvent pas se confondre) et toutes
+les photos rejoignent la même file d'attente d'upload.
+"""
+
+import os
+import re
+import logging
+import threading
+import subprocess
+from typing import Callable, Optional, Dict, Any, List
+
+from camera_session import CameraError, CameraSession, create_camera_backend
+from camera_ingest import EventIngest, PollIngest, iter_saved_files, download_pending, missing_files_cli
+from camera_index import create_camera_index
+from camera_cleanup import create_camera_cleaner
+from camera_recovery import create_camera_recovery
+from camera_stream import create_camera_streamer
+from spool import create_spool, incoming_path
+
+logger = logging.getLogger('CameraFleet')
+
+
+def _slug(text: str) -> str:
+    """Texte utilisable dans un nom de fichier"""
+    return re.sub(r'[^A-Za-z0-9]+', '-', text).strip('-')
+
+
+def body_id(model: str, port: str, serial: Optional[str] = None,
+            names: Optional[Dict[str, str]] = None) -> str:
+    """
+    Identifiant stable d'un boîtier: nom configuré (par numéro de série ou port),
+    sinon modèle et fin du numéro de série, sinon modèle et port
+    """
+    names = names or {}
+    if serial and serial in names:
+        return _slug(names[serial])
+    if port in names:
+        return _slug(names[port])
+    short_model = _slug(model.split()[-1]) if model else 'CAM'
+    if serial:
+        return f"{short_model}-{_slug(serial)[-6:]}"
+    return f"{short_model}-{_slug(port.replace('usb:', ''))}"
+
+
+def detect_cameras_cli() -> List[Dict[str, str]]:
+    """Liste les appareils connectés via gphoto2 --auto-detect ({'model', 'port'})"""
+    try:
+        result = subprocess.run(['gphoto2', '--auto-detect'],
+                                capture_output=True, text=True, timeout=10)
+    except Exception as e:
+        logger.debug(f"Erreur de détection: {e}")
+        return []
+
+    cameras = []
+    for line in result.stdout.split('\n'):
+        match = re.match(r'^(.*?)\s+(usb:\S+)\s*$', line.strip())
+        if match:
+            cameras.append({'model': match.group(1), 'port': match.group(2)})
+    return cameras
+
+
+class CameraWorker:
+    """Ingestion d'un boîtier: session, index et récupération dédiés à son port"""
+
+    def __init__(self, config: Dict[str, Any], camera: Dict[str, str],
+                 on_photo: Callable[[str], None], backend=None, guard=None,
+                 stream_services: Optional[Dict[str, Any]] = None):
+        camera_config = config.get('camera', {})
+        self.guard = guard
+        self.port = camera['port']
+        self.model = camera['model']
+        self.on_photo = on_photo
+        # Téléchargements dans incoming/ du spool, pris en charge à la fin de l'écriture
+        self.spool = create_spool(config)
+        self.download_path = incoming_path(config)
+        self.session = CameraSession(backend, port=self.port) if backend else None
+
+        # Le numéro de série garde le même identifiant après un rebranchement
+        serial = None
+        if self.session and self.session.ensure_open():
+            try:
+                serial = self.session.serial_number()
+            except CameraError:
+                pass
+        self.body = body_id(self.model, self.port, serial, camera_config.get('body_names'))
+        self.name_prefix = f"{self.body}_"
+
+        self.index = create_camera_index(config, self.body)
+        self.recovery = create_camera_recovery(config, self.session)
+        self.streamer = create_camera_streamer(config, self.session, self.index,
+                                               **(stream_services or {}))
+        self.cleaner = create_camera_cleaner(config, self.session, self.index) if self.session else None
+
+        if camera_config.get('ingest_mode', 'poll') == 'events':
+            self.ingest = EventIngest(self.session, self.download_path, on_photo=on_photo,
+                                      index=self.index, streamer=self.streamer,
+                                      recovery=self.recovery, name_prefix=self.name_prefix,
+                                      port=self.port, guard=guard)
+        else:
+            self.ingest = PollIngest(self.download, on_photo=on_photo,
+                                     interval=config.get('system', {}).get('check_interval', 5),
+                                     guard=guard)
+
+    def start(self):
+        """Démarre l'ingestion du boîtier"""
+        logger.info(f"Boîtier {self.body} ({self.model}, {self.port}) pris en charge")
+        self.ingest.start()
+
+    def stop(self):
+        """Arrête l'ingestion et libère le boîtier"""
+        self.ingest.stop()
+        if self.streamer:
+            self.streamer.close()
+        if self.session:
+            self.session.close()
+        self.index.save()
+        logger.info(f"Boîtier {self.body} libéré")
+
+    def download(self, on_photo: Optional[Callable[[str], None]] = None) -> List[str]:
+        """Une passe de téléchargement des nouvelles photos du boîtier"""
+        if not self.session:
+            return self._download_cli(on_photo)
+
+        if not self.session.ensure_open():
+            if self.session.last_error:
+                self.recovery.recover(self.session.last_error)
+            else:
+                self.recovery.record_absent()
+            return []
+        self.recovery.record_success()
+
+        try:
+            photos, _ = download_pending(self.session, self.index, self.download_path,
+                                         on_photo=on_photo, streamer=self.streamer,
+                                         name_prefix=self.name_prefix, spool=self.spool,
+                                         guard=self.guard)
+            return photos
+        except CameraError as e:
+            logger.error(f"Erreur de communication avec {self.body}: {e}")
+            self.recovery.recover(e)
+            return []
+
+    def _download_cli(self, on_photo=None) -> List[str]:
+        """Fallback sans python-gphoto2: gphoto2 limité au port du boîtier"""
+        os.makedirs(self.download_path, exist_ok=True)
+        # --skip-existing ne verrait que incoming/: photos absentes de tous les états du spool
+        missing = missing_files_cli(lambda name, **info: self.spool.has_photo(name, self.name_prefix, **info),
+                                    port=self.port)
+        if not missing:
+            return []
+        cmd = [
+            'gphoto2',
+            '--port', self.port,
+            '--get-file', missing,
+            '--filename', os.path.join(self.download_path, self.name_prefix + '%f')
+        ]
+        photos = []
+        for path in iter_saved_files(cmd, timeout=120):
+            photos.append(path)
+            if on_photo:
+                on_photo(path)
+            if self.guard and not self.guard.check():
+                break
+        return photos
+
+    def cleanup(self):
+        """Supprime du boîtier les photos dont l'upload est confirmé"""
+        if self.cleaner:
+            self.cleaner.run()
+
+
+class CameraFleet:
+    """Détecte les boîtiers connectés et lance une ingestion par port USB"""
+
+    def __init__(self, config: Dict[str, Any], on_photo: Callable[[str], None],
+                 backend_factory: Optional[Callable[..., Any]] = None,
+                 rescan_interval: Optional[float] = None, guard=None,
+                 stream_services: Optional[Dict[str, Any]] = None):
+        self.config = config
+        self.on_photo = on_photo
+        # Contrôle de flux partagé: un seul dossier local pour tous les boîtiers
+        self.guard = guard
+        # Spool, registre, statistiques et validation du service pour l'envoi direct
+        self.stream_services = stream_services
+        # backend_factory(port) crée le backend d'un boîtier, backend_factory(None) le détecteur
+        self.backend_factory = backend_factory or (lambda port=None: create_camera_backend(config))
+        self.rescan_interval = rescan_interval or config.get('system', {}).get('check_interval', 5)
+        self.workers = {}
+        self.running = False
+        self.thread = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._detector = None
+
+    def detect(self) -> List[Dict[str, str]]:
+        """Liste tous les appareils connectés ({'model', 'port'})"""
+        if self._detector is None:
+            self._detector = self.backend_factory(None) or False
+        if not self._detector:
+            return detect_cameras_cli()
+        try:
+            return self._detector.detect()
+        except CameraError as e:
+            logger.debug(f"Erreur de détection: {e}")
+            return []
+
+    def start(self):
+        """Démarre la surveillance des boîtiers"""
+        if self.running:
+            return
+        self.running = True
+        self._wakeup.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        logger.info("Ingestion multi-appareils démarrée")
+
+    def stop(self):
+        """Arrête toutes les ingestions"""
+        self.running = False
+        self._wakeup.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5.0)
+        with self._lock:
+            workers = list(self.workers.values())
+            self.workers.clear()
+        for worker in workers:
+            worker.stop()
+        logger.info("Ingestion multi-appareils arrêtée")
+
+    def refresh(self):
+        """Démarre un worker par nouveau port, arrête ceux des boîtiers débranchés"""
+        cameras = {camera['port']: camera for camera in self.detect()}
+
+        with self._lock:
+            gone = [port for port in self.workers if port not in cameras]
+            removed = [self.workers.pop(port) for port in gone]
+        for worker in removed:
+            worker.stop()
+
+        for port, camera in cameras.items():
+            if port in self.workers:
+                continue
+            try:
+                worker = CameraWorker(self.config, camera, self.on_photo,
+                                      backend=self.backend_factory(port), guard=self.guard,
+                                      stream_services=self.stream_services)
+            except Exception as e:
+                logger.error(f"Impossible de prendre en charge l'appareil {port}: {e}")
+                continue
+            with self._lock:
+                self.workers[port] = worker
+            worker.start()
+
+    def run(self):
+        """Boucle de détection des boîtiers"""
+        self.running = True
+        while self.running:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Erreur lors de la détection des appareils: {e}")
+            self._wakeup.wait(self.rescan_interval)
+
+    def indexes(self) -> list:
+        """Index caméra de tous les boîtiers pris en charge"""
+        with self._lock:
+            return [worker.index for worker in self.workers.values()]
+
+    def cleanup(self):
+        """Supprime de chaque boîtier les photos dont l'upload est confirmé"""
+        with self._lock:
+            workers = list(self.workers.values())
+        for worker in workers:
+            try:
+                worker.cleanup()
+            except Exception as e:
+                logger.error(f"Erreur lors de la suppression des photos de {worker.body}: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        """État de la liaison de chaque boîtier"""
+        with self._lock:
+            return {worker.body: worker.recovery.metrics() for worker in self.workers.values()}
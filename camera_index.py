@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Index persistant des fichiers de l'appareil photo
+Mémorise pour chaque objet de la carte (dossier, nom, taille, date de prise
+de vue, handle) son état local et son état de transfert, afin que le
+téléchargement, la déduplication et la suppression ne dépendent plus du
+contenu du dossier local ni du texte de gphoto2 --list-files
+"""
+
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from typing import Optional, Dict, Any, List
+
+from spool import same_photo
+
+logger = logging.getLogger('CameraIndex')
+
+# États de transfert d'un objet
+UPLOAD_PENDING = 'pending'
+UPLOAD_DONE = 'uploaded'
+
+
+def make_key(folder: str, name: str) -> str:
+    """Clé unique d'un objet de l'appareil"""
+    return f"{folder.rstrip('/')}/{name}"
+
+
+class CameraIndex:
+    """Index des objets de l'appareil, sauvegardé en JSON"""
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self.entries = {}
+        self._by_local_path = {}
+        self._dirty = False
+        self.lock = threading.RLock()
+        self.load()
+
+    def _read_disk(self) -> Dict[str, Dict[str, Any]]:
+        """Lit l'index sauvegardé (vide si absent ou illisible)"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Index caméra illisible ({self.index_path}): {e}")
+            return {}
+
+    def _rebuild_local_paths(self):
+        self._by_local_path = {entry['local_path']: key for key, entry in self.entries.items()
+                               if entry.get('local_path')}
+
+    def load(self):
+        """
+        Recharge l'index depuis le disque en conservant les modifications locales
+        plus récentes (l'index est partagé entre le téléchargement et le transfert)
+        """
+        with self.lock:
+            for key, disk_entry in self._read_disk().items():
+                entry = self.entries.get(key)
+                if entry is None:
+                    self.entries[key] = disk_entry
+                elif disk_entry.get('updated', 0) > entry.get('updated', 0):
+                    # Mise à jour en place: les références détenues restent valides
+                    entry.clear()
+                    entry.update(disk_entry)
+            self._rebuild_local_paths()
+
+    def save(self):
+        """Sauvegarde atomique de l'index, fusionnée avec les écritures des autres processus"""
+        with self.lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+            temp_path = self.index_path + '.tmp'
+            try:
+                with open(self.index_path + '.lock', 'w') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    self.load()
+                    with open(temp_path, 'w', encoding='utf-8') as f:
+                        json.dump(self.entries, f)
+                    os.replace(temp_path, self.index_path)
+                self._dirty = False
+            except Exception as e:
+                logger.error(f"Erreur sauvegarde index caméra: {e}")
+
+    def _touch(self, entry: Dict[str, Any]):
+        """Horodate une modification d'entrée"""
+        entry['updated'] = time.time()
+        self._dirty = True
+
+    def get(self, folder: str, name: str) -> Optional[Dict[str, Any]]:
+        """Retourne l'entrée d'un objet de l'appareil"""
+        return self.entries.get(make_key(folder, name))
+
+    def find_by_local_path(self, local_path: str) -> Optional[Dict[str, Any]]:
+        """Retrouve l'objet de l'appareil correspondant à un fichier local"""
+        key = self._by_local_path.get(local_path)
+        return self.entries.get(key) if key else None
+
+    def find_by_name(self, name: str, folder: Optional[str] = None,
+                     size: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Retrouve un objet présent sur l'appareil par son nom complet (extension comprise)
+        Le dossier et la taille, si connus, doivent aussi correspondre; un nom présent
+        dans plusieurs dossiers sans dossier précisé est ambigu et ne retourne rien
+        """
+        with self.lock:
+            if folder is not None:
+                entry = self.get(folder, name)
+                matches = [entry] if entry and entry['on_camera'] else []
+            else:
+                matches = [entry for entry in self.entries.values()
+                           if entry['on_camera'] and entry['name'] == name]
+            if size is not None:
+                matches = [entry for entry in matches if entry['size'] == size]
+            return matches[0] if len(matches) == 1 else None
+
+    def add(self, folder: str, name: str, size: Optional[int] = None,
+            mtime: Optional[int] = None, handle: Optional[str] = None) -> Dict[str, Any]:
+        """Ajoute (ou réactive) un objet de l'appareil"""
+        with self.lock:
+            key = make_key(folder, name)
+            entry = self.entries.get(key)
+
+            # Même nom mais autre photo (carte formatée, compteur réinitialisé)
+            if entry is not None and size is not None and mtime is not None and \
+                    (entry['size'], entry['mtime']) != (size, mtime):
+                if entry.get('local_path'):
+                    self._by_local_path.pop(entry['local_path'], None)
+                entry = None
+
+            if entry is None:
+                entry = {
+                    'folder': folder,
+                    'name': name,
+                    'size': size,
+                    'mtime': mtime,
+                    'handle': handle or key,
+                    'on_camera': True,
+                    'local_path': None,
+                    'upload_state': UPLOAD_PENDING,
+                    'remote_path': None,
+                    'updated': time.time()
+                }
+                self.entries[key] = entry
+            else:
+                entry['on_camera'] = True
+                if handle:
+                    entry['handle'] = handle
+            self._touch(entry)
+            return entry
+
+    def sync_folder(self, folder: str, names: List[str], info_func=None) -> List[Dict[str, Any]]:
+        """
+        Met à jour l'index avec le listage d'un dossier de l'appareil
+        Les objets absents de l'index (ou réapparus) sont interrogés via
+        info_func et retournés; les objets connus déjà téléchargés ou transférés
+        sont revérifiés (taille, date) pour qu'une autre photo du même nom,
+        après changement de carte, ne reprenne pas leur état
+        """
+        with self.lock:
+            new_entries = []
+            listed = set(names)
+
+            for name in names:
+                entry = self.get(folder, name)
+                if entry and entry['on_camera']:
+                    if not info_func or (entry['upload_state'] == UPLOAD_PENDING
+                                         and not entry['local_path']):
+                        continue
+                    info = info_func(folder, name)
+                    if (info.get('size'), info.get('mtime')) == (entry['size'], entry['mtime']):
+                        continue
+                    logger.info(f"{name}: autre photo du même nom sur l'appareil, nouvel objet")
+                else:
+                    info = info_func(folder, name) if info_func else {}
+                new_entries.append(self.add(folder, name, info.get('size'), info.get('mtime')))
+
+            # Objets supprimés de l'appareil par ailleurs
+            for entry in self.entries.values():
+                if entry['folder'] == folder and entry['on_camera'] and entry['name'] not in listed:
+                    entry['on_camera'] = False
+                    self._touch(entry)
+
+            return new_entries
+
+    def refresh(self, session) -> List[Dict[str, Any]]:
+        """Listage incrémental de l'appareil: retourne les objets nouvellement apparus"""
+        self.load()
+        by_folder = {}
+        for camera_file in session.list_files(with_info=False):
+            by_folder.setdefault(camera_file['folder'], []).append(camera_file['name'])
+
+        new_entries = []
+        for folder, names in by_folder.items():
+            new_entries.extend(self.sync_folder(folder, names, session.file_info))
+
+        # Dossiers disparus (carte formatée ou remplacée)
+        with self.lock:
+            for entry in self.entries.values():
+                if entry['on_camera'] and entry['folder'] not in by_folder:
+                    entry['on_camera'] = False
+                    self._touch(entry)
+
+        self.save()
+        return new_entries
+
+    def needs_download(self, entry: Dict[str, Any]) -> bool:
+        """Un objet doit être téléchargé s'il n'est ni présent localement ni déjà transféré"""
+        if not entry['on_camera'] or entry['upload_state'] == UPLOAD_DONE:
+            return False
+        return not (entry['local_path'] and os.path.exists(entry['local_path']))
+
+    def pending_downloads(self) -> List[Dict[str, Any]]:
+        """Objets de l'appareil restant à télécharger"""
+        with self.lock:
+            return [entry for entry in self.entries.values() if self.needs_download(entry)]
+
+    def pending_deletions(self) -> List[Dict[str, Any]]:
+        """Objets dont l'upload est confirmé et encore présents sur l'appareil"""
+        self.load()
+        with self.lock:
+            return [entry for entry in self.entries.values()
+                    if entry['on_camera'] and entry['upload_state'] == UPLOAD_DONE]
+
+    def mark_downloaded(self, entry: Dict[str, Any], local_path: str):
+        """Enregistre le fichier local correspondant à un objet"""
+        with self.lock:
+            if entry.get('local_path'):
+                self._by_local_path.pop(entry['local_path'], None)
+            entry['local_path'] = local_path
+            self._by_local_path[local_path] = make_key(entry['folder'], entry['name'])
+            self._touch(entry)
+
+    def adopt_existing(self, entry: Dict[str, Any], download_path: str,
+                       filename: Optional[str] = None) -> bool:
+        """Associe un fichier local déjà présent (même nom, même taille et même date) à un objet"""
+        local_path = os.path.join(download_path, filename or entry['name'])
+        if same_photo(local_path, entry['size'], entry['mtime']):
+            self.mark_downloaded(entry, local_path)
+            return True
+        return False
+
+    def rename_local(self, old_path: str, new_path: str):
+        """Suit le renommage d'un fichier local"""
+        with self.lock:
+            entry = self.find_by_local_path(old_path)
+            if entry:
+                self.mark_downloaded(entry, new_path)
+
+    def mark_uploaded(self, local_path: str, remote_path: Optional[str] = None) -> bool:
+        """Marque comme transféré l'objet correspondant à un fichier local"""
+        with self.lock:
+            entry = self.find_by_local_path(local_path)
+            if not entry:
+                return False
+            entry['upload_state'] = UPLOAD_DONE
+            entry['remote_path'] = remote_path
+            self._touch(entry)
+            return True
+
+    def mark_streamed(self, entry: Dict[str, Any], remote_path: str):
+        """Marque comme transféré un objet envoyé directement depuis l'appareil (sans fichier local)"""
+        with self.lock:
+            entry['upload_state'] = UPLOAD_DONE
+            entry['remote_path'] = remote_path
+            self._touch(entry)
+
+    def mark_deleted(self, entry: Dict[str, Any]):
+        """Enregistre la suppression d'un objet de l'appareil"""
+        with self.lock:
+            entry['on_camera'] = False
+            self._touch(entry)
+
+
+def create_camera_index(config: Dict[str, Any], body: Optional[str] = None) -> CameraIndex:
+    """
+    Factory function pour créer l'index caméra configuré
+    En multi-appareils, chaque boîtier (body) a son propre index
+    """
+    index_path = config.get('camera', {}).get('index_path', 'data/camera_index.json')
+    if body:
+        root, ext = os.path.splitext(index_path)
+        index_path = f"{root}_{body}{ext}"
+    # Chemin relatif au projet: tous les scripts partagent le même index
+    if not os.path.isabs(index_path):
+        index_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), index_path)
+    return CameraIndex(index_path)
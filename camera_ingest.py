@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Ingestion des photos depuis l'appareil photo
+Mode événementiel: écoute les événements "nouveau fichier" de l'appareil et
+ne télécharge que l'objet ajouté, sans réénumérer la carte mémoire.
+Mode périodique: chaque photo est transmise dès qu'elle est enregistrée,
+pour que le transfert réseau commence pendant le téléchargement.
+"""
+
+import os
+import time
+import logging
+import threading
+import subprocess
+from typing import Callable, Optional, Iterator, List, Tuple
+
+from camera_session import CameraError, CameraSession, EVENT_FILE_ADDED
+from spool import same_photo
+
+logger = logging.getLogger('CameraIngest')
+
+# Ligne émise par gphoto2 pour chaque fichier enregistré
+SAVING_FILE_PREFIX = 'Saving file as '
+
+# Taille listée par gphoto2 --list-files, en Ko ("#1 DSC_0001.JPG rd 5841 KB image/jpeg 1609459200")
+LIST_SIZE_UNIT = 1024
+
+
+def _wait_for_file(path: str, timeout: float = 5.0) -> bool:
+    """Attend l'apparition d'un fichier (renommage atomique en fin d'écriture)"""
+    deadline = time.time() + timeout
+    while not os.path.exists(path):
+        if time.time() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def iter_saved_files(cmd, cwd: Optional[str] = None,
+                     process_holder: Optional[list] = None,
+                     timeout: Optional[float] = None) -> Iterator[str]:
+    """Lance gphoto2 et produit chaque fichier dès la ligne "Saving file as" """
+    process = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, text=True, bufsize=1)
+    if process_holder is not None:
+        process_holder.append(process)
+
+    # Délai global: le processus est interrompu s'il dépasse timeout secondes
+    timer = None
+    if timeout:
+        def on_timeout():
+            logger.error("Timeout lors de la communication avec la caméra")
+            process.terminate()
+        timer = threading.Timer(timeout, on_timeout)
+        timer.daemon = True
+        timer.start()
+
+    try:
+        for line in process.stdout:
+            line = line.strip()
+            if line.startswith(SAVING_FILE_PREFIX):
+                path = line[len(SAVING_FILE_PREFIX):].strip()
+                if cwd and not os.path.isabs(path):
+                    path = os.path.join(cwd, path)
+                # gphoto2 annonce le fichier juste avant de renommer son fichier temporaire
+                if _wait_for_file(path):
+                    yield path
+                else:
+                    logger.warning(f"Fichier annoncé par gphoto2 introuvable: {path}")
+            elif '*** Error' in line:
+                logger.warning(f"gphoto2: {line}")
+    finally:
+        if timer:
+            timer.cancel()
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        process.stdout.close()
+
+
+def _parse_list_line(parts: List[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Taille approximative (octets) et date d'une ligne de gphoto2 --list-files"""
+    size = mtime = None
+    for index, part in enumerate(parts[2:-1], start=2):
+        if part.isdigit() and parts[index + 1] == 'KB':
+            size = int(part) * LIST_SIZE_UNIT
+            break
+    if parts[-1].isdigit() and len(parts) > 4:
+        mtime = int(parts[-1])
+    return size, mtime
+
+
+def list_camera_files_cli(port: Optional[str] = None,
+                          timeout: float = 30) -> List[Tuple[int, str, Optional[int], Optional[int]]]:
+    """Numéro, nom, taille approximative et date des fichiers de l'appareil (gphoto2 --list-files)"""
+    cmd = ['gphoto2', '--list-files']
+    if port:
+        cmd.extend(['--port', port])
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise CameraError("Timeout lors du listage des fichiers", -10)
+    if result.returncode != 0:
+        raise CameraError(result.stderr.strip() or result.stdout.strip())
+
+    files = []
+    for line in result.stdout.split('\n'):
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].startswith('#') and parts[0][1:].isdigit():
+            files.append((int(parts[0][1:]), parts[1]) + _parse_list_line(parts))
+    return files
+
+
+def file_ranges(numbers) -> str:
+    """Numéros de fichiers gphoto2 sous forme de plages ("1-5,8")"""
+    ranges = []
+    for number in sorted(numbers):
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ','.join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def missing_files_cli(is_known: Callable[..., bool], port: Optional[str] = None) -> str:
+    """
+    Plages des fichiers de l'appareil absents localement (vide si aucun)
+    Remplace --skip-existing, qui ne voit que le dossier de destination.
+    is_known(nom, size=, mtime=, size_tolerance=): la taille listée par gphoto2
+    est arrondie au Ko, l'écart toléré l'est aussi
+    """
+    return file_ranges(number for number, name, size, mtime in list_camera_files_cli(port)
+                       if not is_known(name, size=size, mtime=mtime, size_tolerance=LIST_SIZE_UNIT))
+
+
+def download_pending(session: CameraSession, index, download_path: str,
+                     on_photo: Optional[Callable[[str], None]] = None, streamer=None,
+                     name_prefix: str = '', spool=None, guard=None) -> Tuple[List[str], int]:
+    """
+    Télécharge les objets de l'appareil qui ne sont ni présents localement ni
+    déjà transférés. Retourne (photos téléchargées, nombre de photos envoyées
+    directement au serveur). Lève CameraError si l'appareil ne répond plus.
+    La passe s'interrompt si l'espace libre local devient insuffisant (guard).
+    """
+    photos_downloaded = []
+    photos_streamed = 0
+    os.makedirs(download_path, exist_ok=True)
+
+    # Listage incrémental: seuls les nouveaux objets sont interrogés,
+    # et un objet déjà transféré n'est jamais retéléchargé
+    index.refresh(session)
+    for entry in index.pending_downloads():
+        filename = name_prefix + entry['name']
+        # Fichier déjà téléchargé avant la création de l'index
+        if index.adopt_existing(entry, download_path, filename):
+            continue
+        # Fichier déjà passé dans un autre état du spool (déplacé par un autre processus)
+        existing = spool.locate(filename) if spool else None
+        if existing:
+            if same_photo(existing, entry['size'], entry['mtime']):
+                index.mark_downloaded(entry, existing)
+                continue
+            # Homonyme d'une autre photo (carte formatée, compteur DSC remis à zéro)
+            renamed = spool.unique_name(filename)
+            logger.warning(f"{filename} correspond à une autre photo du spool, téléchargée sous {renamed}")
+            filename = renamed
+        if guard and not guard.check():
+            # Photos restantes laissées sur l'appareil jusqu'à la reprise
+            break
+        if streamer:
+            # Envoi direct; le fichier n'est écrit localement qu'en cas de blocage
+            local_path = streamer.send(entry, filename)
+            if local_path is None:
+                photos_streamed += 1
+                continue
+        else:
+            local_path = session.download(entry, download_path, filename)
+            index.mark_downloaded(entry, local_path)
+        photos_downloaded.append(local_path)
+        logger.info(f"Photo téléchargée: {filename}")
+        if on_photo:
+            on_photo(local_path)
+    index.save()
+    return photos_downloaded, photos_streamed
+
+
+class EventIngest:
+    """Télécharge chaque nouvelle photo dès que l'appareil signale son ajout"""
+
+    def __init__(self, session: Optional[CameraSession], download_path: str,
+                 on_photo: Callable[[str], None], event_timeout: float = 1.0,
+                 retry_interval: float = 2.0, index=None, streamer=None, recovery=None,
+                 name_prefix: str = '', port: Optional[str] = None, guard=None):
+        self.session = session
+        self.guard = guard
+        self.name_prefix = name_prefix
+        self.port = port
+        self.recovery = recovery
+        self.index = index
+        self.streamer = streamer
+        self.download_path = download_path
+        self.on_photo = on_photo
+        self.event_timeout = event_timeout
+        self.retry_interval = retry_interval
+        self.running = False
+        self.thread = None
+        self._cli_process = []
+
+    def start(self):
+        """Démarre l'écoute des événements dans un thread dédié"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        logger.info("Ingestion événementielle démarrée")
+
+    def stop(self):
+        """Arrête l'écoute des événements"""
+        self.running = False
+        for process in self._cli_process:
+            if process.poll() is None:
+                process.terminate()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5.0)
+        logger.info("Ingestion événementielle arrêtée")
+
+    def run(self):
+        """Boucle d'écoute (session native ou gphoto2 --wait-event-and-download)"""
+        self.running = True
+        os.makedirs(self.download_path, exist_ok=True)
+        while self.running:
+            delay = self.retry_interval
+            try:
+                if self.session:
+                    self._run_session()
+                else:
+                    self._run_cli()
+            except CameraError as e:
+                logger.warning(f"Perte de la communication avec l'appareil: {e}")
+                if self.recovery:
+                    # Action ciblée selon l'erreur, nouvelle tentative rapide
+                    delay = self.recovery.handle_error(e)
+            except Exception as e:
+                logger.error(f"Erreur dans l'ingestion événementielle: {e}")
+            if self.running:
+                time.sleep(delay)
+
+    def _run_session(self):
+        """Écoute les événements via la session libgphoto2 persistante"""
+        if not self.session.ensure_open():
+            # Appareil présent mais inaccessible: erreur à traiter par la récupération
+            if self.session.last_error:
+                raise self.session.last_error
+            if self.recovery:
+                self.recovery.record_absent()
+            return
+        if self.recovery:
+            self.recovery.record_success()
+
+        while self.running:
+            event = self.session.wait_for_event(self.event_timeout)
+            if event['type'] != EVENT_FILE_ADDED:
+                continue
+
+            entry = None
+            if self.index:
+                info = self.session.file_info(event['folder'], event['name'])
+                entry = self.index.add(event['folder'], event['name'],
+                                       info.get('size'), info.get('mtime'))
+                if not self.index.needs_download(entry):
+                    continue
+
+            # Espace local insuffisant: le téléchargement attend la reprise
+            if self.guard and not self.guard.wait(lambda: self.running):
+                return
+
+            filename = self.name_prefix + event['name']
+            if self.streamer and entry:
+                # Envoi direct vers le serveur, écriture locale seulement en cas de blocage
+                local_path = self.streamer.send(entry, filename)
+                if local_path is None:
+                    continue
+            else:
+                local_path = self.session.download(event, self.download_path, filename)
+                if entry:
+                    self.index.mark_downloaded(entry, local_path)
+                    self.index.save()
+            logger.info(f"Nouvelle photo reçue de l'appareil: {event['name']}")
+            self._notify(local_path)
+
+    def _run_cli(self):
+        """Fallback sans python-gphoto2: un processus gphoto2 unique et continu"""
+        cmd = [
+            'gphoto2',
+            '--wait-event-and-download',
+            '--keep',
+            '--filename', os.path.join(self.download_path, self.name_prefix + '%f.%C')
+        ]
+        if self.port:
+            cmd.extend(['--port', self.port])
+        if self.guard and not self.guard.wait(lambda: self.running):
+            return
+        self._cli_process.clear()
+        for local_path in iter_saved_files(cmd, process_holder=self._cli_process):
+            if not self.running:
+                break
+            logger.info(f"Nouvelle photo reçue de l'appareil: {os.path.basename(local_path)}")
+            self._notify(local_path)
+            if self.guard and not self.guard.check():
+                # gphoto2 arrêté: les photos prises pendant la pause restent sur la carte
+                logger.warning("Écoute gphoto2 interrompue jusqu'au retour de l'espace libre")
+                break
+
+    def _notify(self, local_path: str):
+        """Transmet la photo à l'étape suivante sans interrompre l'écoute"""
+        try:
+            self.on_photo(local_path)
+        except Exception as e:
+            logger.error(f"Erreur lors de la prise en charge de {local_path}: {e}")
+
+
+class PollIngest:
+    """Téléchargement périodique dans un thread dédié, photo par photo"""
+
+    def __init__(self, download_func: Callable[[Callable[[str], None]], list],
+                 on_photo: Callable[[str], None], interval: float = 5.0, guard=None):
+        self.download_func = download_func
+        self.guard = guard
+        self.on_photo = on_photo
+        self.interval = interval
+        self.running = False
+        self.thread = None
+        self._wakeup = threading.Event()
+
+    def start(self):
+        """Démarre les passes de téléchargement périodiques"""
+        if self.running:
+            return
+        self.running = True
+        self._wakeup.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        logger.info("Ingestion périodique démarrée")
+
+    def stop(self):
+        """Arrête les passes de téléchargement"""
+        self.running = False
+        self._wakeup.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5.0)
+        logger.info("Ingestion périodique arrêtée")
+
+    def run(self):
+        """Boucle de téléchargement: chaque photo est transmise dès son enregistrement"""
+        self.running = True
+        while self.running:
+            try:
+                # Passe sautée tant que l'espace libre local est insuffisant
+                if not self.guard or self.guard.check():
+                    self.download_func(self.on_photo)
+            except Exception as e:
+                logger.error(f"Erreur lors du téléchargement depuis la caméra: {e}")
+            self._wakeup.wait(self.interval)
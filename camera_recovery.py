@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Récupération de la liaison USB/PTP avec l'appareil photo
+Chaque erreur est classée (appareil occupé, USB réclamé par un autre
+processus, délai dépassé, appareil déconnecté) et traitée par une action
+ciblée, avec une attente courte qui augmente à chaque échec. Le temps passé
+dans chaque état est mesuré.
+"""
+
+import os
+import re
+import time
+import glob
+import signal
+import logging
+import subprocess
+from typing import Optional, Dict, Any
+
+from camera_session import CameraError, release_usb_claimers
+
+logger = logging.getLogger('CameraRecovery')
+
+# Classes d'erreurs
+ERROR_BUSY = 'busy'
+ERROR_CLAIM = 'claim_failed'
+ERROR_TIMEOUT = 'timeout'
+ERROR_DISCONNECTED = 'disconnected'
+ERROR_OTHER = 'other'
+
+# États de la liaison
+STATE_CONNECTED = 'connected'
+STATE_RECOVERING = 'recovering'
+STATE_DISCONNECTED = 'disconnected'
+
+# Codes d'erreur libgphoto2
+_ERROR_CODES = {
+    -110: ERROR_BUSY,          # GP_ERROR_CAMERA_BUSY
+    -60: ERROR_BUSY,           # GP_ERROR_IO_LOCK
+    -53: ERROR_CLAIM,          # GP_ERROR_IO_USB_CLAIM
+    -10: ERROR_TIMEOUT,        # GP_ERROR_TIMEOUT
+    -7: ERROR_DISCONNECTED,    # GP_ERROR_IO (PTP I/O error)
+    -52: ERROR_DISCONNECTED,   # GP_ERROR_IO_USB_FIND
+    -105: ERROR_DISCONNECTED,  # GP_ERROR_MODEL_NOT_FOUND
+}
+
+# Messages (ligne de commande gphoto2 et backends) quand le code est absent
+_ERROR_PATTERNS = [
+    (re.compile(r'claim', re.IGNORECASE), ERROR_CLAIM),
+    (re.compile(r'busy|occup', re.IGNORECASE), ERROR_BUSY),
+    (re.compile(r'time.?out|délai', re.IGNORECASE), ERROR_TIMEOUT),
+    (re.compile(r'not found|could not detect|no camera|i/o|aucun appareil|déconnecté',
+                re.IGNORECASE), ERROR_DISCONNECTED),
+]
+
+# Actions successives par classe d'erreur (la dernière est répétée)
+ESCALATION = {
+    ERROR_BUSY: ['wait', 'wait', 'reopen'],
+    ERROR_CLAIM: ['release', 'stop_gphoto2', 'reset_usb'],
+    ERROR_TIMEOUT: ['reopen', 'reset_usb'],
+    ERROR_DISCONNECTED: ['reopen'],
+    ERROR_OTHER: ['reopen', 'reset_usb'],
+}
+
+
+def classify_error(error) -> str:
+    """Classe une erreur de communication avec l'appareil"""
+    code = getattr(error, 'code', None)
+    message = str(error)
+    if code is None:
+        # Sortie gphoto2: "*** Error (-53: 'Could not claim the USB device') ***"
+        match = re.search(r'Error \((-\d+)', message)
+        if match:
+            code = int(match.group(1))
+    if code in _ERROR_CODES:
+        return _ERROR_CODES[code]
+    for pattern, error_class in _ERROR_PATTERNS:
+        if pattern.search(message):
+            return error_class
+    return ERROR_OTHER
+
+
+def stop_stray_gphoto2():
+    """Termine (SIGTERM) les processus gphoto2 qui retiennent l'appareil"""
+    try:
+        result = subprocess.run(['pgrep', '-x', 'gphoto2'], capture_output=True, text=True)
+    except Exception as e:
+        logger.debug(f"Impossible de lister les processus gphoto2: {e}")
+        return 0
+
+    stopped = 0
+    for pid in result.stdout.split():
+        try:
+            os.kill(int(pid), signal.SIGTERM)
+            stopped += 1
+            logger.info(f"Processus gphoto2 {pid} arrêté")
+        except (ValueError, OSError) as e:
+            logger.debug(f"Impossible d'arrêter gphoto2 {pid}: {e}")
+    return stopped
+
+
+def _find_usb_devices(port: Optional[str] = None):
+    """Dossiers sysfs des appareils USB image/PTP (ou de celui du port usb:BUS,DEV)"""
+    wanted = None
+    if port:
+        match = re.match(r'usb:(\d+),(\d+)', port)
+        if match:
+            wanted = (int(match.group(1)), int(match.group(2)))
+
+    devices = []
+    for device in glob.glob('/sys/bus/usb/devices/*'):
+        try:
+            with open(os.path.join(device, 'busnum')) as f:
+                busnum = int(f.read())
+            with open(os.path.join(device, 'devnum')) as f:
+                devnum = int(f.read())
+        except (OSError, ValueError):
+            continue
+        if wanted:
+            if (busnum, devnum) == wanted:
+                devices.append(device)
+            continue
+        # Classe d'interface 06: image (PTP)
+        for interface_class in glob.glob(os.path.join(device, '*', 'bInterfaceClass')):
+            with open(interface_class) as f:
+                if f.read().strip() == '06':
+                    devices.append(device)
+                    break
+    return devices
+
+
+def reset_camera_usb(port: Optional[str] = None) -> bool:
+    """Réinitialise l'appareil USB en basculant son attribut sysfs 'authorized'"""
+    devices = _find_usb_devices(port)
+    if not devices:
+        logger.debug("Aucun appareil USB image trouvé pour la réinitialisation")
+        return False
+
+    reset = False
+    for device in devices:
+        authorized = os.path.join(device, 'authorized')
+        try:
+            with open(authorized, 'w') as f:
+                f.write('0')
+            time.sleep(0.2)
+            with open(authorized, 'w') as f:
+                f.write('1')
+            logger.info(f"Réinitialisation USB de {os.path.basename(device)}")
+            reset = True
+        except OSError as e:
+            logger.warning(f"Réinitialisation USB impossible ({e}). Pour reset manuellement: "
+                           f"sudo sh -c 'echo 0 > {authorized}; sleep 1; echo 1 > {authorized}'")
+    return reset
+
+
+class CameraRecovery:
+    """Machine d'états de récupération de la liaison avec l'appareil"""
+
+    def __init__(self, session=None, base_delay: float = 0.5, max_delay: float = 8.0,
+                 usb_reset: bool = True):
+        self.session = session
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.usb_reset = usb_reset
+        self.state = STATE_DISCONNECTED
+        self.failures = 0
+        self.last_error_class = None
+        self.last_error = None
+        self._state_since = time.monotonic()
+        self._recovery_started = None
+        self.time_in_state = {STATE_CONNECTED: 0.0, STATE_RECOVERING: 0.0, STATE_DISCONNECTED: 0.0}
+        self.error_counts = {}
+        self.action_counts = {}
+        self.recoveries = 0
+        self.last_recovery_time = None
+
+    def _set_state(self, state: str):
+        """Change d'état en cumulant le temps passé dans l'état précédent"""
+        now = time.monotonic()
+        self.time_in_state[self.state] += now - self._state_since
+        self._state_since = now
+        if state != self.state:
+            logger.debug(f"Liaison appareil: {self.state} -> {state}")
+            self.state = state
+
+    def record_success(self):
+        """L'appareil répond: fin de la récupération éventuelle"""
+        if self.state == STATE_RECOVERING and self._recovery_started is not None:
+            self.last_recovery_time = time.monotonic() - self._recovery_started
+            self.recoveries += 1
+            logger.info(f"Liaison avec l'appareil rétablie en {self.last_recovery_time:.1f}s "
+                        f"({self.last_error_class})")
+        self._recovery_started = None
+        self.failures = 0
+        self._set_state(STATE_CONNECTED)
+
+    def record_absent(self):
+        """Aucun appareil branché: ce n'est pas une erreur, aucune action"""
+        self._recovery_started = None
+        self.failures = 0
+        self._set_state(STATE_DISCONNECTED)
+
+    def handle_error(self, error) -> float:
+        """
+        Traite une erreur de communication: exécute l'action ciblée
+        Retourne le délai (secondes) à attendre avant la prochaine tentative
+        """
+        error_class = classify_error(error)
+        if error_class != self.last_error_class:
+            self.failures = 0
+        self.last_error_class = error_class
+        self.last_error = str(error)
+        self.error_counts[error_class] = self.error_counts.get(error_class, 0) + 1
+
+        if self._recovery_started is None:
+            self._recovery_started = time.monotonic()
+        self._set_state(STATE_RECOVERING)
+
+        actions = ESCALATION[error_class]
+        action = actions[min(self.failures, len(actions) - 1)]
+        if action == 'reset_usb' and not self.usb_reset:
+            action = 'reopen'
+        delay = min(self.max_delay, self.base_delay * (2 ** self.failures))
+        self.failures += 1
+
+        logger.warning(f"Erreur appareil ({error_class}): {error} -> {action}, "
+                       f"nouvelle tentative dans {delay:.1f}s")
+        self._run_action(action)
+        return delay
+
+    def _run_action(self, action: str):
+        """Exécute une action de récupération"""
+        self.action_counts[action] = self.action_counts.get(action, 0) + 1
+        port = self.session.port if self.session else None
+
+        if action in ('reopen', 'release', 'stop_gphoto2', 'reset_usb') and self.session:
+            self.session.close()
+        if action == 'release':
+            release_usb_claimers()
+        elif action == 'stop_gphoto2':
+            release_usb_claimers()
+            stop_stray_gphoto2()
+        elif action == 'reset_usb':
+            reset_camera_usb(port)
+
+    def recover(self, error):
+        """Traite une erreur puis attend le délai de la prochaine tentative"""
+        time.sleep(self.handle_error(error))
+
+    def metrics(self) -> Dict[str, Any]:
+        """Temps passé par état, erreurs par classe et durée des récupérations"""
+        time_in_state = dict(self.time_in_state)
+        time_in_state[self.state] += time.monotonic() - self._state_since
+        return {
+            'state': self.state,
+            'time_in_state': {state: round(seconds, 3) for state, seconds in time_in_state.items()},
+            'errors': dict(self.error_counts),
+            'actions': dict(self.action_counts),
+            'recoveries': self.recoveries,
+            'last_recovery_time': self.last_recovery_time,
+            'last_error': self.last_error,
+            'last_error_class': self.last_error_class
+        }
+
+
+def create_camera_recovery(config: Dict[str, Any], session=None) -> CameraRecovery:
+    """Factory function pour créer la récupération de liaison configurée"""
+    camera_config = config.get('camera', {})
+    return CameraRecovery(
+        session,
+        base_delay=camera_config.get('recovery_base_delay', 0.5),
+        max_delay=camera_config.get('recovery_max_delay', 8.0),
+        usb_reset=camera_config.get('recovery_usb_reset', True)
+    )
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Accès à l'appareil photo via une session libgphoto2 persistante
+Une seule session USB/PTP est ouverte puis réutilisée pour la détection,
+le listage, le téléchargement et la suppression des fichiers
+"""
+
+import os
+import abc
+import time
+import shutil
+import logging
+import threading
+import subprocess
+from typing import Optional, Dict, Any, List, Iterator
+
+# Import python-gphoto2 avec gestion d'erreur
+try:
+    import gphoto2 as gp
+    GPHOTO2_SUPPORT = True
+except ImportError:
+    GPHOTO2_SUPPORT = False
+    gp = None
+
+logger = logging.getLogger('CameraSession')
+
+# Types d'événements remontés par wait_for_event
+EVENT_FILE_ADDED = 'file_added'
+EVENT_CAPTURE_COMPLETE = 'capture_complete'
+EVENT_TIMEOUT = 'timeout'
+EVENT_OTHER = 'other'
+
+# Processus qui réclament l'appareil photo dès son branchement
+GVFS_PROCESSES = [
+    "gvfs-gphoto2-volume-monitor",
+    "gvfs-udisks2-volume-monitor",
+    "gvfs-mtp-volume-monitor"
+]
+
+
+class CameraError(Exception):
+    """Erreur de communication avec l'appareil photo"""
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+def release_usb_claimers():
+    """Arrête les processus gvfs qui peuvent bloquer l'accès USB à l'appareil"""
+    for process in GVFS_PROCESSES:
+        try:
+            result = subprocess.run(['pkill', '-f', process],
+                                    capture_output=True, text=True)
+            if result.returncode == 0:
+                logger.info(f"Processus {process} arrêté")
+        except Exception as e:
+            logger.debug(f"Impossible d'arrêter {process}: {e}")
+
+
+class CameraBackend(abc.ABC):
+    """
+    Interface commune des backends d'accès à l'appareil photo
+    Un backend incomplet échoue dès sa création, pas au milieu d'un transfert
+    """
+
+    name = 'base'
+
+    @abc.abstractmethod
+    def detect(self) -> List[Dict[str, str]]:
+        """Retourne la liste des appareils connectés ({'model', 'port'})"""
+
+    @abc.abstractmethod
+    def open(self, port: Optional[str] = None):
+        """Ouvre la session avec l'appareil (port USB optionnel)"""
+
+    @abc.abstractmethod
+    def close(self):
+        """Ferme la session avec l'appareil"""
+
+    @abc.abstractmethod
+    def list_folders(self, folder: str) -> List[str]:
+        """Liste les sous-dossiers d'un dossier de l'appareil"""
+
+    @abc.abstractmethod
+    def list_files(self, folder: str) -> List[str]:
+        """Liste les fichiers d'un dossier de l'appareil"""
+
+    @abc.abstractmethod
+    def file_info(self, folder: str, name: str) -> Dict[str, Any]:
+        """Retourne la taille et la date de prise de vue d'un fichier"""
+
+    @abc.abstractmethod
+    def download(self, folder: str, name: str, dest_path: str):
+        """Télécharge un fichier de l'appareil vers dest_path"""
+
+    @abc.abstractmethod
+    def read(self, folder: str, name: str, offset: int, size: int) -> bytes:
+        """Lit au plus size octets d'un fichier de l'appareil à partir de offset"""
+
+    @abc.abstractmethod
+    def delete(self, folder: str, name: str):
+        """Supprime un fichier de l'appareil"""
+
+    @abc.abstractmethod
+    def wait_for_event(self, timeout_ms: int) -> Dict[str, Any]:
+        """Attend un événement de l'appareil ({'type', 'folder', 'name'})"""
+
+    def serial_number(self) -> Optional[str]:
+        """Numéro de série du boîtier (None si inconnu)"""
+        return None
+
+
+class GPhoto2Backend(CameraBackend):
+    """Backend natif basé sur les bindings python-gphoto2"""
+
+    name = 'gphoto2'
+
+    def __init__(self):
+        if not GPHOTO2_SUPPORT:
+            raise CameraError("python-gphoto2 non disponible")
+        self.camera = None
+
+    def _call(self, func, *args):
+        """Exécute un appel libgphoto2 en convertissant les erreurs"""
+        try:
+            return func(*args)
+        except gp.GPhoto2Error as e:
+            raise CameraError(str(e), e.code)
+
+    def detect(self):
+        cameras = self._call(gp.Camera.autodetect)
+        return [{'model': model, 'port': port} for model, port in cameras]
+
+    def open(self, port=None):
+        camera = gp.Camera()
+        if port:
+            port_info_list = gp.PortInfoList()
+            port_info_list.load()
+            index = self._call(port_info_list.lookup_path, port)
+            camera.set_port_info(port_info_list[index])
+        self._call(camera.init)
+        self.camera = camera
+
+    def close(self):
+        if self.camera:
+            try:
+                self.camera.exit()
+            except gp.GPhoto2Error:
+                pass
+            finally:
+                self.camera = None
+
+    def list_folders(self, folder):
+        return [name for name, _ in self._call(self.camera.folder_list_folders, folder)]
+
+    def list_files(self, folder):
+        return [name for name, _ in self._call(self.camera.folder_list_files, folder)]
+
+    def file_info(self, folder, name):
+        info = self._call(self.camera.file_get_info, folder, name)
+        return {'size': info.file.size, 'mtime': info.file.mtime}
+
+    def download(self, folder, name, dest_path):
+        camera_file = self._call(self.camera.file_get, folder, name, gp.GP_FILE_TYPE_NORMAL)
+        self._call(camera_file.save, dest_path)
+
+    def read(self, folder, name, offset, size):
+        buf = bytearray(size)
+        count = self._call(self.camera.file_read, folder, name, gp.GP_FILE_TYPE_NORMAL, offset, buf)
+        return bytes(buf[:count])
+
+    def delete(self, folder, name):
+        self._call(self.camera.file_delete, folder, name)
+
+    def wait_for_event(self, timeout_ms):
+        event_type, event_data = self._call(self.camera.wait_for_event, timeout_ms)
+        if event_type == gp.GP_EVENT_FILE_ADDED:
+            return {'type': EVENT_FILE_ADDED, 'folder': event_data.folder, 'name': event_data.name}
+        if event_type == gp.GP_EVENT_CAPTURE_COMPLETE:
+            return {'type': EVENT_CAPTURE_COMPLETE}
+        if event_type == gp.GP_EVENT_TIMEOUT:
+            return {'type': EVENT_TIMEOUT}
+        return {'type': EVENT_OTHER}
+
+    def serial_number(self):
+        try:
+            return str(self.camera.get_single_config('serialnumber').get_value()).strip() or None
+        except gp.GPhoto2Error:
+            return None
+
+
+class FakeCameraBackend(CameraBackend):
+    """Backend simulé: un dossier local joue le rôle de la carte mémoire (tests)"""
+
+    name = 'fake'
+
+    def __init__(self, root: str, model: str = 'Fake Camera', port: str = 'usb:001,001',
+                 serial: Optional[str] = None):
+        self.root = root
+        self.model = model
+        self.port = port
+        self.serial = serial
+        self.is_open = False
+        self.open_count = 0
+        self._known_files = set()
+
+    def _path(self, folder, name=''):
+        return os.path.join(self.root, folder.lstrip('/'), name)
+
+    def _require_open(self):
+        if not self.is_open:
+            raise CameraError("Session non ouverte")
+        if not os.path.isdir(self.root):
+            self.is_open = False
+            raise CameraError("Appareil déconnecté")
+
+    def detect(self):
+        if os.path.isdir(self.root):
+            return [{'model': self.model, 'port': self.port}]
+        return []
+
+    def open(self, port=None):
+        if not os.path.isdir(self.root):
+            raise CameraError("Aucun appareil détecté")
+        self.is_open = True
+        self.open_count += 1
+        self._known_files = set(self._walk())
+
+    def close(self):
+        self.is_open = False
+
+    def list_folders(self, folder):
+        self._require_open()
+        path = self._path(folder)
+        return sorted(entry.name for entry in os.scandir(path) if entry.is_dir())
+
+    def list_files(self, folder):
+        self._require_open()
+        path = self._path(folder)
+        return sorted(entry.name for entry in os.scandir(path) if entry.is_file())
+
+    def file_info(self, folder, name):
+        self._require_open()
+        try:
+            stat = os.stat(self._path(folder, name))
+        except FileNotFoundError:
+            raise CameraError(f"Fichier introuvable: {folder}/{name}")
+        return {'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+    def download(self, folder, name, dest_path):
+        self._require_open()
+        # Date de l'objet conservée, comme gp_file_save
+        shutil.copy2(self._path(folder, name), dest_path)
+
+    def read(self, folder, name, offset, size):
+        self._require_open()
+        with open(self._path(folder, name), 'rb') as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def delete(self, folder, name):
+        self._require_open()
+        try:
+            os.unlink(self._path(folder, name))
+        except FileNotFoundError:
+            raise CameraError(f"Fichier introuvable: {folder}/{name}")
+
+    def _walk(self):
+        """Liste (dossier, nom) de tous les fichiers de la fausse carte"""
+        for dirpath, _, filenames in os.walk(self.root):
+            folder = '/' + os.path.relpath(dirpath, self.root).replace(os.sep, '/').lstrip('.')
+            for name in filenames:
+                yield (folder.rstrip('/') or '/', name)
+
+    def wait_for_event(self, timeout_ms):
+        deadline = time.time() + timeout_ms / 1000.0
+        while True:
+            self._require_open()
+            current = set(self._walk())
+            added = sorted(current - self._known_files)
+            self._known_files = current - set(added[1:])
+            if added:
+                folder, name = added[0]
+                return {'type': EVENT_FILE_ADDED, 'folder': folder, 'name': name}
+            if time.time() >= deadline:
+                return {'type': EVENT_TIMEOUT}
+            time.sleep(0.05)
+
+    def serial_number(self):
+        return self.serial
+
+
+class CameraSession:
+    """Session persistante avec un appareil photo, partagée entre les opérations"""
+
+    def __init__(self, backend: CameraBackend, port: Optional[str] = None):
+        self.backend = backend
+        self.port = port
+        self.model = None
+        self.is_open = False
+        self.last_error = None
+        self.lock = threading.RLock()
+
+    def __enter__(self):
+        self.ensure_open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def detect(self) -> List[Dict[str, str]]:
+        """Liste les appareils connectés (sans ouvrir de session)"""
+        with self.lock:
+            try:
+                return self.backend.detect()
+            except CameraError as e:
+                logger.debug(f"Erreur de détection: {e}")
+                return []
+
+    def ensure_open(self) -> bool:
+        """Ouvre la session si nécessaire; retourne False si aucun appareil"""
+        with self.lock:
+            if self.is_open:
+                return True
+
+            self.last_error = None
+            cameras = self.detect()
+            if self.port:
+                cameras = [c for c in cameras if c['port'] == self.port]
+            if not cameras:
+                logger.debug("Aucune caméra détectée")
+                return False
+
+            try:
+                self.backend.open(self.port)
+            except CameraError as e:
+                logger.warning(f"Impossible d'ouvrir la session avec l'appareil: {e}")
+                self.last_error = e
+                return False
+
+            self.model = cameras[0]['model']
+            self.is_open = True
+            logger.info(f"Session ouverte avec {self.model} ({cameras[0]['port']})")
+            return True
+
+    def close(self):
+        """Ferme la session avec l'appareil"""
+        with self.lock:
+            if self.is_open:
+                self.backend.close()
+                self.is_open = False
+                logger.info("Session appareil photo fermée")
+
+    def _run(self, func, *args):
+        """Exécute une opération; la session est fermée si l'appareil ne répond plus"""
+        with self.lock:
+            if not self.ensure_open():
+                raise CameraError("Aucun appareil photo connecté")
+            try:
+                return func(*args)
+            except CameraError as e:
+                self.backend.close()
+                self.is_open = False
+                self.last_error = e
+                raise
+
+    def list_files(self, folder: str = '/', with_info: bool = True) -> List[Dict[str, Any]]:
+        """Liste récursivement les fichiers de l'appareil"""
+        files = []
+        for name in self._run(self.backend.list_files, folder):
+            entry = {'folder': folder, 'name': name}
+            if with_info:
+                entry.update(self._run(self.backend.file_info, folder, name))
+            files.append(entry)
+
+        for subfolder in self._run(self.backend.list_folders, folder):
+            files.extend(self.list_files(os.path.join(folder, subfolder), with_info))
+
+        return files
+
+    def file_info(self, folder: str, name: str) -> Dict[str, Any]:
+        """Retourne la taille et la date de prise de vue d'un fichier"""
+        return self._run(self.backend.file_info, folder, name)
+
+    def download(self, camera_file: Dict[str, Any], dest_dir: str,
+                 filename: Optional[str] = None) -> str:
+        """Télécharge un fichier de l'appareil et retourne le chemin local"""
+        dest_path = os.path.join(dest_dir, filename or camera_file['name'])
+        temp_path = dest_path + '.part'
+        try:
+            self._run(self.backend.download, camera_file['folder'], camera_file['name'], temp_path)
+            os.replace(temp_path, dest_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        return dest_path
+
+    def iter_chunks(self, camera_file: Dict[str, Any], chunk_size: int = 1024 * 1024,
+                    end: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Lit un fichier de l'appareil par morceaux, sans l'écrire sur disque
+        (seulement ses end premiers octets si end est précisé)
+        La session n'est verrouillée que le temps de la lecture de chaque morceau
+        """
+        offset = 0
+        while end is None or offset < end:
+            size = chunk_size if end is None else min(chunk_size, end - offset)
+            data = self._run(self.backend.read, camera_file['folder'], camera_file['name'],
+                             offset, size)
+            if not data:
+                break
+            yield data
+            offset += len(data)
+            if len(data) < size:
+                break
+
+    def delete(self, camera_file: Dict[str, Any]):
+        """Supprime un fichier de l'appareil"""
+        self._run(self.backend.delete, camera_file['folder'], camera_file['name'])
+
+    def wait_for_event(self, timeout: float = 1.0) -> Dict[str, Any]:
+        """Attend le prochain événement de l'appareil (au plus timeout secondes)"""
+        return self._run(self.backend.wait_for_event, int(timeout * 1000))
+
+    def serial_number(self) -> Optional[str]:
+        """Numéro de série du boîtier (None si inconnu)"""
+        return self._run(self.backend.serial_number)
+
+
+def create_camera_backend(config: Dict[str, Any]) -> Optional[CameraBackend]:
+    """Crée le backend configuré (camera.backend: 'gphoto2' ou 'fake')"""
+    camera_config = config.get('camera', {})
+    backend = camera_config.get('backend', 'gphoto2').lower()
+
+    if backend == 'fake':
+        return FakeCameraBackend(camera_config.get('fake_camera_path', '/tmp/fake_camera'))
+
+    if backend == 'gphoto2' and GPHOTO2_SUPPORT:
+        return GPhoto2Backend()
+
+    if backend != 'gphoto2':
+        logger.warning(f"Backend caméra invalide '{backend}'")
+    else:
+        logger.info("python-gphoto2 non disponible, utilisation de la ligne de commande gphoto2")
+    return None
+
+
+def create_camera_session(config: Dict[str, Any], port: Optional[str] = None) -> Optional[CameraSession]:
+    """Factory function pour créer une session caméra (None si indisponible)"""
+    backend = create_camera_backend(config)
+    if backend is None:
+        return None
+    return CameraSession(backend, port=port)
@@ -0,0 +1,308 @@
+"""
+Transfert direct appareil photo → serveur, sans attendre la fin du téléchargement
+Le fichier est lu par morceaux dans la session libgphoto2 et envoyé sur le
+canal de données à travers un tampon borné. Chaque morceau est haché et vérifié
+au passage (empreinte du registre des transferts, en-tête et fin de la photo):
+rien n'est écrit localement tant que l'upload avance. Si l'upload se bloque, la
+suite du flux est écrite dans le dossier local; s'il échoue, la photo y est
+téléchargée. Le fichier distant porte un nom temporaire jusqu'à la fin de l'envoi.
+"""
+
+import os
+import time
+import hashlib
+import queue
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+from camera_session import CameraError, CameraSession
+from simple_transfer import create_transfer
+from photo_validator import STATUS_CORRUPT, STATUS_EMPTY
+from spool import INCOMING, PART_SUFFIX, incoming_path
+
+logger = logging.getLogger('CameraStream')
+
+# Marqueur de fin de flux dans le tampon
+_END_OF_STREAM = None
+
+
+class StreamAborted(IOError):
+    """Flux interrompu (upload bloqué ou lecture de l'appareil impossible)"""
+
+
+class StreamBuffer:
+    """Tampon borné entre la lecture de l'appareil et le canal de données"""
+
+    def __init__(self, max_chunks: int = 8, stall_timeout: float = 10.0):
+        self._queue = queue.Queue(max(1, max_chunks))
+        self._pending = b''
+        self._eof = False
+        self.stall_timeout = stall_timeout
+        self.aborted = threading.Event()
+        self.consumer_done = threading.Event()
+
+    def write(self, chunk: Optional[bytes]) -> bool:
+        """Ajoute un morceau; retourne False si l'upload ne le consomme pas à temps"""
+        deadline = time.time() + self.stall_timeout
+        while not self.consumer_done.is_set():
+            try:
+                self._queue.put(chunk, timeout=0.1)
+                return True
+            except queue.Full:
+                if time.time() >= deadline:
+                    return False
+        return False
+
+    def close(self) -> bool:
+        """Signale la fin du fichier"""
+        return self.write(_END_OF_STREAM)
+
+    def abort(self):
+        """Interrompt le flux: la prochaine lecture de l'upload échoue"""
+        self.aborted.set()
+
+    def read(self, size: int = -1) -> bytes:
+        """Lecture côté upload (interface fichier pour storbinary/putfo)"""
+        while not self._eof and (size < 0 or len(self._pending) < size):
+            if self.aborted.is_set():
+                raise StreamAborted("Flux interrompu")
+            try:
+                chunk = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if chunk is _END_OF_STREAM:
+                self._eof = True
+            else:
+                self._pending += chunk
+
+        if self.aborted.is_set():
+            raise StreamAborted("Flux interrompu")
+        if size < 0:
+            data, self._pending = self._pending, b''
+        else:
+            data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+class CameraStreamer:
+    """Envoie les fichiers de l'appareil directement vers le serveur"""
+
+    def __init__(self, session: CameraSession, transfer, remote_dir: str, spool_dir: str,
+                 index=None, chunk_size: int = 1024 * 1024, buffer_size: int = 8 * 1024 * 1024,
+                 stall_timeout: float = 10.0, spool=None, ledger=None, stats=None,
+                 validator=None):
+        self.session = session
+        # Connexion dédiée: le transfert des fichiers locaux garde la sienne
+        self.transfer = transfer
+        self.remote_dir = remote_dir
+        self.spool_dir = spool_dir
+        self.index = index
+        self.chunk_size = chunk_size
+        self.max_chunks = max(1, buffer_size // chunk_size)
+        self.stall_timeout = stall_timeout
+        # Mêmes étapes que le transfert des fichiers locaux (tous optionnels)
+        self.spool = spool
+        self.ledger = ledger
+        self.stats = stats
+        self.validator = validator
+        self._dir_ready = False
+
+    def _prepare(self) -> bool:
+        """Connexion au serveur et répertoire distant (une seule fois par connexion)"""
+        if self._dir_ready and self.transfer.is_connected():
+            return True
+        if not self.transfer.connect():
+            return False
+        self._dir_ready = self.transfer.ensure_dir(self.remote_dir)
+        return self._dir_ready
+
+    def _open_part(self, camera_file: Dict[str, Any], filename: str, offset: int):
+        """
+        Fichier partiel local d'un upload bloqué: le début déjà envoyé
+        (offset octets) est relu sur l'appareil, la suite vient du flux
+        """
+        os.makedirs(self.spool_dir, exist_ok=True)
+        part_path = os.path.join(self.spool_dir, filename + PART_SUFFIX)
+        local_file = open(part_path, 'wb')
+        try:
+            for chunk in self.session.iter_chunks(camera_file, self.chunk_size, end=offset):
+                local_file.write(chunk)
+        except Exception:
+            local_file.close()
+            os.unlink(part_path)
+            raise
+        return local_file, part_path
+
+    def _stream(self, camera_file: Dict[str, Any], remote_path: str, filename: str,
+                digest, check):
+        """
+        Pompe le fichier de l'appareil vers l'upload, en le hachant et en le vérifiant
+        Retourne (upload abouti, octets envoyés, fichier partiel local ou None)
+        """
+        buffer = StreamBuffer(self.max_chunks, self.stall_timeout)
+        result = {'success': False}
+
+        def upload():
+            try:
+                result['success'] = self.transfer.upload_stream(buffer, remote_path,
+                                                                blocksize=self.chunk_size)
+            finally:
+                buffer.consumer_done.set()
+
+        upload_thread = threading.Thread(target=upload, daemon=True)
+        upload_thread.start()
+        sent = 0
+        local_file = part_path = None
+        try:
+            for chunk in self.session.iter_chunks(camera_file, self.chunk_size):
+                if local_file is None:
+                    if buffer.write(chunk):
+                        digest.update(chunk)
+                        if check:
+                            check.update(chunk)
+                        sent += len(chunk)
+                        continue
+                    logger.warning(f"Upload bloqué ou interrompu pour {camera_file['name']}, "
+                                   "repli sur le dossier local")
+                    buffer.abort()
+                    local_file, part_path = self._open_part(camera_file, filename, sent)
+                local_file.write(chunk)
+            closed = local_file is None and buffer.close()
+            if not closed:
+                buffer.abort()
+        except Exception:
+            buffer.abort()
+            upload_thread.join(timeout=self.stall_timeout)
+            if local_file:
+                local_file.close()
+                os.unlink(part_path)
+            raise
+        finally:
+            if local_file:
+                local_file.close()
+
+        upload_thread.join(timeout=self.stall_timeout)
+        if upload_thread.is_alive():
+            buffer.abort()
+            self.transfer.disconnect()
+            self._dir_ready = False
+            return False, sent, part_path
+        if not result['success']:
+            self._dir_ready = False
+        return closed and result['success'], sent, part_path
+
+    def _is_valid(self, check, filename: str) -> bool:
+        """Validation structurelle du flux envoyé avant de publier le fichier distant"""
+        if not check:
+            return True
+        verdict = check.verdict(filename)
+        if verdict['status'] in (STATUS_CORRUPT, STATUS_EMPTY):
+            logger.warning(f"Fichier invalide {filename}: {verdict['reason']}")
+            return False
+        return True
+
+    def _discard_remote(self, temp_path: str):
+        """Supprime le fichier distant temporaire d'un envoi abandonné"""
+        if self.transfer.is_connected():
+            self.transfer.delete_remote(temp_path)
+        else:
+            # Connexion perdue: le fichier partiel garde son nom temporaire
+            logger.debug(f"Fichier distant temporaire non supprimé: {temp_path}")
+
+    def _record(self, camera_file: Dict[str, Any], filename: str, remote_path: str,
+                digest: str, size: int, duration: float):
+        """Registre (empreinte calculée au fil du flux), statistiques et index d'un envoi direct"""
+        if self.ledger:
+            self.ledger.record_digest(digest, remote_path, size)
+            self.ledger.save()
+        if self.stats:
+            self.stats.record(size, duration, name=filename)
+        if self.index:
+            self.index.mark_streamed(camera_file, remote_path)
+            self.index.save()
+
+    def _keep_local(self, camera_file: Dict[str, Any], part_path: Optional[str],
+                    filename: str) -> str:
+        """
+        Copie locale dans incoming/ (transférée ensuite normalement): le fichier
+        partiel d'un upload bloqué, sinon la photo téléchargée depuis l'appareil
+        """
+        if part_path is None:
+            part_path = self.session.download(camera_file, self.spool_dir, filename + PART_SUFFIX)
+        if self.spool:
+            return self.spool.move(part_path, INCOMING, filename)
+        local_path = os.path.join(self.spool_dir, filename)
+        os.replace(part_path, local_path)
+        return local_path
+
+    def send(self, camera_file: Dict[str, Any], filename: Optional[str] = None) -> Optional[str]:
+        """
+        Transfère un fichier de l'appareil vers le serveur
+        Retourne None s'il a été envoyé directement, sinon le chemin du fichier
+        écrit dans le dossier local (à transférer ensuite normalement)
+        """
+        filename = filename or camera_file['name']
+        remote_path = os.path.join(self.remote_dir, filename).replace('\\', '/')
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        if not self._prepare():
+            local_path = self.session.download(camera_file, self.spool_dir, filename)
+        else:
+            # Nom temporaire: un upload interrompu ne laisse jamais de fichier tronqué sous le nom final
+            temp_path = remote_path + PART_SUFFIX
+            digest = hashlib.sha256()
+            check = self.validator.stream_check() if self.validator else None
+            started = time.monotonic()
+            try:
+                streamed, size, part_path = self._stream(camera_file, temp_path, filename,
+                                                         digest, check)
+            except Exception:
+                self._discard_remote(temp_path)
+                raise
+
+            if (streamed and self._is_valid(check, filename)
+                    and self.transfer.rename_remote(temp_path, remote_path)):
+                logger.info(f"Photo envoyée directement depuis l'appareil: {camera_file['name']}")
+                self._record(camera_file, filename, remote_path, digest.hexdigest(), size,
+                             time.monotonic() - started)
+                return None
+            # Repli: la copie locale suit le chemin normal (validation et quarantaine comprises)
+            self._discard_remote(temp_path)
+            local_path = self._keep_local(camera_file, part_path, filename)
+
+        if self.index:
+            self.index.mark_downloaded(camera_file, local_path)
+            self.index.save()
+        return local_path
+
+    def close(self):
+        """Ferme la connexion dédiée au flux direct"""
+        self.transfer.disconnect()
+        self._dir_ready = False
+
+
+def create_camera_streamer(config: Dict[str, Any], session: Optional[CameraSession],
+                           index=None, spool=None, ledger=None, stats=None,
+                           validator=None) -> Optional[CameraStreamer]:
+    """
+    Factory function pour créer le transfert direct (None si désactivé)
+    spool, ledger, stats et validator: ceux du service de transfert, pour que les
+    photos envoyées directement suivent les mêmes étapes que les autres
+    """
+    camera_config = config.get('camera', {})
+    if session is None or not camera_config.get('stream_upload', False):
+        return None
+    return CameraStreamer(
+        session,
+        create_transfer(config),
+        remote_dir=config.get('ftp', {}).get('directory', 'photos'),
+        spool_dir=spool.dir(INCOMING) if spool else incoming_path(config),
+        index=index,
+        buffer_size=int(camera_config.get('stream_buffer_mb', 8) * 1024 * 1024),
+        stall_timeout=camera_config.get('stream_stall_timeout', 10),
+        spool=spool,
+        ledger=ledger,
+        stats=stats,
+        validator=validator
+    )
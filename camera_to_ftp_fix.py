@@ -11,6 +11,8 @@ import subprocess
 import logging
 from datetime import datetime
 
+from file_types import add_extension
+
 # Configuration du logging
 logging.basicConfig(
     level=logging.INFO,
@@ -80,14 +82,11 @@ def download_from_camera(download_path):
             # Détecter et corriger les fichiers sans extension
             elif os.path.isfile(file_path) and os.path.getsize(file_path) > 100:
                 try:
-                    with open(file_path, 'rb') as img_file:
-                        header = img_file.read(10)
-                        # En-tête JPEG: FF D8 FF
-                        if header[0:3] == b'\xff\xd8\xff':
-                            new_path = file_path + '.jpg'
-                            os.rename(file_path, new_path)
-                            photos.append(new_path)
-                            logger.info(f"✅ Fichier JPEG détecté et renommé: {filename} -> {filename}.jpg")
+                    # Extension ajoutée selon le type détecté (fichier ignoré si inconnu)
+                    new_path = add_extension(file_path)
+                    if new_path:
+                        photos.append(new_path)
+                        logger.info(f"✅ Fichier photo détecté: {filename} -> {os.path.basename(new_path)}")
                 except Exception as e:
                     logger.warning(f"⚠️ Erreur lors de la vérification du fichier {filename}: {e}")
                     
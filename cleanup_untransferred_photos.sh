@@ -1,17 +1,11 @@
 #!/bin/bash
-# Script de nettoyage des fichiers non transférés dans /tmp/photos
-# Supprime tous les fichiers qui ne sont pas .jpg/.jpeg (donc non transférés)
+# Script de nettoyage du dossier local des photos
+# Applique les quotas de rétention de config.json (âge, taille): les photos
+# transférées (done/) sont supprimées en premier, les photos non transférées
+# ne le sont que si retention_evict_unsent est activé
 
-PHOTO_DIR="/tmp/photos"
+cd "$(dirname "$0")" || exit 1
 
-cd "$PHOTO_DIR" || exit 1
-
-# Supprimer tous les fichiers qui ne sont pas .jpg ou .jpeg
-for f in *; do
-    if [ -f "$f" ] && [[ ! "$f" =~ \.(jpg|jpeg|JPG|JPEG)$ ]]; then
-        echo "Suppression du fichier non transféré: $f"
-        rm -f "$f"
-    fi
-done
+python3 retention.py config.json
 
 echo "Nettoyage terminé."
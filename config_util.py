@@ -70,14 +70,57 @@ def create_default_config(config_path="config.json"):
         "camera": {
             "auto_detect": True,
             "download_path": "/tmp/photos",
-            "delete_after_upload": False
+            "delete_after_upload": False,
+            "backend": "gphoto2",
+            "ingest_mode": "poll",
+            "index_path": "data/camera_index.json",
+            "delete_from_camera": False,
+            "delete_batch_size": 50,
+            "stream_upload": False,
+            "stream_buffer_mb": 8,
+            "stream_stall_timeout": 10,
+            "recovery_base_delay": 0.5,
+            "recovery_max_delay": 8.0,
+            "recovery_usb_reset": True,
+            "multi_camera": False,
+            "body_names": {},
+            "raw_preview": False
         },
         "system": {
             "log_level": "INFO",
             "check_interval": 5,
             "max_retries": 3,
             "web_port": 8080,
-            "web_host": "0.0.0.0"
+            "web_host": "0.0.0.0",
+            "inotify": True,
+            "transfer_workers": 2,
+            "transfer_queue_size": 100,
+            "transfer_retry_delay": 5,
+            "validate_before_upload": True,
+            "validate_raw": True,
+            "dedupe": "skip",
+            "dedupe_index_path": "data/upload_ledger.json",
+            "retention_max_age_hours": 24,
+            "retention_max_mb": 0,
+            "retention_evict_unsent": False,
+            "spool_pause_free_mb": 500,
+            "spool_resume_free_mb": 1000,
+            "status_probe_interval": 30,
+            "live_interval": 1.0,
+            "log_files": {
+                "transfer": "logs/photo_transfer.log",
+                "webui": "logs/webui.log",
+                "auto_transfer": "/home/server01/projet_ftp/Projet_FTP/logs/auto_transfer.log",
+                "d800_download": "/home/server01/projet_ftp/Projet_FTP/logs/d800_download.log"
+            },
+            "log_max_rotated": 5,
+            "control_socket": "data/photo_transfer.sock",
+            "stats_db_path": "data/transfer_stats.db",
+            "stats_flush_interval": 10,
+            "thumbnail_cache_dir": "data/thumbnails",
+            "thumbnail_cache_mb": 200,
+            "thumbnail_workers": 2,
+            "thumbnail_size": 320
         }
     }
     
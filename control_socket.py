@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Socket de contrôle local du service de transfert
+Le service de transfert tourne dans son propre processus et répond sur un
+socket Unix (une requête JSON par ligne, une réponse JSON par ligne): état,
+démarrage/arrêt, mise en file, statistiques, rechargement de la configuration.
+L'interface web n'en est qu'un client: une page lente ou de nombreux onglets
+ne touchent jamais la boucle de transfert ni sa connexion au serveur.
+"""
+
+import os
+import json
+import socket
+import logging
+import threading
+import socketserver
+from typing import Optional, Dict, Any, Callable, List
+
+from config_util import load_config
+from spool import create_spool
+from transfer_stats import create_transfer_stats
+
+logger = logging.getLogger('ControlSocket')
+
+DEFAULT_SOCKET_PATH = 'data/photo_transfer.sock'
+# Taille maximale d'une requête (une ligne JSON)
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+class ControlError(Exception):
+    """Service injoignable ou commande refusée"""
+    pass
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    """Connexion d'un client: requêtes traitées ligne par ligne jusqu'à sa fermeture"""
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_BYTES)
+            if not line:
+                return
+            try:
+                request = json.loads(line)
+                handler = self.server.handlers.get(request.get('command'))
+                if handler is None:
+                    raise ControlError(f"Commande inconnue: {request.get('command')}")
+                response = {'ok': True, 'result': handler(**request.get('args', {}))}
+            except Exception as e:
+                logger.warning(f"Commande de contrôle en échec: {e}")
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlServer:
+    """Expose des commandes du service sur un socket Unix (un thread par client)"""
+
+    def __init__(self, path: str, handlers: Dict[str, Callable[..., Any]]):
+        self.path = path
+        self.handlers = handlers
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """Crée le socket (en remplaçant celui d'un processus précédent) et répond aux clients"""
+        if self.server:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = _ThreadingUnixServer(self.path, _ControlHandler)
+        self.server.handlers = self.handlers
+        # Accès réservé à l'utilisateur du service et à son groupe
+        os.chmod(self.path, 0o660)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True,
+                                       name='control-socket')
+        self.thread.start()
+        logger.info(f"Socket de contrôle disponible: {self.path}")
+
+    def stop(self):
+        """Ferme le socket"""
+        if not self.server:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class ControlClient:
+    """Client du socket de contrôle (une connexion par commande)"""
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+
+    def call(self, command: str, timeout: Optional[float] = None, **args) -> Any:
+        """Exécute une commande du service; lève ControlError s'il est injoignable ou refuse"""
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout or self.timeout)
+                sock.connect(self.path)
+                sock.sendall(json.dumps({'command': command, 'args': args}).encode('utf-8') + b'\n')
+                with sock.makefile('rb') as reader:
+                    line = reader.readline(MAX_REQUEST_BYTES)
+        except OSError as e:
+            raise ControlError(f"Service de transfert injoignable ({self.path}): {e}")
+        if not line:
+            raise ControlError("Réponse vide du service de transfert")
+        try:
+            response = json.loads(line)
+        except ValueError as e:
+            raise ControlError(f"Réponse invalide du service de transfert: {e}")
+        if not isinstance(response, dict):
+            raise ControlError("Réponse invalide du service de transfert")
+        if not response.get('ok'):
+            raise ControlError(response.get('error', 'Erreur inconnue'))
+        return response.get('result')
+
+
+class ServiceClient:
+    """
+    Service de transfert vu depuis un autre processus (interface web)
+    Le spool et les statistiques sont des fichiers partagés, lus directement;
+    tout le reste (transferts compris) passe par le socket de contrôle.
+    """
+
+    def __init__(self, config_path: str = "config.json"):
+        self.config_path = config_path
+        self.config = None
+        self.client = None
+        self.spool = None
+        self.transfer_stats = None
+        self.reload_config()
+
+    def reload_config(self):
+        """Relit la configuration locale (le service est rechargé par reload())"""
+        self.config = load_config(self.config_path)
+        self.client = create_control_client(self.config)
+        self.spool = create_spool(self.config)
+        if self.transfer_stats:
+            self.transfer_stats.close()
+        self.transfer_stats = create_transfer_stats(self.config)
+        # Photos reçues par l'interface web (incoming/ -> ready/), pour la galerie
+        if self.transfer_stats:
+            self.transfer_stats.watch(self.spool)
+
+    def status(self) -> Dict[str, Any]:
+        """État du service; available=False s'il ne répond pas"""
+        try:
+            status = self.client.call('status')
+            status['available'] = True
+            return status
+        except ControlError as e:
+            return {'available': False, 'error': str(e), 'running': False, 'queue_depth': 0,
+                    'transfer': None, 'bytes_uploaded': 0, 'photos_uploaded': 0,
+                    'spool_exists': os.path.isdir(self.spool.root), 'spool_counts': self.spool.counts(),
+                    'disk_space': None, 'camera_link': None}
+
+    @property
+    def running(self) -> bool:
+        return self.status()['running']
+
+    def start(self) -> Dict[str, Any]:
+        return self.client.call('start')
+
+    def stop(self) -> Dict[str, Any]:
+        # L'arrêt attend la fin du transfert en cours
+        return self.client.call('stop', timeout=30)
+
+    def enqueue(self, paths: List[str]) -> int:
+        return self.client.call('enqueue', paths=paths)
+
+    def upload_results(self, names: List[str]) -> Dict[str, Any]:
+        return self.client.call('upload_results', names=names)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.client.call('stats')
+
+    def reload(self) -> Dict[str, Any]:
+        """Recharge la configuration locale et celle du service"""
+        self.reload_config()
+        return self.client.call('reload', timeout=30)
+
+
+def create_control_server(config: Dict[str, Any], service) -> ControlServer:
+    """Factory function pour le socket de contrôle du service de transfert"""
+    def start():
+        service.start()
+        return service.status()
+
+    def stop():
+        service.stop()
+        return service.status()
+
+    def reload():
+        service.reload_config()
+        return service.status()
+
+    handlers = {
+        'status': service.status,
+        'start': start,
+        'stop': stop,
+        'enqueue': service.enqueue,
+        'upload_results': service.upload_results,
+        'stats': service.stats,
+        'reload': reload,
+    }
+    path = config.get('system', {}).get('control_socket', DEFAULT_SOCKET_PATH)
+    return ControlServer(path, handlers)
+
+
+def create_control_client(config: Dict[str, Any]) -> ControlClient:
+    """Factory function pour le client du socket de contrôle"""
+    return ControlClient(config.get('system', {}).get('control_socket', DEFAULT_SOCKET_PATH))
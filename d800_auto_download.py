@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Script de récupération automatique des photos depuis le Nikon D800
-Utilise gphoto2 pour télécharger les nouvelles photos dans /tmp/photos
+Utilise gphoto2 pour télécharger les nouvelles photos dans /tmp/photos/incoming
 Le système de surveillance existant se charge ensuite du transfert FTP
 """
 
@@ -14,10 +14,23 @@ import signal
 import sys
 from datetime import datetime
 
+from camera_session import CameraError, create_camera_session
+from camera_ingest import EventIngest, download_pending, missing_files_cli
+from camera_index import create_camera_index
+from camera_cleanup import create_camera_cleaner
+from camera_recovery import create_camera_recovery
+from file_types import add_extension
+from spool import INCOMING, create_spool
+from disk_space import create_disk_guard
+from retention import create_retention_manager
+
 # Configuration
 CONFIG_FILE = "/home/server01/projet_ftp/Projet_FTP/config.json"
 LOG_FILE = "/home/server01/projet_ftp/Projet_FTP/logs/d800_download.log"
 
+# Intervalle (secondes) entre deux relectures du spool pour la rétention
+RETENTION_INTERVAL = 600
+
 # Configuration du logging
 logging.basicConfig(
     level=logging.INFO,
@@ -76,8 +89,17 @@ def check_camera_connection():
         logger.debug(f"Erreur lors de la détection de l'appareil photo: {e}")
         return False
 
-def download_new_photos(download_path):
-    """Télécharger les nouvelles photos depuis l'appareil photo"""
+def download_new_photos(download_path, spool):
+    """
+    Télécharger les nouvelles photos depuis l'appareil photo
+    Lève CameraError si gphoto2 ne peut pas communiquer avec l'appareil
+    """
+    # Photos absentes de tous les états du spool (--skip-existing ne verrait que incoming/)
+    missing = missing_files_cli(spool.has_photo)
+    if not missing:
+        logger.debug("Aucune nouvelle photo à télécharger")
+        return 0
+    
     try:
         # S'assurer que le répertoire de destination existe
         os.makedirs(download_path, exist_ok=True)
@@ -91,8 +113,7 @@ def download_new_photos(download_path):
         # en se basant sur le type MIME du fichier
         cmd = [
             'gphoto2',
-            '--get-all-files',
-            '--skip-existing',
+            '--get-file', missing,
             '--filename=%f.%C'  # %f=nom du fichier original, %C=extension basée sur le type MIME
         ]
         
@@ -116,14 +137,12 @@ def download_new_photos(download_path):
                 return 0
         else:
             logger.error(f"Erreur lors du téléchargement: {result.stderr}")
-            return -1
+            # Le message gphoto2 permet de classer l'erreur pour la récupération
+            raise CameraError(result.stderr.strip() or result.stdout.strip())
             
     except subprocess.TimeoutExpired:
         logger.error("Timeout lors du téléchargement des photos")
-        return -1
-    except Exception as e:
-        logger.error(f"Erreur lors du téléchargement: {e}")
-        return -1
+        raise CameraError("Timeout lors du téléchargement des photos", -10)
     finally:
         # Restaurer le répertoire de travail original
         try:
@@ -131,38 +150,64 @@ def download_new_photos(download_path):
         except:
             pass
 
-def cleanup_old_photos(download_path, max_age_hours=24):
-    """Nettoyer les anciennes photos si elles n'ont pas été transférées"""
+def on_photo_downloaded(path):
+    """
+    Signale une photo téléchargée dans incoming/
+    L'aperçu d'un RAW (camera.raw_preview) est extrait par le service de transfert
+    quand il prend la photo en charge: une seule extraction par fichier
+    """
+    logger.info(f"Photo téléchargée: {os.path.basename(path)}")
+
+def download_new_photos_with_session(session, download_path, index, spool=None,
+                                     guard=None):
+    """
+    Télécharger les nouvelles photos via la session libgphoto2 persistante
+    Lève CameraError si la communication avec l'appareil échoue
+    """
+    # Les décisions de téléchargement viennent de l'index (pas du contenu local):
+    # une photo déjà transférée puis supprimée localement n'est pas retéléchargée
+    photos, _ = download_pending(session, index, download_path,
+                                 on_photo=on_photo_downloaded,
+                                 spool=spool, guard=guard)
+    downloaded_count = len(photos)
+    
+    if downloaded_count > 0:
+        logger.info(f"{downloaded_count} nouvelle(s) photo(s) téléchargée(s)")
+    else:
+        logger.debug("Aucune nouvelle photo à télécharger")
+    return downloaded_count
+
+def enforce_retention(retention, last_run):
+    """
+    Applique les quotas de rétention au plus toutes les RETENTION_INTERVAL secondes
+    Les photos arrivent dans done/ par le service de transfert (autre processus):
+    le spool est relu avant chaque application. Retourne la date de ce passage.
+    """
+    now = time.time()
+    if now - last_run < RETENTION_INTERVAL:
+        return last_run
     try:
-        current_time = time.time()
-        max_age_seconds = max_age_hours * 3600
-        
-        for filename in os.listdir(download_path):
-            file_path = os.path.join(download_path, filename)
-            if os.path.isfile(file_path):
-                file_age = current_time - os.path.getmtime(file_path)
-                if file_age > max_age_seconds:
-                    os.remove(file_path)
-                    logger.info(f"Ancienne photo supprimée: {filename}")
+        retention.refresh()
+        retention.enforce()
     except Exception as e:
-        logger.error(f"Erreur lors du nettoyage: {e}")
+        logger.error(f"Erreur lors de la rétention: {e}")
+    return now
 
 def rename_files_without_extension(download_path):
-    """Renomme tous les fichiers sans extension en .jpg dans le dossier donné."""
+    """Ajoute l'extension correspondant à leur type aux fichiers sans extension du dossier donné."""
     for filename in os.listdir(download_path):
         file_path = os.path.join(download_path, filename)
         if os.path.isfile(file_path):
             name, ext = os.path.splitext(filename)
             if ext == '':
-                new_path = file_path + '.jpg'
                 try:
-                    os.rename(file_path, new_path)
-                    logger.info(f"Fichier renommé (auto): {filename} -> {os.path.basename(new_path)}")
+                    if not add_extension(file_path):
+                        logger.warning(f"Type non reconnu, fichier laissé sans extension: {filename}")
                 except Exception as e:
                     logger.warning(f"Impossible de renommer {file_path}: {e}")
 
-def add_jpg_extension_to_files(download_path):
-    """Ajoute l'extension .JPG aux fichiers qui n'en ont pas et vérifie les types MIME"""
+def add_jpg_extension_to_files(download_path, index=None):
+    """Ajoute l'extension correspondant à leur type (.JPG, .NEF...) aux fichiers qui n'en ont pas"""
     try:
         added_count = 0
         logger.info("Vérification des extensions des fichiers téléchargés...")
@@ -174,25 +219,14 @@ def add_jpg_extension_to_files(download_path):
                 
                 # Cas 1: Fichier sans extension
                 if ext == '':
-                    # Vérifier si c'est bien une image JPEG en examinant les premiers octets du fichier
+                    # Type identifié par les premiers octets du fichier (JPEG, NEF, CR2, PNG, HEIF)
                     try:
-                        with open(file_path, 'rb') as f:
-                            header = f.read(11)
-                            # Vérifier la signature JPEG (commence par FF D8 FF)
-                            is_jpeg = header[0:3] == b'\xff\xd8\xff'
-                        
-                        if is_jpeg:
-                            new_path = file_path + '.JPG'
-                            os.rename(file_path, new_path)
-                            logger.info(f"Extension JPG ajoutée (fichier JPEG détecté): {filename} -> {os.path.basename(new_path)}")
+                        new_path = add_extension(file_path, upper=True, index=index)
+                        if new_path:
                             added_count += 1
                         else:
-                            # Si ce n'est pas un JPEG, essayer de déduire le type
-                            # Mais par défaut, considérer comme JPG pour la compatibilité
-                            new_path = file_path + '.JPG'
-                            os.rename(file_path, new_path)
-                            logger.warning(f"Extension JPG ajoutée par défaut (type non détecté): {filename}")
-                            added_count += 1
+                            # Type inconnu: ne pas le faire passer pour un JPEG
+                            logger.warning(f"Type non détecté, fichier laissé sans extension: {filename}")
                     except Exception as e:
                         logger.error(f"Erreur lors de l'analyse du fichier {filename}: {e}")
                 
@@ -202,21 +236,35 @@ def add_jpg_extension_to_files(download_path):
                     new_path = os.path.join(download_path, name + '.JPG')
                     try:
                         os.rename(file_path, new_path)
+                        if index:
+                            index.rename_local(file_path, new_path)
                         logger.debug(f"Extension normalisée: {filename} -> {os.path.basename(new_path)}")
                         added_count += 1
                     except Exception as e:
                         logger.warning(f"Impossible de normaliser l'extension de {filename}: {e}")
         
         if added_count > 0:
-            logger.info(f"{added_count} fichier(s) ont été corrigés avec l'extension .JPG")
+            logger.info(f"{added_count} fichier(s) ont été corrigés avec l'extension de leur type")
         else:
             logger.debug("Aucun fichier à corriger (tous possèdent déjà l'extension correcte)")
             
     except Exception as e:
         logger.error(f"Erreur lors de la vérification des extensions: {e}")
 
+def delete_uploaded_photos(session, cleaner, index):
+    """Supprimer de l'appareil les photos transférées (jamais celles en attente d'upload)"""
+    try:
+        if cleaner:
+            # Dans la session déjà ouverte, par lots
+            cleaner.run()
+        elif index.pending_deletions():
+            if not delete_photos_from_camera():
+                logger.warning("La suppression des photos de l'appareil a échoué.")
+    except Exception as del_error:
+        logger.error(f"Exception lors de la suppression des photos: {del_error}")
+
 def delete_photos_from_camera():
-    """Supprimer toutes les photos de l'appareil photo après téléchargement réussi"""
+    """Supprimer de l'appareil photo les photos transférées (script d800_delete.py)"""
     try:
         logger.info("Suppression des photos de l'appareil photo...")
         
@@ -257,7 +305,14 @@ def main():
     
     # Charger la configuration
     config = load_config()
-    download_path = config.get('camera', {}).get('download_path', '/tmp/photos')
+    # Téléchargements dans incoming/ du spool; le transfert les prend en charge de là
+    spool = create_spool(config)
+    download_path = spool.dir(INCOMING)
+    # Téléchargements suspendus quand l'espace libre local devient insuffisant
+    guard = create_disk_guard(config, spool.root)
+    # Quotas d'âge et d'octets du dossier local
+    retention = create_retention_manager(config, spool)
+    last_retention = 0
     check_interval = config.get('camera', {}).get('check_interval', 30)
     delete_from_camera = config.get('camera', {}).get('delete_from_camera', False)
     
@@ -272,71 +327,95 @@ def main():
     # S'assurer que le répertoire de destination existe
     os.makedirs(download_path, exist_ok=True)
     
-    # Compteur d'échecs consécutifs
-    consecutive_failures = 0
-    max_consecutive_failures = 3
+    # Session libgphoto2 persistante (None si python-gphoto2 est absent)
+    session = create_camera_session(config)
+    index = create_camera_index(config)
+    cleaner = create_camera_cleaner(config, session, index) if session else None
+    
+    # Mode événementiel: seules les nouvelles photos signalées par l'appareil sont téléchargées
+    if config.get('camera', {}).get('ingest_mode', 'poll') == 'events':
+        logger.info("Mode d'ingestion: événements de l'appareil photo")
+        ingest = EventIngest(session, download_path,
+                             on_photo=on_photo_downloaded,
+                             index=index, recovery=create_camera_recovery(config, session),
+                             guard=guard)
+        ingest.start()
+        try:
+            while True:
+                time.sleep(check_interval)
+                if delete_from_camera:
+                    delete_uploaded_photos(session, cleaner, index)
+                last_retention = enforce_retention(retention, last_retention)
+        except KeyboardInterrupt:
+            logger.info("Arrêt demandé par l'utilisateur")
+        finally:
+            ingest.stop()
+            if session:
+                session.close()
+        return
+    
+    # Récupération de la liaison USB/PTP: action ciblée selon l'erreur, attente courte
+    recovery = create_camera_recovery(config, session)
     
     while True:
         try:
-            # Libérer l'accès USB
-            kill_gvfs_processes()
+            # Libérer l'espace local selon les quotas (photos transférées d'abord),
+            # y compris pendant une suspension pour manque d'espace
+            last_retention = enforce_retention(retention, last_retention)
             
-            # Attendre un peu que les processus se terminent
-            time.sleep(2)
+            # Espace libre insuffisant: photos laissées sur l'appareil jusqu'à la reprise
+            if guard and not guard.check():
+                time.sleep(check_interval)
+                continue
             
             # Vérifier si l'appareil photo est connecté
-            if check_camera_connection():
+            if session:
+                camera_connected = session.ensure_open()
+                if not camera_connected and session.last_error:
+                    # Appareil présent mais inaccessible (USB réclamé, occupé...)
+                    recovery.recover(session.last_error)
+                    continue
+            else:
+                camera_connected = check_camera_connection()
+            
+            if camera_connected:
                 # Télécharger les nouvelles photos
-                downloaded = download_new_photos(download_path)
+                try:
+                    if session:
+                        downloaded = download_new_photos_with_session(session, download_path, index,
+                                                                      spool, guard)
+                    else:
+                        downloaded = download_new_photos(download_path, spool)
+                except CameraError as e:
+                    recovery.recover(e)
+                    continue
+                recovery.record_success()
                 
                 # Toujours ajouter/vérifier les extensions JPG 
                 # même si gphoto2 devrait maintenant le faire correctement avec --filename=%f.%C
-                add_jpg_extension_to_files(download_path)
+                add_jpg_extension_to_files(download_path, index)
+                index.save()
                 
                 if downloaded > 0:
                     logger.info(f"Téléchargement terminé: {downloaded} photo(s)")
-                    # Réinitialiser le compteur d'échecs
-                    consecutive_failures = 0
-                    
-                    # Supprimer IMMÉDIATEMENT les photos de l'appareil pour éviter les re-téléchargements
-                    if delete_from_camera:
-                        try:
-                            delete_success = delete_photos_from_camera()
-                            if not delete_success:
-                                logger.warning("La suppression des photos de l'appareil a échoué.")
-                                # Si la suppression échoue mais que les photos sont téléchargées,
-                                # nous continuons quand même pour ne pas bloquer le processus
-                        except Exception as del_error:
-                            logger.error(f"Exception lors de la suppression des photos: {del_error}")
-                elif downloaded == -1:
-                    consecutive_failures += 1
-                    logger.warning(f"Erreur lors du téléchargement ({consecutive_failures}/{max_consecutive_failures})")
-                    
-                    if consecutive_failures >= max_consecutive_failures:
-                        logger.error(f"Trop d'échecs consécutifs, redémarrage du processus gphoto2")
-                        # Forcer le redémarrage de gphoto2
-                        os.system("pkill -9 gphoto2")
-                        consecutive_failures = 0
-                        time.sleep(30)
-                    else:
-                        time.sleep(10)
-                    continue
+                
+                # Supprimer de l'appareil les photos dont le transfert est confirmé
+                if delete_from_camera:
+                    delete_uploaded_photos(session, cleaner, index)
             else:
                 logger.debug("Aucun appareil photo connecté")
-                consecutive_failures = 0  # Réinitialiser, ce n'est pas un échec de connexion
-            
-            # Nettoyer les anciennes photos si nécessaire
-            cleanup_old_photos(download_path)
+                recovery.record_absent()  # Ce n'est pas un échec de connexion
             
             # Attendre avant la prochaine vérification
             time.sleep(check_interval)
             
         except KeyboardInterrupt:
             logger.info("Arrêt demandé par l'utilisateur")
+            if session:
+                session.close()
             break
         except Exception as e:
             logger.error(f"Erreur inattendue: {e}")
-            consecutive_failures += 1
             time.sleep(10)
 
 if __name__ == "__main__":
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 """
-Script pour supprimer toutes les photos de la carte SD du Nikon D800
+Script pour supprimer les photos de la carte SD du Nikon D800
 Cette approche est nécessaire car le D800 ne supporte pas la commande --delete-all-files
-et nécessite de supprimer les fichiers un par un.
+et nécessite de désigner les fichiers par leurs numéros (--delete-file avec plages).
+Par défaut seules les photos dont le transfert est confirmé sont supprimées (--all pour tout vider).
 """
 
 import subprocess
@@ -10,8 +11,18 @@ import logging
 import time
 import os
 import sys
-import re
 import signal
+import json
+import argparse
+import re
+
+from camera_session import CameraError, create_camera_session, release_usb_claimers
+from camera_recovery import reset_camera_usb
+from camera_index import create_camera_index, UPLOAD_DONE
+from camera_cleanup import create_camera_cleaner
+
+# Configuration
+CONFIG_FILE = "/home/server01/projet_ftp/Projet_FTP/config.json"
 
 # Configuration du logging
 LOG_FILE = "/home/server01/projet_ftp/Projet_FTP/logs/d800_delete.log"
@@ -26,6 +37,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger('D800Delete')
 
+def load_config():
+    """Charger la configuration depuis config.json"""
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Configuration non chargée, valeurs par défaut utilisées: {e}")
+        return {'camera': {}}
+
 def kill_gvfs_processes():
     """Arrêter les processus gvfs qui peuvent bloquer l'accès à l'appareil photo"""
     processes_to_kill = [
@@ -45,28 +65,8 @@ def kill_gvfs_processes():
 
 def reset_usb_device():
     """Reset le périphérique USB pour améliorer la stabilité"""
-    try:
-        # Obtenir les infos sur les périphériques USB
-        result = subprocess.run(['lsusb'], capture_output=True, text=True)
-        lines = result.stdout.split('\n')
-        
-        # Chercher le Nikon
-        for line in lines:
-            if 'Nikon' in line:
-                # Exemple de ligne: Bus 003 Device 005: ID 04b0:0428 Nikon Corp. D800
-                match = re.search(r'Bus (\d+) Device (\d+):', line)
-                if match:
-                    bus = match.group(1)
-                    device = match.group(2)
-                    
-                    # Reset USB
-                    logger.info(f"Reset USB pour Nikon: Bus {bus}, Device {device}")
-                    
-                    # On ne peut pas exécuter directement cette commande sans sudo,
-                    # donc on la journalise seulement pour référence manuelle
-                    logger.info(f"Pour reset manuellement: sudo sh -c 'echo 0 > /sys/bus/usb/devices/{bus}-{device}/authorized; sleep 2; echo 1 > /sys/bus/usb/devices/{bus}-{device}/authorized'")
-    except Exception as e:
-        logger.warning(f"Impossible de reset l'USB: {e}")
+    # Bascule sysfs ciblée sur l'appareil image/PTP (voir camera_recovery)
+    return reset_camera_usb()
 
 def test_camera_connection():
     """Vérifier si l'appareil photo est connecté et accessible"""
@@ -85,26 +85,34 @@ def test_camera_connection():
         return False
 
 def get_camera_files():
-    """Lister les fichiers disponibles sur l'appareil photo"""
+    """
+    Lister les fichiers disponibles sur l'appareil photo
+    Retourne pour chaque fichier son numéro gphoto2, son dossier, son nom et sa taille en Ko
+    """
     try:
         result = subprocess.run(['gphoto2', '--list-files'], 
                               capture_output=True, text=True, timeout=30)
         
         if result.returncode == 0:
             files = []
+            folder = None
             lines = result.stdout.split('\n')
             
             for line in lines:
-                # Format: #1 DSC_0001.JPG etc.
-                if line.startswith('#'):
-                    try:
-                        parts = line.split(' ', 1)
-                        if len(parts) > 1:
-                            file_num = parts[0][1:]  # Supprimer le # au début
-                            file_path = parts[1].strip()
-                            files.append((file_num, file_path))
-                    except:
-                        pass
+                # En-tête de dossier: There are 3 files in folder '/store_00010001/DCIM/100NCD800':
+                match = re.search(r"in folder '([^']*)'", line)
+                if match:
+                    folder = match.group(1)
+                    continue
+                # Format: #1     DSC_0001.JPG      rd  5632 KB image/jpeg
+                match = re.match(r'#(\d+)\s+(\S+)\s+\S*\s+(\d+) KB', line)
+                if match and folder:
+                    files.append({
+                        'number': int(match.group(1)),
+                        'folder': folder,
+                        'name': match.group(2),
+                        'size_kb': int(match.group(3))
+                    })
             
             logger.info(f"Trouvé {len(files)} fichiers sur l'appareil")
             return files
@@ -118,24 +126,79 @@ def get_camera_files():
         logger.error(f"Exception lors du listage des fichiers: {e}")
         return []
 
-def delete_file(file_num):
-    """Supprimer un fichier spécifique de l'appareil photo par son numéro"""
+def format_ranges(numbers):
+    """Regroupe des numéros de fichiers en plages gphoto2 (1-3,5,7-8)"""
+    ranges = []
+    for number in sorted(set(numbers)):
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ','.join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+def same_size(entry, size_kb):
+    """La taille indexée correspond-elle à la taille en Ko affichée par gphoto2 (arrondie)?"""
+    if entry['size'] is None:
+        return False
+    return size_kb in (entry['size'] // 1024, (entry['size'] + 1023) // 1024)
+
+def delete_files(numbers):
+    """Supprimer des fichiers de l'appareil photo par leurs numéros, en une seule commande"""
+    ranges = format_ranges(numbers)
     try:
-        cmd = ['gphoto2', f'--delete-file={file_num}']
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        cmd = ['gphoto2', f'--delete-file={ranges}']
+        result = subprocess.run(cmd, capture_output=True, text=True,
+                                timeout=30 + len(numbers))
         
         if result.returncode == 0:
-            logger.debug(f"Fichier #{file_num} supprimé")
+            logger.debug(f"Fichiers {ranges} supprimés")
             return True
         else:
-            logger.warning(f"Impossible de supprimer le fichier #{file_num}: {result.stderr}")
+            logger.warning(f"Impossible de supprimer les fichiers {ranges}: {result.stderr}")
             return False
     except Exception as e:
-        logger.error(f"Exception lors de la suppression du fichier #{file_num}: {e}")
+        logger.error(f"Exception lors de la suppression des fichiers {ranges}: {e}")
         return False
 
-def delete_all_files_individually():
-    """Supprimer tous les fichiers de l'appareil photo un par un"""
+def delete_files_with_session(session, index, config, uploaded_only=True):
+    """Supprimer les fichiers de l'appareil dans une seule session libgphoto2, par lots"""
+    release_usb_claimers()
+    
+    with session:
+        if not session.is_open:
+            logger.error("Appareil photo non connecté, impossible de supprimer les fichiers")
+            return False
+        
+        # Liste des objets issue de l'index (listage incrémental, sans parser --list-files)
+        try:
+            index.refresh(session)
+        except CameraError as e:
+            logger.error(f"Erreur lors du listage des fichiers: {e}")
+            return False
+        
+        entries = None
+        if not uploaded_only:
+            # Vidage complet demandé explicitement: tous les objets présents,
+            # sans les marquer comme transférés
+            entries = [entry for entry in index.entries.values() if entry['on_camera']]
+        
+        stats = create_camera_cleaner(config, session, index).run(entries)
+    
+    remaining = [entry for entry in index.entries.values() if entry['on_camera']]
+    if remaining:
+        logger.info(f"{len(remaining)} fichier(s) non transféré(s) conservé(s) sur l'appareil")
+    return stats['failed'] == 0
+
+def delete_all_files_individually(uploaded_only=True):
+    """Supprimer les fichiers de l'appareil photo (par défaut, uniquement ceux transférés)"""
+    config = load_config()
+    index = create_camera_index(config)
+    
+    # Utiliser une session persistante si python-gphoto2 est disponible
+    session = create_camera_session(config)
+    if session:
+        return delete_files_with_session(session, index, config, uploaded_only)
+    
     # Arrêter les processus qui peuvent interférer
     kill_gvfs_processes()
     time.sleep(2)
@@ -148,27 +211,33 @@ def delete_all_files_individually():
     # Obtenir la liste des fichiers
     files = get_camera_files()
     
+    # Ne garder que les fichiers dont le transfert est confirmé dans l'index:
+    # même dossier, même nom complet et même taille que l'objet transféré
+    if uploaded_only:
+        confirmed = []
+        for camera_file in files:
+            entry = index.find_by_name(camera_file['name'], camera_file['folder'])
+            if entry and entry['upload_state'] == UPLOAD_DONE and \
+                    same_size(entry, camera_file['size_kb']):
+                confirmed.append(camera_file)
+        files = confirmed
+    
     if not files:
         logger.info("Aucun fichier à supprimer sur l'appareil photo")
         return True
     
-    # Supprimer chaque fichier individuellement
+    # Une seule commande gphoto2 pour tous les fichiers, par plages de numéros
     logger.info(f"Suppression de {len(files)} fichiers...")
-    success_count = 0
-    
-    for file_num, file_path in files:
-        if delete_file(file_num):
-            success_count += 1
-            # Petite pause pour éviter les problèmes
-            time.sleep(0.5)
-    
-    logger.info(f"{success_count}/{len(files)} fichiers supprimés avec succès")
-    
-    # Vérifier si tous les fichiers ont été supprimés
-    if success_count == len(files):
-        return True
-    else:
+    if not delete_files([camera_file['number'] for camera_file in files]):
         return False
+    
+    for camera_file in files:
+        entry = index.find_by_name(camera_file['name'], camera_file['folder'])
+        if entry:
+            index.mark_deleted(entry)
+    index.save()
+    logger.info(f"{len(files)} fichiers supprimés avec succès")
+    return True
 
 def signal_handler(signum, frame):
     """Gestionnaire de signal pour arrêt propre"""
@@ -176,6 +245,11 @@ def signal_handler(signum, frame):
     sys.exit(0)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suppression des photos de l'appareil photo")
+    parser.add_argument('--all', action='store_true',
+                        help="Supprimer toutes les photos, même celles dont le transfert n'est pas confirmé")
+    args = parser.parse_args()
+    
     # Gestionnaire de signaux pour arrêt propre
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
@@ -185,8 +259,8 @@ if __name__ == "__main__":
     
     logger.info("Début du processus de suppression des photos de l'appareil")
     
-    # Supprimer tous les fichiers
-    if delete_all_files_individually():
-        logger.info("Tous les fichiers ont été supprimés avec succès")
+    # Supprimer les fichiers transférés (ou tous avec --all)
+    if delete_all_files_individually(uploaded_only=not args.all):
+        logger.info("Les fichiers ont été supprimés avec succès")
     else:
         logger.warning("La suppression de certains fichiers a échoué")
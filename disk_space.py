@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Contrôle de flux entre le téléchargement caméra et l'upload selon l'espace libre
+Quand l'espace libre du dossier local passe sous le seuil de pause, les
+téléchargements s'arrêtent (les photos restent sur la carte de l'appareil);
+ils reprennent quand l'upload et la rétention ont libéré l'espace jusqu'au
+seuil de reprise. L'écart entre les deux seuils évite les reprises en rafale.
+Les seuils sont ramenés à une part de la taille du système de fichiers: sur une
+petite partition, des seuils absolus ne seraient jamais atteints.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Optional, Dict, Any, Callable
+
+logger = logging.getLogger('DiskSpace')
+
+MB = 1024 * 1024
+# Part maximale de la taille du système de fichiers pour chaque seuil
+MAX_PAUSE_FRACTION = 0.1
+MAX_RESUME_FRACTION = 0.2
+
+
+class DiskGuard:
+    """Suspend l'ingestion caméra tant que l'espace libre est insuffisant"""
+
+    def __init__(self, path: str, pause_free_bytes: int, resume_free_bytes: int,
+                 check_interval: float = 5.0):
+        self.path = path
+        self.pause_free_bytes = pause_free_bytes
+        # Seuil de reprise jamais inférieur au seuil de pause
+        self.resume_free_bytes = max(resume_free_bytes, pause_free_bytes)
+        self.check_interval = check_interval
+        self.paused = False
+        self.free_bytes = None
+        # Taille du système de fichiers, lue au premier contrôle
+        self.capacity_bytes = None
+        self.pauses = 0
+        self.paused_seconds = 0.0
+        self._paused_since = None
+        self.lock = threading.Lock()
+
+    def free(self) -> int:
+        """Espace libre (octets) disponible pour le dossier local"""
+        stat = os.statvfs(self.path)
+        return stat.f_bavail * stat.f_frsize
+
+    def capacity(self) -> int:
+        """Taille totale (octets) du système de fichiers du dossier local"""
+        stat = os.statvfs(self.path)
+        return stat.f_blocks * stat.f_frsize
+
+    def _fit_capacity(self, total: int):
+        """Ramène les seuils à une part de la taille du système de fichiers"""
+        self.capacity_bytes = total
+        pause = min(self.pause_free_bytes, int(total * MAX_PAUSE_FRACTION))
+        resume = max(min(self.resume_free_bytes, int(total * MAX_RESUME_FRACTION)), pause)
+        if (pause, resume) != (self.pause_free_bytes, self.resume_free_bytes):
+            logger.warning(f"Seuils d'espace libre ({self.pause_free_bytes // MB}/"
+                           f"{self.resume_free_bytes // MB} Mo) trop grands pour {self.path} "
+                           f"({total // MB} Mo): ramenés à {pause // MB}/{resume // MB} Mo")
+            self.pause_free_bytes = pause
+            self.resume_free_bytes = resume
+
+    def check(self) -> bool:
+        """Met à jour l'état; retourne True si les téléchargements peuvent continuer"""
+        try:
+            if self.capacity_bytes is None:
+                self._fit_capacity(self.capacity())
+            free = self.free()
+        except OSError as e:
+            logger.warning(f"Espace libre de {self.path} illisible: {e}")
+            return not self.paused
+        with self.lock:
+            self.free_bytes = free
+            if not self.paused and free < self.pause_free_bytes:
+                self.paused = True
+                self.pauses += 1
+                self._paused_since = time.monotonic()
+                logger.warning(f"Espace libre insuffisant ({free // MB} Mo < "
+                               f"{self.pause_free_bytes // MB} Mo): téléchargements suspendus")
+            elif self.paused and free >= self.resume_free_bytes:
+                self.paused = False
+                self.paused_seconds += time.monotonic() - self._paused_since
+                self._paused_since = None
+                logger.info(f"Espace libre rétabli ({free // MB} Mo): reprise des téléchargements")
+            return not self.paused
+
+    def wait(self, running: Callable[[], bool] = lambda: True) -> bool:
+        """Attend que l'espace soit rétabli; retourne False si running() devient faux"""
+        while not self.check():
+            if not running():
+                return False
+            time.sleep(self.check_interval)
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        """État du contrôle de flux pour l'interface web"""
+        with self.lock:
+            paused_seconds = self.paused_seconds
+            if self._paused_since is not None:
+                paused_seconds += time.monotonic() - self._paused_since
+            return {
+                'paused': self.paused,
+                'free_mb': self.free_bytes // MB if self.free_bytes is not None else None,
+                'pause_free_mb': self.pause_free_bytes // MB,
+                'resume_free_mb': self.resume_free_bytes // MB,
+                'pauses': self.pauses,
+                'paused_seconds': round(paused_seconds, 1)
+            }
+
+
+def create_disk_guard(config: Dict[str, Any], path: Optional[str] = None) -> Optional[DiskGuard]:
+    """Factory function pour le contrôle de flux (None si désactivé)"""
+    system_config = config.get('system', {})
+    pause_mb = system_config.get('spool_pause_free_mb', 500)
+    if not pause_mb:
+        return None
+    return DiskGuard(path or config.get('camera', {}).get('download_path', '/tmp/photos'),
+                     pause_free_bytes=int(pause_mb * MB),
+                     resume_free_bytes=int(system_config.get('spool_resume_free_mb', 1000) * MB),
+                     check_interval=system_config.get('check_interval', 5))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Identification du type des fichiers photo par leur signature
+Une seule lecture d'en-tête par fichier (JPEG, RAW TIFF NEF/CR2, PNG, HEIF),
+résultat mis en cache par inode, date de modification et taille: un nouveau
+parcours du dossier ne rouvre jamais un fichier inchangé.
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Iterable
+
+logger = logging.getLogger('FileTypes')
+
+TYPE_JPEG = 'jpeg'
+TYPE_NEF = 'nef'
+TYPE_CR2 = 'cr2'
+TYPE_TIFF = 'tiff'
+TYPE_PNG = 'png'
+TYPE_HEIF = 'heif'
+
+# Extension à donner à un fichier sans extension, selon son type
+EXTENSIONS = {
+    TYPE_JPEG: '.jpg',
+    TYPE_NEF: '.nef',
+    TYPE_CR2: '.cr2',
+    TYPE_TIFF: '.tif',
+    TYPE_PNG: '.png',
+    TYPE_HEIF: '.heic',
+}
+
+# Autres extensions acceptées pour un type
+_ALIASES = {
+    TYPE_JPEG: ('.jpeg',),
+    TYPE_TIFF: ('.tiff',),
+    TYPE_HEIF: ('.heif', '.hif'),
+}
+
+# En-tête lu: assez pour la marque du boîtier dans l'IFD0 d'un NEF
+HEADER_SIZE = 512
+
+_HEIF_BRANDS = (b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1')
+
+_cache = {}
+_cache_lock = threading.Lock()
+MAX_CACHE_ENTRIES = 65536
+
+
+def classify_header(header: bytes) -> Optional[str]:
+    """Type du fichier d'après ses premiers octets (None si inconnu)"""
+    if header[:3] == b'\xff\xd8\xff':
+        return TYPE_JPEG
+    if header[:8] == b'\x89PNG\r\n\x1a\n':
+        return TYPE_PNG
+    if header[:4] in (b'II*\x00', b'MM\x00*'):
+        # CR2: signature "CR" juste après l'en-tête TIFF
+        if header[8:10] == b'CR':
+            return TYPE_CR2
+        if b'NIKON' in header:
+            return TYPE_NEF
+        return TYPE_TIFF
+    if header[4:8] == b'ftyp' and header[8:12] in _HEIF_BRANDS:
+        return TYPE_HEIF
+    return None
+
+
+def sniff(path: str) -> Optional[str]:
+    """Type du fichier (None si inconnu ou illisible), sans relire un fichier inchangé"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        if key in _cache:
+            return _cache[key]
+
+    try:
+        with open(path, 'rb') as f:
+            kind = classify_header(f.read(HEADER_SIZE))
+    except OSError as e:
+        logger.warning(f"Impossible de lire l'en-tête de {path}: {e}")
+        return None
+
+    with _cache_lock:
+        if len(_cache) >= MAX_CACHE_ENTRIES:
+            _cache.clear()
+        _cache[key] = kind
+    return kind
+
+
+def sniff_many(paths: Iterable[str], max_workers: int = 4) -> Dict[str, Optional[str]]:
+    """Type de chaque fichier, en-têtes lus en parallèle"""
+    paths = list(paths)
+    if len(paths) <= 1:
+        return {path: sniff(path) for path in paths}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(sniff, paths)))
+
+
+def is_jpeg(path: str) -> bool:
+    """Indique si le fichier est un JPEG"""
+    return sniff(path) == TYPE_JPEG
+
+
+def add_extension(path: str, upper: bool = False, index=None) -> Optional[str]:
+    """
+    Renomme un fichier sans extension selon son type détecté
+    Retourne le nouveau chemin (inchangé si l'extension correspond déjà),
+    ou None si le type est inconnu (fichier laissé tel quel)
+    """
+    kind = sniff(path)
+    if kind is None:
+        return None
+    if path.lower().endswith((EXTENSIONS[kind],) + _ALIASES.get(kind, ())):
+        return path
+    extension = EXTENSIONS[kind].upper() if upper else EXTENSIONS[kind]
+    new_path = path + extension
+    os.rename(path, new_path)
+    if index:
+        index.rename_local(path, new_path)
+    logger.info(f"Type {kind} détecté: {os.path.basename(path)} -> {os.path.basename(new_path)}")
+    return new_path
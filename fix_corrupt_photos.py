@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Script pour vérifier et corriger les photos corrompues dans /tmp/photos
-Détecte les fichiers vides, sans extension ou avec des en-têtes/pieds JPEG invalides
+Détecte les fichiers vides, sans extension ou à la structure JPEG invalide (tronqués)
 """
 
 import os
@@ -12,6 +12,9 @@ from pathlib import Path
 import argparse
 from datetime import datetime
 
+from file_types import TYPE_JPEG
+from photo_validator import STATUS_CORRUPT, PhotoValidator
+
 # Configuration du logging
 logging.basicConfig(
     level=logging.INFO,
@@ -54,6 +57,9 @@ class PhotoFixer:
         # Parcourir tous les fichiers
         files = list(Path(self.photos_dir).glob('*'))
         stats['total'] = len(files)
+        # Structure vérifiée sur tous les cœurs (segments JPEG jusqu'à l'EOI, IFD des RAW)
+        verdicts = {verdict['path']: verdict for verdict in
+                    PhotoValidator().validate(str(file_path) for file_path in files if file_path.is_file())}
         
         for file_path in files:
             if not file_path.is_file():
@@ -80,59 +86,54 @@ class PhotoFixer:
                 continue
             
             # Vérifier si c'est un fichier JPEG sans extension
-            is_jpg = False
+            verdict = verdicts[str(file_path)]
+            is_jpg = verdict['kind'] == TYPE_JPEG
+            if verdict['kind'] and not is_jpg and verdict['status'] != STATUS_CORRUPT:
+                # RAW, PNG, HEIF: photo valide
+                stats['valid'] += 1
+                continue
             
             try:
-                with open(file_path, 'rb') as f:
-                    header = f.read(3)
-                    is_jpg = header == b'\xff\xd8\xff'
+                if verdict['status'] == STATUS_CORRUPT:
+                    # Structure incomplète: tronqué, segment invalide, EOI absent
+                    logger.warning(f"Fichier avec structure invalide: {filename} ({verdict['reason']})")
+                    stats['corrupt_footer'] += 1
                     
-                    # Vérifier le footer pour les fichiers JPEG
-                    if is_jpg:
-                        # Lire le pied de fichier JPEG (les 2 derniers octets)
-                        f.seek(-2, os.SEEK_END)
-                        footer = f.read(2)
-                        
-                        if footer != b'\xff\xd9':
-                            logger.warning(f"Fichier JPEG avec pied invalide: {filename}")
-                            stats['corrupt_footer'] += 1
-                            
-                            if delete_corrupt:
-                                os.unlink(file_path)
-                                stats['deleted'] += 1
-                                logger.info(f"Supprimé fichier corrompu: {filename}")
-                            else:
-                                shutil.move(file_path, os.path.join(self.backup_dir, filename))
-                                stats['backed_up'] += 1
-                                logger.info(f"Déplacé fichier corrompu vers backup: {filename}")
-                            
-                            continue
-                        
-                        # C'est un JPEG valide
-                        stats['valid'] += 1
-                        
-                        # Ajouter l'extension .jpg si demandé et si elle manque
-                        if add_extension and not any(file_path.name.lower().endswith(ext) 
-                                                    for ext in ['.jpg', '.jpeg']):
-                            # Renommer avec extension .jpg
-                            new_path = str(file_path) + '.jpg'
-                            os.rename(file_path, new_path)
-                            stats['fixed_extension'] += 1
-                            logger.info(f"Renommé avec extension .jpg: {filename} → {filename}.jpg")
+                    if delete_corrupt:
+                        os.unlink(file_path)
+                        stats['deleted'] += 1
+                        logger.info(f"Supprimé fichier corrompu: {filename}")
+                    else:
+                        shutil.move(file_path, os.path.join(self.backup_dir, filename))
+                        stats['backed_up'] += 1
+                        logger.info(f"Déplacé fichier corrompu vers backup: {filename}")
+                
+                elif is_jpg:
+                    # C'est un JPEG valide
+                    stats['valid'] += 1
+                    
+                    # Ajouter l'extension .jpg si demandé et si elle manque
+                    if add_extension and not any(file_path.name.lower().endswith(ext) 
+                                                for ext in ['.jpg', '.jpeg']):
+                        # Renommer avec extension .jpg
+                        new_path = str(file_path) + '.jpg'
+                        os.rename(file_path, new_path)
+                        stats['fixed_extension'] += 1
+                        logger.info(f"Renommé avec extension .jpg: {filename} → {filename}.jpg")
+                else:
+                    # Ce n'est pas un JPEG ou l'en-tête est invalide
+                    logger.warning(f"Fichier avec en-tête invalide: {filename}")
+                    stats['corrupt_header'] += 1
+                    
+                    if delete_corrupt:
+                        os.unlink(file_path)
+                        stats['deleted'] += 1
+                        logger.info(f"Supprimé fichier non-JPEG: {filename}")
                     else:
-                        # Ce n'est pas un JPEG ou l'en-tête est invalide
-                        logger.warning(f"Fichier avec en-tête invalide: {filename}")
-                        stats['corrupt_header'] += 1
+                        shutil.move(file_path, os.path.join(self.backup_dir, filename))
+                        stats['backed_up'] += 1
+                        logger.info(f"Déplacé fichier non-JPEG vers backup: {filename}")
                         
-                        if delete_corrupt:
-                            os.unlink(file_path)
-                            stats['deleted'] += 1
-                            logger.info(f"Supprimé fichier non-JPEG: {filename}")
-                        else:
-                            shutil.move(file_path, os.path.join(self.backup_dir, filename))
-                            stats['backed_up'] += 1
-                            logger.info(f"Déplacé fichier non-JPEG vers backup: {filename}")
-                            
             except Exception as e:
                 logger.error(f"Erreur lors de l'analyse de {filename}: {e}")
                 
@@ -150,7 +151,7 @@ class PhotoFixer:
         logger.info(f"Valides: {stats['valid']} fichiers")
         logger.info(f"Vides: {stats['empty']} fichiers")
         logger.info(f"En-têtes corrompus: {stats['corrupt_header']} fichiers")
-        logger.info(f"Pieds corrompus: {stats['corrupt_footer']} fichiers")
+        logger.info(f"Structures corrompues: {stats['corrupt_footer']} fichiers")
         logger.info(f"Extensions ajoutées: {stats['fixed_extension']} fichiers")
         logger.info(f"Fichiers sauvegardés: {stats['backed_up']} fichiers")
         logger.info(f"Fichiers supprimés: {stats['deleted']} fichiers")
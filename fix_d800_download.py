@@ -13,6 +13,8 @@ import time
 import shutil
 from datetime import datetime
 
+from file_types import add_extension
+
 # Configuration du logging
 logging.basicConfig(
     level=logging.DEBUG,
@@ -134,13 +136,10 @@ def verify_and_fix_files(file_list):
         if not ext:
             # Détecter le type de fichier et ajouter l'extension
             try:
-                with open(file_path, 'rb') as f:
-                    header = f.read(10)
-                    if header.startswith(b'\xff\xd8\xff'):
-                        new_path = file_path + '.jpg'
-                        os.rename(file_path, new_path)
-                        file_path = new_path
-                        logger.info(f"Fichier renommé: {filename} -> {filename}.jpg")
+                new_path = add_extension(file_path)
+                if new_path:
+                    file_path = new_path
+                    logger.info(f"Fichier renommé: {filename} -> {os.path.basename(new_path)}")
             except Exception as e:
                 logger.error(f"Erreur lors de la vérification du fichier {filename}: {e}")
                 
@@ -11,6 +11,8 @@ import logging
 import json
 import argparse
 
+from file_types import is_jpeg
+
 # Configuration
 CONFIG_FILE = "/home/server01/projet_ftp/Projet_FTP/config.json"
 LOG_FILE = "/home/server01/projet_ftp/Projet_FTP/logs/fix_extensions.log"
@@ -41,14 +43,7 @@ def load_config():
 
 def is_jpeg_file(file_path):
     """Vérifie si un fichier est au format JPEG en analysant son contenu"""
-    try:
-        with open(file_path, 'rb') as f:
-            # Les JPEG commencent par les octets FF D8 FF
-            header = f.read(3)
-            return header == b'\xff\xd8\xff'
-    except Exception as e:
-        logger.error(f"Erreur lors de l'analyse du fichier {file_path}: {e}")
-        return False
+    return is_jpeg(file_path)
 
 def fix_extensions(directory, dry_run=False, force=False):
     """Corrige les extensions des fichiers JPG dans le répertoire spécifié"""
@@ -1,6 +1,6 @@
 #!/bin/bash
 echo "Installation du service..."
-sudo cp photo-ftp-web.service /etc/systemd/system/
+sudo cp photo-transfer.service photo-ftp-web.service /etc/systemd/system/
 sudo systemctl daemon-reload
-sudo systemctl enable photo-ftp-web.service
-echo "Service installé. Démarrer avec: sudo systemctl start photo-ftp-web.service"
+sudo systemctl enable photo-transfer.service photo-ftp-web.service
+echo "Services installés. Démarrer avec: sudo systemctl start photo-transfer.service photo-ftp-web.service"
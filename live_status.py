@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Flux Server-Sent Events du tableau de bord
+L'état (file d'attente, transfert en cours, débit, appareil photo, nouvelles
+lignes de log) est calculé une seule fois par intervalle, et seulement si un
+navigateur écoute; chaque onglet ne reçoit que les valeurs qui ont changé.
+Un onglet ouvert ne coûte qu'une file d'attente et un thread bloqué dessus.
+"""
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from typing import Dict, Any, Iterator, List
+
+logger = logging.getLogger('LiveStatus')
+
+# Lignes de log conservées pour un nouvel onglet
+RECENT_LOG_LINES = 20
+
+
+class LiveStatus:
+    """Diffuse les changements d'état du service à tous les onglets ouverts"""
+
+    def __init__(self, service, prober, interval: float = 1.0,
+                 log_file: str = os.path.join('logs', 'photo_transfer.log'),
+                 heartbeat: float = 15.0, max_pending: int = 50):
+        self.service = service
+        self.prober = prober
+        self.interval = interval
+        self.log_file = log_file
+        self.heartbeat = heartbeat
+        self.max_pending = max_pending
+        self.subscribers = set()
+        # Onglets ouverts avant le premier calcul: attendent l'état complet
+        self.joining = set()
+        self.state: Dict[str, Any] = {}
+        self.recent_logs: List[str] = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self._wakeup = threading.Event()
+        self._log_position = None
+        self._last_total = None
+        self._last_time = None
+        self._throughput = 0.0
+
+    def start(self):
+        """Démarre le calcul périodique de l'état"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Arrête le calcul et ferme les flux ouverts"""
+        self.running = False
+        self._wakeup.set()
+        with self.lock:
+            subscribers, self.subscribers = list(self.subscribers), set()
+            self.joining = set()
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(None)
+            except queue.Full:
+                pass
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5.0)
+
+    def subscribe(self) -> queue.Queue:
+        """Nouvel onglet: reçoit d'abord l'état complet, puis les changements"""
+        subscriber = queue.Queue(maxsize=self.max_pending)
+        with self.lock:
+            if self.state:
+                subscriber.put_nowait(dict(self.state, logs=list(self.recent_logs)))
+            else:
+                # Premier calcul fait par le thread, pas dans la requête de l'onglet
+                self.joining.add(subscriber)
+            self.subscribers.add(subscriber)
+        self.start()
+        self._wakeup.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        """Onglet fermé"""
+        with self.lock:
+            self.subscribers.discard(subscriber)
+            self.joining.discard(subscriber)
+
+    def run(self):
+        """Calcul de l'état à intervalle fixe, uniquement s'il y a des onglets ouverts"""
+        while self.running:
+            self._wakeup.clear()
+            with self.lock:
+                listening = bool(self.subscribers)
+            if listening:
+                try:
+                    # Requêtes au service et lecture du log hors du verrou: un service
+                    # lent ne bloque ni l'ouverture ni la fermeture des onglets
+                    state = self.collect()
+                    if not self.state and not self.recent_logs:
+                        recent = self.prober.get()['local']['recent_logs']
+                        self.recent_logs = [line.rstrip('\n') for line in recent]
+                    logs = self._read_new_logs()
+                    with self.lock:
+                        self._publish_locked(state, logs)
+                except Exception as e:
+                    logger.error(f"Erreur lors du calcul de l'état en direct: {e}")
+            else:
+                # Personne n'écoute: le suivi des logs reprendra à la fin du fichier
+                self._log_position = None
+            self._wakeup.wait(self.interval)
+
+    def collect(self) -> Dict[str, Any]:
+        """
+        État courant du service (sans les lignes de log), une requête au service par
+        calcul; appelé par le seul thread de calcul, sans tenir le verrou
+        """
+        status = self.service.status()
+        snapshot = self.prober.get()
+        local = snapshot['local']
+        connection = snapshot['connection']
+
+        progress = status['transfer']
+        transfer = None
+        sent = 0
+        if progress:
+            sent = progress['sent']
+            total = progress['total']
+            transfer = {'file': progress['file'], 'sent': sent, 'total': total,
+                        'percent': round(100 * sent / total) if total else 0}
+
+        # Débit lissé: octets confirmés plus l'avancement du fichier en cours
+        now = time.monotonic()
+        uploaded_total = status['bytes_uploaded'] + sent
+        if self._last_time is not None and now > self._last_time:
+            rate = max(0, uploaded_total - self._last_total) / (now - self._last_time)
+            self._throughput = 0.5 * self._throughput + 0.5 * rate
+        self._last_total, self._last_time = uploaded_total, now
+
+        camera = None
+        if status['camera_link']:
+            link = status['camera_link']
+            camera = {'state': link['state'], 'last_error_class': link['last_error_class']}
+        disk_space = status['disk_space']
+
+        return {
+            'running': status['running'],
+            'daemon': status.get('available', True),
+            'queue_depth': status['queue_depth'],
+            'pending': local['pending'],
+            'transfer': transfer,
+            'throughput_kbps': round(self._throughput / 1024, 1),
+            'photos_uploaded': status['photos_uploaded'],
+            'camera': camera,
+            'disk_paused': bool(disk_space and disk_space['paused']),
+            'connection': {'success': connection['success'], 'message': connection['message'],
+                           'checked_at': connection['checked_at']},
+        }
+
+    def _read_new_logs(self) -> List[str]:
+        """Lignes ajoutées au log depuis le dernier calcul"""
+        try:
+            size = os.path.getsize(self.log_file)
+        except OSError:
+            return []
+        if self._log_position is None or size < self._log_position:
+            # Premier calcul ou log remplacé (rotation): reprise à la fin
+            self._log_position = size
+            return []
+        if size == self._log_position:
+            return []
+        with open(self.log_file, 'rb') as f:
+            f.seek(self._log_position)
+            data = f.read(min(size - self._log_position, 64 * 1024))
+        # Ligne incomplète laissée pour le prochain calcul
+        end = data.rfind(b'\n') + 1
+        self._log_position += end
+        return data[:end].decode('utf-8', errors='replace').splitlines()
+
+    def _publish_locked(self, state: Dict[str, Any], logs: List[str]):
+        """Différence avec l'état précédent, envoyée à chaque onglet (verrou tenu)"""
+        delta = {key: value for key, value in state.items() if self.state.get(key) != value}
+        if logs:
+            delta['logs'] = logs
+            self.recent_logs = (self.recent_logs + logs)[-RECENT_LOG_LINES:]
+        self.state = state
+        full = dict(state, logs=list(self.recent_logs))
+        joining, self.joining = self.joining, set()
+        for subscriber in list(self.subscribers):
+            message = full if subscriber in joining else delta
+            if not message:
+                continue
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Onglet qui ne lit plus: son flux est fermé
+                self.subscribers.discard(subscriber)
+
+    def stream(self, subscriber: queue.Queue) -> Iterator[str]:
+        """Messages SSE d'un onglet (commentaire périodique pour garder la connexion)"""
+        try:
+            while True:
+                try:
+                    delta = subscriber.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    with self.lock:
+                        if subscriber not in self.subscribers:
+                            return
+                    yield ": ping\n\n"
+                    continue
+                if delta is None:
+                    return
+                yield f"data: {json.dumps(delta)}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def create_live_status(config: Dict[str, Any], service, prober) -> LiveStatus:
+    """Factory function pour le flux du tableau de bord"""
+    return LiveStatus(service, prober,
+                      interval=config.get('system', {}).get('live_interval', 1.0))
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Lecture des logs des services pour l'interface web
+Les dernières entrées sont lues en remontant depuis la fin des fichiers
+(fichier courant puis archives .1, .2...), sans jamais charger un log entier;
+les filtres de niveau et de texte sont appliqués côté serveur. Un curseur
+(inode et position de chaque fichier) permet ensuite de ne lire que les
+lignes ajoutées, y compris quand le log a été archivé entre deux lectures.
+Le curseur s'arrête toujours après la dernière ligne complète: une ligne en
+cours d'écriture est lue en entier à la lecture suivante.
+"""
+
+import os
+import re
+import logging
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+
+logger = logging.getLogger('LogReader')
+
+# Niveaux de logging, du plus bavard au plus grave
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
+
+# Début d'entrée: "2024-05-01 12:00:00,123 - [nom - ]NIVEAU - message"
+_ENTRY_RE = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:,\d{3})?) - '
+                       r'(?:.*? - )?(DEBUG|INFO|WARNING|ERROR|CRITICAL) - ')
+
+# Archives consultées par service (handler.log.1 ... handler.log.N)
+MAX_ROTATED = 5
+# Octets parcourus au plus par service et par requête (filtre très sélectif)
+MAX_SCAN_BYTES = 8 * 1024 * 1024
+BLOCK_SIZE = 64 * 1024
+
+# Logs des services (nom affiché -> fichier)
+DEFAULT_LOG_FILES = {
+    'transfer': 'logs/photo_transfer.log',
+    'webui': 'logs/webui.log',
+    'auto_transfer': '/home/server01/projet_ftp/Projet_FTP/logs/auto_transfer.log',
+    'd800_download': '/home/server01/projet_ftp/Projet_FTP/logs/d800_download.log',
+}
+
+
+def rotated_paths(path: str, max_rotated: int = MAX_ROTATED) -> List[str]:
+    """Fichier courant puis archives existantes, du plus récent au plus ancien"""
+    paths = [path]
+    for index in range(1, max_rotated + 1):
+        rotated = f"{path}.{index}"
+        if not os.path.exists(rotated):
+            break
+        paths.append(rotated)
+    return paths
+
+
+def parse_entry(line: str) -> Tuple[Optional[str], Optional[str]]:
+    """Horodatage et niveau d'une première ligne d'entrée (None, None pour une suite)"""
+    match = _ENTRY_RE.match(line)
+    if not match:
+        return None, None
+    return match.group(1), match.group(2)
+
+
+class LogFilter:
+    """Filtre d'entrées: niveau minimal et texte (insensible à la casse)"""
+
+    def __init__(self, level: Optional[str] = None, text: Optional[str] = None):
+        self.min_level = LEVELS.get((level or '').upper(), 0)
+        self.text = (text or '').lower()
+
+    def match(self, entry: Dict[str, Any]) -> bool:
+        if self.min_level and LEVELS.get(entry['level'], 0) < self.min_level:
+            return False
+        return not self.text or self.text in entry['text'].lower()
+
+
+def _reverse_lines(path: str, end: int, budget: List[int]) -> Iterator[str]:
+    """Lignes d'un fichier de la fin vers le début, à partir de l'octet end"""
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return
+    with f:
+        position = end
+        remainder = b''
+        while position > 0 and budget[0] > 0:
+            step = min(BLOCK_SIZE, position)
+            position -= step
+            budget[0] -= step
+            f.seek(position)
+            data = f.read(step) + remainder
+            lines = data.split(b'\n')
+            # Le premier morceau peut être une ligne coupée: il attend le bloc précédent
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line.decode('utf-8', errors='replace')
+        if remainder and position == 0:
+            yield remainder.decode('utf-8', errors='replace')
+
+
+def _line_end(f, size: int) -> int:
+    """Position qui suit le dernier saut de ligne avant l'octet size (0 s'il n'y en a pas)"""
+    position = size
+    while position > 0:
+        step = min(BLOCK_SIZE, position)
+        position -= step
+        f.seek(position)
+        index = f.read(step).rfind(b'\n')
+        if index >= 0:
+            return position + index + 1
+    return 0
+
+
+class LogSource:
+    """Log d'un service et ses archives"""
+
+    def __init__(self, name: str, path: str, max_rotated: int = MAX_ROTATED):
+        self.name = name
+        self.path = path
+        self.max_rotated = max_rotated
+
+    def position(self) -> Optional[Tuple[int, int]]:
+        """
+        (inode, fin de la dernière ligne complète) du fichier courant, None s'il
+        n'existe pas
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                return stat.st_ino, _line_end(f, stat.st_size)
+        except OSError:
+            return None
+
+    def _header_before(self, path: str, offset: int) -> Optional[str]:
+        """Ligne d'entrée à laquelle se rattachent des lignes de suite lues à partir de offset"""
+        for line in _reverse_lines(path, offset, [BLOCK_SIZE]):
+            if parse_entry(line)[0] is not None:
+                return line
+        return None
+
+    def _entry(self, header: str, continuation: List[str]) -> Dict[str, Any]:
+        time, level = parse_entry(header)
+        return {'source': self.name, 'time': time or '', 'level': level,
+                'text': '\n'.join([header] + continuation)}
+
+    def tail(self, count: int, log_filter: LogFilter,
+             end: Optional[int] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """count dernières entrées filtrées (ordre chronologique), et si la lecture a été tronquée"""
+        entries = []
+        budget = [MAX_SCAN_BYTES]
+        # Lignes de suite (traceback...) rattachées à la ligne d'entrée qui les précède,
+        # éventuellement en fin d'archive
+        continuation = []
+        for index, path in enumerate(rotated_paths(self.path, self.max_rotated)):
+            if index == 0 and end is not None:
+                file_end = end
+            else:
+                try:
+                    file_end = os.path.getsize(path)
+                except OSError:
+                    continue
+            for line in _reverse_lines(path, file_end, budget):
+                if parse_entry(line)[0] is None:
+                    continuation.insert(0, line)
+                    continue
+                entry = self._entry(line, continuation)
+                continuation = []
+                if log_filter.match(entry):
+                    entries.append(entry)
+                    if len(entries) >= count:
+                        entries.reverse()
+                        return entries, False
+            if budget[0] <= 0:
+                entries.reverse()
+                return entries, True
+        entries.reverse()
+        return entries, False
+
+    def _find_rotated(self, inode: int) -> Optional[str]:
+        """Archive correspondant à un fichier courant déjà lu (même inode)"""
+        for path in rotated_paths(self.path, self.max_rotated)[1:]:
+            try:
+                if os.stat(path).st_ino == inode:
+                    return path
+            except OSError:
+                continue
+        return None
+
+    def read_after(self, inode: int, offset: int,
+                   log_filter: LogFilter) -> Tuple[List[Dict[str, Any]], Tuple[int, int], bool]:
+        """Entrées ajoutées après (inode, offset); retourne aussi le nouveau curseur"""
+        current = self.position()
+        if current is None:
+            return [], (inode, offset), False
+        chunks = []
+        if current[0] != inode:
+            # Log archivé depuis la dernière lecture: fin de l'archive puis nouveau fichier
+            rotated = self._find_rotated(inode)
+            if rotated:
+                chunks.append((rotated, offset, os.path.getsize(rotated)))
+            offset = 0
+        elif current[1] < offset:
+            # Log tronqué: relecture depuis le début
+            offset = 0
+        chunks.append((self.path, offset, current[1]))
+
+        entries = []
+        truncated = False
+        new_offset = offset
+        for path, start, end in chunks:
+            skipped = end - start > MAX_SCAN_BYTES
+            if skipped:
+                # Retard trop important: seule la fin est lue
+                start = end - MAX_SCAN_BYTES
+                truncated = True
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(start)
+                    data = f.read(end - start)
+            except OSError:
+                continue
+            # Ligne incomplète laissée pour la lecture suivante (fichier courant seulement)
+            if path == self.path:
+                data = data[:data.rfind(b'\n') + 1]
+                new_offset = start + len(data)
+            if skipped:
+                data = data[data.find(b'\n') + 1:]
+            for line in data.decode('utf-8', errors='replace').splitlines():
+                if not line:
+                    continue
+                if parse_entry(line)[0] is not None:
+                    entries.append(self._entry(line, []))
+                elif entries:
+                    entries[-1]['text'] += '\n' + line
+                else:
+                    # Suite d'une entrée déjà transmise (trace écrite après la lecture
+                    # précédente): horodatage et niveau repris de cette entrée
+                    entry = self._entry(self._header_before(path, start) or line, [])
+                    entry['text'] = line
+                    entries.append(entry)
+        return [entry for entry in entries if log_filter.match(entry)], (current[0], new_offset), truncated
+
+
+class LogReader:
+    """Logs de tous les services: dernières entrées et suivi incrémental par curseur"""
+
+    def __init__(self, sources: Dict[str, str], max_rotated: int = MAX_ROTATED):
+        self.sources = {name: LogSource(name, path, max_rotated) for name, path in sources.items()}
+
+    def _selected(self, source: Optional[str]) -> List[LogSource]:
+        if source and source in self.sources:
+            return [self.sources[source]]
+        return list(self.sources.values())
+
+    @staticmethod
+    def _merge(entries: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+        # Tri stable par horodatage: l'ordre de chaque fichier est conservé
+        entries.sort(key=lambda entry: entry['time'])
+        return entries[-count:]
+
+    @staticmethod
+    def encode_cursor(positions: Dict[str, Tuple[int, int]]) -> str:
+        return ','.join(f"{name}:{inode}:{offset}" for name, (inode, offset) in positions.items())
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Dict[str, Tuple[int, int]]:
+        positions = {}
+        for part in (cursor or '').split(','):
+            try:
+                name, inode, offset = part.rsplit(':', 2)
+                positions[name] = (int(inode), int(offset))
+            except ValueError:
+                continue
+        return positions
+
+    def tail(self, count: int = 100, level: Optional[str] = None, text: Optional[str] = None,
+             source: Optional[str] = None) -> Dict[str, Any]:
+        """Dernières entrées filtrées de tous les services, avec le curseur de suivi"""
+        log_filter = LogFilter(level, text)
+        entries = []
+        positions = {}
+        truncated = False
+        for log_source in self._selected(source):
+            position = log_source.position()
+            if position is None:
+                continue
+            # La position est relevée avant la lecture: rien n'est perdu ni lu deux fois
+            positions[log_source.name] = position
+            source_entries, source_truncated = log_source.tail(count, log_filter, end=position[1])
+            entries.extend(source_entries)
+            truncated = truncated or source_truncated
+        return {'entries': self._merge(entries, count), 'cursor': self.encode_cursor(positions),
+                'truncated': truncated}
+
+    def read_after(self, cursor: str, count: int = 100, level: Optional[str] = None,
+                   text: Optional[str] = None, source: Optional[str] = None) -> Dict[str, Any]:
+        """Entrées ajoutées depuis le curseur (services absents du curseur: à partir de maintenant)"""
+        log_filter = LogFilter(level, text)
+        known = self.decode_cursor(cursor)
+        entries = []
+        positions = {}
+        truncated = False
+        for log_source in self._selected(source):
+            if log_source.name not in known:
+                position = log_source.position()
+                if position is not None:
+                    positions[log_source.name] = position
+                continue
+            inode, offset = known[log_source.name]
+            source_entries, positions[log_source.name], source_truncated = \
+                log_source.read_after(inode, offset, log_filter)
+            entries.extend(source_entries)
+            truncated = truncated or source_truncated
+        if len(entries) > count:
+            truncated = True
+        return {'entries': self._merge(entries, count), 'cursor': self.encode_cursor(positions),
+                'truncated': truncated}
+
+
+def create_log_reader(config: Dict[str, Any]) -> LogReader:
+    """Factory function pour la lecture des logs des services"""
+    system_config = config.get('system', {})
+    sources = system_config.get('log_files') or DEFAULT_LOG_FILES
+    return LogReader(sources, max_rotated=system_config.get('log_max_rotated', MAX_ROTATED))
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Validation structurelle des photos avant transfert
+Les segments JPEG sont parcourus marqueur par marqueur jusqu'au vrai EOI:
+un fichier tronqué au milieu est détecté, des octets de bourrage (ou une
+seconde image MPF) après l'EOI ne rendent pas le fichier invalide. Pour les
+RAW TIFF (NEF, CR2), les offsets des IFD et des aperçus doivent rester dans
+le fichier. Les fichiers sont lus par mmap et validés sur tous les cœurs;
+les envois directs depuis l'appareil sont vérifiés au fil du flux (en-tête, fin).
+"""
+
+import os
+import re
+import mmap
+import struct
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, Any, List, Iterable
+
+from file_types import TYPE_JPEG, TYPE_NEF, TYPE_CR2, TYPE_TIFF, HEADER_SIZE, classify_header
+from raw_preview import find_jpeg_candidates
+
+logger = logging.getLogger('PhotoValidator')
+
+STATUS_VALID = 'valid'
+STATUS_CORRUPT = 'corrupt'
+STATUS_EMPTY = 'empty'
+STATUS_UNKNOWN = 'unknown'
+
+# Marqueurs sans segment de longueur
+_STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD8))
+# Fin des données compressées: 0xFF suivi d'autre chose que 0x00 (bourrage) ou RSTn
+_ENTROPY_END = re.compile(rb'\xff(?![\x00\xd0-\xd7\xff])')
+
+# En dessous, la validation se fait dans le processus courant
+MIN_POOL_BATCH = 4
+# Démarrage des processus du groupe sans fork du service (ses threads tiennent des verrous)
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def check_jpeg(data, start: int = 0, end: Optional[int] = None) -> Optional[str]:
+    """
+    Parcourt les segments JPEG de data[start:end]
+    Retourne None si la structure est complète jusqu'à l'EOI, sinon la raison
+    """
+    end = len(data) if end is None else end
+    if data[start:start + 2] != b'\xff\xd8':
+        return "en-tête SOI absent"
+    position = start + 2
+    frame_seen = False
+
+    while True:
+        if position + 2 > end:
+            return "fichier tronqué (EOI absent)"
+        if data[position] != 0xFF:
+            return f"marqueur attendu à l'offset {position - start}"
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # Octets de remplissage entre segments
+            position += 1
+            continue
+        if marker == 0xD9:
+            return None if frame_seen else "EOI sans image"
+        if marker in _STANDALONE_MARKERS:
+            position += 2
+            continue
+        if position + 4 > end:
+            return "fichier tronqué (segment incomplet)"
+        length = struct.unpack('>H', data[position + 2:position + 4])[0]
+        if length < 2 or position + 2 + length > end:
+            return f"segment 0x{marker:02X} tronqué à l'offset {position - start}"
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            frame_seen = True
+        position += 2 + length
+
+        if marker == 0xDA:
+            # Données compressées jusqu'au prochain marqueur
+            match = _ENTROPY_END.search(data, position, end)
+            if not match:
+                return "fichier tronqué dans les données d'image"
+            position = match.start()
+
+
+def check_tiff_raw(data) -> Optional[str]:
+    """Vérifie que les IFD et les aperçus JPEG d'un RAW TIFF restent dans le fichier"""
+    size = len(data)
+    endian = '<' if data[:2] == b'II' else '>'
+    first_ifd = struct.unpack(endian + 'I', data[4:8])[0]
+    if not 8 <= first_ifd < size:
+        return f"IFD0 hors du fichier (offset {first_ifd})"
+
+    data.seek(0)
+    candidates = find_jpeg_candidates(data)
+    for offset, length in candidates:
+        if offset + length > size:
+            return f"aperçu hors du fichier (offset {offset}, {length} octets)"
+    for offset, length in candidates:
+        # Aperçus et données RAW en JPEG sans perte: structure complète exigée
+        reason = check_jpeg(data, offset, offset + length)
+        if reason:
+            return f"aperçu JPEG invalide: {reason}"
+    return None
+
+
+def validate_file(path: str, check_raw: bool = True) -> Dict[str, Any]:
+    """Verdict pour un fichier: {'path', 'status', 'kind', 'reason'}"""
+    verdict = {'path': path, 'status': STATUS_VALID, 'kind': None, 'reason': None}
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                verdict.update(status=STATUS_EMPTY, reason="fichier vide")
+                return verdict
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                kind = classify_header(data[:HEADER_SIZE])
+                verdict['kind'] = kind
+                if kind == TYPE_JPEG:
+                    reason = check_jpeg(data)
+                elif kind in (TYPE_NEF, TYPE_CR2, TYPE_TIFF):
+                    reason = check_tiff_raw(data) if check_raw else None
+                elif kind is None:
+                    verdict['status'] = STATUS_UNKNOWN
+                    return verdict
+                else:
+                    # PNG, HEIF: pas de validation structurelle
+                    reason = None
+    except (OSError, ValueError, struct.error) as e:
+        verdict.update(status=STATUS_CORRUPT, reason=f"illisible: {e}")
+        return verdict
+
+    if reason:
+        verdict.update(status=STATUS_CORRUPT, reason=reason)
+    return verdict
+
+
+class StreamCheck:
+    """
+    Validation d'une photo au fil de son envoi, sans copie locale
+    Seuls l'en-tête et la fin du flux sont conservés: type reconnu, SOI et EOI
+    pour un JPEG, premier IFD dans le fichier pour un RAW TIFF
+    """
+
+    TAIL_SIZE = 1024
+
+    def __init__(self, check_raw: bool = True):
+        self.check_raw = check_raw
+        self.size = 0
+        self._head = b''
+        self._tail = b''
+
+    def update(self, chunk: bytes):
+        """Ajoute un morceau du flux"""
+        if len(self._head) < HEADER_SIZE:
+            self._head += chunk[:HEADER_SIZE - len(self._head)]
+        self._tail = (self._tail + chunk)[-self.TAIL_SIZE:]
+        self.size += len(chunk)
+
+    def verdict(self, path: str) -> Dict[str, Any]:
+        """Verdict du flux complet, au format de validate_file"""
+        verdict = {'path': path, 'status': STATUS_VALID, 'kind': None, 'reason': None}
+        if self.size == 0:
+            verdict.update(status=STATUS_EMPTY, reason="fichier vide")
+            return verdict
+        kind = classify_header(self._head)
+        verdict['kind'] = kind
+        reason = None
+        if kind == TYPE_JPEG:
+            if not self._head.startswith(b'\xff\xd8'):
+                reason = "en-tête SOI absent"
+            elif not self._tail.rstrip(b'\x00').endswith(b'\xff\xd9'):
+                reason = "fichier tronqué (EOI absent)"
+        elif kind in (TYPE_NEF, TYPE_CR2, TYPE_TIFF) and self.check_raw:
+            endian = '<' if self._head[:2] == b'II' else '>'
+            first_ifd = struct.unpack(endian + 'I', self._head[4:8])[0]
+            if not 8 <= first_ifd < self.size:
+                reason = f"IFD0 hors du fichier (offset {first_ifd})"
+        elif kind is None:
+            verdict['status'] = STATUS_UNKNOWN
+        if reason:
+            verdict.update(status=STATUS_CORRUPT, reason=reason)
+        return verdict
+
+
+def _validate_raw_files(path: str) -> Dict[str, Any]:
+    return validate_file(path, check_raw=True)
+
+
+def _validate_jpeg_only(path: str) -> Dict[str, Any]:
+    return validate_file(path, check_raw=False)
+
+
+class PhotoValidator:
+    """Valide des lots de photos dans un groupe de processus (créé à la demande)"""
+
+    def __init__(self, max_workers: Optional[int] = None, check_raw: bool = True):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.check_raw = check_raw
+        self._executor = None
+
+    def validate(self, paths: Iterable[str]) -> List[Dict[str, Any]]:
+        """Verdicts des fichiers, dans l'ordre des chemins"""
+        paths = list(paths)
+        worker = _validate_raw_files if self.check_raw else _validate_jpeg_only
+        if len(paths) < MIN_POOL_BATCH or self.max_workers == 1:
+            return [worker(path) for path in paths]
+        try:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context(POOL_START_METHOD))
+            chunksize = max(1, len(paths) // (self.max_workers * 4))
+            return list(self._executor.map(worker, paths, chunksize=chunksize))
+        except (OSError, RuntimeError) as e:
+            # Pas de groupe de processus possible (ressources, /dev/shm): validation locale
+            logger.warning(f"Validation parallèle impossible ({e}), validation séquentielle")
+            self.close()
+            return [worker(path) for path in paths]
+
+    def split(self, paths: Iterable[str]):
+        """Sépare les fichiers transférables des fichiers invalides (avec verdicts)"""
+        valid, rejected = [], []
+        for verdict in self.validate(paths):
+            if verdict['status'] in (STATUS_CORRUPT, STATUS_EMPTY):
+                logger.warning(f"Fichier invalide {os.path.basename(verdict['path'])}: {verdict['reason']}")
+                rejected.append(verdict)
+            else:
+                valid.append(verdict['path'])
+        return valid, rejected
+
+    def stream_check(self) -> StreamCheck:
+        """Validation au fil d'un envoi direct, avec les mêmes réglages"""
+        return StreamCheck(check_raw=self.check_raw)
+
+    def close(self):
+        """Arrête le groupe de processus"""
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def create_photo_validator(config: Dict[str, Any]) -> Optional[PhotoValidator]:
+    """Factory function pour la validation avant transfert (None si désactivée)"""
+    system_config = config.get('system', {})
+    if not system_config.get('validate_before_upload', True):
+        return None
+    return PhotoValidator(check_raw=system_config.get('validate_raw', True))
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Détection des nouvelles photos d'un dossier local
+Un seul parcours os.scandir au démarrage (synchronisation initiale), puis
+une surveillance inotify: chaque fichier terminé (écriture fermée ou
+renommage dans le dossier) est signalé sans reparcourir le dossier.
+Sans inotify, le dossier est reparcouru périodiquement (une seule passe)
+et un fichier n'est signalé qu'une fois sa taille stable entre deux passes.
+"""
+
+import os
+import sys
+import errno
+import struct
+import select
+import logging
+import threading
+from typing import Callable, Optional, Dict, Any, Set, List, Tuple
+
+logger = logging.getLogger('PhotoWatch')
+
+# inotify via la libc (Linux), sans dépendance supplémentaire
+try:
+    import ctypes
+    import ctypes.util
+    _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    _libc.inotify_init1.argtypes = [ctypes.c_int]
+    _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    INOTIFY_AVAILABLE = sys.platform.startswith('linux')
+except (OSError, AttributeError):
+    INOTIFY_AVAILABLE = False
+
+# Masques inotify utilisés
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# Fichier terminé: écriture fermée ou déplacé dans le dossier (fichiers .part renommés)
+IN_COMPLETED = IN_CLOSE_WRITE | IN_MOVED_TO
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.raw', '.cr2', '.nef')
+
+
+def is_photo(name: str) -> bool:
+    """Indique si le nom de fichier correspond à une photo"""
+    return name.lower().endswith(PHOTO_EXTENSIONS)
+
+
+def scan_photos(directory: str, accept: Callable[[str], bool] = is_photo) -> Set[str]:
+    """Photos présentes dans le dossier (un seul parcours, sans doublons)"""
+    return set(_scan_sizes(directory, accept))
+
+
+def _scan_sizes(directory: str, accept: Callable[[str], bool]) -> Dict[str, int]:
+    """Taille de chaque photo présente dans le dossier (un seul parcours)"""
+    sizes = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if accept(entry.name) and entry.is_file():
+                    try:
+                        sizes[entry.path] = entry.stat().st_size
+                    except FileNotFoundError:
+                        continue
+    except FileNotFoundError:
+        pass
+    return sizes
+
+
+class InotifyWatch:
+    """Surveillance inotify d'un seul dossier"""
+
+    def __init__(self, directory: str, mask: int = IN_COMPLETED):
+        if not INOTIFY_AVAILABLE:
+            raise OSError(errno.ENOSYS, "inotify non disponible")
+        self.directory = directory
+        self.fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(directory),
+                                     mask | IN_DELETE_SELF | IN_MOVE_SELF)
+        if wd < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch {directory}")
+
+    def read(self, timeout: Optional[float] = None) -> List[Tuple[str, int]]:
+        """Événements reçus (nom, masque); liste vide après timeout"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        position = 0
+        while position + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, position)
+            position += _EVENT_HEADER.size
+            name = os.fsdecode(data[position:position + length].rstrip(b'\0'))
+            position += length
+            events.append((name, mask))
+        return events
+
+    def close(self):
+        """Libère le descripteur inotify"""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PhotoWatcher:
+    """Signale chaque photo du dossier: existantes au démarrage, puis nouvelles"""
+
+    def __init__(self, directory: str, on_photo: Callable[[str], None],
+                 interval: float = 5, use_inotify: bool = True,
+                 accept: Callable[[str], bool] = is_photo):
+        self.directory = directory
+        self.on_photo = on_photo
+        self.interval = interval
+        self.use_inotify = use_inotify and INOTIFY_AVAILABLE
+        self.accept = accept
+        self.running = False
+        self.thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Démarre la surveillance dans un thread"""
+        if self.running:
+            return
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Arrête la surveillance"""
+        self.running = False
+        self._stop_event.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5.0)
+
+    def _emit(self, paths):
+        for path in sorted(paths):
+            try:
+                self.on_photo(path)
+            except Exception as e:
+                logger.error(f"Erreur lors de la prise en charge de {path}: {e}")
+
+    def sync(self) -> Set[str]:
+        """Synchronisation: signale toutes les photos présentes dans le dossier"""
+        os.makedirs(self.directory, exist_ok=True)
+        photos = scan_photos(self.directory, self.accept)
+        logger.debug(f"Total photos trouvées: {len(photos)}")
+        self._emit(photos)
+        return photos
+
+    def run(self):
+        """Boucle de surveillance (inotify, ou parcours périodique en repli)"""
+        self.running = True
+        while self.running:
+            try:
+                if self.use_inotify:
+                    self._run_inotify()
+                else:
+                    self._run_polling()
+            except OSError as e:
+                if not self.use_inotify:
+                    logger.error(f"Erreur de surveillance de {self.directory}: {e}")
+                    self._stop_event.wait(self.interval)
+                    continue
+                logger.warning(f"Surveillance inotify impossible ({e}), parcours périodique")
+                self.use_inotify = False
+            except Exception as e:
+                logger.error(f"Erreur de surveillance de {self.directory}: {e}")
+                self._stop_event.wait(self.interval)
+
+    def _run_inotify(self):
+        """Surveillance inotify; synchronisation complète si des événements sont perdus"""
+        os.makedirs(self.directory, exist_ok=True)
+        # Surveillance posée avant la synchronisation: aucun fichier ne passe entre les deux
+        watch = InotifyWatch(self.directory)
+        try:
+            self.sync()
+            logger.info(f"Surveillance inotify de {self.directory}")
+            while self.running:
+                for name, mask in watch.read(timeout=0.5):
+                    if mask & IN_Q_OVERFLOW:
+                        logger.warning("File d'événements inotify saturée, nouvelle synchronisation")
+                        self.sync()
+                    elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                        logger.warning(f"Dossier {self.directory} supprimé ou déplacé, nouvelle surveillance")
+                        return
+                    elif name and not mask & IN_ISDIR and self.accept(name):
+                        self._emit([os.path.join(self.directory, name)])
+        finally:
+            watch.close()
+
+    def _run_polling(self):
+        """
+        Repli sans inotify: une photo apparue depuis la synchronisation est signalée
+        dès que sa taille n'a pas changé entre deux parcours (écriture terminée)
+        """
+        reported = self.sync()
+        previous = {}
+        while self.running:
+            self._stop_event.wait(self.interval)
+            if not self.running:
+                return
+            current = _scan_sizes(self.directory, self.accept)
+            completed = [path for path, size in current.items()
+                         if path not in reported and size > 0 and previous.get(path) == size]
+            self._emit(completed)
+            # Un fichier supprimé puis recréé sous le même nom est signalé à nouveau
+            reported = (reported & current.keys()) | set(completed)
+            previous = current
+
+
+def create_photo_watcher(config: Dict[str, Any], on_photo: Callable[[str], None]) -> PhotoWatcher:
+    """Factory function pour surveiller le dossier de téléchargement"""
+    return PhotoWatcher(config.get('camera', {}).get('download_path', '/tmp/photos'),
+                        on_photo,
+                        interval=config.get('system', {}).get('check_interval', 5),
+                        use_inotify=config.get('system', {}).get('inotify', True))
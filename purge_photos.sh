@@ -18,15 +18,15 @@ purge_photos() {
     fi
     
     # Compter les fichiers avant
-    local count_before=$(find "$dir" -type f | wc -l)
+    local count_before=$(find "$dir" -type f -not -path "*/uploading/*" | wc -l)
     
     echo -e "${YELLOW}Suppression de tous les fichiers dans $dir...${NC}"
     
-    # Supprimer tous les fichiers (pas les sous-répertoires)
-    find "$dir" -type f -delete
+    # Supprimer tous les fichiers (pas les sous-répertoires), sauf les transferts en cours
+    find "$dir" -type f -not -path "*/uploading/*" -delete
     
     # Compter les fichiers après
-    local count_after=$(find "$dir" -type f | wc -l)
+    local count_after=$(find "$dir" -type f -not -path "*/uploading/*" | wc -l)
     local deleted=$((count_before - count_after))
     
     echo -e "${GREEN}$deleted fichiers supprimés avec succès.${NC}"
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Extraction de l'aperçu JPEG pleine taille intégré aux fichiers RAW (NEF, CR2)
+Les IFD TIFF sont parcourus pour localiser le JPEG intégré, qui est copié
+tel quel: les données RAW ne sont jamais décodées. L'aperçu est transféré
+en priorité, le RAW est mis en file pour un transfert de masse ultérieur.
+"""
+
+import os
+import struct
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+
+from upload_queue import PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_BULK
+
+logger = logging.getLogger('RawPreview')
+
+RAW_EXTENSIONS = ('.nef', '.cr2')
+PREVIEW_SUFFIX = '_preview.jpg'
+
+# Tags TIFF utilisés
+TAG_COMPRESSION = 0x0103
+TAG_STRIP_OFFSETS = 0x0111
+TAG_STRIP_BYTE_COUNTS = 0x0117
+TAG_SUB_IFDS = 0x014A
+TAG_JPEG_OFFSET = 0x0201
+TAG_JPEG_LENGTH = 0x0202
+
+# Taille en octets des types TIFF
+_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+_TYPE_FORMATS = {3: 'H', 4: 'I', 8: 'h', 9: 'i', 13: 'I'}
+
+# Garde-fous contre les fichiers corrompus
+MAX_IFDS = 32
+MAX_ENTRIES = 1024
+
+
+def is_raw(path: str) -> bool:
+    """Indique si le fichier est un RAW au format TIFF (NEF, CR2)"""
+    return path.lower().endswith(RAW_EXTENSIONS)
+
+
+def is_preview(path: str) -> bool:
+    """Indique si le fichier est un aperçu extrait d'un RAW"""
+    return path.lower().endswith(PREVIEW_SUFFIX)
+
+
+def upload_priority(path: str) -> int:
+    """Priorité de transfert: aperçus d'abord, RAW en dernier"""
+    if is_preview(path):
+        return PRIORITY_HIGH
+    if is_raw(path):
+        return PRIORITY_BULK
+    return PRIORITY_NORMAL
+
+
+def preview_path_for(raw_path: str, dest_dir: Optional[str] = None) -> str:
+    """Chemin de l'aperçu correspondant à un RAW"""
+    stem = os.path.splitext(os.path.basename(raw_path))[0]
+    return os.path.join(dest_dir or os.path.dirname(raw_path), stem + PREVIEW_SUFFIX)
+
+
+def read_ifd(f, offset: int, endian: str) -> Tuple[Dict[int, List[int]], int]:
+    """Lit une IFD: valeurs numériques des tags et offset de l'IFD suivante"""
+    f.seek(offset)
+    raw_count = f.read(2)
+    if len(raw_count) < 2:
+        return {}, 0
+    count = min(struct.unpack(endian + 'H', raw_count)[0], MAX_ENTRIES)
+    data = f.read(count * 12 + 4)
+
+    tags = {}
+    for i in range(min(count, (len(data) - 4) // 12)):
+        tag, value_type, value_count = struct.unpack(endian + 'HHI', data[i * 12:i * 12 + 8])
+        if value_type not in _TYPE_FORMATS:
+            continue
+        size = _TYPE_SIZES[value_type] * value_count
+        value_data = data[i * 12 + 8:i * 12 + 12]
+        if size > 4:
+            # Valeurs stockées hors de l'IFD (listes de strips, SubIFDs)
+            position = f.tell()
+            f.seek(struct.unpack(endian + 'I', value_data)[0])
+            value_data = f.read(min(size, 4096))
+            f.seek(position)
+            value_count = len(value_data) // _TYPE_SIZES[value_type]
+        tags[tag] = list(struct.unpack(endian + _TYPE_FORMATS[value_type] * value_count,
+                                       value_data[:_TYPE_SIZES[value_type] * value_count]))
+
+    next_offset = 0
+    if len(data) >= count * 12 + 4:
+        next_offset = struct.unpack(endian + 'I', data[count * 12:count * 12 + 4])[0]
+    return tags, next_offset
+
+
+def find_jpeg_candidates(f) -> List[Tuple[int, int]]:
+    """Liste (offset, longueur) des JPEG référencés par les IFD du fichier TIFF"""
+    f.seek(0)
+    header = f.read(8)
+    if header[:2] == b'II':
+        endian = '<'
+    elif header[:2] == b'MM':
+        endian = '>'
+    else:
+        return []
+    if len(header) < 8 or struct.unpack(endian + 'H', header[2:4])[0] != 42:
+        return []
+
+    candidates = []
+    to_visit = [struct.unpack(endian + 'I', header[4:8])[0]]
+    visited = set()
+    while to_visit and len(visited) < MAX_IFDS:
+        offset = to_visit.pop(0)
+        if not offset or offset in visited:
+            continue
+        visited.add(offset)
+        tags, next_offset = read_ifd(f, offset, endian)
+        to_visit.append(next_offset)
+        to_visit.extend(tags.get(TAG_SUB_IFDS, []))
+
+        # Aperçu JPEG (NEF: SubIFD, CR2: IFD1)
+        if TAG_JPEG_OFFSET in tags and TAG_JPEG_LENGTH in tags:
+            candidates.append((tags[TAG_JPEG_OFFSET][0], tags[TAG_JPEG_LENGTH][0]))
+        # JPEG en un seul strip (CR2: IFD0, compression 6)
+        if tags.get(TAG_COMPRESSION, [0])[0] == 6 and \
+                len(tags.get(TAG_STRIP_OFFSETS, [])) == 1 and TAG_STRIP_BYTE_COUNTS in tags:
+            candidates.append((tags[TAG_STRIP_OFFSETS][0], tags[TAG_STRIP_BYTE_COUNTS][0]))
+    return candidates
+
+
+def is_displayable_jpeg(head: bytes) -> bool:
+    """JPEG standard (SOF0/1/2), pas le JPEG sans perte des données RAW (SOF3)"""
+    if head[:2] != b'\xff\xd8':
+        return False
+    position = 2
+    while position + 4 <= len(head):
+        if head[position] != 0xFF:
+            return False
+        marker = head[position + 1]
+        if marker in (0xC0, 0xC1, 0xC2):
+            return True
+        if marker in (0xC3, 0xDA, 0xD9):
+            return False
+        length = struct.unpack('>H', head[position + 2:position + 4])[0]
+        position += 2 + length
+    return False
+
+
+def extract_preview(raw_path: str, dest_dir: Optional[str] = None) -> Optional[str]:
+    """
+    Copie le plus grand aperçu JPEG intégré au RAW dans un fichier séparé
+    Retourne le chemin de l'aperçu, ou None si le RAW n'en contient pas
+    """
+    try:
+        with open(raw_path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            best = None
+            for offset, length in find_jpeg_candidates(f):
+                if length <= 0 or offset + length > file_size:
+                    continue
+                if best and length <= best[1]:
+                    continue
+                f.seek(offset)
+                if is_displayable_jpeg(f.read(min(length, 65536))):
+                    best = (offset, length)
+
+            if not best:
+                logger.debug(f"Aucun aperçu JPEG dans {os.path.basename(raw_path)}")
+                return None
+
+            preview_path = preview_path_for(raw_path, dest_dir)
+            temp_path = preview_path + '.part'
+            f.seek(best[0])
+            remaining = best[1]
+            with open(temp_path, 'wb') as out:
+                while remaining > 0:
+                    chunk = f.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    remaining -= len(chunk)
+            os.replace(temp_path, preview_path)
+
+        logger.info(f"Aperçu extrait de {os.path.basename(raw_path)} ({best[1] // 1024} Ko)")
+        return preview_path
+    except (OSError, struct.error) as e:
+        logger.warning(f"Impossible d'extraire l'aperçu de {raw_path}: {e}")
+        return None
+
+
+class PreviewStage:
+    """Étape d'ingestion: l'aperçu part en priorité, le RAW en transfert de masse"""
+
+    def __init__(self, upload_queue, preview_dir: Optional[str] = None):
+        self.upload_queue = upload_queue
+        self.preview_dir = preview_dir
+
+    def __call__(self, path: str) -> bool:
+        if not is_raw(path):
+            return self.upload_queue.put(path)
+        preview = extract_preview(path, self.preview_dir)
+        if preview:
+            self.upload_queue.put(preview, priority=PRIORITY_HIGH)
+        return self.upload_queue.put(path, priority=PRIORITY_BULK)
+
+
+def create_preview_stage(config: Dict[str, Any], upload_queue):
+    """Retourne la fonction de mise en file des photos (avec extraction d'aperçu si configurée)"""
+    if not config.get('camera', {}).get('raw_preview', False):
+        return upload_queue.put
+    return PreviewStage(upload_queue)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Rétention des photos locales par quotas (âge et octets)
+L'âge d'une photo est compté depuis son arrivée dans le spool, pas depuis sa
+date de fichier (date de prise de vue pour gphoto2: une photo ancienne de la
+carte serait supprimée dès son arrivée).
+Les fichiers du spool sont suivis dans des tas ordonnés par âge, alimentés
+par les déplacements entre états (ingestion, transfert): l'éviction retire
+le plus ancien en O(log n), sans reparcourir le dossier à chaque boucle.
+Les photos transférées (done/) partent en premier; les photos pas encore
+envoyées ne sont supprimées que si la configuration l'autorise.
+"""
+
+import os
+import sys
+import time
+import heapq
+import logging
+import threading
+from typing import Optional, Dict, Any, Tuple
+
+from spool import READY, DONE, QUARANTINE, Spool, create_spool
+
+logger = logging.getLogger('Retention')
+
+# États suivis: transférés (évincés en premier) et pas encore envoyés
+_UPLOADED_STATES = (DONE,)
+_UNSENT_STATES = (READY, QUARANTINE)
+
+
+class RetentionManager:
+    """Applique les quotas d'âge et d'octets au spool, plus anciennes photos d'abord"""
+
+    def __init__(self, spool: Spool, max_age_hours: Optional[float] = 24,
+                 max_bytes: int = 0, evict_unsent: bool = False):
+        self.spool = spool
+        self.max_age = max_age_hours * 3600 if max_age_hours else None
+        self.max_bytes = max_bytes
+        self.evict_unsent = evict_unsent
+        # Chemin -> (arrivée, taille, transféré); les entrées des tas qui ne
+        # correspondent plus (fichier déplacé ou supprimé) sont ignorées à l'extraction
+        self.files: Dict[str, Tuple[float, int, bool]] = {}
+        self.heaps = {True: [], False: []}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self._quota_warned = False
+
+        # Un seul parcours au démarrage, puis uniquement les événements du spool
+        for state in _UPLOADED_STATES + _UNSENT_STATES:
+            for path in spool.list(state):
+                self.track(path)
+        spool.listeners.append(self.on_move)
+
+    def close(self):
+        """Cesse de suivre le spool (rechargement de la configuration)"""
+        if self.on_move in self.spool.listeners:
+            self.spool.listeners.remove(self.on_move)
+
+    def on_move(self, old_path: str, new_path: Optional[str]):
+        """Suit un déplacement du spool (nouveau chemin None: fichier supprimé)"""
+        self.forget(old_path)
+        if new_path:
+            self.track(new_path, arrived=time.time())
+
+    def refresh(self):
+        """
+        Reprend les fichiers déplacés par un autre processus (un parcours des états suivis)
+        Les fichiers déjà suivis gardent leur date d'arrivée
+        """
+        seen = set()
+        for state in _UPLOADED_STATES + _UNSENT_STATES:
+            for path in self.spool.list(state):
+                seen.add(path)
+                if path not in self.files:
+                    self.track(path)
+        with self.lock:
+            for path in [path for path in self.files if path not in seen]:
+                self._forget(path)
+
+    def track(self, path: str, arrived: Optional[float] = None):
+        """
+        Ajoute un fichier aux tas s'il est dans un état soumis à la rétention
+        arrived: date d'arrivée dans le spool; à défaut, date de changement d'état
+        du fichier (ctime, mise à jour par chaque déplacement)
+        """
+        state = self.spool.state_of(path)
+        if state not in _UPLOADED_STATES + _UNSENT_STATES:
+            return
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        uploaded = state in _UPLOADED_STATES
+        arrived = stat.st_ctime if arrived is None else arrived
+        with self.lock:
+            self._forget(path)
+            self.files[path] = (arrived, stat.st_size, uploaded)
+            self.total_bytes += stat.st_size
+            heapq.heappush(self.heaps[uploaded], (arrived, path))
+            self._compact()
+
+    def forget(self, path: str):
+        """Retire un fichier du suivi (l'entrée du tas devient obsolète)"""
+        with self.lock:
+            self._forget(path)
+
+    def _forget(self, path: str):
+        entry = self.files.pop(path, None)
+        if entry:
+            self.total_bytes -= entry[1]
+
+    def _compact(self):
+        # Reconstruction quand les entrées obsolètes dominent (déplacements nombreux)
+        for uploaded, heap in self.heaps.items():
+            if len(heap) > 2 * len(self.files) + 64:
+                self.heaps[uploaded] = [(arrived, path) for path, (arrived, _, done) in self.files.items()
+                                        if done == uploaded]
+                heapq.heapify(self.heaps[uploaded])
+
+    def _oldest(self, uploaded: bool) -> Optional[Tuple[float, str]]:
+        """Plus ancien fichier encore suivi d'un tas (entrées obsolètes retirées)"""
+        heap = self.heaps[uploaded]
+        while heap:
+            arrived, path = heap[0]
+            entry = self.files.get(path)
+            if entry and entry[0] == arrived and entry[2] == uploaded:
+                return arrived, path
+            heapq.heappop(heap)
+        return None
+
+    def _over_quota(self, arrived: float, now: float) -> bool:
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            return True
+        return self.max_age is not None and now - arrived > self.max_age
+
+    def enforce(self) -> Dict[str, int]:
+        """Évince les plus anciennes photos tant qu'un quota est dépassé"""
+        evicted = {'files': 0, 'bytes': 0}
+        now = time.time()
+        classes = (True, False) if self.evict_unsent else (True,)
+        for uploaded in classes:
+            while True:
+                with self.lock:
+                    oldest = self._oldest(uploaded)
+                    if not oldest or not self._over_quota(oldest[0], now):
+                        break
+                    path = oldest[1]
+                    size = self.files[path][1]
+                try:
+                    self.spool.remove(path)
+                    label = "transférée" if uploaded else "non transférée"
+                    logger.info(f"Rétention: photo {label} supprimée {os.path.basename(path)}")
+                    evicted['files'] += 1
+                    evicted['bytes'] += size
+                except FileNotFoundError:
+                    self.forget(path)
+                except OSError as e:
+                    logger.error(f"Rétention: impossible de supprimer {path}: {e}")
+                    self.forget(path)
+
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            if not self._quota_warned:
+                logger.warning(f"Quota local dépassé ({self.total_bytes // (1024 * 1024)} Mo): "
+                               "photos non transférées conservées (retention_evict_unsent désactivé)")
+                self._quota_warned = True
+        else:
+            self._quota_warned = False
+        return evicted
+
+    def metrics(self) -> Dict[str, Any]:
+        """État de la rétention pour l'interface web"""
+        with self.lock:
+            uploaded = sum(1 for entry in self.files.values() if entry[2])
+            return {
+                'tracked_files': len(self.files),
+                'uploaded_files': uploaded,
+                'unsent_files': len(self.files) - uploaded,
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+def create_retention_manager(config: Dict[str, Any], spool: Optional[Spool] = None) -> RetentionManager:
+    """Factory function pour la rétention du spool"""
+    system_config = config.get('system', {})
+    return RetentionManager(spool or create_spool(config),
+                            max_age_hours=system_config.get('retention_max_age_hours', 24),
+                            max_bytes=int(system_config.get('retention_max_mb', 0) * 1024 * 1024),
+                            evict_unsent=system_config.get('retention_evict_unsent', False))
+
+
+if __name__ == "__main__":
+    # Application ponctuelle des quotas (remplace les nettoyages en shell)
+    from config_util import load_config
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    config_path = sys.argv[1] if len(sys.argv) > 1 else 'config.json'
+    result = create_retention_manager(load_config(config_path)).enforce()
+    print(f"{result['files']} photo(s) supprimée(s), {result['bytes'] // (1024 * 1024)} Mo libérés")
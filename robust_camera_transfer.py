@@ -14,6 +14,13 @@ import shutil
 from datetime import datetime
 from pathlib import Path
 import tempfile
+import threading
+
+from camera_ingest import iter_saved_files
+from camera_fleet import body_id, detect_cameras_cli
+from upload_queue import UploadQueue
+from file_types import add_extension
+from photo_validator import STATUS_CORRUPT, STATUS_EMPTY, STATUS_UNKNOWN, PhotoValidator
 
 # Configuration du logging
 logging.basicConfig(
@@ -34,6 +41,7 @@ class RobustCameraTransfer:
         # Charger la configuration
         self.config = self._load_config(config_path)
         self.download_path = self.config['camera'].get('download_path', '/tmp/photos')
+        self.cameras = []
         self.backup_path = "/tmp/photos_backup_{}".format(int(time.time()))
         
         # S'assurer que les répertoires existent
@@ -73,44 +81,34 @@ class RobustCameraTransfer:
         logger.info("🔍 Vérification et nettoyage des fichiers corrompus...")
         
         deleted = 0
-        for file_path in Path(self.download_path).glob('*'):
-            if not file_path.is_file():
-                continue
-                
-            # Vérifier la taille
-            size = os.path.getsize(file_path)
-            if size == 0:
+        files = [str(file_path) for file_path in Path(self.download_path).glob('*') if file_path.is_file()]
+        
+        # Structure complète vérifiée sur tous les cœurs (segments JPEG jusqu'à l'EOI, IFD des RAW)
+        for verdict in PhotoValidator().validate(files):
+            file_path = verdict['path']
+            filename = os.path.basename(file_path)
+            
+            if verdict['status'] == STATUS_EMPTY:
                 logger.warning(f"Suppression fichier vide: {file_path}")
                 os.unlink(file_path)
                 deleted += 1
                 continue
-                
-            # Vérifier l'intégrité des JPG
-            if file_path.suffix.lower() in ['.jpg', '.jpeg'] or file_path.name.lower().startswith('dsc'):
-                try:
-                    with open(file_path, 'rb') as f:
-                        header = f.read(3)
-                        # Aller à la fin du fichier pour vérifier le footer JPEG
-                        f.seek(-2, os.SEEK_END)
-                        footer = f.read(2)
-                        
-                    # En-tête JPEG doit être FF D8 FF
-                    if header != b'\xff\xd8\xff':
-                        logger.warning(f"Fichier {file_path} n'a pas un en-tête JPEG valide")
-                        # Créer une sauvegarde au lieu de supprimer
-                        os.makedirs(self.backup_path, exist_ok=True)
-                        shutil.move(file_path, os.path.join(self.backup_path, file_path.name))
-                        deleted += 1
-                        
-                    # Footer JPEG doit être FF D9
-                    elif footer != b'\xff\xd9':
-                        logger.warning(f"Fichier {file_path} n'a pas un footer JPEG valide")
-                        # Créer une sauvegarde au lieu de supprimer
-                        os.makedirs(self.backup_path, exist_ok=True)
-                        shutil.move(file_path, os.path.join(self.backup_path, file_path.name))
-                        deleted += 1
-                except Exception as e:
-                    logger.error(f"Erreur vérification fichier {file_path}: {e}")
+            
+            # Fichier nommé comme une photo mais de type inconnu: en-tête invalide
+            if verdict['status'] == STATUS_UNKNOWN and \
+                    (filename.lower().endswith(('.jpg', '.jpeg')) or filename.lower().startswith('dsc')):
+                verdict['reason'] = "en-tête JPEG invalide"
+            elif verdict['status'] != STATUS_CORRUPT:
+                continue
+            
+            logger.warning(f"Fichier {file_path} invalide: {verdict['reason']}")
+            try:
+                # Créer une sauvegarde au lieu de supprimer
+                os.makedirs(self.backup_path, exist_ok=True)
+                shutil.move(file_path, os.path.join(self.backup_path, filename))
+                deleted += 1
+            except Exception as e:
+                logger.error(f"Erreur vérification fichier {file_path}: {e}")
         
         logger.info(f"Nettoyage terminé: {deleted} fichiers déplacés/supprimés")
         return deleted
@@ -133,98 +131,88 @@ class RobustCameraTransfer:
         logger.info("🔍 Recherche d'appareils photo...")
         
         try:
-            result = subprocess.run(
-                ['gphoto2', '--auto-detect'],
-                capture_output=True, 
-                text=True,
-                timeout=10
-            )
+            # Tous les boîtiers connectés (un téléchargement par port USB)
+            self.cameras = detect_cameras_cli()
+            for camera in self.cameras:
+                logger.info(f"📷 Caméra détectée: {camera['model']} ({camera['port']})")
             
-            if "usb:" in result.stdout and result.returncode == 0:
-                camera_info = [line for line in result.stdout.split('\n') 
-                              if line.strip() and 'usb:' in line.lower()]
-                
-                if camera_info:
-                    logger.info(f"📷 Caméra détectée: {camera_info[0].strip()}")
-                    return True
+            if self.cameras:
+                return True
             
             logger.warning("❌ Aucune caméra compatible détectée")
             return False
             
-        except subprocess.TimeoutExpired:
-            logger.error("⏱️ Timeout lors de la détection de caméra")
-            return False
         except Exception as e:
             logger.error(f"❌ Erreur lors de la détection: {e}")
             return False
     
-    def download_from_camera(self):
-        """Télécharge les photos depuis la caméra"""
-        logger.info("📥 Téléchargement des photos depuis la caméra...")
+    def download_from_camera(self, on_photo=None):
+        """
+        Télécharge les photos depuis la ou les caméras
+        on_photo est appelé pour chaque photo dès qu'elle est enregistrée
+        """
+        cameras = self.cameras
+        if len(cameras) <= 1:
+            return self._download_port(on_photo=on_photo)
         
-        files_before = set(os.listdir(self.download_path))
+        # Plusieurs boîtiers: un gphoto2 par port, fichiers préfixés par boîtier
+        results = {}
+        threads = []
+        for camera in cameras:
+            prefix = body_id(camera['model'], camera['port'],
+                             names=self.config['camera'].get('body_names')) + '_'
+            thread = threading.Thread(
+                target=lambda c=camera, p=prefix: results.update(
+                    {c['port']: self._download_port(c['port'], p, on_photo)}),
+                daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return [path for files in results.values() for path in files]
+    
+    def _download_port(self, port=None, prefix='', on_photo=None):
+        """Télécharge les photos d'un boîtier (port USB optionnel)"""
+        logger.info(f"📥 Téléchargement des photos depuis la caméra {port or ''}...")
         
+        fixed_files = []
         try:
             # Utiliser gphoto2 avec les options optimales pour éviter la corruption
             cmd = [
                 'gphoto2',
                 '--get-all-files',
                 '--skip-existing',
-                '--filename', os.path.join(self.download_path, '%f')  # %f préserve l'extension
+                '--filename', os.path.join(self.download_path, prefix + '%f')  # %f préserve l'extension
             ]
+            if port:
+                cmd.extend(['--port', port])
             
-            result = subprocess.run(
-                cmd, 
-                capture_output=True,
-                text=True, 
-                timeout=300  # Temps suffisant même pour beaucoup de photos
-            )
-            
-            # Vérifier le résultat
-            if "*** Error" in result.stdout or "*** Error" in result.stderr:
-                logger.warning(f"⚠️ Problème potentiel: {result.stderr}")
-            
-            # Compter les nouveaux fichiers
-            files_after = set(os.listdir(self.download_path))
-            new_files = files_after - files_before
-            
-            # Vérifier et corriger les extensions manquantes
-            fixed_files = []
-            for filename in new_files:
-                file_path = os.path.join(self.download_path, filename)
+            # Chaque fichier est traité dès que gphoto2 l'a enregistré
+            for file_path in iter_saved_files(cmd, timeout=300):  # Temps suffisant même pour beaucoup de photos
+                filename = os.path.basename(file_path)
                 
                 # Vérifier si le fichier a une extension connue
                 if not any(filename.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.nef', '.raw']):
                     # Tenter d'identifier le type de fichier
                     try:
-                        with open(file_path, 'rb') as f:
-                            header = f.read(10)
-                            
-                            # Vérifier s'il s'agit d'un JPEG (header FF D8 FF)
-                            if header[0:3] == b'\xff\xd8\xff':
-                                new_path = file_path + '.jpg'
-                                os.rename(file_path, new_path)
-                                logger.info(f"✅ Fichier JPEG renommé: {filename} → {filename}.jpg")
-                                fixed_files.append(new_path)
-                            else:
-                                # Type inconnu, garder le fichier original
-                                fixed_files.append(file_path)
+                        new_path = add_extension(file_path)
+                        if new_path and new_path != file_path:
+                            logger.info(f"✅ Fichier renommé: {filename} → {os.path.basename(new_path)}")
+                            file_path = new_path
                     except Exception as e:
                         logger.warning(f"⚠️ Erreur lors de l'identification du fichier {filename}: {e}")
-                        fixed_files.append(file_path)
-                else:
-                    # Fichier avec extension correcte
-                    fixed_files.append(file_path)
+                
+                fixed_files.append(file_path)
+                if on_photo:
+                    on_photo(file_path)
             
             logger.info(f"✅ {len(fixed_files)} photos téléchargées/traitées")
             return fixed_files
             
-        except subprocess.TimeoutExpired:
-            logger.error("⏱️ Timeout lors du téléchargement")
-            return []
         except Exception as e:
             logger.error(f"❌ Erreur: {e}")
-            return []
+            return fixed_files
     
     def transfer_photos_lftp(self, file_paths):
         """Transfère les photos via lftp (plus fiable pour FTPS)"""
@@ -340,13 +328,24 @@ class RobustCameraTransfer:
         
         # Étape 3: Détecter la caméra
         if self.detect_camera():
-            # Étape 4: Télécharger depuis la caméra
-            photo_files = self.download_from_camera()
+            # Étapes 4 et 5: télécharger depuis la caméra et transférer en parallèle,
+            # chaque photo part vers le serveur dès qu'elle est enregistrée
+            upload_queue = UploadQueue()
+            download_thread = threading.Thread(
+                target=self.download_from_camera,
+                kwargs={'on_photo': upload_queue.put},
+                daemon=True
+            )
+            download_thread.start()
+            
+            transferred = 0
+            while download_thread.is_alive() or len(upload_queue):
+                batch = upload_queue.get_batch(timeout=0.5)
+                if batch:
+                    transferred += self.transfer_photos_lftp(batch)
+            download_thread.join()
             
-            # Étape 5: Transférer les photos
-            if photo_files:
-                transferred = self.transfer_photos_lftp(photo_files)
-                return transferred > 0
+            return transferred > 0
         
         return False
 
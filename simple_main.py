@@ -12,11 +12,29 @@ import subprocess
 import threading
 import signal
 from datetime import datetime
-from pathlib import Path
+from collections import OrderedDict
 
 # Imports simplifiés
 from config_util import load_config, save_config
 from simple_transfer import SimpleTransfer, create_transfer
+from camera_session import CameraError, create_camera_session
+from camera_ingest import EventIngest, PollIngest, iter_saved_files, download_pending, missing_files_cli
+from camera_index import create_camera_index
+from camera_cleanup import create_camera_cleaner
+from camera_stream import create_camera_streamer
+from camera_recovery import create_camera_recovery
+from camera_fleet import CameraFleet
+from raw_preview import create_preview_stage, upload_priority
+from upload_ledger import DEDUPE_LINK, create_upload_ledger
+from upload_queue import UploadQueue
+from photo_watch import PhotoWatcher
+from file_types import add_extension
+from photo_validator import create_photo_validator
+from spool import INCOMING, READY, UPLOADING, DONE, QUARANTINE, create_spool, is_incoming_photo
+from retention import create_retention_manager
+from disk_space import create_disk_guard
+from control_socket import create_control_server
+from transfer_stats import create_transfer_stats
 
 # Configurer le logging
 logging.basicConfig(
@@ -29,6 +47,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger('PhotoTransfer')
 
+# Résultats de transfert conservés pour le suivi des uploads de l'interface web
+MAX_UPLOAD_RESULTS = 1000
+
 class SimpleFTPService:
     """Service de transfert de photos simplifié"""
     
@@ -38,6 +59,29 @@ class SimpleFTPService:
         self.running = False
         self.transfer_thread = None
         self.config = None
+        self.camera_session = None
+        self.camera_index = None
+        self.camera_cleaner = None
+        self.camera_streamer = None
+        self.camera_recovery = None
+        self.camera_ingest = None
+        self.upload_ledger = None
+        self.photo_watcher = None
+        self.photo_validator = None
+        self.spool = None
+        self.retention = None
+        self.disk_guard = None
+        self.enqueue_photo = None
+        self.transfer_stats = None
+        self.upload_queue = UploadQueue()
+        # Activité des transferts, lue par le tableau de bord en direct
+        self.transfer_progress = None
+        self.bytes_uploaded = 0
+        self.photos_uploaded = 0
+        self.started_at = time.time()
+        # Issue définitive des derniers transferts, par nom de fichier
+        self.transfer_results = OrderedDict()
+        self.results_lock = threading.Lock()
         
         # Créer le répertoire de logs s'il n'existe pas
         os.makedirs('logs', exist_ok=True)
@@ -80,8 +124,32 @@ class SimpleFTPService:
             self.config = load_config(self.config_path)
             logger.info("Configuration chargée avec succès")
             self._configure_logging()
-            # Recharger aussi le module de transfert
+            # Recharger aussi le module de transfert et la session caméra
             self.reload_transfer()
+            self.upload_ledger = create_upload_ledger(self.config)
+            # Composants de la configuration précédente arrêtés avant d'être recréés
+            self._close_spool_components()
+            # Statistiques persistantes (totaux et agrégats par minute, heure et jour)
+            self.transfer_stats = create_transfer_stats(self.config)
+            if self.photo_validator:
+                self.photo_validator.close()
+            self.photo_validator = create_photo_validator(self.config)
+            # Dossier local par états; les index caméra suivent chaque déplacement
+            self.spool = create_spool(self.config)
+            self.spool.listeners.append(self._track_spool_move)
+            # Dernières photos et leur état, pour la galerie de l'interface web
+            if self.transfer_stats:
+                self.transfer_stats.watch(self.spool)
+            # Quotas d'âge et d'octets, suivis à partir des déplacements du spool
+            self.retention = create_retention_manager(self.config, self.spool)
+            # Téléchargements suspendus quand l'espace libre local devient insuffisant
+            self.disk_guard = create_disk_guard(self.config, self.spool.root)
+            # Mise en file d'upload (aperçu des RAW extrait et transféré en priorité si configuré)
+            self.enqueue_photo = create_preview_stage(self.config, self.upload_queue)
+            self.reload_camera()
+            if self.running:
+                self._stop_photo_watcher()
+                self._start_photo_watcher()
         except Exception as e:
             logger.error(f"Erreur chargement configuration: {e}")
             # Créer une configuration minimale
@@ -91,6 +159,22 @@ class SimpleFTPService:
                 'camera': {'auto_detect': True, 'download_path': '/tmp/photos'},
                 'system': {'log_level': 'INFO', 'check_interval': 5}
             }
+            self.spool = self.spool or create_spool(self.config)
+            self.enqueue_photo = self.enqueue_photo or self.upload_queue.put
+    
+    def _close_spool_components(self):
+        """
+        Détache de l'ancien spool les composants qui le suivent (rétention, index
+        caméra) et arrête les statistiques (thread d'écriture, base SQLite)
+        """
+        if self.retention:
+            self.retention.close()
+            self.retention = None
+        if self.transfer_stats:
+            self.transfer_stats.close()
+            self.transfer_stats = None
+        if self.spool and self._track_spool_move in self.spool.listeners:
+            self.spool.listeners.remove(self._track_spool_move)
     
     def reload_transfer(self):
         """Recharge le module de transfert avec la configuration actuelle"""
@@ -101,6 +185,97 @@ class SimpleFTPService:
             logger.error(f"Erreur lors du rechargement du module de transfert: {e}")
             self.transfer = None
     
+    def reload_camera(self):
+        """Recrée la session caméra persistante avec la configuration actuelle"""
+        self._stop_camera_ingest()
+        if self.camera_streamer:
+            self.camera_streamer.close()
+        if self.camera_session:
+            self.camera_session.close()
+        try:
+            self.camera_session = create_camera_session(self.config)
+            self.camera_index = create_camera_index(self.config)
+            self.camera_cleaner = None
+            if self.camera_session:
+                self.camera_cleaner = create_camera_cleaner(self.config, self.camera_session,
+                                                            self.camera_index)
+            # Récupération ciblée de la liaison USB/PTP
+            self.camera_recovery = create_camera_recovery(self.config, self.camera_session)
+            # Transfert direct appareil → serveur (camera.stream_upload)
+            self.camera_streamer = create_camera_streamer(self.config, self.camera_session,
+                                                          self.camera_index, **self._stream_services())
+        except Exception as e:
+            logger.error(f"Erreur lors de la création de la session caméra: {e}")
+            self.camera_session = None
+        if self.running:
+            self._start_camera_ingest()
+    
+    def _stream_services(self):
+        """Étapes du transfert partagées avec l'envoi direct depuis l'appareil"""
+        return {'spool': self.spool, 'ledger': self.upload_ledger,
+                'stats': self.transfer_stats, 'validator': self.photo_validator}
+    
+    def _event_mode(self):
+        """Indique si l'ingestion caméra est pilotée par les événements"""
+        camera_config = self.config.get('camera', {})
+        return (camera_config.get('auto_detect', True) and
+                camera_config.get('ingest_mode', 'poll') == 'events')
+    
+    def _start_camera_ingest(self):
+        """
+        Démarre l'ingestion caméra dans son propre thread: chaque photo rejoint
+        la file d'attente d'upload dès son téléchargement, en parallèle des transferts
+        """
+        if not self.config['camera'].get('auto_detect', True) or self.camera_ingest:
+            return
+        download_path = self.spool.dir(INCOMING)
+        on_photo = self._ingest_photo
+
+        if self.config['camera'].get('multi_camera', False):
+            # Une ingestion et une session par boîtier, même file d'attente d'upload
+            self.camera_ingest = CameraFleet(self.config, on_photo=on_photo, guard=self.disk_guard,
+                                            stream_services=self._stream_services())
+        elif self._event_mode():
+            self.camera_ingest = EventIngest(self.camera_session, download_path,
+                                             on_photo=on_photo,
+                                             index=self.camera_index,
+                                             streamer=self.camera_streamer,
+                                             recovery=self.camera_recovery,
+                                             guard=self.disk_guard)
+        else:
+            check_interval = self.config['system'].get('check_interval', 5)
+            self.camera_ingest = PollIngest(self._detect_and_download_from_camera,
+                                            on_photo=on_photo,
+                                            interval=check_interval,
+                                            guard=self.disk_guard)
+        self.camera_ingest.start()
+    
+    def _stop_camera_ingest(self):
+        """Arrête l'ingestion caméra"""
+        if self.camera_ingest:
+            self.camera_ingest.stop()
+            self.camera_ingest = None
+    
+    def _start_photo_watcher(self):
+        """
+        Reprend le spool (transferts interrompus, photos en attente) puis surveille
+        incoming/: seules les photos entièrement écrites passent dans ready/
+        """
+        self.spool.recover()
+        for photo_path in self.spool.list(READY):
+            self._queue_photo(photo_path)
+        self.photo_watcher = PhotoWatcher(self.spool.dir(INCOMING), self._ingest_photo,
+                                          interval=self.config['system'].get('check_interval', 5),
+                                          use_inotify=self.config['system'].get('inotify', True),
+                                          accept=is_incoming_photo)
+        self.photo_watcher.start()
+    
+    def _stop_photo_watcher(self):
+        """Arrête la surveillance du dossier de téléchargement"""
+        if self.photo_watcher:
+            self.photo_watcher.stop()
+            self.photo_watcher = None
+    
     def start(self):
         """Démarre le service de transfert"""
         if self.running:
@@ -112,6 +287,12 @@ class SimpleFTPService:
         self.transfer_thread.daemon = True
         self.transfer_thread.start()
         
+        # Photos du dossier local: synchronisation initiale puis surveillance inotify
+        self._start_photo_watcher()
+        
+        # Ingestion caméra (événements ou passes périodiques)
+        self._start_camera_ingest()
+        
         logger.info("Service de transfert démarré")
     
     def stop(self):
@@ -122,122 +303,352 @@ class SimpleFTPService:
             
         logger.info("Arrêt du service de transfert...")
         self.running = False
+        self._stop_camera_ingest()
+        self._stop_photo_watcher()
         
         if self.transfer_thread:
             self.transfer_thread.join(timeout=5.0)
             if self.transfer_thread.is_alive():
                 logger.warning("Le thread de transfert ne s'est pas arrêté proprement")
+        
+        if self.photo_validator:
+            self.photo_validator.close()
+        if self.transfer_stats:
+            self.transfer_stats.flush()
+        
+        # Libérer l'appareil photo
+        if self.camera_streamer:
+            self.camera_streamer.close()
+        if self.camera_session:
+            self.camera_session.close()
     
     def _monitoring_loop(self):
         """Boucle principale de surveillance et transfert"""
         logger.info("Démarrage de la boucle de surveillance")
+        # Photos en échec, retentées après check_interval
+        retry = set()
+        next_retry = 0
         
         while self.running:
             try:
-                # Vérifier la présence de photos à transférer
-                photos = self._scan_for_photos()
+                photos = []
+                check_interval = self.config['system'].get('check_interval', 5)
+                
+                if retry and time.time() >= next_retry:
+                    photos = [p for p in retry if os.path.exists(p)]
+                    retry.clear()
+                
+                # Photos signalées par l'ingestion caméra et la surveillance du dossier
+                timeout = 0 if photos else (max(0, next_retry - time.time()) if retry else 1.0)
+                pending = set(photos)
+                for photo_path in self.upload_queue.get_batch(timeout=timeout):
+                    if photo_path not in pending:
+                        pending.add(photo_path)
+                        photos.append(photo_path)
                 
                 if photos:
                     logger.info(f"Trouvé {len(photos)} photos à transférer")
-                    self._upload_photos(photos)
+                    # Aperçus d'abord, RAW en dernier
+                    photos.sort(key=upload_priority)
+                    failed = self._upload_photos(photos)
+                    if failed:
+                        retry.update(failed)
+                        next_retry = time.time() + check_interval
                 
-                # Attendre avant la prochaine vérification
-                check_interval = self.config['system'].get('check_interval', 5)
-                time.sleep(check_interval)
+                # Quotas locaux: seul le plus ancien fichier est examiné tant qu'aucun n'est dépassé
+                if self.retention:
+                    self.retention.enforce()
+                # Espace libre relevé une fois par cycle (affiché par l'interface web)
+                if self.disk_guard:
+                    self.disk_guard.check()
                 
             except Exception as e:
                 logger.error(f"Erreur dans la boucle de surveillance: {e}")
                 time.sleep(10)  # Attendre un peu plus long en cas d'erreur
     
-    def _scan_for_photos(self):
-        """Recherche les photos disponibles dans le dossier configuré et sur la caméra"""
-        photos = []
-        
+    def _queue_photo(self, photo_path):
+        """Met en file d'upload une photo du dossier local (aperçus en priorité)"""
+        self.upload_queue.put(photo_path, priority=upload_priority(photo_path))
+    
+    def _ingest_photo(self, photo_path):
+        """
+        Prend en charge une photo téléchargée (ingestion caméra ou surveillance de
+        incoming/): le premier renommage vers ready/ l'emporte, l'autre est ignoré
+        """
         try:
-            # 1. Détecter et télécharger depuis la caméra si activé
-            if self.config['camera'].get('auto_detect', True):
-                new_photos = self._detect_and_download_from_camera()
-                photos.extend(new_photos)
-                if new_photos:
-                    logger.info(f"Nouvelles photos téléchargées depuis la caméra: {len(new_photos)}")
-            
-            # 2. Rechercher les fichiers dans le dossier de téléchargement
-            download_path = self.config['camera'].get('download_path', '/tmp/photos')
-            
-            # Créer le répertoire s'il n'existe pas
-            os.makedirs(download_path, exist_ok=True)
-            
-            # Rechercher les fichiers images
-            extensions = ['.jpg', '.jpeg', '.png', '.raw', '.cr2', '.nef']
-            
-            for ext in extensions:
-                for photo in Path(download_path).glob(f"*{ext}"):
-                    photo_path = str(photo)
-                    if photo_path not in photos:  # Éviter les doublons
-                        photos.append(photo_path)
-                for photo in Path(download_path).glob(f"*{ext.upper()}"):
-                    photo_path = str(photo)
-                    if photo_path not in photos:  # Éviter les doublons
-                        photos.append(photo_path)
-            
-            logger.debug(f"Total photos trouvées: {len(photos)}")
-            
-        except Exception as e:
-            logger.error(f"Erreur lors de la recherche de photos: {e}")
-        
-        return photos
+            if not os.path.splitext(photo_path)[1]:
+                # Extension ajoutée selon le type détecté (fichier ignoré si inconnu)
+                new_path = add_extension(photo_path)
+                if not new_path:
+                    return
+                self._track_spool_move(photo_path, new_path)
+                photo_path = new_path
+        except FileNotFoundError:
+            return
+        if self.spool.state_of(photo_path) == INCOMING:
+            photo_path = self.spool.claim(photo_path, READY)
+            if not photo_path:
+                return
+        # Empreinte calculée une seule fois, à l'ingestion
+        if self.upload_ledger:
+            self.upload_ledger.hash_file(photo_path)
+        self.enqueue_photo(photo_path)
+    
+    def _track_spool_move(self, old_path, new_path):
+        """Suit dans les index caméra le déplacement d'une photo entre deux états"""
+        if new_path:
+            for camera_index in self._camera_indexes():
+                camera_index.rename_local(old_path, new_path)
     
     def _upload_photos(self, photos):
-        """Upload les photos trouvées vers le serveur"""
+        """Upload les photos trouvées vers le serveur; retourne celles en échec"""
+        # Fichiers tronqués ou corrompus écartés avant toute connexion
+        photos = self._reject_invalid(photos)
         if not photos:
-            return
+            return []
             
         # Se connecter au serveur
         if not self.transfer.connect():
             logger.error("Impossible de se connecter au serveur, abandon du transfert")
-            return
+            return list(photos)
             
         # Créer le répertoire distant si nécessaire
         remote_dir = self.config['ftp']['directory']
         if not self.transfer.ensure_dir(remote_dir):
             logger.error(f"Impossible de créer/accéder au répertoire {remote_dir}")
             self.transfer.disconnect()
-            return
+            return list(photos)
         
         # Transférer chaque photo
         success_count = 0
+        total_count = 0
+        failed = []
+        linger = self.config['system'].get('upload_linger', 2)
         
-        for photo_path in photos:
-            try:
-                # Déterminer le nom du fichier distant
-                filename = os.path.basename(photo_path)
-                remote_path = os.path.join(remote_dir, filename).replace('\\', '/')
+        while photos:
+            while photos:
+                # Un aperçu arrivé pendant le lot passe avant les photos restantes
+                urgent = self.upload_queue.get_urgent()
+                if urgent:
+                    photos = urgent + [p for p in photos if p not in urgent]
+                photo_path = photos.pop(0)
+                # ready/ -> uploading/: photo déjà prise en charge ailleurs si le renommage échoue
+                if self.spool.state_of(photo_path) == READY:
+                    photo_path = self.spool.claim(photo_path, UPLOADING)
+                    if not photo_path:
+                        continue
+                total_count += 1
+                try:
+                    # Déterminer le nom du fichier distant
+                    filename = os.path.basename(photo_path)
+                    remote_path = os.path.join(remote_dir, filename).replace('\\', '/')
+                
+                    # Contenu déjà transféré (sous ce nom ou un autre): pas d'upload
+                    existing = self._find_duplicate(photo_path, remote_path)
+                    if existing:
+                        success_count += 1
+                        self._record_stats(duplicate=True, name=filename)
+                        self._record_result(filename, remote_path=existing)
+                        self._after_upload(photo_path, existing)
+                        continue
                 
-                # Upload du fichier
-                logger.info(f"Upload de {filename}...")
+                    # Upload du fichier
+                    logger.info(f"Upload de {filename}...")
                 
-                if self.transfer.upload_file(photo_path, remote_path):
-                    logger.info(f"Upload réussi: {filename}")
-                    success_count += 1
+                    size = os.path.getsize(photo_path)
+                    self.transfer_progress = {'file': filename, 'sent': 0, 'total': size}
+                    started = time.monotonic()
+                    try:
+                        uploaded = self.transfer.upload_file(photo_path, remote_path,
+                                                             progress=self._track_progress)
+                    finally:
+                        self.transfer_progress = None
+                    self._record_stats(size, time.monotonic() - started, success=uploaded, name=filename)
                     
-                    # Supprimer le fichier local si configuré
-                    if self.config['camera'].get('delete_after_upload', False):
-                        try:
-                            os.unlink(photo_path)
-                            logger.info(f"Fichier local supprimé: {photo_path}")
-                        except Exception as e:
-                            logger.warning(f"Impossible de supprimer le fichier local: {e}")
-                else:
-                    logger.error(f"Échec de l'upload: {filename}")
+                    if uploaded:
+                        logger.info(f"Upload réussi: {filename}")
+                        success_count += 1
+                        self.bytes_uploaded += size
+                        self.photos_uploaded += 1
+                        if self.upload_ledger:
+                            self.upload_ledger.record(photo_path, remote_path)
+                        self._record_result(filename, remote_path=remote_path)
+                        self._after_upload(photo_path, remote_path)
+                    else:
+                        logger.error(f"Échec de l'upload: {filename}")
+                        failed.append(self._release(photo_path))
                     
-            except Exception as e:
-                logger.error(f"Erreur lors de l'upload de {photo_path}: {e}")
+                except Exception as e:
+                    logger.error(f"Erreur lors de l'upload de {photo_path}: {e}")
+                    self._record_stats(success=False)
+                    failed.append(self._release(photo_path))
+            
+            # Photos téléchargées pendant ce lot: même connexion, sans attendre le prochain cycle
+            photos = self._reject_invalid(self.upload_queue.get_batch(timeout=linger)) if self.running else []
         
         # Déconnecter
         self.transfer.disconnect()
         
+        for camera_index in self._camera_indexes():
+            camera_index.save()
+        if self.upload_ledger:
+            self.upload_ledger.save()
+        
+        # Supprimer de l'appareil les photos dont l'upload est confirmé
+        self._delete_uploaded_from_camera()
+        
         # Résumé
-        logger.info(f"Transfert terminé: {success_count}/{len(photos)} photos transférées")
+        logger.info(f"Transfert terminé: {success_count}/{total_count} photos transférées")
+        return failed
+    
+    def _record_stats(self, size=0, duration=0.0, success=True, duplicate=False, name=None):
+        """Ajoute un transfert aux statistiques persistantes"""
+        if self.transfer_stats:
+            self.transfer_stats.record(size, duration, success=success, duplicate=duplicate, name=name)
+    
+    def _record_result(self, name, remote_path=None, error=None):
+        """Issue définitive du transfert d'une photo (chemin distant, ou erreur)"""
+        with self.results_lock:
+            self.transfer_results.pop(name, None)
+            self.transfer_results[name] = {'remote_path': remote_path, 'error': error}
+            while len(self.transfer_results) > MAX_UPLOAD_RESULTS:
+                self.transfer_results.popitem(last=False)
+    
+    def _track_progress(self, sent, total):
+        """Avancement de l'upload en cours (octets envoyés sur le total)"""
+        progress = self.transfer_progress
+        if progress:
+            progress['sent'] = sent
+            progress['total'] = total or progress['total']
+    
+    def _reject_invalid(self, photos):
+        """Valide la structure des photos (tous les cœurs) et retourne celles à transférer"""
+        if not self.photo_validator or not photos:
+            return photos
+        valid, rejected = self.photo_validator.split(photos)
+        if rejected:
+            logger.warning(f"{len(rejected)} fichier(s) invalide(s) mis en quarantaine")
+            for verdict in rejected:
+                self._record_result(os.path.basename(verdict['path']),
+                                    error=f"Fichier invalide: {verdict['reason']}")
+                if self.spool.state_of(verdict['path']) is not None:
+                    self.spool.claim(verdict['path'], QUARANTINE)
+        return valid
+    
+    def _release(self, photo_path):
+        """Remet en attente (uploading/ -> ready/) une photo dont l'upload a échoué"""
+        if self.spool.state_of(photo_path) == UPLOADING:
+            return self.spool.claim(photo_path, READY) or photo_path
+        return photo_path
+    
+    def _find_duplicate(self, photo_path, remote_path):
+        """
+        Retourne le chemin distant d'un contenu identique déjà transféré
+        En mode 'link' (SFTP), un lien distant est créé sous le nouveau nom
+        """
+        if not self.upload_ledger:
+            return None
+        existing = self.upload_ledger.find_uploaded(photo_path)
+        if not existing:
+            return None
+        logger.info(f"Contenu déjà transféré ({existing}), upload ignoré: {os.path.basename(photo_path)}")
+        if existing != remote_path and self.upload_ledger.mode == DEDUPE_LINK:
+            self.transfer.link_remote(existing, remote_path)
+        return existing
+    
+    def _after_upload(self, photo_path, remote_path):
+        """Enregistre un transfert confirmé et supprime le fichier local si configuré"""
+        # Mémoriser le transfert dans l'index caméra (celui du boîtier d'origine)
+        for camera_index in self._camera_indexes():
+            if camera_index.mark_uploaded(photo_path, remote_path):
+                break
+        
+        # Supprimer le fichier local si configuré, sinon le conserver dans done/
+        try:
+            if self.config['camera'].get('delete_after_upload', False):
+                self.spool.remove(photo_path)
+                logger.info(f"Fichier local supprimé: {photo_path}")
+            elif self.spool.state_of(photo_path) is not None:
+                self.spool.move(photo_path, DONE)
+        except Exception as e:
+            logger.warning(f"Impossible de libérer le fichier local: {e}")
+    
+    def _camera_indexes(self):
+        """Index caméra actifs (un par boîtier en mode multi-appareils)"""
+        if isinstance(self.camera_ingest, CameraFleet):
+            return self.camera_ingest.indexes()
+        return [self.camera_index] if self.camera_index else []
+    
+    def _delete_uploaded_from_camera(self):
+        """Supprime de l'appareil les photos dont l'upload est confirmé (si configuré)"""
+        if not self.config['camera'].get('delete_from_camera', False):
+            return
+        if isinstance(self.camera_ingest, CameraFleet):
+            self.camera_ingest.cleanup()
+        elif self.camera_cleaner:
+            try:
+                self.camera_cleaner.run()
+            except Exception as e:
+                logger.error(f"Erreur lors de la suppression des photos de l'appareil: {e}")
+    
+    def status(self):
+        """État du service pour le socket de contrôle (interface web)"""
+        progress = self.transfer_progress
+        disk_space = None
+        if self.disk_guard:
+            # Dernier relevé de la boucle de téléchargement (statvfs seulement s'il n'y en a pas)
+            if self.disk_guard.free_bytes is None:
+                self.disk_guard.check()
+            disk_space = self.disk_guard.metrics()
+        return {
+            'running': self.running,
+            'queue_depth': len(self.upload_queue),
+            'transfer': dict(progress) if progress else None,
+            'bytes_uploaded': self.bytes_uploaded,
+            'photos_uploaded': self.photos_uploaded,
+            'spool_exists': bool(self.spool) and os.path.isdir(self.spool.root),
+            'spool_counts': self.spool.counts() if self.spool else None,
+            'disk_space': disk_space,
+            'camera_link': self.camera_recovery.metrics() if self.camera_recovery else None
+        }
+    
+    def stats(self):
+        """Compteurs du service pour le socket de contrôle"""
+        return {
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'uptime_seconds': round(time.time() - self.started_at),
+            'bytes_uploaded': self.bytes_uploaded,
+            'photos_uploaded': self.photos_uploaded,
+            'retention': self.retention.metrics() if self.retention else None,
+            'transfers': self.transfer_stats.summary() if self.transfer_stats else None
+        }
+    
+    def upload_results(self, names):
+        """
+        Suivi de photos par le socket de contrôle: transfert en cours et issue
+        définitive des photos demandées (absentes si aucun transfert n'a abouti)
+        """
+        progress = self.transfer_progress
+        with self.results_lock:
+            files = {name: dict(self.transfer_results[name]) for name in names
+                     if name in self.transfer_results}
+        return {'transfer': dict(progress) if progress else None, 'files': files}
+    
+    def enqueue(self, paths):
+        """
+        Prend en charge des photos déjà présentes dans le spool (uploads web);
+        elles suivent l'ingestion des photos de l'appareil (extension, empreinte,
+        aperçu des RAW) avant la file d'upload; retourne leur nombre
+        """
+        queued = 0
+        for path in paths:
+            if self.spool.state_of(path) in (INCOMING, READY) and os.path.exists(path):
+                self._ingest_photo(path)
+            else:
+                logger.warning(f"Photo hors de la file d'attente du spool ignorée: {path}")
+                continue
+            queued += 1
+        return queued
     
     def test_connection(self):
         """Test la connexion au serveur FTP/SFTP"""
@@ -267,16 +678,24 @@ class SimpleFTPService:
             return False
             
         try:
-            # Se connecter
-            if not self.transfer.connect():
-                logger.error("Impossible de se connecter au serveur")
-                return False
-                
             # Déterminer le nom du fichier distant
             filename = os.path.basename(photo_path)
             remote_dir = self.config['ftp']['directory']
             remote_path = os.path.join(remote_dir, filename).replace('\\', '/')
             
+            # Contenu déjà transféré: rien à envoyer
+            if self.upload_ledger:
+                self.upload_ledger.load()
+                existing = self.upload_ledger.find_uploaded(photo_path)
+                if existing:
+                    logger.info(f"Contenu déjà transféré ({existing}), upload ignoré: {filename}")
+                    return True
+            
+            # Se connecter
+            if not self.transfer.connect():
+                logger.error("Impossible de se connecter au serveur")
+                return False
+            
             # S'assurer que le répertoire existe
             if not self.transfer.ensure_dir(remote_dir):
                 logger.error(f"Impossible de créer/accéder au répertoire {remote_dir}")
@@ -304,6 +723,9 @@ class SimpleFTPService:
             
             if result:
                 logger.info(f"Upload manuel réussi: {filename}")
+                if self.upload_ledger:
+                    self.upload_ledger.record(photo_path, remote_path)
+                    self.upload_ledger.save()
             else:
                 logger.error(f"Échec de l'upload manuel: {filename}")
                 
@@ -313,8 +735,15 @@ class SimpleFTPService:
             logger.error(f"Erreur lors de l'upload manuel: {e}")
             return False
     
-    def _detect_and_download_from_camera(self):
-        """Détecte et télécharge les nouvelles photos depuis la caméra avec gphoto2"""
+    def _detect_and_download_from_camera(self, on_photo=None):
+        """
+        Détecte et télécharge les nouvelles photos depuis la caméra avec gphoto2
+        on_photo est appelé pour chaque photo dès qu'elle est enregistrée
+        """
+        # Session libgphoto2 persistante si disponible
+        if self.camera_session:
+            return self._download_with_session(on_photo)
+        
         photos_downloaded = []
         
         try:
@@ -333,57 +762,37 @@ class SimpleFTPService:
             else:
                 logger.info("Caméra détectée")
             
-            # Obtenir le chemin de téléchargement
-            download_path = self.config['camera'].get('download_path', '/tmp/photos')
+            # Téléchargement dans incoming/ du spool
+            download_path = self.spool.dir(INCOMING)
             os.makedirs(download_path, exist_ok=True)
             
-            # Méthode simple : télécharger toutes les nouvelles photos
-            logger.info("Téléchargement des nouvelles photos...")
-            
-            # Compter les fichiers avant téléchargement
-            files_before = set(os.listdir(download_path))
+            # Photos de l'appareil absentes de tous les états du spool
+            # (--skip-existing ne verrait que incoming/)
+            missing = missing_files_cli(self.spool.has_photo)
+            if not missing:
+                logger.debug("Aucune nouvelle photo à télécharger")
+                return photos_downloaded
             
-            # Télécharger toutes les nouvelles photos (celles pas encore téléchargées)
-            download_result = subprocess.run([
+            # Télécharger les nouvelles photos en traitant chaque fichier dès que gphoto2 l'annonce
+            logger.info("Téléchargement des nouvelles photos...")
+            cmd = [
                 'gphoto2', 
-                '--get-all-files',
-                '--skip-existing', 
-                '--filename', os.path.join(download_path, '%f')  # %f inclut l'extension du fichier
-            ], capture_output=True, text=True, timeout=120)
+                '--get-file', missing,
+                '--filename', os.path.join(download_path, '%f')  # %f: nom sans extension
+            ]
             
-            # Compter les nouveaux fichiers
-            files_after = set(os.listdir(download_path))
-            new_files = files_after - files_before
+            for file_path in iter_saved_files(cmd, timeout=120):
+                photos_downloaded.append(file_path)
+                # Transmettre immédiatement la photo (extension ajoutée selon son type à l'ingestion)
+                if on_photo:
+                    on_photo(file_path)
+                if self.disk_guard and not self.disk_guard.check():
+                    break
             
-            if download_result.returncode == 0 or new_files:
-                # Vérifier l'extension ET les fichiers sans extension mais qui sont des images
-                photos_downloaded = []
-                for f in new_files:
-                    file_path = os.path.join(download_path, f)
-                    # Vérifier par extension
-                    if any(f.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.nef', '.raw', '.cr2']):
-                        photos_downloaded.append(file_path)
-                    # Vérifier les fichiers sans extension en analysant les premiers octets
-                    elif os.path.isfile(file_path) and os.path.getsize(file_path) > 100:
-                        try:
-                            with open(file_path, 'rb') as img_file:
-                                header = img_file.read(10)
-                                # En-tête JPEG: FF D8 FF
-                                if header[0:3] == b'\xff\xd8\xff':
-                                    # Ajouter l'extension .jpg aux fichiers JPEG sans extension
-                                    new_path = file_path + '.jpg'
-                                    os.rename(file_path, new_path)
-                                    photos_downloaded.append(new_path)
-                                    logger.info(f"Fichier JPEG détecté et renommé: {f} -> {f}.jpg")
-                        except Exception as e:
-                            logger.warning(f"Erreur lors de la vérification du fichier {f}: {e}")
-                
-                if photos_downloaded:
-                    logger.info(f"Photos téléchargées avec succès: {len(photos_downloaded)}")
-                else:
-                    logger.debug("Aucune nouvelle photo à télécharger")
+            if photos_downloaded:
+                logger.info(f"Photos téléchargées avec succès: {len(photos_downloaded)}")
             else:
-                logger.warning(f"Problème lors du téléchargement: {download_result.stderr}")
+                logger.debug("Aucune nouvelle photo à télécharger")
                 
         except subprocess.TimeoutExpired:
             logger.error("Timeout lors de la communication avec la caméra")
@@ -391,6 +800,44 @@ class SimpleFTPService:
             logger.error(f"Erreur lors de la détection de caméra: {e}")
         
         return photos_downloaded
+    
+    def _download_with_session(self, on_photo=None):
+        """Télécharge les nouvelles photos via la session caméra persistante"""
+        photos_downloaded = []
+        
+        # Ouvre la session uniquement si elle ne l'est pas déjà (pas de redétection USB)
+        if not self.camera_session.ensure_open():
+            if self.camera_session.last_error:
+                # Appareil présent mais inaccessible: action ciblée puis nouvelle tentative
+                self.camera_recovery.recover(self.camera_session.last_error)
+            else:
+                self.camera_recovery.record_absent()
+            return photos_downloaded
+        self.camera_recovery.record_success()
+        
+        download_path = self.spool.dir(INCOMING)
+        
+        try:
+            photos_downloaded, photos_streamed = download_pending(
+                self.camera_session, self.camera_index, download_path,
+                on_photo=on_photo, streamer=self.camera_streamer, spool=self.spool,
+                guard=self.disk_guard)
+            
+            if photos_streamed:
+                logger.info(f"Photos envoyées directement au serveur: {photos_streamed}")
+                self._delete_uploaded_from_camera()
+            if photos_downloaded:
+                logger.info(f"Photos téléchargées avec succès: {len(photos_downloaded)}")
+            else:
+                logger.debug("Aucune nouvelle photo à télécharger")
+                
+        except CameraError as e:
+            logger.error(f"Erreur de communication avec la caméra: {e}")
+            self.camera_recovery.recover(e)
+        except Exception as e:
+            logger.error(f"Erreur lors du téléchargement depuis la caméra: {e}")
+        
+        return photos_downloaded
 
 # Point d'entrée principal si exécuté directement
 if __name__ == "__main__":
@@ -407,6 +854,10 @@ if __name__ == "__main__":
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
+    # Socket de contrôle: l'interface web pilote le service depuis son propre processus
+    control_server = create_control_server(service.config, service)
+    control_server.start()
+    
     # Démarrer le service
     service.start()
     
@@ -417,3 +868,5 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logger.info("Interruption clavier, arrêt en cours...")
         service.stop()
+    finally:
+        control_server.stop()
@@ -9,7 +9,7 @@ import ftplib
 import logging
 import re
 import socket
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 import subprocess
 
 # Import SFTP avec gestion d'erreur
@@ -266,8 +266,12 @@ class SimpleTransfer:
                 self.connection = None
             return False
     
-    def upload_file(self, local_path: str, remote_filename: Optional[str] = None) -> bool:
-        """Upload un fichier avec gestion d'erreur améliorée et retry"""
+    def upload_file(self, local_path: str, remote_filename: Optional[str] = None,
+                    progress: Optional[Callable[[int, int], None]] = None) -> bool:
+        """
+        Upload un fichier avec gestion d'erreur améliorée et retry
+        progress(octets envoyés, taille totale) est appelé au fil de l'envoi
+        """
         if not os.path.exists(local_path):
             self.logger.error(f"Fichier local non trouvé: {local_path}")
             return False
@@ -298,12 +302,17 @@ class SimpleTransfer:
                     self.connection.sock.settimeout(strategy['timeout'])
                 
                 if self.protocol == 'sftp':
-                    self.connection.put(local_path, remote_filename)
+                    self.connection.put(local_path, remote_filename, callback=progress)
                 else:
                     with open(local_path, 'rb') as file:
+                        total = os.fstat(file.fileno()).st_size
+                        sent = [0]
+                        
                         # Fonction de callback pour suivre le progrès
                         def callback(data):
-                            pass  # On pourrait logger le progrès ici
+                            sent[0] += len(data)
+                            if progress:
+                                progress(sent[0], total)
                         
                         # Upload avec buffer personnalisé
                         self.connection.storbinary(
@@ -332,6 +341,71 @@ class SimpleTransfer:
         self.disconnect()
         return False
     
+    def upload_stream(self, stream, remote_filename: str, blocksize: int = 65536) -> bool:
+        """
+        Upload depuis un objet fichier (flux de l'appareil photo) sans fichier local
+        Pas de nouvelle tentative: le flux ne peut pas être relu, l'appelant se replie
+        sur le téléchargement local en cas d'échec
+        """
+        if not self.is_connected():
+            self.logger.info("Reconnexion nécessaire...")
+            if not self.connect():
+                self.logger.error("Impossible de se reconnecter au serveur")
+                return False
+
+        try:
+            if self.protocol == 'sftp':
+                self.connection.putfo(stream, remote_filename)
+            else:
+                self.connection.storbinary(f'STOR {remote_filename}', stream, blocksize=blocksize)
+            self.logger.info(f"Upload direct réussi: {remote_filename}")
+            return True
+        except Exception as e:
+            self.logger.warning(f"Échec de l'upload direct de {remote_filename}: {e}")
+            self.disconnect()
+            return False
+
+    def link_remote(self, existing_path: str, link_path: str) -> bool:
+        """Crée sur le serveur un lien vers un fichier déjà transféré (SFTP uniquement)"""
+        if self.protocol != 'sftp' or not self.connection:
+            return False
+        try:
+            self.connection.symlink(existing_path, link_path)
+            self.logger.info(f"Lien distant créé: {link_path} -> {existing_path}")
+            return True
+        except Exception as e:
+            self.logger.warning(f"Impossible de créer le lien distant {link_path}: {e}")
+            return False
+
+    def rename_remote(self, old_path: str, new_path: str) -> bool:
+        """Renomme un fichier sur le serveur (fichier temporaire terminé)"""
+        if not self.connection:
+            return False
+        try:
+            if self.protocol == 'sftp':
+                # rename SFTP refuse d'écraser un fichier existant
+                self.connection.posix_rename(old_path, new_path)
+            else:
+                self.connection.rename(old_path, new_path)
+            return True
+        except Exception as e:
+            self.logger.warning(f"Impossible de renommer {old_path} en {new_path}: {e}")
+            return False
+
+    def delete_remote(self, remote_path: str) -> bool:
+        """Supprime un fichier sur le serveur (upload interrompu)"""
+        if not self.connection:
+            return False
+        try:
+            if self.protocol == 'sftp':
+                self.connection.remove(remote_path)
+            else:
+                self.connection.delete(remote_path)
+            return True
+        except Exception as e:
+            self.logger.warning(f"Impossible de supprimer {remote_path} sur le serveur: {e}")
+            return False
+
     def upload_file_with_fallback(self, local_path: str, remote_filename: Optional[str] = None) -> bool:
         """Upload avec fallback automatique vers SFTP si FTPS échoue"""
         
@@ -1,14 +1,22 @@
 #!/usr/bin/env python3
 """
 Interface web simplifiée pour le transfert de photos
+Client léger du service de transfert (simple_main.py), piloté par son socket de contrôle
 """
 
 import os
 import sys
 import json
 import logging
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
-from simple_main import SimpleFTPService
+from flask import Flask, Request, Response, render_template, request, jsonify, redirect, url_for, flash, send_file, abort
+from control_socket import ControlError, ServiceClient
+from spool import INCOMING, READY, UPLOADING, DONE, QUARANTINE
+from status_probe import create_status_prober
+from live_status import create_live_status
+from log_reader import create_log_reader
+from web_uploads import create_upload_jobs, safe_filename
+from thumbnails import create_thumbnail_cache
+from photo_watch import is_photo
 
 # Configuration du logging
 logging.basicConfig(
@@ -21,30 +29,121 @@ logging.basicConfig(
 )
 logger = logging.getLogger('WebUI')
 
+class SpoolRequest(Request):
+    """Requête dont les fichiers envoyés sur /upload sont écrits directement dans le spool"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        if self.path != '/upload':
+            # Autres formulaires: flux temporaire par défaut de Werkzeug, hors du spool
+            return super()._get_file_stream(total_content_length, content_type, filename,
+                                            content_length)
+        part = get_upload_jobs().open_part()
+        self.__dict__.setdefault('upload_parts', []).append(part.name)
+        return part
+
 # Créer l'application Flask
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
+app.request_class = SpoolRequest
 
 # Instance globale du service
 photo_service = None
+# Relevé d'état en arrière-plan (les pages n'attendent jamais le serveur)
+status_prober = None
+# Flux SSE du tableau de bord (un seul calcul d'état pour tous les onglets)
+live_status = None
+# Uploads manuels traités en arrière-plan
+upload_jobs = None
+# Miniatures de la galerie (cache disque LRU)
+thumbnail_cache = None
+
+# États du spool affichés dans la galerie
+GALLERY_STATES = {
+    DONE: 'Transférée',
+    UPLOADING: 'En cours',
+    READY: 'En attente',
+    QUARANTINE: 'Rejetée',
+}
+GALLERY_PAGE_SIZE = 60
 
 def get_photo_service():
-    """Récupère ou crée l'instance du service photo"""
+    """Récupère ou crée le client du service de transfert (processus distinct)"""
     global photo_service
     
     if not photo_service:
-        try:
-            photo_service = SimpleFTPService()
-        except Exception as e:
-            logger.error(f"Erreur initialisation service: {e}")
-            # Créer un service basique si échec
-            photo_service = SimpleFTPService(config_path='config.json')
+        photo_service = ServiceClient(config_path='config.json')
     
     return photo_service
 
+def get_status_prober():
+    """Récupère ou démarre le relevé d'état en arrière-plan"""
+    global status_prober
+    
+    if not status_prober:
+        service = get_photo_service()
+        status_prober = create_status_prober(service.config, service)
+        status_prober.start()
+    
+    return status_prober
+
+def get_live_status():
+    """Récupère ou crée le flux du tableau de bord"""
+    global live_status
+    
+    if not live_status:
+        service = get_photo_service()
+        live_status = create_live_status(service.config, service, get_status_prober())
+    
+    return live_status
+
+def reset_status_monitors():
+    """
+    Arrête le relevé d'état et le flux du tableau de bord (onglets ouverts
+    déconnectés, ils se reconnectent); recréés avec la nouvelle configuration
+    """
+    global status_prober, live_status
+    
+    if live_status:
+        live_status.stop()
+        live_status = None
+    if status_prober:
+        status_prober.stop()
+        status_prober = None
+
+def get_upload_jobs():
+    """Récupère ou crée le gestionnaire des uploads manuels"""
+    global upload_jobs
+    
+    if not upload_jobs:
+        service = get_photo_service()
+        upload_jobs = create_upload_jobs(service.config, service)
+    
+    return upload_jobs
+
+def get_thumbnail_cache():
+    """Récupère ou crée le cache des miniatures"""
+    global thumbnail_cache
+    
+    if not thumbnail_cache:
+        thumbnail_cache = create_thumbnail_cache(get_photo_service().config)
+    
+    return thumbnail_cache
+
+def transfer_summary():
+    """Totaux des transferts pour les pages (None si la base de statistiques est inaccessible)"""
+    transfer_stats = get_photo_service().transfer_stats
+    if not transfer_stats:
+        return None
+    summary = transfer_stats.summary()
+    rate = summary['success_rate']
+    return dict(summary, total_photos=summary['total_files'],
+                total_transfers=summary['total_files'] + summary['total_failures'],
+                success_rate=f"{rate}%" if rate is not None else '-')
+
 @app.route('/')
 def index():
-    """Page d'accueil"""
+    """Page d'accueil (dernier relevé d'état, sans attendre le serveur)"""
     global photo_service
     
     photo_service = get_photo_service()
@@ -52,93 +151,139 @@ def index():
     # Obtenir la configuration
     config = photo_service.config
     
-    # Tester la connexion
-    is_connected, connection_message = photo_service.test_connection()
-    connection_status = 'success' if is_connected else 'error'
-    
-    # Vérifier le statut du dossier local
-    local_path = config.get('camera', {}).get('download_path', '/tmp/photos')
-    local_status = 'success' if os.path.exists(local_path) else 'warning'
-    
-    # Compter les photos en attente (si le dossier existe)
-    photos_count = 0
-    if os.path.exists(local_path):
-        try:
-            photo_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.raw']
-            photos_count = len([f for f in os.listdir(local_path) 
-                              if any(f.lower().endswith(ext) for ext in photo_extensions)])
-        except (PermissionError, OSError):
-            photos_count = 0
-    
-    # Statistiques basiques
-    stats = {
-        'total_photos': 0,  # Pourrait être lu depuis un fichier de statistiques
-        'success_rate': '100%'  # Placeholder
-    }
-    
-    # Statut du service
-    service_status = photo_service.running if photo_service else False
+    # État relevé en arrière-plan (connexion, spool, espace libre, logs)
+    snapshot = get_status_prober().get()
+    connection = snapshot['connection']
+    local = snapshot['local']
+    if not connection['checked']:
+        connection_status = 'warning'
+    else:
+        connection_status = 'success' if connection['success'] else 'error'
+    local_status = 'success' if local['exists'] else 'warning'
     
-    # Logs récents (optionnel)
-    recent_logs = []
-    log_file = os.path.join('logs', 'photo_transfer.log')
-    if os.path.exists(log_file):
-        try:
-            with open(log_file, 'r', encoding='utf-8') as f:
-                recent_logs = f.readlines()[-5:]  # 5 dernières lignes
-        except (PermissionError, UnicodeDecodeError):
-            recent_logs = []
+    # Statistiques persistantes des transferts
+    stats = transfer_summary()
     
     return render_template(
         'index.html',
         config=config,
         stats=stats,
-        service_status=service_status,
+        service_status=snapshot['running'],
         connection_status=connection_status,
         local_status=local_status,
-        photos_count=photos_count,
-        recent_logs=recent_logs
+        photos_count=local['pending'],
+        disk_space=local['disk_space'],
+        recent_logs=local['recent_logs']
     )
 
 @app.route('/status')
 def status():
-    """Affiche l'état du service"""
+    """Affiche l'état du service (dernier relevé, sans attendre le serveur)"""
     global photo_service
     
     photo_service = get_photo_service()
     
-    # Tester la connexion FTP
-    is_connected, message = photo_service.test_connection()
-    
     # Obtenir la configuration
     config = photo_service.config
     
-    # Compter les photos locales en attente
-    local_photos_count = 0
-    local_path = config.get('camera', {}).get('download_path', '/tmp/photos')
-    if os.path.exists(local_path):
-        try:
-            photo_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.raw', '.nef', '.cr2']
-            local_photos_count = len([f for f in os.listdir(local_path) 
-                                   if os.path.isfile(os.path.join(local_path, f)) and
-                                   any(f.lower().endswith(ext) for ext in photo_extensions)])
-        except Exception as e:
-            logger.error(f"Erreur lors du comptage des photos: {e}")
-    
-    # Obtenir la date de dernière vérification
-    last_scan = None
-    # On pourrait récupérer cette information depuis un fichier de statut si nécessaire
+    # État relevé en arrière-plan
+    snapshot = get_status_prober().get()
+    connection = snapshot['connection']
+    local = snapshot['local']
     
     return render_template(
         'status.html', 
-        connected=is_connected,
-        message=message,
+        connected=connection['success'],
+        message=connection['message'],
+        connection=connection,
         config=config,
-        running=photo_service.running,
-        local_photos_count=local_photos_count,
-        last_scan=last_scan
+        running=snapshot['running'],
+        local_photos_count=local['pending'],
+        spool_counts=local['spool_counts'],
+        disk_space=local['disk_space'],
+        last_scan=connection['checked_at'],
+        camera_link=local['camera_link'],
+        daemon=local['daemon'],
+        stats=transfer_summary()
+    )
+
+@app.route('/api/stats')
+def stats_api():
+    """Totaux des transferts et activité des dernières 24 heures"""
+    transfer_stats = get_photo_service().transfer_stats
+    if not transfer_stats:
+        return jsonify({'error': 'Statistiques indisponibles'}), 503
+    return jsonify(transfer_stats.summary())
+
+@app.route('/api/stats/<period>')
+def stats_series_api(period):
+    """Agrégats par minute, heure ou jour (paramètre limit: nombre de périodes)"""
+    transfer_stats = get_photo_service().transfer_stats
+    if not transfer_stats:
+        return jsonify({'error': 'Statistiques indisponibles'}), 503
+    limit = min(max(request.args.get('limit', 60, type=int), 1), 2000)
+    try:
+        return jsonify({'period': period, 'series': transfer_stats.series(period, limit)})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/events')
+def events():
+    """Flux Server-Sent Events des changements d'état (tableau de bord en direct)"""
+    hub = get_live_status()
+    subscriber = hub.subscribe()
+    return Response(hub.stream(subscriber), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/logs')
+def logs():
+    """Page des logs de tous les services"""
+    global photo_service
+    
+    photo_service = get_photo_service()
+    reader = create_log_reader(photo_service.config)
+    result = reader.tail(100)
+    
+    return render_template(
+        'logs.html',
+        logs=[entry['text'] for entry in result['entries']],
+        sources=reader.sources,
+        cursor=result['cursor']
     )
 
+@app.route('/logs_api')
+def logs_api():
+    """Dernières entrées des logs (ou entrées ajoutées depuis un curseur), filtrées côté serveur"""
+    global photo_service
+    
+    photo_service = get_photo_service()
+    reader = create_log_reader(photo_service.config)
+    
+    max_lines = min(max(request.args.get('max_lines', 100, type=int), 1), 2000)
+    filters = {
+        'level': request.args.get('level') or None,
+        'text': request.args.get('q') or None,
+        'source': request.args.get('source') or None
+    }
+    cursor = request.args.get('cursor')
+    
+    try:
+        if cursor:
+            result = reader.read_after(cursor, max_lines, **filters)
+        else:
+            result = reader.tail(max_lines, **filters)
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture des logs: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'logs': [entry['text'] for entry in result['entries']],
+        'entries': result['entries'],
+        'cursor': result['cursor'],
+        'truncated': result['truncated'],
+        'incremental': bool(cursor)
+    })
+
 @app.route('/config', methods=['GET', 'POST'])
 def config():
     """Affiche et modifie la configuration"""
@@ -175,21 +320,21 @@ def config():
         # Mise à jour de la configuration
         photo_service.config['ftp'] = ftp_config
         
-        # Mettre à jour les paramètres de la caméra
-        photo_service.config['camera'] = {
+        # Mettre à jour les paramètres de la caméra (les options avancées sont conservées)
+        photo_service.config.setdefault('camera', {}).update({
             'auto_detect': 'auto_detect' in request.form,
             'download_path': request.form.get('download_path', '/tmp/photos'),
             'delete_after_upload': 'delete_after_upload' in request.form
-        }
+        })
         
         # Mettre à jour les paramètres système
-        photo_service.config['system'] = {
+        photo_service.config.setdefault('system', {}).update({
             'log_level': request.form.get('log_level', 'INFO'),
             'check_interval': int(request.form.get('check_interval', 5)),
             'max_retries': int(request.form.get('max_retries', 3)),
             'web_port': int(request.form.get('web_port', 8080)),
             'web_host': request.form.get('web_host', '0.0.0.0')
-        }
+        })
         
         # Sauvegarder la configuration
         try:
@@ -198,15 +343,19 @@ def config():
             
             flash("Configuration sauvegardée avec succès", "success")
             
-            # Recharger le module de transfert avec la nouvelle configuration
-            photo_service.reload_transfer()
+            # Le service de transfert recharge sa configuration (transfert, caméra, spool)
+            try:
+                photo_service.reload()
+            except ControlError as e:
+                flash(f"Configuration non appliquée au service de transfert: {e}", "warning")
+            reset_status_monitors()
             
-            # Tester la connexion
-            is_connected, message = photo_service.test_connection()
-            if is_connected:
-                flash(f"Test de connexion réussi: {message}", "success")
+            # Tester la connexion (connexion dédiée, pas celle du service)
+            connection = get_status_prober().refresh_connection()
+            if connection['success']:
+                flash(f"Test de connexion réussi: {connection['message']}", "success")
             else:
-                flash(f"Test de connexion échoué: {message}", "warning")
+                flash(f"Test de connexion échoué: {connection['message']}", "warning")
                 
         except Exception as e:
             flash(f"Erreur lors de la sauvegarde: {e}", "danger")
@@ -222,11 +371,15 @@ def start_service():
     
     photo_service = get_photo_service()
     
-    if not photo_service.running:
-        photo_service.start()
-        flash("Service démarré", "success")
-    else:
-        flash("Le service est déjà en cours d'exécution", "warning")
+    try:
+        if not photo_service.running:
+            photo_service.start()
+            flash("Service démarré", "success")
+        else:
+            flash("Le service est déjà en cours d'exécution", "warning")
+    except ControlError as e:
+        flash(f"Service de transfert injoignable: {e}", "danger")
+    get_status_prober().refresh_local()
     
     return redirect(url_for('status'))
 
@@ -237,11 +390,15 @@ def stop_service():
     
     photo_service = get_photo_service()
     
-    if photo_service.running:
-        photo_service.stop()
-        flash("Service arrêté", "warning")
-    else:
-        flash("Le service n'est pas en cours d'exécution", "info")
+    try:
+        if photo_service.running:
+            photo_service.stop()
+            flash("Service arrêté", "warning")
+        else:
+            flash("Le service n'est pas en cours d'exécution", "info")
+    except ControlError as e:
+        flash(f"Service de transfert injoignable: {e}", "danger")
+    get_status_prober().refresh_local()
     
     return redirect(url_for('status'))
 
@@ -252,7 +409,9 @@ def test_connection():
     
     photo_service = get_photo_service()
     
-    is_connected, message = photo_service.test_connection()
+    # Test explicite: connexion dédiée, le relevé affiché est mis à jour
+    connection = get_status_prober().refresh_connection()
+    is_connected, message = connection['success'], connection['message']
     
     if is_connected:
         flash(f"Test de connexion réussi: {message}", "success")
@@ -263,66 +422,33 @@ def test_connection():
 
 @app.route('/upload', methods=['GET', 'POST'])
 def upload():
-    """Upload manuel d'un ou plusieurs fichiers"""
+    """Upload manuel d'un ou plusieurs fichiers (réponse immédiate, transfert en arrière-plan)"""
     try:
         photo_service = get_photo_service()
         
         if request.method == 'POST':
-            # Vérifier s'il y a des fichiers
+            # Vérifier s'il y a des fichiers (déjà écrits dans le spool pendant la réception)
             if 'file' not in request.files:
                 return jsonify({'error': 'Aucun fichier sélectionné'}), 400
             
-            files = request.files.getlist('file')
+            files = [f for f in request.files.getlist('file') if f.filename]
             
-            if not files or all(f.filename == '' for f in files):
+            if not files:
                 return jsonify({'error': 'Aucun fichier valide sélectionné'}), 400
             
-            uploaded_count = 0
-            failed_count = 0
-            failed_files = []
-            
-            # Créer le répertoire temporaire
-            temp_dir = '/tmp/photo_uploads'
-            os.makedirs(temp_dir, exist_ok=True)
-            
-            # Traiter chaque fichier
+            received = []
             for file in files:
-                if file.filename == '':
-                    continue
-                    
-                try:
-                    # Sauvegarder temporairement le fichier
-                    temp_path = os.path.join(temp_dir, file.filename)
-                    file.save(temp_path)
-                    
-                    # Uploader le fichier
-                    if photo_service.upload_photo_to_ftp(temp_path):
-                        uploaded_count += 1
-                        logger.info(f"Fichier uploadé avec succès: {file.filename}")
-                    else:
-                        failed_count += 1
-                        failed_files.append(file.filename)
-                        logger.error(f"Échec upload: {file.filename}")
-                    
-                    # Supprimer le fichier temporaire
-                    try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
-                        
-                except Exception as e:
-                    failed_count += 1
-                    failed_files.append(file.filename)
-                    logger.error(f"Erreur traitement {file.filename}: {e}")
+                file.stream.close()
+                received.append((file.filename, file.stream.name))
             
-            # Retourner le résultat
-            if uploaded_count > 0:
-                message = f"{uploaded_count} fichier(s) uploadé(s) avec succès"
-                if failed_count > 0:
-                    message += f", {failed_count} échec(s)"
-                return jsonify({'success': True, 'message': message}), 200
-            else:
-                return jsonify({'error': f'Tous les uploads ont échoué: {", ".join(failed_files)}'}), 500
+            # Les workers de transfert prennent le relais
+            job_id = get_upload_jobs().submit(received)
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'message': f"{len(received)} fichier(s) en file de transfert",
+                'progress_url': url_for('upload_job', job_id=job_id)
+            }), 202
         
         else:
             return render_template('upload.html', config=photo_service.config)
@@ -334,10 +460,77 @@ def upload():
         else:
             flash(f"Erreur: {str(e)}", "danger")
             return render_template('upload.html', config=photo_service.config)
+    finally:
+        # Fichiers partiels d'une requête interrompue ou rejetée
+        for part in request.__dict__.get('upload_parts', []):
+            if os.path.exists(part):
+                try:
+                    os.unlink(part)
+                except OSError:
+                    pass
+
+@app.route('/upload/jobs/<job_id>')
+def upload_job(job_id):
+    """Avancement d'un upload manuel (travail et chacun de ses fichiers)"""
+    job = get_upload_jobs().get(job_id)
+    if not job:
+        return jsonify({'error': 'Travail inconnu'}), 404
+    return jsonify(job)
+
+@app.route('/upload/jobs/<job_id>/files/<int:index>')
+def upload_job_file(job_id, index):
+    """Avancement d'un fichier d'un upload manuel"""
+    job = get_upload_jobs().get(job_id)
+    if not job or not 0 <= index < len(job['files']):
+        return jsonify({'error': 'Fichier inconnu'}), 404
+    return jsonify(job['files'][index])
+
+@app.route('/gallery')
+def gallery():
+    """Galerie des dernières photos et de leur état de transfert"""
+    photo_service = get_photo_service()
+    state = request.args.get('state', '')
+    states = [state] if state in GALLERY_STATES else list(GALLERY_STATES)
+    page = max(request.args.get('page', 1, type=int), 1)
+    
+    # Liste tenue à jour par le service (table des dernières photos), le spool n'est pas relu
+    photos = []
+    if photo_service.transfer_stats:
+        # Une photo de plus que la page: indique s'il y a une page suivante
+        photos = photo_service.transfer_stats.recent_photos(states, limit=GALLERY_PAGE_SIZE + 1,
+                                                            offset=(page - 1) * GALLERY_PAGE_SIZE)
+    has_next = len(photos) > GALLERY_PAGE_SIZE
+    photos = photos[:GALLERY_PAGE_SIZE]
+    # Miniatures générées pendant que le navigateur reçoit la page
+    spool = photo_service.spool
+    get_thumbnail_cache().prefetch(os.path.join(spool.dir(photo['state']), photo['name'])
+                                   for photo in photos if photo['present'])
+    
+    return render_template(
+        'gallery.html',
+        photos=photos,
+        states=GALLERY_STATES,
+        state=state,
+        page=page,
+        has_next=has_next
+    )
+
+@app.route('/thumbnails/<name>')
+def thumbnail(name):
+    """Miniature d'une photo du spool (générée au premier affichage)"""
+    if safe_filename(name) != name or not is_photo(name):
+        abort(404)
+    path = get_photo_service().spool.locate(name)
+    if not path:
+        abort(404)
+    thumbnail_path = get_thumbnail_cache().get(path)
+    if not thumbnail_path:
+        abort(404)
+    return send_file(thumbnail_path, mimetype='image/jpeg', max_age=3600)
 
 @app.route('/purge_photos')
 def purge_photos():
-    """Purge tous les fichiers dans le dossier de photos local"""
+    """Purge les fichiers du dossier de photos local (sauf les transferts en cours)"""
     global photo_service
     
     photo_service = get_photo_service()
@@ -351,17 +544,16 @@ def purge_photos():
             flash(f"Dossier {local_path} introuvable", "warning")
             return redirect(url_for('status'))
         
-        # Compter les fichiers avant suppression
-        count_before = len([f for f in os.listdir(local_path) if os.path.isfile(os.path.join(local_path, f))])
-        
-        # Supprimer tous les fichiers (pas les dossiers)
+        # Supprimer les fichiers de chaque état; uploading/ appartient au transfert en cours
         files_deleted = 0
-        for filename in os.listdir(local_path):
-            file_path = os.path.join(local_path, filename)
-            if os.path.isfile(file_path):
+        spool = photo_service.spool
+        for state in (INCOMING, READY, DONE, QUARANTINE):
+            for file_path in spool.list(state):
                 try:
-                    os.unlink(file_path)
+                    spool.remove(file_path)
                     files_deleted += 1
+                except FileNotFoundError:
+                    continue
                 except Exception as e:
                     logger.error(f"Erreur lors de la suppression de {file_path}: {e}")
         
@@ -382,8 +574,8 @@ if __name__ == '__main__':
     # Créer les répertoires nécessaires
     os.makedirs('logs', exist_ok=True)
     
-    # Créer le service
-    photo_service = SimpleFTPService()
+    # Client du service de transfert (lancé séparément: simple_main.py)
+    photo_service = get_photo_service()
     
     # Obtenir la configuration du port web
     port = photo_service.config['system'].get('web_port', 8080)
@@ -392,4 +584,4 @@ if __name__ == '__main__':
     logger.info(f"Démarrage du serveur web sur {host}:{port}")
     
     # Démarrer Flask
-    app.run(host=host, port=port, debug=False)
+    app.run(host=host, port=port, debug=False, threaded=True)
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Dossier local des photos organisé par état
+Chaque photo passe d'un sous-dossier à l'autre par un rename atomique:
+    incoming/    téléchargement en cours ou terminé, pas encore pris en charge
+    ready/       prête à être transférée
+    uploading/   transfert en cours
+    done/        transférée (conservée selon la rétention)
+    quarantine/  invalide (tronquée, corrompue), jamais transférée
+Chaque composant ne lit que son propre sous-dossier, et après un arrêt
+brutal l'état de chaque fichier se lit dans le nom de son dossier.
+"""
+
+import os
+import time
+import heapq
+import logging
+import threading
+from typing import Callable, Optional, Dict, Any, List, Iterable, Tuple
+
+from photo_watch import is_photo
+
+logger = logging.getLogger('Spool')
+
+INCOMING = 'incoming'
+READY = 'ready'
+UPLOADING = 'uploading'
+DONE = 'done'
+QUARANTINE = 'quarantine'
+
+STATES = (INCOMING, READY, UPLOADING, DONE, QUARANTINE)
+
+# Suffixe des fichiers en cours d'écriture
+PART_SUFFIX = '.part'
+# Préfixe des fichiers partiels des uploads de l'interface web (autre processus)
+UPLOAD_PART_PREFIX = '.upload-'
+# Fichier partiel d'upload web écrit depuis moins longtemps: upload en cours, conservé
+UPLOAD_PART_GRACE = 300
+
+# Âge minimal de la date d'un dossier pour que son compte soit conservé
+RACY_SECONDS = 0.05
+
+# Écart toléré entre la date d'un objet de l'appareil et celle du fichier local (FAT: 2 s)
+MTIME_TOLERANCE = 2
+
+
+def is_incoming_photo(name: str) -> bool:
+    """Photo terminée dans incoming/ (gphoto2 %f peut l'enregistrer sans extension)"""
+    if name.startswith('.') or name.endswith(PART_SUFFIX):
+        return False
+    return is_photo(name) or not os.path.splitext(name)[1]
+
+
+def same_photo(path: str, size: Optional[int], mtime: Optional[float] = None,
+               size_tolerance: int = 0) -> bool:
+    """
+    Indique si un fichier local est la copie d'un objet de l'appareil: même taille
+    et, si elle est connue, même date (un homonyme après formatage de la carte
+    ou remise à zéro du compteur DSC n'est pas la même photo)
+    """
+    if size is None:
+        return False
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if abs(stat.st_size - size) > size_tolerance:
+        return False
+    return mtime is None or abs(stat.st_mtime - mtime) <= MTIME_TOLERANCE
+
+
+def incoming_path(config: Dict[str, Any]) -> str:
+    """Dossier de destination des téléchargements caméra"""
+    return os.path.join(config.get('camera', {}).get('download_path', '/tmp/photos'), INCOMING)
+
+
+class Spool:
+    """Sous-dossiers d'état du dossier de téléchargement"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.dirs = {state: os.path.join(root, state) for state in STATES}
+        for directory in self.dirs.values():
+            os.makedirs(directory, exist_ok=True)
+        # Rappels (ancien chemin, nouveau chemin) après chaque déplacement (index caméra)
+        self.listeners: List[Callable[[str, Optional[str]], None]] = []
+        # Nombre de photos par état et date du dossier correspondante: le compte reste
+        # valable tant que personne d'autre n'a modifié le dossier (done/ n'est jamais relu)
+        self._counts: Dict[str, Tuple[int, Optional[int]]] = {}
+        self._counts_lock = threading.Lock()
+
+    def dir(self, state: str) -> str:
+        """Chemin du sous-dossier d'un état"""
+        return self.dirs[state]
+
+    def state_of(self, path: str) -> Optional[str]:
+        """État d'un fichier d'après son dossier (None hors du spool)"""
+        parent = os.path.dirname(os.path.abspath(path))
+        for state, directory in self.dirs.items():
+            if parent == os.path.abspath(directory):
+                return state
+        return None
+
+    def move(self, path: str, state: str, name: Optional[str] = None) -> str:
+        """
+        Déplace un fichier vers un état (rename atomique) et retourne son nouveau chemin
+        name renomme le fichier au passage (fichier partiel terminé...)
+        Lève FileNotFoundError si le fichier a déjà été déplacé par un autre composant
+        """
+        new_path = os.path.join(self.dirs[state], name or os.path.basename(path))
+        if os.path.abspath(path) == os.path.abspath(new_path):
+            return path
+        if os.path.lexists(new_path) and os.path.exists(path):
+            # Homonyme déjà présent dans l'état cible (autre photo): jamais écrasé
+            new_path = os.path.join(self.dirs[state], self._free_name(state, os.path.basename(new_path)))
+            logger.warning(f"{os.path.basename(path)} existe déjà dans {state}/, renommé en "
+                           f"{os.path.basename(new_path)}")
+        old_state = self.state_of(path)
+        before = {s: self._dir_mtime(s) for s in {old_state, state} if s}
+        os.rename(path, new_path)
+        counted_old = is_photo(os.path.basename(path))
+        counted_new = is_photo(os.path.basename(new_path))
+        if old_state == state:
+            self._adjust_count(state, counted_new - counted_old, before[state])
+        else:
+            if old_state:
+                self._adjust_count(old_state, -counted_old, before[old_state])
+            self._adjust_count(state, counted_new, before[state])
+        self._notify(path, new_path)
+        return new_path
+
+    def remove(self, path: str):
+        """Supprime un fichier du spool"""
+        state = self.state_of(path)
+        before = self._dir_mtime(state) if state else None
+        os.unlink(path)
+        if state:
+            self._adjust_count(state, -is_photo(os.path.basename(path)), before)
+        self._notify(path, None)
+
+    def _dir_mtime(self, state: str) -> Optional[int]:
+        try:
+            return os.stat(self.dirs[state]).st_mtime_ns
+        except OSError:
+            return None
+
+    def _adjust_count(self, state: str, delta: int, before: Optional[int]):
+        """Compte mis à jour après une modification faite ici, si le dossier n'avait pas changé avant"""
+        with self._counts_lock:
+            cached = self._counts.get(state)
+            if cached and before is not None and cached[1] == before:
+                self._counts[state] = (cached[0] + delta, self._dir_mtime(state))
+            else:
+                self._counts.pop(state, None)
+
+    def _notify(self, old_path: str, new_path: Optional[str]):
+        for listener in self.listeners:
+            try:
+                listener(old_path, new_path)
+            except Exception as e:
+                logger.warning(f"Erreur de suivi du déplacement de {old_path}: {e}")
+
+    def list(self, state: str) -> List[str]:
+        """Photos présentes dans un état (lecture de ce seul sous-dossier)"""
+        paths = []
+        try:
+            with os.scandir(self.dirs[state]) as entries:
+                for entry in entries:
+                    if is_photo(entry.name) and entry.is_file():
+                        paths.append(entry.path)
+        except FileNotFoundError:
+            pass
+        return sorted(paths)
+
+    def recent(self, states: Iterable[str] = STATES, limit: int = 60,
+               offset: int = 0) -> List[Dict[str, Any]]:
+        """Photos les plus récentes des états demandés (sans trier tout le dossier)"""
+        def entries():
+            for state in states:
+                try:
+                    with os.scandir(self.dirs[state]) as scan:
+                        for entry in scan:
+                            if not is_photo(entry.name):
+                                continue
+                            try:
+                                stat = entry.stat()
+                            except OSError:
+                                continue
+                            yield (stat.st_mtime, entry.name, state, entry.path, stat.st_size)
+                except FileNotFoundError:
+                    continue
+
+        newest = heapq.nlargest(offset + limit, entries())
+        return [{'name': name, 'state': state, 'path': path, 'size': size, 'mtime': mtime}
+                for mtime, name, state, path, size in newest[offset:]]
+
+    def count(self, state: str) -> int:
+        """
+        Nombre de photos dans un état: le dossier n'est relu que si sa date a changé
+        depuis le dernier compte sans que ce spool en soit l'auteur (téléchargement
+        dans incoming/, autre processus)
+        """
+        mtime = self._dir_mtime(state)
+        with self._counts_lock:
+            cached = self._counts.get(state)
+        if cached and mtime is not None and cached[1] == mtime:
+            return cached[0]
+        count = len(self.list(state))
+        # Dossier modifié à l'instant: une écriture dans le même tick d'horloge
+        # ne changerait pas sa date, le compte n'est pas conservé
+        if mtime is not None and time.time() - mtime / 1e9 > RACY_SECONDS:
+            with self._counts_lock:
+                self._counts[state] = (count, mtime)
+        return count
+
+    def counts(self) -> Dict[str, int]:
+        """Nombre de photos par état (sans relire les dossiers inchangés)"""
+        return {state: self.count(state) for state in STATES}
+
+    def locate(self, name: str) -> Optional[str]:
+        """Chemin d'une photo, quel que soit son état (None si absente)"""
+        for directory in self.dirs.values():
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _free_name(self, state: str, name: str) -> str:
+        stem, ext = os.path.splitext(name)
+        candidate = name
+        counter = 1
+        while os.path.lexists(os.path.join(self.dirs[state], candidate)):
+            candidate = f"{stem}_{counter}{ext}"
+            counter += 1
+        return candidate
+
+    def unique_name(self, name: str) -> str:
+        """Nom absent de tous les états (suffixe _1, _2... en cas d'homonyme)"""
+        stem, ext = os.path.splitext(name)
+        candidate = name
+        counter = 1
+        while self.locate(candidate):
+            candidate = f"{stem}_{counter}{ext}"
+            counter += 1
+        return candidate
+
+    def find_photo(self, name: str, size: Optional[int], mtime: Optional[float] = None,
+                   size_tolerance: int = 0) -> Optional[str]:
+        """Copie locale d'un objet de l'appareil, quel que soit son état (None si absente)"""
+        path = self.locate(name)
+        if path and same_photo(path, size, mtime, size_tolerance):
+            return path
+        return None
+
+    def has_photo(self, camera_name: str, prefix: str = '', size: Optional[int] = None,
+                  mtime: Optional[float] = None, size_tolerance: int = 0) -> bool:
+        """
+        Indique si une photo de l'appareil est déjà dans le spool (avec ou sans extension)
+        Sans taille connue, le nom seul fait foi
+        """
+        stem, ext = os.path.splitext(prefix + camera_name)
+        for name in {stem, stem + ext, stem + ext.lower(), stem + ext.upper()}:
+            path = self.locate(name)
+            if path and (size is None or same_photo(path, size, mtime, size_tolerance)):
+                return True
+        return False
+
+    def claim(self, path: str, state: str) -> Optional[str]:
+        """Déplace un fichier vers un état; None s'il a déjà été pris par un autre composant"""
+        try:
+            return self.move(path, state)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _recently_written(path: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(path) < UPLOAD_PART_GRACE
+        except OSError:
+            return False
+
+    def recover(self) -> Dict[str, int]:
+        """
+        Remet le spool dans un état cohérent au démarrage:
+        transferts interrompus remis en attente, écritures interrompues supprimées,
+        photos de l'ancienne organisation (à la racine) mises en attente
+        """
+        recovered = {'uploading': 0, 'partial': 0, 'legacy': 0}
+        for path in self.list(UPLOADING):
+            self.move(path, READY)
+            recovered['uploading'] += 1
+
+        for directory in (self.root, self.dirs[INCOMING]):
+            try:
+                with os.scandir(directory) as entries:
+                    names = [(entry.path, entry.name) for entry in entries if entry.is_file()]
+            except FileNotFoundError:
+                continue
+            for path, name in names:
+                if name.endswith(PART_SUFFIX):
+                    if name.startswith(UPLOAD_PART_PREFIX) and self._recently_written(path):
+                        # Upload web en cours dans l'interface (redémarrage du service seul)
+                        continue
+                    os.unlink(path)
+                    recovered['partial'] += 1
+                elif directory == self.root and is_photo(name):
+                    self.move(path, READY)
+                    recovered['legacy'] += 1
+
+        if any(recovered.values()):
+            logger.info(f"Spool restauré: {recovered['uploading']} transfert(s) repris, "
+                        f"{recovered['partial']} fichier(s) partiel(s) supprimé(s), "
+                        f"{recovered['legacy']} photo(s) reprise(s) de {self.root}")
+        return recovered
+
+
+def create_spool(config: Dict[str, Any]) -> Spool:
+    """Factory function pour le spool du dossier de téléchargement"""
+    return Spool(config.get('camera', {}).get('download_path', '/tmp/photos'))
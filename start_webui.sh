@@ -37,6 +37,12 @@ fi
 # Créer le répertoire de logs s'il n'existe pas
 mkdir -p logs
 
+# Le service de transfert tourne dans son propre processus (socket de contrôle)
+if ! pgrep -f "simple_main.py" > /dev/null; then
+    echo -e "${YELLOW}Démarrage du service de transfert...${NC}"
+    nohup python3 simple_main.py > /dev/null 2>&1 &
+fi
+
 # Vérifier l'environnement virtuel
 if [ -d "venv" ]; then
     echo -e "${YELLOW}Activation de l'environnement virtuel...${NC}"
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+État du service mesuré en arrière-plan pour l'interface web
+La connexion au serveur (connexion, authentification, listage) est testée
+périodiquement dans un thread dédié, avec sa propre connexion; l'état du
+service de transfert (spool, espace libre, appareil photo) est relevé plus
+souvent. Les pages affichent le dernier relevé sans jamais attendre le serveur.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, List
+
+from simple_transfer import create_transfer
+from spool import READY, UPLOADING
+
+logger = logging.getLogger('StatusProbe')
+
+
+def tail_lines(path: str, count: int = 5, block_size: int = 4096) -> List[str]:
+    """Dernières lignes d'un fichier, lues depuis la fin"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            data = b''
+            while position > 0 and data.count(b'\n') <= count:
+                step = min(block_size, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+    except OSError:
+        return []
+    lines = data.decode('utf-8', errors='replace').splitlines(keepends=True)
+    return lines[-count:]
+
+
+class StatusProber:
+    """Relevé périodique de l'état du service, consulté sans attente par les pages"""
+
+    def __init__(self, service, probe_interval: float = 30, local_interval: float = 5,
+                 log_file: str = os.path.join('logs', 'photo_transfer.log')):
+        self.service = service
+        self.probe_interval = probe_interval
+        self.local_interval = local_interval
+        self.log_file = log_file
+        self.snapshot: Dict[str, Any] = {
+            'connection': {'checked': False, 'success': False,
+                           'message': 'Vérification de la connexion en cours...',
+                           'protocol': None, 'latency_ms': None, 'remote_count': None,
+                           'checked_at': None},
+            'local': {'exists': False, 'pending': 0, 'spool_counts': None, 'disk_space': None,
+                      'camera_link': None, 'daemon': None, 'recent_logs': [], 'checked_at': None},
+        }
+        self.running_state = False
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self._wakeup = threading.Event()
+        self._probe_requested = True
+
+    def start(self):
+        """Démarre les relevés dans un thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Arrête les relevés"""
+        self.running = False
+        self._wakeup.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5.0)
+
+    def request_probe(self):
+        """Demande un test de connexion immédiat (configuration modifiée...)"""
+        self._probe_requested = True
+        self._wakeup.set()
+
+    def get(self) -> Dict[str, Any]:
+        """Dernier relevé, avec l'état marche/arrêt du service"""
+        with self.lock:
+            snapshot = {key: dict(value) for key, value in self.snapshot.items()}
+            snapshot['running'] = self.running_state
+        return snapshot
+
+    def run(self):
+        """Boucle de relevés: état local à chaque tour, serveur à son propre rythme"""
+        next_probe = 0
+        while self.running:
+            try:
+                self.refresh_local()
+            except Exception as e:
+                logger.error(f"Erreur lors du relevé local: {e}")
+            if self._probe_requested or time.monotonic() >= next_probe:
+                self._probe_requested = False
+                try:
+                    self.refresh_connection()
+                except Exception as e:
+                    logger.error(f"Erreur lors du test de connexion: {e}")
+                next_probe = time.monotonic() + self.probe_interval
+            self._wakeup.wait(self.local_interval)
+            self._wakeup.clear()
+
+    def refresh_connection(self) -> Dict[str, Any]:
+        """Teste le serveur avec une connexion dédiée (l'upload en cours n'est pas touché)"""
+        transfer = create_transfer(self.service.config)
+        started = time.monotonic()
+        try:
+            result = transfer.test_connection()
+        finally:
+            transfer.disconnect()
+        connection = {
+            'checked': True,
+            'success': result['success'],
+            'message': result['message'],
+            'protocol': result.get('protocol'),
+            'latency_ms': round((time.monotonic() - started) * 1000),
+            'remote_count': result.get('files_count') if result['success'] else None,
+            'checked_at': datetime.now().strftime('%H:%M:%S')
+        }
+        with self.lock:
+            self.snapshot['connection'] = connection
+        return connection
+
+    def refresh_local(self) -> Dict[str, Any]:
+        """Relève l'état du service de transfert (spool, espace libre, caméra) et les derniers logs"""
+        status = self.service.status()
+        spool_counts = status['spool_counts']
+        local = {
+            'exists': status['spool_exists'],
+            'pending': spool_counts[READY] + spool_counts[UPLOADING] if spool_counts else 0,
+            'spool_counts': spool_counts,
+            'disk_space': status['disk_space'],
+            'camera_link': status['camera_link'],
+            # Service de transfert joignable (processus distinct de l'interface web)
+            'daemon': status.get('available', True),
+            'recent_logs': tail_lines(self.log_file, 5),
+            'checked_at': datetime.now().strftime('%H:%M:%S')
+        }
+        with self.lock:
+            self.snapshot['local'] = local
+            self.running_state = status['running']
+        return local
+
+
+def create_status_prober(config: Dict[str, Any], service) -> StatusProber:
+    """Factory function pour le relevé d'état de l'interface web"""
+    system_config = config.get('system', {})
+    return StatusProber(service,
+                        probe_interval=system_config.get('status_probe_interval', 30),
+                        local_interval=system_config.get('check_interval', 5))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test du nettoyage par lots de la carte mémoire
+Ne nécessite ni appareil photo ni python-gphoto2
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from camera_session import CameraSession, FakeCameraBackend
+from camera_index import CameraIndex
+from camera_cleanup import CameraCleaner
+
+
+def make_fake_card(root, names):
+    """Crée une fausse carte mémoire avec quelques fichiers"""
+    folder = os.path.join(root, 'store_00010001', 'DCIM', '100NCD800')
+    os.makedirs(folder, exist_ok=True)
+    for name in names:
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe0' + name.encode() + b'\xff\xd9')
+    return folder
+
+
+def test_cleaner_deletes_only_confirmed_uploads():
+    with tempfile.TemporaryDirectory() as card, tempfile.TemporaryDirectory() as dest:
+        names = [f'DSC_{n:04d}.JPG' for n in range(1, 501)]
+        make_fake_card(card, names)
+        backend = FakeCameraBackend(card)
+        session = CameraSession(backend)
+        index = CameraIndex(os.path.join(dest, 'camera_index.json'))
+        index.refresh(session)
+        for entry in index.pending_downloads()[:-10]:
+            local_path = os.path.join(dest, entry['name'])
+            index.mark_downloaded(entry, local_path)
+            index.mark_uploaded(local_path)
+
+        start = time.time()
+        stats = CameraCleaner(session, index, batch_size=50).run()
+        assert time.time() - start < 5
+        assert stats == {'deleted': 490, 'failed': 0, 'skipped': 0, 'duration': stats['duration']}
+        # Les 10 photos non transférées restent sur l'appareil
+        assert len(session.list_files(with_info=False)) == 10
+        assert backend.open_count == 1
+
+        # Vidage complet explicite: supprimées sans être marquées comme transférées
+        remaining = [entry for entry in index.entries.values() if entry['on_camera']]
+        assert CameraCleaner(session, index).run(remaining)['deleted'] == 10
+        assert session.list_files(with_info=False) == []
+        assert all(entry['upload_state'] == 'pending' for entry in remaining)
+
+
+def test_cleaner_keeps_photo_replaced_since_upload():
+    with tempfile.TemporaryDirectory() as card, tempfile.TemporaryDirectory() as dest:
+        folder = make_fake_card(card, ['DSC_0001.JPG', 'DSC_0002.JPG'])
+        session = CameraSession(FakeCameraBackend(card))
+        index = CameraIndex(os.path.join(dest, 'camera_index.json'))
+        index.refresh(session)
+        for entry in index.pending_downloads():
+            local_path = os.path.join(dest, entry['name'])
+            index.mark_downloaded(entry, local_path)
+            index.mark_uploaded(local_path)
+
+        # Carte changée entre le listage et le nettoyage
+        replaced = os.path.join(folder, 'DSC_0001.JPG')
+        with open(replaced, 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe0 nouvelle photo \xff\xd9')
+
+        stats = CameraCleaner(session, index).run()
+        assert (stats['deleted'], stats['skipped'], stats['failed']) == (1, 1, 0)
+        assert os.path.exists(replaced)
+        entry = index.get(index.pending_downloads()[0]['folder'], 'DSC_0001.JPG')
+        assert entry['upload_state'] == 'pending' and entry['size'] == os.path.getsize(replaced)
+        assert index.pending_deletions() == []
+
+
+if __name__ == "__main__":
+    test_cleaner_deletes_only_confirmed_uploads()
+    print("✅ Suppression par lots des seules photos transférées")
+    test_cleaner_keeps_photo_replaced_since_upload()
+    print("✅ Photo remplacée depuis le transfert conservée et réindexée")
+    sys.exit(0)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test de l'ingestion simultanée de plusieurs boîtiers
+Ne nécessite ni appareil photo ni python-gphoto2
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from camera_session import FakeCameraBackend
+from camera_fleet import CameraFleet
+from upload_queue import UploadQueue
+
+
+def make_fake_card(root, names):
+    """Crée une fausse carte mémoire avec quelques fichiers"""
+    folder = os.path.join(root, 'store_00010001', 'DCIM', '100NCD800')
+    os.makedirs(folder, exist_ok=True)
+    for name in names:
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe0' + name.encode() + b'\xff\xd9')
+    return folder
+
+
+class FakeDetector:
+    """Détecteur de plusieurs faux boîtiers"""
+
+    def __init__(self, backends):
+        self.backends = backends
+
+    def detect(self):
+        return [{'model': b.model, 'port': b.port} for b in self.backends.values()]
+
+
+def test_fleet_ingests_each_body_with_its_own_session():
+    with tempfile.TemporaryDirectory() as parent:
+        dest = os.path.join(parent, 'photos')
+        backends = {}
+        for n, serial in enumerate(['3001111', '3002222'], start=1):
+            card = os.path.join(parent, f'card{n}')
+            make_fake_card(card, ['DSC_0001.JPG', 'DSC_0002.JPG'])
+            port = f'usb:001,00{n}'
+            backends[port] = FakeCameraBackend(card, model='Nikon DSC D800', port=port, serial=serial)
+
+        config = {
+            'camera': {'download_path': dest,
+                       'index_path': os.path.join(parent, 'camera_index.json'),
+                       'body_names': {'3002222': 'B'}},
+            'system': {'check_interval': 0.2}
+        }
+        upload_queue = UploadQueue()
+        fleet = CameraFleet(config, upload_queue.put,
+                            backend_factory=lambda port=None: backends[port] if port else FakeDetector(backends))
+        fleet.start()
+        try:
+            queued = set()
+            deadline = time.time() + 5
+            while len(queued) < 4 and time.time() < deadline:
+                queued.update(upload_queue.get_batch(timeout=0.5))
+        finally:
+            fleet.stop()
+
+        # Noms préfixés par boîtier: aucune collision entre les DSC_0001
+        assert sorted(os.path.basename(p) for p in queued) == [
+            'B_DSC_0001.JPG', 'B_DSC_0002.JPG', 'D800-001111_DSC_0001.JPG', 'D800-001111_DSC_0002.JPG']
+        assert all(backend.open_count == 1 for backend in backends.values())
+        assert os.path.exists(os.path.join(parent, 'camera_index_B.json'))
+
+
+if __name__ == "__main__":
+    test_fleet_ingests_each_body_with_its_own_session()
+    print("✅ Ingestion simultanée de plusieurs boîtiers")
+    sys.exit(0)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test de l'index des photos de l'appareil
+Ne nécessite ni appareil photo ni python-gphoto2
+"""
+
+import os
+import sys
+import tempfile
+
+from camera_session import CameraSession, FakeCameraBackend
+from camera_index import CameraIndex
+
+
+def make_fake_card(root, names):
+    """Crée une fausse carte mémoire avec quelques fichiers"""
+    folder = os.path.join(root, 'store_00010001', 'DCIM', '100NCD800')
+    os.makedirs(folder, exist_ok=True)
+    for name in names:
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe0' + name.encode() + b'\xff\xd9')
+    return folder
+
+
+def test_index_prevents_redownload_after_local_delete():
+    with tempfile.TemporaryDirectory() as card, tempfile.TemporaryDirectory() as dest:
+        make_fake_card(card, ['DSC_0001.JPG', 'DSC_0002.JPG'])
+        session = CameraSession(FakeCameraBackend(card))
+        index_path = os.path.join(dest, 'index', 'camera_index.json')
+        index = CameraIndex(index_path)
+
+        assert len(index.refresh(session)) == 2
+        for entry in index.pending_downloads():
+            index.mark_downloaded(entry, session.download(entry, dest))
+        uploaded = os.path.join(dest, 'DSC_0001.JPG')
+        index.mark_uploaded(uploaded, '/photos/DSC_0001.JPG')
+        index.save()
+        os.unlink(uploaded)
+
+        # Nouvel index relu depuis le disque (autre processus)
+        index = CameraIndex(index_path)
+        assert index.refresh(session) == []
+        assert index.pending_downloads() == []
+        assert index.find_by_name('DSC_0001.JPG')['upload_state'] == 'uploaded'
+
+
+def test_jpg_nef_pair_matched_by_full_name():
+    with tempfile.TemporaryDirectory() as card, tempfile.TemporaryDirectory() as dest:
+        folder = make_fake_card(card, ['DSC_0001.JPG', 'DSC_0001.NEF'])
+        os.makedirs(os.path.join(card, 'store_00010001', 'DCIM', '101NCD800'))
+        session = CameraSession(FakeCameraBackend(card))
+        index = CameraIndex(os.path.join(dest, 'camera_index.json'))
+        index.refresh(session)
+
+        for entry in index.pending_downloads():
+            index.mark_downloaded(entry, session.download(entry, dest))
+        index.mark_uploaded(os.path.join(dest, 'DSC_0001.JPG'), '/photos/DSC_0001.JPG')
+
+        # Le RAW de même numéro n'hérite pas de l'état du JPEG transféré
+        nef = index.find_by_name('DSC_0001.NEF')
+        assert nef['name'] == 'DSC_0001.NEF' and nef['upload_state'] == 'pending'
+        assert [entry['name'] for entry in index.pending_deletions()] == ['DSC_0001.JPG']
+        assert index.find_by_name('DSC_0001.JPG', size=1) is None
+
+        # Même nom dans deux dossiers: seul le dossier précisé lève l'ambiguïté
+        other = os.path.join(card, 'store_00010001', 'DCIM', '101NCD800')
+        with open(os.path.join(other, 'DSC_0001.JPG'), 'wb') as f:
+            f.write(b'\xff\xd8\xff\xd9')
+        index.refresh(session)
+        assert index.find_by_name('DSC_0001.JPG') is None
+        camera_folder = '/' + os.path.relpath(folder, card)
+        assert index.find_by_name('DSC_0001.JPG', camera_folder)['upload_state'] == 'uploaded'
+
+
+def test_card_swap_resets_same_name_to_pending():
+    with tempfile.TemporaryDirectory() as card, tempfile.TemporaryDirectory() as dest:
+        folder = make_fake_card(card, ['DSC_0001.JPG'])
+        session = CameraSession(FakeCameraBackend(card))
+        index = CameraIndex(os.path.join(dest, 'camera_index.json'))
+        index.refresh(session)
+        entry = index.pending_downloads()[0]
+        index.mark_downloaded(entry, session.download(entry, dest))
+        index.mark_uploaded(os.path.join(dest, 'DSC_0001.JPG'), '/photos/DSC_0001.JPG')
+        assert len(index.pending_deletions()) == 1
+
+        # Nouvelle carte: autre photo sous le même nom, sans passage par un dossier vide
+        photo = os.path.join(folder, 'DSC_0001.JPG')
+        with open(photo, 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe0 autre prise de vue \xff\xd9')
+        os.utime(photo, (1500000000, 1500000000))
+
+        new_entries = index.refresh(session)
+        assert [e['name'] for e in new_entries] == ['DSC_0001.JPG']
+        assert new_entries[0]['upload_state'] == 'pending'
+        assert index.pending_deletions() == []
+        assert index.pending_downloads() == new_entries
+
+        # Photo inchangée: pas de nouvel objet au listage suivant
+        assert index.refresh(session) == []
+
+
+if __name__ == "__main__":
+    test_index_prevents_redownload_after_local_delete()
+    print("✅ Pas de retéléchargement d'une photo déjà transférée")
+    test_jpg_nef_pair_matched_by_full_name()
+    print("✅ JPEG et NEF de même numéro distingués par leur nom complet")
+    test_card_swap_resets_same_name_to_pending()
+    print("✅ Photo homonyme après changement de carte remise en attente")
+    sys.exit(0)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test de l'ingestion des photos de l'appareil avec le backend simulé
+Ne nécessite ni appareil photo ni python-gphoto2
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from camera_session import CameraSession, FakeCameraBackend
+from camera_ingest import EventIngest, iter_saved_files, download_pending
+from upload_queue import UploadQueue
+from camera_index import CameraIndex
+from spool import Spool, INCOMING, READY, DONE
+
+
+def make_fake_card(root, names):
+    """Crée une fausse carte mémoire avec quelques fichiers"""
+    folder = os.path.join(root, 'store_00010001', 'DCIM', '100NCD800')
+    os.makedirs(folder, exist_ok=True)
+    for name in names:
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe0' + name.encode() + b'\xff\xd9')
+    return folder
+
+
+def test_event_ingest_fetches_only_new_file():
+    with tempfile.TemporaryDirectory() as card, tempfile.TemporaryDirectory() as dest:
+        folder = make_fake_card(card, ['DSC_0001.JPG'])
+        upload_queue = UploadQueue()
+        ingest = EventIngest(CameraSession(FakeCameraBackend(card)), dest,
+                             on_photo=upload_queue.put, event_timeout=0.2)
+        ingest.start()
+        try:
+            time.sleep(0.3)
+            make_fake_card(card, ['DSC_0002.JPG'])
+            start = time.time()
+            queued = upload_queue.get(timeout=5)
+            assert time.time() - start < 1.0
+        finally:
+            ingest.stop()
+
+        assert queued == os.path.join(dest, 'DSC_0002.JPG')
+        # La photo déjà présente sur la carte n'est pas retéléchargée
+        assert os.listdir(dest) == ['DSC_0002.JPG']
+        assert os.path.exists(os.path.join(folder, 'DSC_0001.JPG'))
+
+
+def test_saved_files_streamed_before_process_ends():
+    with tempfile.TemporaryDirectory() as dest:
+        # Faux gphoto2: enregistre une photo puis reste occupé
+        script = (
+            "import os, sys, time\n"
+            f"path = os.path.join({dest!r}, 'DSC_0001.JPG')\n"
+            "open(path, 'wb').write(b'x')\n"
+            "print('Saving file as ' + path, flush=True)\n"
+            "time.sleep(10)\n"
+        )
+        start = time.time()
+        saved = iter_saved_files([sys.executable, '-c', script], timeout=20)
+        assert next(saved) == os.path.join(dest, 'DSC_0001.JPG')
+        assert time.time() - start < 5
+        saved.close()
+
+
+def test_same_name_from_formatted_card_is_not_mistaken_for_old_photo():
+    with tempfile.TemporaryDirectory() as card, tempfile.TemporaryDirectory() as root:
+        spool = Spool(root)
+        # DSC_0001 d'avant le formatage, déjà transféré
+        old = os.path.join(spool.dir(DONE), 'DSC_0001.JPG')
+        with open(old, 'wb') as f:
+            f.write(b'\xff\xd8' + b'\x00' * 100 + b'\xff\xd9')
+        make_fake_card(card, ['DSC_0001.JPG', 'DSC_0002.JPG'])
+        session = CameraSession(FakeCameraBackend(card))
+        index = CameraIndex(os.path.join(root, 'camera_index.json'))
+
+        photos, _ = download_pending(session, index, spool.dir(INCOMING), spool=spool)
+        assert sorted(os.path.basename(p) for p in photos) == ['DSC_0001_1.JPG', 'DSC_0002.JPG']
+        assert index.pending_downloads() == []
+        # Même nom, taille et date: déjà présente
+        assert spool.has_photo('DSC_0002.JPG', size=os.path.getsize(photos[-1]),
+                               mtime=os.path.getmtime(photos[-1]))
+        assert not spool.has_photo('DSC_0001.JPG', size=5000, size_tolerance=1024)
+
+        # Un homonyme dans l'état cible n'est jamais écrasé
+        other = os.path.join(spool.dir(READY), 'DSC_0001.JPG')
+        with open(other, 'wb') as f:
+            f.write(b'\xff\xd8\xff\xd9')
+        moved = spool.move(other, DONE)
+        assert moved == os.path.join(spool.dir(DONE), 'DSC_0001_1.JPG')
+        assert os.path.getsize(old) == 104
+
+
+if __name__ == "__main__":
+    test_event_ingest_fetches_only_new_file()
+    print("✅ Ingestion événementielle de la seule nouvelle photo")
+    test_saved_files_streamed_before_process_ends()
+    print("✅ Photos transmises pendant le téléchargement gphoto2")
+    test_same_name_from_formatted_card_is_not_mistaken_for_old_photo()
+    print("✅ Homonymes après formatage téléchargés sous un nouveau nom, jamais écrasés")
+    sys.exit(0)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test de la récupération de la liaison USB/PTP
+Ne nécessite ni appareil photo ni python-gphoto2
+"""
+
+import os
+import sys
+import tempfile
+
+from camera_session import CameraSession, FakeCameraBackend, CameraError
+from camera_recovery import CameraRecovery, classify_error
+
+
+def make_fake_card(root, names):
+    """Crée une fausse carte mémoire avec quelques fichiers"""
+    folder = os.path.join(root, 'store_00010001', 'DCIM', '100NCD800')
+    os.makedirs(folder, exist_ok=True)
+    for name in names:
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe0' + name.encode() + b'\xff\xd9')
+    return folder
+
+
+def test_recovery_classifies_and_escalates():
+    assert classify_error(CameraError("Could not claim the USB device", -53)) == 'claim_failed'
+    assert classify_error(CameraError("*** Error (-110: 'I/O in progress') ***")) == 'busy'
+    assert classify_error(CameraError("Timeout lors du téléchargement des photos")) == 'timeout'
+    assert classify_error(CameraError("PTP I/O error", -7)) == 'disconnected'
+
+    with tempfile.TemporaryDirectory() as card:
+        make_fake_card(card, ['DSC_0001.JPG'])
+        session = CameraSession(FakeCameraBackend(card))
+        recovery = CameraRecovery(session, base_delay=0.5, max_delay=8.0, usb_reset=False)
+        assert session.ensure_open()
+
+        # Un appareil occupé coûte une attente courte, pas trente secondes
+        busy = CameraError("Camera is busy", -110)
+        assert recovery.handle_error(busy) == 0.5
+        assert recovery.handle_error(busy) == 1.0
+        assert session.is_open
+        assert recovery.handle_error(busy) == 2.0
+        assert recovery.action_counts == {'wait': 2, 'reopen': 1}
+        assert recovery.state == 'recovering' and not session.is_open
+
+        assert session.ensure_open()
+        recovery.record_success()
+        metrics = recovery.metrics()
+        assert metrics['state'] == 'connected'
+        assert metrics['recoveries'] == 1
+        assert metrics['errors'] == {'busy': 3}
+        assert metrics['time_in_state']['recovering'] >= 0
+
+
+if __name__ == "__main__":
+    test_recovery_classifies_and_escalates()
+    print("✅ Récupération ciblée de la liaison USB/PTP")
+    sys.exit(0)
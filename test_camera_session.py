@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test de la session caméra persistante avec le backend simulé
+Ne nécessite ni appareil photo ni python-gphoto2
+"""
+
+import os
+import sys
+import tempfile
+
+from camera_session import CameraBackend, CameraSession, FakeCameraBackend, create_camera_session
+
+
+def make_fake_card(root, names):
+    """Crée une fausse carte mémoire avec quelques fichiers"""
+    folder = os.path.join(root, 'store_00010001', 'DCIM', '100NCD800')
+    os.makedirs(folder, exist_ok=True)
+    for name in names:
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe0' + name.encode() + b'\xff\xd9')
+    return folder
+
+
+def test_single_session_for_all_operations():
+    with tempfile.TemporaryDirectory() as card, tempfile.TemporaryDirectory() as dest:
+        make_fake_card(card, ['DSC_0001.JPG', 'DSC_0002.JPG'])
+        backend = FakeCameraBackend(card)
+        session = CameraSession(backend)
+
+        assert session.ensure_open()
+        files = session.list_files()
+        assert [f['name'] for f in files] == ['DSC_0001.JPG', 'DSC_0002.JPG']
+        assert files[0]['folder'] == '/store_00010001/DCIM/100NCD800'
+        assert files[0]['size'] > 0
+
+        for camera_file in files:
+            local_path = session.download(camera_file, dest)
+            assert os.path.getsize(local_path) == camera_file['size']
+        session.delete(files[0])
+
+        assert [f['name'] for f in session.list_files()] == ['DSC_0002.JPG']
+        # Une seule ouverture USB pour toutes les opérations
+        assert backend.open_count == 1
+        session.close()
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoStreamBackend(CameraBackend):
+        def detect(self):
+            return []
+
+    try:
+        NoStreamBackend()
+        assert False, "Un backend incomplet aurait dû être refusé"
+    except TypeError:
+        pass
+
+
+def test_session_reopens_after_disconnect():
+    with tempfile.TemporaryDirectory() as parent:
+        card = os.path.join(parent, 'card')
+        make_fake_card(card, ['DSC_0001.JPG'])
+        session = create_camera_session({'camera': {'backend': 'fake', 'fake_camera_path': card}})
+
+        assert session.ensure_open()
+        os.rename(card, card + '.unplugged')
+        try:
+            session.list_files()
+            assert False, "L'appareil débranché aurait dû lever une erreur"
+        except Exception:
+            pass
+        assert not session.is_open
+        assert not session.ensure_open()
+
+        os.rename(card + '.unplugged', card)
+        assert session.ensure_open()
+        assert len(session.list_files()) == 1
+
+
+if __name__ == "__main__":
+    test_single_session_for_all_operations()
+    print("✅ Session unique pour détection, listage, téléchargement et suppression")
+    test_incomplete_backend_fails_at_construction()
+    print("✅ Backend incomplet refusé dès sa création")
+    test_session_reopens_after_disconnect()
+    print("✅ Réouverture de la session après débranchement")
+    sys.exit(0)
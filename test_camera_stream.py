@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test de l'envoi direct appareil → serveur
+Ne nécessite ni appareil photo ni python-gphoto2
+"""
+
+import os
+import sys
+import time
+import hashlib
+import tempfile
+from unittest import mock
+
+from camera_session import CameraSession, FakeCameraBackend
+from camera_index import CameraIndex
+from camera_stream import CameraStreamer
+from upload_ledger import UploadLedger
+from photo_validator import PhotoValidator
+from spool import Spool, INCOMING
+from transfer_stats import TransferStats
+
+
+class MemoryTransfer:
+    """Faux serveur: conserve en mémoire les fichiers reçus en flux"""
+
+    def __init__(self, stall=False, fail=False):
+        self.stall = stall
+        self.fail = fail
+        self.files = {}
+
+    def connect(self):
+        return True
+
+    def is_connected(self):
+        return True
+
+    def ensure_dir(self, remote_dir):
+        return True
+
+    def disconnect(self):
+        pass
+
+    def upload_stream(self, stream, remote_filename, blocksize=8192):
+        data = b''
+        try:
+            while True:
+                if self.stall:
+                    time.sleep(0.5)
+                chunk = stream.read(blocksize)
+                if not chunk:
+                    break
+                data += chunk
+        except IOError:
+            return False
+        if self.fail:
+            return False
+        self.files[remote_filename] = data
+        return True
+
+    def rename_remote(self, old_path, new_path):
+        self.files[new_path] = self.files.pop(old_path)
+        return True
+
+    def delete_remote(self, remote_path):
+        self.files.pop(remote_path, None)
+        return True
+
+
+def make_fake_card(root, names):
+    """Crée une fausse carte mémoire avec quelques fichiers"""
+    folder = os.path.join(root, 'store_00010001', 'DCIM', '100NCD800')
+    os.makedirs(folder, exist_ok=True)
+    for name in names:
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe0' + name.encode() + b'\xff\xd9')
+    return folder
+
+
+def test_streamer_sends_without_local_copy():
+    with tempfile.TemporaryDirectory() as card, tempfile.TemporaryDirectory() as dest:
+        folder = make_fake_card(card, ['DSC_0001.JPG'])
+        with open(os.path.join(folder, 'DSC_0001.JPG'), 'ab') as f:
+            f.write(os.urandom(300000) + b'\xff\xd9')
+        session = CameraSession(FakeCameraBackend(card))
+        index = CameraIndex(os.path.join(dest, 'camera_index.json'))
+        index.refresh(session)
+        transfer = MemoryTransfer()
+        ledger = UploadLedger(os.path.join(dest, 'ledger.json'))
+        stats = TransferStats(os.path.join(dest, 'stats.db'))
+        streamer = CameraStreamer(session, transfer, '/photos', dest, index=index,
+                                  chunk_size=65536, buffer_size=131072, ledger=ledger,
+                                  stats=stats, validator=PhotoValidator(max_workers=1))
+
+        # Aucune écriture locale: empreinte et validation calculées au fil du flux
+        with mock.patch('camera_stream.open', side_effect=AssertionError, create=True):
+            assert streamer.send(index.pending_downloads()[0]) is None
+        with open(os.path.join(folder, 'DSC_0001.JPG'), 'rb') as f:
+            data = f.read()
+        assert transfer.files == {'/photos/DSC_0001.JPG': data}
+        assert not [name for name in os.listdir(dest) if name.startswith('DSC_0001')]
+        assert len(index.pending_deletions()) == 1
+        # Même registre et mêmes statistiques que les transferts depuis le dossier local
+        assert ledger.entries[hashlib.sha256(data).hexdigest()]['remote_path'] == '/photos/DSC_0001.JPG'
+        assert stats.summary()['total_files'] == 1
+        stats.close()
+
+
+def test_streamer_spools_when_upload_stalls():
+    with tempfile.TemporaryDirectory() as card, tempfile.TemporaryDirectory() as dest:
+        folder = make_fake_card(card, ['DSC_0001.JPG'])
+        with open(os.path.join(folder, 'DSC_0001.JPG'), 'ab') as f:
+            f.write(os.urandom(300000))
+        session = CameraSession(FakeCameraBackend(card))
+        index = CameraIndex(os.path.join(dest, 'camera_index.json'))
+        index.refresh(session)
+        transfer = MemoryTransfer(stall=True)
+        streamer = CameraStreamer(session, transfer, '/photos', dest,
+                                  index=index, chunk_size=65536, buffer_size=65536,
+                                  stall_timeout=0.2)
+
+        # Seul le début déjà envoyé est relu: la suite du flux est écrite localement
+        with mock.patch.object(session, 'download', side_effect=AssertionError):
+            local_path = streamer.send(index.pending_downloads()[0])
+        assert local_path == os.path.join(dest, 'DSC_0001.JPG')
+        with open(os.path.join(folder, 'DSC_0001.JPG'), 'rb') as f, open(local_path, 'rb') as local:
+            assert local.read() == f.read()
+        assert index.find_by_local_path(local_path)['upload_state'] == 'pending'
+        # Aucun fichier tronqué sous le nom final sur le serveur
+        assert '/photos/DSC_0001.JPG' not in transfer.files
+
+
+def test_streamer_keeps_corrupt_photo_unpublished():
+    with tempfile.TemporaryDirectory() as card, tempfile.TemporaryDirectory() as dest:
+        folder = make_fake_card(card, ['DSC_0001.JPG'])
+        # JPEG tronqué: pas de marqueur de fin d'image
+        with open(os.path.join(folder, 'DSC_0001.JPG'), 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe0\x00\x10JFIF\x00' + os.urandom(1000))
+        session = CameraSession(FakeCameraBackend(card))
+        index = CameraIndex(os.path.join(dest, 'camera_index.json'))
+        index.refresh(session)
+        transfer = MemoryTransfer()
+        spool = Spool(dest)
+        streamer = CameraStreamer(session, transfer, '/photos', spool.dir(INCOMING), index=index,
+                                  spool=spool, validator=PhotoValidator(max_workers=1))
+
+        local_path = streamer.send(index.pending_downloads()[0])
+        # Fichier distant temporaire supprimé, photo laissée au chemin normal (quarantaine)
+        assert transfer.files == {}
+        assert local_path == os.path.join(spool.dir(INCOMING), 'DSC_0001.JPG')
+        assert os.listdir(spool.dir(INCOMING)) == ['DSC_0001.JPG']
+
+
+def test_streamer_downloads_when_upload_fails():
+    with tempfile.TemporaryDirectory() as card, tempfile.TemporaryDirectory() as dest:
+        folder = make_fake_card(card, ['DSC_0001.JPG'])
+        session = CameraSession(FakeCameraBackend(card))
+        index = CameraIndex(os.path.join(dest, 'camera_index.json'))
+        index.refresh(session)
+        spool = Spool(dest)
+        streamer = CameraStreamer(session, MemoryTransfer(fail=True), '/photos',
+                                  spool.dir(INCOMING), index=index, spool=spool)
+
+        local_path = streamer.send(index.pending_downloads()[0])
+        assert local_path == os.path.join(spool.dir(INCOMING), 'DSC_0001.JPG')
+        with open(os.path.join(folder, 'DSC_0001.JPG'), 'rb') as f, open(local_path, 'rb') as local:
+            assert local.read() == f.read()
+        assert index.find_by_local_path(local_path)['upload_state'] == 'pending'
+
+
+if __name__ == "__main__":
+    test_streamer_sends_without_local_copy()
+    print("✅ Envoi direct appareil → serveur sans aucune écriture locale")
+    test_streamer_spools_when_upload_stalls()
+    print("✅ Repli sur le dossier local quand l'upload se bloque")
+    test_streamer_keeps_corrupt_photo_unpublished()
+    print("✅ Photo invalide jamais publiée sous son nom final")
+    test_streamer_downloads_when_upload_fails()
+    print("✅ Photo téléchargée dans le dossier local quand l'upload échoue")
+    sys.exit(0)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test du socket de contrôle du service de transfert
+"""
+
+import os
+import sys
+import socket
+import tempfile
+import threading
+from unittest import mock
+
+from control_socket import ControlClient, ControlError, create_control_server
+
+
+def test_control_client_rejects_malformed_reply():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'control.sock')
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+
+        def reply():
+            connection, _ = server.accept()
+            with connection:
+                connection.recv(1024)
+                connection.sendall(b'not json\n')
+
+        threading.Thread(target=reply, daemon=True).start()
+        try:
+            ControlClient(path, timeout=2).call('status')
+            assert False, "Une réponse invalide aurait dû lever ControlError"
+        except ControlError:
+            pass
+        finally:
+            server.close()
+
+
+def test_control_socket_drives_service_from_another_process():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'control.sock')
+        service = mock.Mock()
+        state = {'running': False}
+        service.status.side_effect = lambda: dict(state)
+        service.start.side_effect = lambda: state.update(running=True)
+        service.enqueue.side_effect = lambda paths: len(paths)
+        server = create_control_server({'system': {'control_socket': path}}, service)
+        server.start()
+        try:
+            client = ControlClient(path, timeout=2)
+            assert client.call('status') == {'running': False}
+            assert client.call('start') == {'running': True}
+            assert client.call('enqueue', paths=['/tmp/photos/ready/A.JPG']) == 1
+            # Requêtes simultanées: un thread par client
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(client.call('status')))
+                       for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert results == [{'running': True}] * 8
+            try:
+                client.call('format_card')
+                assert False, "commande inconnue acceptée"
+            except ControlError as e:
+                assert 'format_card' in str(e)
+        finally:
+            server.stop()
+        # Service arrêté: erreur explicite, sans blocage
+        try:
+            ControlClient(path, timeout=2).call('status')
+            assert False, "service arrêté joignable"
+        except ControlError:
+            pass
+
+
+if __name__ == "__main__":
+    test_control_client_rejects_malformed_reply()
+    print("✅ Réponse invalide du service signalée comme service injoignable")
+    test_control_socket_drives_service_from_another_process()
+    print("✅ Service de transfert piloté par son socket de contrôle")
+    sys.exit(0)
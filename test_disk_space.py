@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test de la surveillance de l'espace disque
+"""
+
+import sys
+import time
+import tempfile
+
+from camera_ingest import PollIngest
+from disk_space import DiskGuard, MB
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline and not condition():
+        time.sleep(0.05)
+    return condition()
+
+
+def test_disk_guard_pauses_downloads_until_space_returns():
+    with tempfile.TemporaryDirectory() as root:
+        guard = DiskGuard(root, pause_free_bytes=500 * MB, resume_free_bytes=1000 * MB,
+                          check_interval=0.05)
+        free = [2000 * MB]
+        guard.free = lambda: free[0]
+        guard.capacity = lambda: 64 * 1024 * MB
+        passes = []
+        ingest = PollIngest(lambda on_photo: passes.append(free[0]), on_photo=lambda path: None,
+                            interval=0.05, guard=guard)
+        ingest.start()
+        try:
+            assert wait_for(lambda: len(passes) >= 1)
+
+            # Sous le seuil de pause: plus aucune passe de téléchargement
+            free[0] = 400 * MB
+            assert wait_for(lambda: guard.paused)
+            count = len(passes)
+            # Entre les deux seuils: toujours suspendu (pas de reprise en rafale)
+            free[0] = 800 * MB
+            time.sleep(0.3)
+            assert guard.paused and len(passes) <= count + 1
+
+            free[0] = 1200 * MB
+            assert wait_for(lambda: len(passes) > count + 1)
+            assert not guard.paused
+        finally:
+            ingest.stop()
+        metrics = guard.metrics()
+        assert metrics['pauses'] == 1 and metrics['paused_seconds'] > 0
+
+
+def test_disk_guard_fits_thresholds_to_small_partition():
+    with tempfile.TemporaryDirectory() as root:
+        guard = DiskGuard(root, pause_free_bytes=500 * MB, resume_free_bytes=1000 * MB)
+        # Partition de 2 Go presque pleine de photos transférées
+        guard.capacity = lambda: 2000 * MB
+        free = [150 * MB]
+        guard.free = lambda: free[0]
+        assert not guard.check()
+        assert guard.metrics()['pause_free_mb'] == 200 and guard.metrics()['resume_free_mb'] == 400
+        # La rétention libère 300 Mo: la reprise est possible sur cette partition
+        free[0] = 450 * MB
+        assert guard.check()
+
+
+if __name__ == "__main__":
+    test_disk_guard_pauses_downloads_until_space_returns()
+    print("✅ Téléchargements suspendus puis repris selon l'espace libre")
+    test_disk_guard_fits_thresholds_to_small_partition()
+    print("✅ Seuils d'espace libre ramenés à la taille de la partition")
+    sys.exit(0)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Test de l'identification du type des fichiers par leur en-tête
+"""
+
+import os
+import sys
+import tempfile
+from unittest import mock
+
+from file_types import TYPE_JPEG, TYPE_NEF, TYPE_CR2, TYPE_PNG, TYPE_HEIF, add_extension, sniff_many
+
+
+def test_sniffer_names_files_by_type_and_caches():
+    headers = {
+        'a': b'\xff\xd8\xff\xe1' + b'\x00' * 200,
+        'b': b'II*\x00\x08\x00\x00\x00' + b'\x00' * 40 + b'NIKON CORPORATION\x00',
+        'c': b'II*\x00\x10\x00\x00\x00CR\x02\x00' + b'\x00' * 200,
+        'd': b'\x89PNG\r\n\x1a\n' + b'\x00' * 200,
+        'e': b'\x00\x00\x00\x18ftypheic' + b'\x00' * 200,
+        'f': b'MOV?' + b'\x00' * 200,
+    }
+    with tempfile.TemporaryDirectory() as dest:
+        paths = []
+        for name, header in headers.items():
+            paths.append(os.path.join(dest, name))
+            with open(paths[-1], 'wb') as f:
+                f.write(header)
+
+        kinds = sniff_many(paths)
+        assert [kinds[p] for p in paths] == [TYPE_JPEG, TYPE_NEF, TYPE_CR2, TYPE_PNG, TYPE_HEIF, None]
+
+        # Fichiers inchangés: plus aucune ouverture, même après renommage
+        with mock.patch('file_types.open', side_effect=AssertionError, create=True):
+            assert add_extension(paths[0], upper=True) == paths[0] + '.JPG'
+            assert add_extension(paths[1]) == paths[1] + '.nef'
+            assert add_extension(paths[5]) is None
+        assert os.path.exists(paths[5])
+
+
+if __name__ == "__main__":
+    test_sniffer_names_files_by_type_and_caches()
+    print("✅ Type des fichiers identifié par une seule lecture d'en-tête")
+    sys.exit(0)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test du tableau de bord en direct
+"""
+
+import os
+import sys
+import time
+import json
+import tempfile
+import threading
+from unittest import mock
+
+from upload_queue import UploadQueue
+from live_status import LiveStatus
+
+
+def test_live_status_streams_only_changes_to_every_tab():
+    with tempfile.TemporaryDirectory() as root:
+        log_file = os.path.join(root, 'transfer.log')
+        with open(log_file, 'w') as f:
+            f.write("ancienne ligne\n")
+        service = mock.Mock(upload_queue=UploadQueue(), transfer_progress=None)
+        service.status.side_effect = lambda: {'running': True, 'queue_depth': len(service.upload_queue),
+                                              'transfer': service.transfer_progress, 'bytes_uploaded': 0,
+                                              'photos_uploaded': 0, 'camera_link': None,
+                                              'disk_space': None}
+        local = {'pending': 0, 'disk_space': None, 'recent_logs': ["ancienne ligne\n"]}
+        connection = {'success': True, 'message': 'ok', 'checked_at': '10:00:00'}
+        prober = mock.Mock()
+        prober.get.return_value = {'local': local, 'connection': connection, 'running': True}
+
+        hub = LiveStatus(service, prober, interval=0.05, log_file=log_file)
+        with mock.patch.object(hub, 'collect', wraps=hub.collect) as collect:
+            # Aucun onglet ouvert: aucun calcul
+            hub.start()
+            time.sleep(0.2)
+            assert collect.call_count == 0
+            try:
+                tabs = [hub.subscribe() for _ in range(3)]
+                streams = [hub.stream(tab) for tab in tabs]
+                first = [json.loads(next(stream)[len('data: '):]) for stream in streams]
+                assert all(state['queue_depth'] == 0 and state['logs'] == ["ancienne ligne"]
+                           for state in first)
+
+                service.upload_queue.put('/tmp/photos/ready/DSC_0001.JPG')
+                service.transfer_progress = {'file': 'DSC_0001.JPG', 'sent': 512, 'total': 1024}
+                with open(log_file, 'a') as f:
+                    f.write("Upload de DSC_0001.JPG...\n")
+                deltas = []
+                while not any('logs' in delta for delta in deltas):
+                    deltas.append(json.loads(next(streams[0])[len('data: '):]))
+                merged = {}
+                for delta in deltas:
+                    merged.update(delta)
+                # Seules les valeurs modifiées sont envoyées
+                assert 'connection' not in merged and 'running' not in merged
+                assert merged['queue_depth'] == 1 and merged['transfer']['percent'] == 50
+                assert merged['logs'] == ["Upload de DSC_0001.JPG..."]
+            finally:
+                hub.stop()
+
+
+def test_live_status_queries_service_outside_lock():
+    release = threading.Event()
+    service = mock.Mock()
+
+    def slow_status():
+        # Service occupé (transfert en cours, socket de contrôle lente)
+        release.wait(5)
+        return {'running': True, 'queue_depth': 0, 'transfer': None, 'bytes_uploaded': 0,
+                'photos_uploaded': 0, 'camera_link': None, 'disk_space': None}
+
+    service.status.side_effect = slow_status
+    prober = mock.Mock()
+    prober.get.return_value = {'local': {'pending': 0, 'recent_logs': []},
+                               'connection': {'success': True, 'message': 'ok', 'checked_at': None}}
+    with tempfile.TemporaryDirectory() as root:
+        hub = LiveStatus(service, prober, interval=0.05, log_file=os.path.join(root, 'transfer.log'))
+        try:
+            first = hub.subscribe()
+            time.sleep(0.2)
+            assert service.status.called
+            # Calcul en cours: ouvrir et fermer un onglet ne l'attend pas
+            started = time.monotonic()
+            second = hub.subscribe()
+            hub.unsubscribe(second)
+            assert time.monotonic() - started < 1
+            release.set()
+            state = first.get(timeout=5)
+            assert state['running'] and state['logs'] == []
+        finally:
+            release.set()
+            hub.stop()
+
+
+if __name__ == "__main__":
+    test_live_status_streams_only_changes_to_every_tab()
+    print("✅ Tableau de bord en direct: seuls les changements sont diffusés")
+    test_live_status_queries_service_outside_lock()
+    print("✅ État du service relevé hors du verrou des onglets")
+    sys.exit(0)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test de la lecture des logs par curseur
+"""
+
+import os
+import sys
+import tempfile
+
+from log_reader import LogReader
+
+
+def test_log_reader_tails_filters_and_follows_rotation():
+    with tempfile.TemporaryDirectory() as root:
+        transfer_log = os.path.join(root, 'photo_transfer.log')
+        webui_log = os.path.join(root, 'webui.log')
+        with open(transfer_log + '.1', 'w') as f:
+            for i in range(5000):
+                f.write(f"2024-05-01 10:00:{i % 60:02d},000 - INFO - Archive {i}\n")
+            f.write("2024-05-01 10:59:00,000 - ERROR - Upload échoué\n")
+            f.write("Traceback (most recent call last):\n  OSError: timeout\n")
+        with open(transfer_log, 'w') as f:
+            f.write("2024-05-01 11:00:00,000 - INFO - Upload de DSC_0001.JPG\n")
+            f.write("2024-05-01 11:00:02,000 - WARNING - Reconnexion FTP\n")
+        with open(webui_log, 'w') as f:
+            f.write("2024-05-01 11:00:01,000 - INFO - Démarrage du serveur web\n")
+
+        reader = LogReader({'transfer': transfer_log, 'webui': webui_log})
+        result = reader.tail(3)
+        # Dernières entrées de tous les services, fusionnées par horodatage
+        assert [entry['source'] for entry in result['entries']] == ['transfer', 'webui', 'transfer']
+        assert result['entries'][-1]['text'].endswith("Reconnexion FTP")
+
+        # Filtre de niveau: la trace est rattachée à son entrée, dans l'archive
+        errors = reader.tail(10, level='WARNING')['entries']
+        assert [entry['level'] for entry in errors] == ['ERROR', 'WARNING']
+        assert errors[0]['text'].endswith("OSError: timeout")
+        assert [e['text'] for e in reader.tail(10, text='dsc_0001')['entries']] == \
+            ["2024-05-01 11:00:00,000 - INFO - Upload de DSC_0001.JPG"]
+
+        # Suivi incrémental: seules les nouvelles lignes, même après archivage du log
+        cursor = result['cursor']
+        assert reader.read_after(cursor)['entries'] == []
+        with open(transfer_log, 'a') as f:
+            f.write("2024-05-01 11:00:03,000 - INFO - Upload de DSC_0002.JPG\n")
+        os.rename(transfer_log + '.1', transfer_log + '.2')
+        os.rename(transfer_log, transfer_log + '.1')
+        with open(transfer_log, 'w') as f:
+            f.write("2024-05-01 11:00:04,000 - INFO - Upload de DSC_0003.JPG\n")
+            f.write("2024-05-01 11:00:05,000 - INFO - ligne en cours d'écri")
+        update = reader.read_after(cursor)
+        assert [entry['text'][-12:] for entry in update['entries']] == ["DSC_0002.JPG", "DSC_0003.JPG"]
+        with open(transfer_log, 'a') as f:
+            f.write("ture\n")
+        assert [entry['text'][-10:] for entry in reader.read_after(update['cursor'])['entries']] == \
+            ["d'écriture"]
+
+
+def test_log_reader_cursor_stops_at_last_complete_line():
+    with tempfile.TemporaryDirectory() as root:
+        log = os.path.join(root, 'photo_transfer.log')
+        with open(log, 'w') as f:
+            f.write("2024-05-01 11:00:00,000 - INFO - Upload de DSC_0001.JPG\n")
+            f.write("2024-05-01 11:00:01,000 - ERROR - Upload de DSC_00")
+        reader = LogReader({'transfer': log})
+
+        # Ligne en cours d'écriture: ni affichée, ni comptée dans le curseur
+        result = reader.tail(10)
+        assert [entry['text'][-12:] for entry in result['entries']] == ["DSC_0001.JPG"]
+        assert reader.read_after(result['cursor'])['entries'] == []
+
+        # Ligne terminée puis trace écrite après coup: rattachée à son entrée
+        with open(log, 'a') as f:
+            f.write("02.JPG échoué\nTraceback (most recent call last):\n")
+        update = reader.read_after(result['cursor'])
+        assert [entry['level'] for entry in update['entries']] == ['ERROR']
+        assert update['entries'][0]['text'].endswith("DSC_0002.JPG échoué\nTraceback (most recent call last):")
+        with open(log, 'a') as f:
+            f.write("  OSError: timeout\n  File")
+        update = reader.read_after(update['cursor'])
+        assert [(entry['time'], entry['level'], entry['text']) for entry in update['entries']] == \
+            [('2024-05-01 11:00:01,000', 'ERROR', "  OSError: timeout")]
+        assert len(reader.tail(10, level='ERROR')['entries'][0]['text'].splitlines()) == 3
+
+        # Archivage pendant l'écriture d'une ligne: fin de la ligne lue dans l'archive
+        with open(log, 'a') as f:
+            f.write(' "ftp.py"\n2024-05-01 11:00:02,000 - INFO - Reconnex')
+        cursor = reader.read_after(update['cursor'])['cursor']
+        with open(log, 'a') as f:
+            f.write("ion FTP\n")
+        os.rename(log, log + '.1')
+        with open(log, 'w') as f:
+            f.write("  suite sans entrée dans le nouveau fichier\n")
+            f.write("2024-05-01 11:00:03,000 - INFO - Upload de DSC_00")
+        update = reader.read_after(cursor)
+        assert [entry['text'] for entry in update['entries']] == \
+            ["2024-05-01 11:00:02,000 - INFO - Reconnexion FTP\n  suite sans entrée dans le nouveau fichier"]
+        with open(log, 'a') as f:
+            f.write("03.JPG\n")
+        assert [entry['text'][-12:] for entry in reader.read_after(update['cursor'])['entries']] == \
+            ["DSC_0003.JPG"]
+
+
+if __name__ == "__main__":
+    test_log_reader_tails_filters_and_follows_rotation()
+    print("✅ Logs lus depuis la fin, filtrés et suivis par curseur malgré l'archivage")
+    test_log_reader_cursor_stops_at_last_complete_line()
+    print("✅ Curseur arrêté à la dernière ligne complète (lignes en cours, traces, archivage)")
+    sys.exit(0)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test de la validation structurelle des photos avant transfert
+"""
+
+import os
+import sys
+import tempfile
+
+from photo_validator import PhotoValidator, StreamCheck
+
+
+def make_fake_nef(path, preview):
+    """NEF minimal: IFD0 -> SubIFD avec aperçu JPEG, puis données RAW"""
+    import struct
+    raw_data = b'\x00' * 4096
+    sub_ifd_offset = 8 + 2 + 12 + 4
+    preview_offset = sub_ifd_offset + 2 + 2 * 12 + 4
+    with open(path, 'wb') as f:
+        f.write(b'II' + struct.pack('<HI', 42, 8))
+        # IFD0: un seul tag SubIFDs
+        f.write(struct.pack('<H', 1) + struct.pack('<HHII', 0x014A, 4, 1, sub_ifd_offset) + struct.pack('<I', 0))
+        # SubIFD: offset et longueur de l'aperçu
+        f.write(struct.pack('<H', 2))
+        f.write(struct.pack('<HHII', 0x0201, 4, 1, preview_offset))
+        f.write(struct.pack('<HHII', 0x0202, 4, 1, len(preview)))
+        f.write(struct.pack('<I', 0))
+        f.write(preview + raw_data)
+
+
+def test_validator_walks_jpeg_to_real_eoi():
+    exif = b'\xff\xe1\x40\x00' + b'\x00' * 0x3ffe
+    jpeg = (b'\xff\xd8' + exif + b'\xff\xe0\x00\x04JF\xff\xc0\x00\x05\x08\x00\x01\xff\xda\x00\x04\x01\x00'
+            + b'\x12\xff\x00\x34\xff\xd0' * 2000 + b'\xff\xd9')
+    contents = {
+        'ok.jpg': jpeg,
+        'padded.jpg': jpeg + b'\x00' * 512,
+        # Tronqué au milieu mais terminé par FF D9 (accepté par l'ancien contrôle)
+        'truncated.jpg': jpeg[:5000] + b'\xff\xd9',
+        'empty.jpg': b'',
+    }
+    with tempfile.TemporaryDirectory() as dest:
+        paths = []
+        for name, data in contents.items():
+            paths.append(os.path.join(dest, name))
+            with open(paths[-1], 'wb') as f:
+                f.write(data)
+        make_fake_nef(os.path.join(dest, 'ok.nef'), jpeg)
+        paths.append(os.path.join(dest, 'ok.nef'))
+        # NEF dont l'aperçu déborde du fichier
+        with open(paths[-1], 'rb') as f:
+            nef = f.read()
+        with open(os.path.join(dest, 'cut.nef'), 'wb') as f:
+            f.write(nef[:len(nef) - 4096 - 100])
+        paths.append(os.path.join(dest, 'cut.nef'))
+
+        validator = PhotoValidator(max_workers=2)
+        try:
+            statuses = [verdict['status'] for verdict in validator.validate(paths)]
+            valid, rejected = validator.split(paths)
+            # Processus du groupe jamais créés par fork du service multi-thread
+            assert validator._executor._mp_context.get_start_method() != 'fork'
+        finally:
+            validator.close()
+        assert statuses == ['valid', 'valid', 'corrupt', 'empty', 'valid', 'corrupt']
+        assert valid == [paths[0], paths[1], paths[4]]
+        assert len(rejected) == 3
+
+
+def test_stream_check_reads_only_header_and_trailer():
+    jpeg = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00' + os.urandom(200000) + b'\xff\xd9'
+
+    def stream(data, chunk_size=65536):
+        check = PhotoValidator(max_workers=1).stream_check()
+        for offset in range(0, len(data), chunk_size):
+            check.update(data[offset:offset + chunk_size])
+        return check.verdict('DSC_0001.JPG')
+
+    assert stream(jpeg)['status'] == 'valid'
+    assert stream(jpeg + b'\x00' * 100)['status'] == 'valid'
+    assert stream(jpeg[:-2])['reason'] == "fichier tronqué (EOI absent)"
+    assert StreamCheck().verdict('vide.jpg')['status'] == 'empty'
+
+    with tempfile.TemporaryDirectory() as dest:
+        make_fake_nef(os.path.join(dest, 'ok.nef'), jpeg)
+        with open(os.path.join(dest, 'ok.nef'), 'rb') as f:
+            nef = f.read()
+    assert stream(nef, 1000)['status'] == 'valid'
+    # Premier IFD au-delà de la fin du flux
+    assert stream(nef[:4] + b'\xff\xff\xff\x00' + nef[8:])['status'] == 'corrupt'
+
+
+if __name__ == "__main__":
+    test_validator_walks_jpeg_to_real_eoi()
+    print("✅ Validation structurelle des JPEG et NEF avant transfert")
+    test_stream_check_reads_only_header_and_trailer()
+    print("✅ Validation au fil du flux par l'en-tête et la fin de la photo")
+    sys.exit(0)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test de la surveillance du dossier local des photos
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from photo_watch import PhotoWatcher
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline and not condition():
+        time.sleep(0.05)
+    return condition()
+
+
+def test_watcher_syncs_once_then_reports_new_photos():
+    for use_inotify in (True, False):
+        with tempfile.TemporaryDirectory() as dest:
+            existing = os.path.join(dest, 'DSC_0001.JPG')
+            open(existing, 'wb').close()
+            open(os.path.join(dest, 'notes.txt'), 'wb').close()
+
+            found = []
+            watcher = PhotoWatcher(dest, found.append, interval=0.1, use_inotify=use_inotify)
+            watcher.start()
+            try:
+                assert wait_for(lambda: found == [existing])
+
+                # Écriture en .part puis renommage, comme les téléchargements
+                new_photo = os.path.join(dest, 'DSC_0002.NEF')
+                with open(new_photo + '.part', 'wb') as f:
+                    f.write(b'II*\x00')
+                os.rename(new_photo + '.part', new_photo)
+                assert wait_for(lambda: found == [existing, new_photo])
+            finally:
+                watcher.stop()
+
+
+def test_watcher_reports_photo_once_written():
+    with tempfile.TemporaryDirectory() as dest:
+        found = []
+        watcher = PhotoWatcher(dest, found.append, interval=0.1)
+        watcher.start()
+        try:
+            time.sleep(0.2)
+            photo = os.path.join(dest, 'DSC_0003.JPG')
+            with open(photo, 'wb') as f:
+                f.write(b'\xff\xd8' + b'\x00' * 1024)
+                f.flush()
+                # Écriture en cours: pas encore signalée (sans inotify, taille stable entre deux passes)
+                time.sleep(0.3 if watcher.use_inotify else 0.05)
+                assert found == []
+                f.write(b'\xff\xd9')
+            assert wait_for(lambda: found == [photo])
+        finally:
+            watcher.stop()
+
+
+if __name__ == "__main__":
+    test_watcher_syncs_once_then_reports_new_photos()
+    print("✅ Synchronisation initiale puis détection des nouvelles photos")
+    test_watcher_reports_photo_once_written()
+    print("✅ Photo signalée à la fin de son écriture, sans attente fixe")
+    sys.exit(0)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test de l'extraction des aperçus JPEG intégrés aux RAW
+"""
+
+import os
+import sys
+import tempfile
+
+from raw_preview import PreviewStage
+from upload_queue import UploadQueue
+
+
+def make_fake_nef(path, preview):
+    """NEF minimal: IFD0 -> SubIFD avec aperçu JPEG, puis données RAW"""
+    import struct
+    raw_data = b'\x00' * 4096
+    sub_ifd_offset = 8 + 2 + 12 + 4
+    preview_offset = sub_ifd_offset + 2 + 2 * 12 + 4
+    with open(path, 'wb') as f:
+        f.write(b'II' + struct.pack('<HI', 42, 8))
+        # IFD0: un seul tag SubIFDs
+        f.write(struct.pack('<H', 1) + struct.pack('<HHII', 0x014A, 4, 1, sub_ifd_offset) + struct.pack('<I', 0))
+        # SubIFD: offset et longueur de l'aperçu
+        f.write(struct.pack('<H', 2))
+        f.write(struct.pack('<HHII', 0x0201, 4, 1, preview_offset))
+        f.write(struct.pack('<HHII', 0x0202, 4, 1, len(preview)))
+        f.write(struct.pack('<I', 0))
+        f.write(preview + raw_data)
+
+
+def test_raw_preview_uploaded_before_raw():
+    preview = b'\xff\xd8\xff\xe0\x00\x04JF\xff\xc0\x00\x05\x08\x00' + b'\x11' * 5000 + b'\xff\xd9'
+    with tempfile.TemporaryDirectory() as dest:
+        nef_path = os.path.join(dest, 'DSC_0001.NEF')
+        make_fake_nef(nef_path, preview)
+        upload_queue = UploadQueue()
+        upload_queue.put(os.path.join(dest, 'DSC_0000.JPG'))
+
+        on_photo = PreviewStage(upload_queue)
+        on_photo(nef_path)
+
+        preview_path = os.path.join(dest, 'DSC_0001_preview.jpg')
+        with open(preview_path, 'rb') as f:
+            assert f.read() == preview
+        # Aperçu d'abord, photos normales ensuite, RAW en dernier
+        assert upload_queue.get_urgent() == [preview_path]
+        assert upload_queue.get_batch(timeout=0) == [os.path.join(dest, 'DSC_0000.JPG'), nef_path]
+
+
+if __name__ == "__main__":
+    test_raw_preview_uploaded_before_raw()
+    print("✅ Aperçu JPEG des RAW transféré en priorité")
+    sys.exit(0)
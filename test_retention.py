@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test de la rétention des photos par quotas
+"""
+
+import os
+import sys
+import time
+import tempfile
+from unittest import mock
+
+from spool import Spool, READY, DONE
+from retention import RetentionManager
+
+
+def test_retention_evicts_oldest_uploaded_first():
+    with tempfile.TemporaryDirectory() as root:
+        spool = Spool(root)
+        now = time.time()
+
+        def photo(state, name, age_hours=0):
+            path = os.path.join(spool.dir(state), name)
+            with open(path, 'wb') as f:
+                f.write(b'\x00' * 1024)
+            # Date de prise de vue conservée par gphoto2
+            os.utime(path, (now - age_hours * 3600, now - age_hours * 3600))
+            return path
+
+        old_done = photo(DONE, 'DSC_0001.JPG')
+        recent_done = photo(DONE, 'DSC_0002.JPG')
+        old_unsent = photo(READY, 'DSC_0003.JPG')
+        retention = RetentionManager(spool, max_age_hours=24, max_bytes=2048)
+
+        # Quota d'octets dépassé (3 Ko): le premier arrivé des transférés part, l'envoi en attente reste
+        assert retention.enforce() == {'files': 1, 'bytes': 1024}
+        assert not os.path.exists(old_done) and os.path.exists(old_unsent)
+
+        # Photo suivie par les déplacements du spool, sans nouveau parcours; son âge
+        # part de son arrivée, pas de sa date de prise de vue
+        with mock.patch('spool.os.scandir', side_effect=AssertionError):
+            uploaded = spool.move(photo(READY, 'DSC_0004.JPG', age_hours=40), DONE)
+            assert retention.enforce() == {'files': 1, 'bytes': 1024}
+        assert not os.path.exists(recent_done) and os.path.exists(uploaded)
+        assert os.path.exists(old_unsent)
+
+        # Photos non transférées supprimées seulement si la configuration l'autorise
+        retention.evict_unsent = True
+        assert retention.enforce()['files'] == 0
+        with mock.patch('retention.time.time', return_value=now + 25 * 3600):
+            assert retention.enforce()['files'] == 2
+        assert not os.path.exists(old_unsent)
+        assert retention.metrics()['tracked_files'] == 0
+
+
+def test_retention_refresh_follows_other_processes():
+    with tempfile.TemporaryDirectory() as root:
+        retention = RetentionManager(Spool(root), max_age_hours=24)
+        # Photo transférée par un autre processus (autre instance du spool)
+        other = Spool(root)
+        path = os.path.join(other.dir(READY), 'DSC_0001.JPG')
+        with open(path, 'wb') as f:
+            f.write(b'\x00' * 1024)
+        done_path = other.move(path, DONE)
+        retention.refresh()
+        assert retention.metrics()['uploaded_files'] == 1
+        with mock.patch('retention.time.time', return_value=time.time() + 25 * 3600):
+            assert retention.enforce()['files'] == 1
+        assert not os.path.exists(done_path)
+
+
+def test_retention_close_stops_following_spool():
+    with tempfile.TemporaryDirectory() as root:
+        spool = Spool(root)
+        retention = RetentionManager(spool, max_age_hours=24)
+        # Configuration rechargée: l'ancien gestionnaire ne suit plus le spool
+        retention.close()
+        assert retention.on_move not in spool.listeners
+        path = os.path.join(spool.dir(READY), 'DSC_0001.JPG')
+        with open(path, 'wb') as f:
+            f.write(b'\x00' * 1024)
+        spool.move(path, DONE)
+        assert retention.metrics()['tracked_files'] == 0
+
+
+if __name__ == "__main__":
+    test_retention_evicts_oldest_uploaded_first()
+    print("✅ Rétention par quotas, photos transférées supprimées en premier")
+    test_retention_refresh_follows_other_processes()
+    print("✅ Rétention des photos transférées par un autre processus")
+    test_retention_close_stops_following_spool()
+    print("✅ Rétention détachée du spool au rechargement de la configuration")
+    sys.exit(0)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test du spool des photos (états, déplacements atomiques, reprise)
+"""
+
+import os
+import sys
+import time
+import tempfile
+from unittest import mock
+
+from spool import Spool, INCOMING, READY, UPLOADING, DONE
+
+
+def test_spool_moves_atomically_and_recovers():
+    with tempfile.TemporaryDirectory() as root:
+        # Photo de l'ancienne organisation, à la racine du dossier
+        with open(os.path.join(root, 'DSC_0001.JPG'), 'wb') as f:
+            f.write(b'\xff\xd8\xff\xd9')
+        spool = Spool(root)
+        moves = []
+        spool.listeners.append(lambda old, new: moves.append((old, new)))
+
+        incoming = os.path.join(spool.dir(INCOMING), 'DSC_0002.JPG')
+        with open(incoming, 'wb') as f:
+            f.write(b'\xff\xd8\xff\xd9')
+        ready = spool.claim(incoming, READY)
+        assert ready == os.path.join(spool.dir(READY), 'DSC_0002.JPG')
+        assert moves == [(incoming, ready)]
+        # Le second composant à renommer la même photo ne la reprend pas
+        assert spool.claim(incoming, READY) is None
+        assert spool.state_of(ready) == READY
+        assert spool.has_photo('DSC_0002.jpg') and not spool.has_photo('DSC_0003.JPG')
+
+        # Arrêt brutal pendant un transfert et un téléchargement
+        spool.claim(ready, UPLOADING)
+        with open(os.path.join(spool.dir(INCOMING), 'DSC_0003.JPG.part'), 'wb') as f:
+            f.write(b'\xff\xd8')
+        # Upload web en cours dans l'interface, et un autre abandonné depuis longtemps
+        web_part = os.path.join(spool.dir(INCOMING), '.upload-abc.part')
+        stale_part = os.path.join(spool.dir(INCOMING), '.upload-old.part')
+        for path in (web_part, stale_part):
+            with open(path, 'wb') as f:
+                f.write(b'\xff\xd8')
+        os.utime(stale_part, (time.time() - 3600, time.time() - 3600))
+        recovered = spool.recover()
+        assert recovered == {'uploading': 1, 'partial': 2, 'legacy': 1}
+        assert [os.path.basename(p) for p in spool.list(READY)] == ['DSC_0001.JPG', 'DSC_0002.JPG']
+        assert os.listdir(spool.dir(INCOMING)) == ['.upload-abc.part'] and spool.list(UPLOADING) == []
+        os.unlink(web_part)
+
+        spool.move(spool.list(READY)[0], DONE)
+        time.sleep(0.1)
+        assert spool.counts() == {'incoming': 0, 'ready': 1, 'uploading': 0, 'done': 1, 'quarantine': 0}
+
+        # Comptes tenus à jour par les déplacements: done/ n'est plus relu
+        with mock.patch.object(spool, 'list', wraps=spool.list) as listing:
+            spool.move(spool.list(READY)[0], DONE)
+            listing.reset_mock()
+            assert spool.counts()[DONE] == 2
+            # Photo écrite par un autre processus: seul incoming/ est relu
+            time.sleep(0.1)
+            with open(os.path.join(spool.dir(INCOMING), 'DSC_0004.JPG'), 'wb') as f:
+                f.write(b'\xff\xd8\xff\xd9')
+            counts = spool.counts()
+            assert counts[INCOMING] == 1 and counts[READY] == 0 and counts[DONE] == 2
+            assert DONE not in [call.args[0] for call in listing.call_args_list]
+
+
+if __name__ == "__main__":
+    test_spool_moves_atomically_and_recovers()
+    print("✅ Photos déplacées entre états par rename atomique, reprise après arrêt")
+    sys.exit(0)
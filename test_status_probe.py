@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test du relevé d'état du service
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from unittest import mock
+
+from spool import Spool, READY
+from status_probe import StatusProber, tail_lines
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline and not condition():
+        time.sleep(0.05)
+    return condition()
+
+
+def test_status_snapshot_never_waits_for_server():
+    with tempfile.TemporaryDirectory() as root:
+        release = threading.Event()
+
+        class SlowTransfer:
+            def test_connection(self):
+                release.wait(5)
+                return {'success': True, 'protocol': 'ftp', 'message': 'Connexion réussie (FTP)',
+                        'files_count': 12}
+
+            def disconnect(self):
+                pass
+
+        # État du service de transfert, lu par son socket de contrôle
+        spool = Spool(root)
+        service = mock.Mock(config={})
+        service.status.side_effect = lambda: {'running': True, 'spool_exists': True,
+                                              'spool_counts': spool.counts(), 'disk_space': None,
+                                              'camera_link': None}
+        open(os.path.join(spool.dir(READY), 'DSC_0001.JPG'), 'wb').close()
+        log_file = os.path.join(root, 'transfer.log')
+        with open(log_file, 'w') as f:
+            f.writelines(f"ligne {i}\n" for i in range(1000))
+
+        prober = StatusProber(service, probe_interval=60, local_interval=0.05, log_file=log_file)
+        with mock.patch('status_probe.create_transfer', return_value=SlowTransfer()):
+            prober.start()
+            try:
+                # Serveur bloqué: la page obtient aussitôt l'état local
+                assert wait_for(lambda: prober.get()['local']['pending'] == 1)
+                started = time.time()
+                snapshot = prober.get()
+                assert time.time() - started < 0.1
+                assert not snapshot['connection']['checked'] and snapshot['running']
+                assert snapshot['local']['recent_logs'][-1] == "ligne 999\n"
+
+                release.set()
+                assert wait_for(lambda: prober.get()['connection']['checked'])
+                connection = prober.get()['connection']
+                assert connection['success'] and connection['remote_count'] == 12
+                assert connection['latency_ms'] is not None
+            finally:
+                release.set()
+                prober.stop()
+        assert tail_lines(log_file, 3) == ["ligne 997\n", "ligne 998\n", "ligne 999\n"]
+
+
+if __name__ == "__main__":
+    test_status_snapshot_never_waits_for_server()
+    print("✅ État affiché sans attendre le serveur (relevé en arrière-plan)")
+    sys.exit(0)
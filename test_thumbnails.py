@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test des miniatures tirées des vignettes intégrées
+"""
+
+import os
+import sys
+import tempfile
+
+from thumbnails import ThumbnailCache, embedded_thumbnail
+
+
+def make_fake_nef(path, preview):
+    """NEF minimal: IFD0 -> SubIFD avec aperçu JPEG, puis données RAW"""
+    import struct
+    raw_data = b'\x00' * 4096
+    sub_ifd_offset = 8 + 2 + 12 + 4
+    preview_offset = sub_ifd_offset + 2 + 2 * 12 + 4
+    with open(path, 'wb') as f:
+        f.write(b'II' + struct.pack('<HI', 42, 8))
+        # IFD0: un seul tag SubIFDs
+        f.write(struct.pack('<H', 1) + struct.pack('<HHII', 0x014A, 4, 1, sub_ifd_offset) + struct.pack('<I', 0))
+        # SubIFD: offset et longueur de l'aperçu
+        f.write(struct.pack('<H', 2))
+        f.write(struct.pack('<HHII', 0x0201, 4, 1, preview_offset))
+        f.write(struct.pack('<HHII', 0x0202, 4, 1, len(preview)))
+        f.write(struct.pack('<I', 0))
+        f.write(preview + raw_data)
+
+
+def make_exif_jpeg(path, thumbnail, image_size=100000):
+    """JPEG avec bloc EXIF: IFD0 vide, IFD1 pointant sur la vignette"""
+    import struct
+    ifd1_offset = 8 + 2 + 4
+    thumbnail_offset = ifd1_offset + 2 + 2 * 12 + 4
+    tiff = b'II' + struct.pack('<HI', 42, 8)
+    tiff += struct.pack('<H', 0) + struct.pack('<I', ifd1_offset)
+    tiff += struct.pack('<H', 2)
+    tiff += struct.pack('<HHII', 0x0201, 4, 1, thumbnail_offset)
+    tiff += struct.pack('<HHII', 0x0202, 4, 1, len(thumbnail))
+    tiff += struct.pack('<I', 0) + thumbnail
+    app1 = b'Exif\x00\x00' + tiff
+    with open(path, 'wb') as f:
+        f.write(b'\xff\xd8\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1)
+        f.write(b'\xff\xc0\x00\x05\x08\x00' + b'\x22' * image_size + b'\xff\xd9')
+
+
+def test_thumbnails_come_from_embedded_jpeg_and_stay_bounded():
+    thumbnail = b'\xff\xd8\xff\xc0\x00\x05\x08\x00' + b'\x33' * 2000 + b'\xff\xd9'
+    preview = b'\xff\xd8\xff\xe0\x00\x04JF\xff\xc0\x00\x05\x08\x00' + b'\x11' * 5000 + b'\xff\xd9'
+    with tempfile.TemporaryDirectory() as root:
+        photos = []
+        for index in range(4):
+            path = os.path.join(root, f'DSC_{index:04d}.JPG')
+            make_exif_jpeg(path, thumbnail)
+            photos.append(path)
+        nef_path = os.path.join(root, 'DSC_0100.NEF')
+        make_fake_nef(nef_path, preview)
+        plain = os.path.join(root, 'IMG_0001.JPG')
+        with open(plain, 'wb') as f:
+            f.write(b'\xff\xd8\xff\xc0\x00\x05\x08\x00' + b'\x44' * 1000 + b'\xff\xd9')
+
+        # Vignette copiée depuis le bloc EXIF ou l'aperçu du RAW, sans décoder l'image
+        assert embedded_thumbnail(photos[0]) == thumbnail
+        assert embedded_thumbnail(nef_path) == preview
+        assert embedded_thumbnail(plain) is None
+
+        # Cache limité à trois miniatures
+        cache_dir = os.path.join(root, 'thumbnails')
+        cache = ThumbnailCache(cache_dir, max_bytes=3 * len(thumbnail) + 100, workers=2)
+        generated = [cache.get(path, timeout=5) for path in photos[:3]]
+        assert all(generated) and cache.stats()['thumbnails'] == 3
+        # Photo déplacée dans le spool (même nom, taille et date): même miniature
+        moved = os.path.join(root, 'done')
+        os.makedirs(moved)
+        os.rename(photos[0], os.path.join(moved, 'DSC_0000.JPG'))
+        assert cache.get(os.path.join(moved, 'DSC_0000.JPG')) == generated[0]
+        # La moins récemment affichée (DSC_0001) est supprimée
+        cache.get(photos[3], timeout=5)
+        assert not os.path.exists(generated[1])
+        assert os.path.exists(generated[0]) and os.path.exists(generated[2])
+        cache.close()
+
+        # Cache repris au redémarrage, sans nouvelle génération
+        cache = ThumbnailCache(cache_dir, max_bytes=3 * len(thumbnail) + 100)
+        assert cache.stats()['thumbnails'] == 3
+        assert cache.lookup(ThumbnailCache.key_for(photos[2])) == generated[2]
+        cache.close()
+
+
+if __name__ == "__main__":
+    test_thumbnails_come_from_embedded_jpeg_and_stay_bounded()
+    print("✅ Miniatures tirées des vignettes intégrées, cache disque borné")
+    sys.exit(0)
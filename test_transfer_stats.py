@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test des statistiques de transfert
+"""
+
+import os
+import sys
+import time
+import tempfile
+from unittest import mock
+
+from transfer_stats import TransferStats, MINUTE, HOUR, DAY
+from spool import Spool, INCOMING, READY, UPLOADING, DONE
+
+
+def test_transfer_stats_rolls_up_and_persists():
+    with tempfile.TemporaryDirectory() as root:
+        db_path = os.path.join(root, 'stats.db')
+        stats = TransferStats(db_path, flush_interval=3600, retention={MINUTE: 2})
+        now = time.time()
+        start = now - now % 3600 - 3600
+        # 10 photos en 1 s, sur trois minutes successives, puis un échec et un doublon
+        for index in range(10):
+            stats.record(1024 * 1024, 1.0, timestamp=start + 60 * (index % 3))
+        stats.record(success=False, timestamp=start + 120)
+        stats.record(duplicate=True, timestamp=start + 120)
+
+        # Agrégats encore en mémoire: déjà visibles
+        summary = stats.summary()
+        assert summary['total_files'] == 10
+        assert summary['total_failures'] == 1
+        assert summary['total_duplicates'] == 1
+        assert summary['success_rate'] == 90.9
+        assert summary['throughput_kbps'] == 1024.0
+        latency = summary['last_24h']['latency_ms']
+        assert 900 <= latency['p50'] <= 1000 and latency['max'] == 1000
+        assert [row['files'] for row in stats.series(MINUTE, limit=10)] == [4, 3, 3]
+        stats.close()
+
+        # Base rouverte: totaux conservés, minutes purgées au-delà de la rétention
+        stats = TransferStats(db_path, retention={MINUTE: 2})
+        assert stats.summary()['total_files'] == 10
+        minutes = stats.series(MINUTE, limit=10)
+        assert [row['files'] for row in minutes] == [3, 3]
+        assert minutes[-1]['failures'] == 1
+        assert [row['files'] for row in stats.series(HOUR)] == [10]
+        assert stats.series(DAY)[0]['bytes'] == 10 * 1024 * 1024
+
+        # Base verrouillée en écriture par l'autre processus: l'upload n'attend pas,
+        # la lecture non plus (WAL)
+        import sqlite3
+        other = sqlite3.connect(db_path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        started = time.monotonic()
+        stats.record(1024, 0.5)
+        assert stats.summary()['total_files'] == 11
+        assert time.monotonic() - started < 1
+        other.execute("ROLLBACK")
+        other.close()
+        try:
+            stats.series('week')
+            assert False, "période inconnue acceptée"
+        except ValueError:
+            pass
+        stats.close()
+
+
+def test_gallery_lists_recent_photos_without_reading_spool():
+    with tempfile.TemporaryDirectory() as root:
+        spool = Spool(os.path.join(root, 'photos'))
+        old = os.path.join(spool.dir(DONE), 'DSC_0001.JPG')
+        with open(old, 'wb') as f:
+            f.write(b'\xff\xd8' + b'\x00' * 10 + b'\xff\xd9')
+        db_path = os.path.join(root, 'stats.db')
+        stats = TransferStats(db_path, flush_interval=3600)
+        # Table remplie une seule fois depuis le spool existant
+        stats.watch(spool)
+        assert [(p['name'], p['state']) for p in stats.recent_photos()] == [('DSC_0001.JPG', DONE)]
+
+        with mock.patch.object(spool, 'recent', side_effect=AssertionError("spool relu")):
+            for index in range(2, 6):
+                path = os.path.join(spool.dir(INCOMING), f'DSC_{index:04d}.JPG')
+                with open(path, 'wb') as f:
+                    f.write(b'\xff\xd8\xff\xd9')
+                spool.move(path, READY)
+                time.sleep(0.01)
+            uploading = spool.move(os.path.join(spool.dir(READY), 'DSC_0002.JPG'), UPLOADING)
+            # Transférée puis supprimée (delete_after_upload): reste listée comme transférée
+            stats.record(4, 0.1, name='DSC_0002.JPG')
+            spool.remove(uploading)
+
+            photos = stats.recent_photos(limit=3)
+            assert [(p['name'], p['state'], p['present']) for p in photos] == [
+                ('DSC_0002.JPG', DONE, 0), ('DSC_0005.JPG', READY, 1), ('DSC_0004.JPG', READY, 1)]
+            assert [p['name'] for p in stats.recent_photos([DONE])] == ['DSC_0002.JPG', 'DSC_0001.JPG']
+            stats.flush()
+            assert [p['name'] for p in stats.recent_photos(limit=2, offset=3)] == ['DSC_0003.JPG', 'DSC_0001.JPG']
+        stats.close()
+
+        # Lue par un autre processus; table bornée aux plus récentes
+        stats = TransferStats(db_path)
+        assert len(stats.recent_photos(limit=100)) == 5
+        stats.max_photos = 2
+        stats.watch(spool)
+        spool.move(os.path.join(spool.dir(READY), 'DSC_0003.JPG'), UPLOADING)
+        stats.flush()
+        assert [p['name'] for p in stats.recent_photos(limit=100)] == ['DSC_0003.JPG', 'DSC_0002.JPG']
+        stats.close()
+
+
+if __name__ == "__main__":
+    test_transfer_stats_rolls_up_and_persists()
+    print("✅ Statistiques de transfert agrégées par minute/heure/jour et conservées")
+    test_gallery_lists_recent_photos_without_reading_spool()
+    print("✅ Galerie servie par la table des dernières photos, sans relire le spool")
+    sys.exit(0)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Test du registre des empreintes des photos transférées
+"""
+
+import os
+import sys
+import tempfile
+
+from upload_ledger import UploadLedger
+
+
+def test_ledger_skips_renamed_duplicate():
+    with tempfile.TemporaryDirectory() as dest:
+        ledger_path = os.path.join(dest, 'upload_ledger.json')
+        photo = os.path.join(dest, 'DSC_0001.JPG')
+        with open(photo, 'wb') as f:
+            f.write(b'\xff\xd8' + b'\x42' * 4096 + b'\xff\xd9')
+
+        ledger = UploadLedger(ledger_path)
+        assert ledger.find_uploaded(photo) is None
+        ledger.record(photo, '/photos/DSC_0001.JPG')
+        ledger.save()
+
+        # Même contenu sous un autre nom, vu par un autre processus
+        renamed = os.path.join(dest, 'DSC_0001_copie.JPG')
+        os.rename(photo, renamed)
+        assert UploadLedger(ledger_path).find_uploaded(renamed) == '/photos/DSC_0001.JPG'
+
+        other = os.path.join(dest, 'DSC_0002.JPG')
+        with open(other, 'wb') as f:
+            f.write(b'\xff\xd8' + b'\x43' * 4096 + b'\xff\xd9')
+        assert UploadLedger(ledger_path).find_uploaded(other) is None
+
+
+if __name__ == "__main__":
+    test_ledger_skips_renamed_duplicate()
+    print("✅ Doublon renommé ignoré grâce au registre des empreintes")
+    sys.exit(0)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test de la file de transfert bornée, de ses workers et des reprises espacées
+"""
+
+import sys
+import time
+import queue
+import threading
+
+from upload_queue import UploadQueue, UploadWorkers, RetryBackoff, PRIORITY_HIGH
+
+
+def test_queue_is_bounded_and_coalesces_paths():
+    upload_queue = UploadQueue(maxsize=2)
+    assert upload_queue.put('/ready/DSC_0001.JPG')
+    # Même chemin signalé deux fois (inotify puis balayage): un seul exemplaire
+    assert not upload_queue.put('/ready/DSC_0001.JPG')
+    assert upload_queue.put('/ready/DSC_0002.JPG')
+    try:
+        upload_queue.put('/ready/DSC_0003.JPG', block=False)
+        assert False, "file pleine attendue"
+    except queue.Full:
+        pass
+    assert len(upload_queue) == 2
+
+    # Un chemin refusé (file pleine) ou retiré peut être proposé de nouveau
+    assert upload_queue.get(timeout=0) == '/ready/DSC_0001.JPG'
+    assert upload_queue.put('/ready/DSC_0003.JPG', block=False)
+    assert upload_queue.get(timeout=0) == '/ready/DSC_0002.JPG'
+    assert upload_queue.put('/ready/DSC_0001.JPG', block=False, priority=PRIORITY_HIGH)
+    assert upload_queue.get_batch(timeout=0) == ['/ready/DSC_0001.JPG', '/ready/DSC_0003.JPG']
+
+
+def test_workers_apply_backpressure_and_stop_cleanly():
+    release = threading.Event()
+    uploaded = []
+
+    def fake_upload(path):
+        release.wait(5)
+        time.sleep(0.01)
+        uploaded.append(path)
+
+    workers = UploadWorkers(UploadQueue(maxsize=2), fake_upload, count=1)
+    workers.start()
+    # Le worker tient le premier fichier, la file se remplit avec les deux suivants
+    assert workers.submit('/ready/DSC_0001.JPG')
+    time.sleep(0.7)
+    assert workers.submit('/ready/DSC_0002.JPG')
+    assert workers.submit('/ready/DSC_0003.JPG')
+
+    # File pleine: la surveillance attend qu'un worker libère une place
+    submitted = threading.Event()
+    threading.Thread(target=lambda: workers.submit('/ready/DSC_0004.JPG') and submitted.set(),
+                     daemon=True).start()
+    assert not submitted.wait(0.5)
+    release.set()
+    assert submitted.wait(5)
+
+    deadline = time.time() + 5
+    while len(uploaded) < 4 and time.time() < deadline:
+        time.sleep(0.05)
+    workers.stop()
+    assert uploaded == ['/ready/DSC_%04d.JPG' % n for n in range(1, 5)]
+    assert workers.workers == []
+    # Workers arrêtés: plus d'attente sur une file pleine
+    workers.upload_queue.put('/ready/A.JPG')
+    workers.upload_queue.put('/ready/B.JPG')
+    assert workers.submit('/ready/C.JPG') is False
+
+
+def test_failed_path_retried_with_backoff_then_abandoned():
+    now = [1000.0]
+    retries = RetryBackoff(max_attempts=3, base_delay=5, clock=lambda: now[0])
+    path = '/ready/DSC_0001.JPG'
+    attempts = []
+
+    def fake_upload(p):
+        attempts.append(now[0])
+        return False
+
+    def scan():
+        # Balayage périodique de ready/ par la boucle principale
+        if retries.due(path) and not fake_upload(path):
+            return retries.failure(path)
+        return False
+
+    assert scan() is False
+    for _ in range(20):
+        now[0] += 1
+        if scan():
+            break
+    # Tentatives à t, t+5, t+15 (délais 5 puis 10 s), puis abandon (quarantaine)
+    assert attempts == [1000.0, 1005.0, 1015.0]
+    assert retries.due(path)
+
+    # Un succès efface l'historique des échecs
+    other = '/ready/DSC_0002.JPG'
+    assert retries.failure(other) is False
+    assert not retries.due(other)
+    retries.success(other)
+    assert retries.due(other)
+
+
+if __name__ == "__main__":
+    test_queue_is_bounded_and_coalesces_paths()
+    print("✅ File de transfert bornée, un seul exemplaire par chemin")
+    test_workers_apply_backpressure_and_stop_cleanly()
+    print("✅ Surveillance en attente tant que la file est pleine, arrêt propre des workers")
+    test_failed_path_retried_with_backoff_then_abandoned()
+    print("✅ Reprises espacées des transferts en échec, puis quarantaine")
+    sys.exit(0)
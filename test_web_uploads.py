@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test des uploads web confiés au service
+"""
+
+import os
+import sys
+import time
+import tempfile
+from unittest import mock
+
+from spool import Spool, INCOMING, READY, UPLOADING, DONE, QUARANTINE, is_incoming_photo
+from web_uploads import UploadJobs
+
+
+class FakeService:
+    """Service de transfert simulé: issue des transferts enregistrée par nom de fichier"""
+
+    def __init__(self, spool):
+        self.spool = spool
+        self.config = {'ftp': {'directory': '/photos'}, 'camera': {}}
+        self.enqueue = mock.Mock()
+        self.transfer = None
+        self.results = {}
+        self.calls = 0
+
+    def upload_results(self, names):
+        self.calls += 1
+        return {'transfer': self.transfer,
+                'files': {name: self.results[name] for name in names if name in self.results}}
+
+
+def receive(jobs, names):
+    """Corps de requête écrits directement dans incoming/, invisibles pour la surveillance"""
+    received = []
+    for name in names:
+        part = jobs.open_part()
+        part.write(b'\xff\xd8' + b'x' * 1000 + b'\xff\xd9')
+        part.close()
+        assert not is_incoming_photo(os.path.basename(part.name))
+        received.append((name, part.name))
+    return received
+
+
+def test_web_upload_hands_files_to_service():
+    with tempfile.TemporaryDirectory() as root:
+        spool = Spool(root)
+        service = FakeService(spool)
+        jobs = UploadJobs(service)
+
+        received = receive(jobs, ('A.JPG', 'B.JPG', 'C.JPG', '../D.JPG'))
+        started = time.time()
+        job_id = jobs.submit(received)
+        assert time.time() - started < 0.2
+        # Fichiers confiés au service en un seul appel, sous leur nom final dans incoming/:
+        # le service les ingère comme les photos de l'appareil (empreinte, aperçu des RAW)
+        names = ['A.JPG', 'B.JPG', 'C.JPG', 'D.JPG']
+        service.enqueue.assert_called_once_with([os.path.join(spool.dir(INCOMING), name) for name in names])
+        assert sorted(os.listdir(spool.dir(INCOMING))) == names
+        assert jobs.get(job_id)['status'] == 'queued'
+        ready = [spool.claim(os.path.join(spool.dir(INCOMING), name), READY) for name in names]
+        assert jobs.get(job_id)['status'] == 'queued'
+
+        # Le service transfère A et envoie B: issue enregistrée par le service, envoi lu dans le spool
+        spool.move(ready[0], DONE)
+        service.results['A.JPG'] = {'remote_path': '/photos/A.JPG', 'error': None}
+        uploading = spool.move(ready[1], UPLOADING)
+        service.transfer = {'file': 'B.JPG', 'sent': 500, 'total': 1004}
+        job = jobs.get(job_id)
+        assert job['status'] == 'running'
+        assert [f['status'] for f in job['files']] == ['done', 'uploading', 'queued', 'queued']
+        assert job['files'][0]['remote_path'] == '/photos/A.JPG' and job['files'][1]['sent'] == 500
+
+        # B transféré, C rejeté, D transféré sous le nom d'un contenu identique déjà envoyé
+        spool.move(uploading, DONE)
+        service.results['B.JPG'] = {'remote_path': '/photos/B.JPG', 'error': None}
+        spool.move(ready[2], QUARANTINE)
+        service.results['C.JPG'] = {'remote_path': None, 'error': "Fichier invalide: EOI absent"}
+        spool.move(ready[3], DONE)
+        service.results['D.JPG'] = {'remote_path': '/photos/A.JPG', 'error': None}
+        job = jobs.get(job_id)
+        assert job['status'] == 'partial' and job['completed'] == 3 and job['failed'] == 1
+        assert [f['name'] for f in job['files']] == ['A.JPG', 'B.JPG', 'C.JPG', 'D.JPG']
+        assert job['files'][2]['error'] == "Fichier invalide: EOI absent"
+        assert job['files'][3]['remote_path'] == '/photos/A.JPG'
+        # Travail terminé: plus d'appel au service
+        calls = service.calls
+        jobs.get(job_id)
+        assert service.calls == calls
+
+
+def test_web_upload_evicted_before_upload_is_not_reported_done():
+    with tempfile.TemporaryDirectory() as root:
+        spool = Spool(root)
+        service = FakeService(spool)
+        # Même avec suppression après transfert, une disparition n'est pas un succès
+        service.config['camera']['delete_after_upload'] = True
+        jobs = UploadJobs(service)
+        job_id = jobs.submit(receive(jobs, ('A.JPG', 'B.JPG')))
+
+        # A supprimé par la rétention avant son transfert; B transféré puis supprimé
+        spool.remove(os.path.join(spool.dir(INCOMING), 'A.JPG'))
+        spool.remove(os.path.join(spool.dir(INCOMING), 'B.JPG'))
+        service.results['B.JPG'] = {'remote_path': '/photos/B.JPG', 'error': None}
+        job = jobs.get(job_id)
+        assert [f['status'] for f in job['files']] == ['unknown', 'done']
+        assert job['files'][0]['remote_path'] is None
+        assert job['status'] == 'partial' and job['failed'] == 1 and job['sent_bytes'] == 1004
+
+        # Service injoignable: dernier état connu conservé, rien n'est deviné
+        service.upload_results = mock.Mock(side_effect=OSError("socket absent"))
+        assert [f['status'] for f in jobs.get(job_id)['files']] == ['unknown', 'done']
+
+        # Issue enregistrée plus tard (service redémarré, fichier transféré entre-temps)
+        service.upload_results = FakeService.upload_results.__get__(service)
+        service.results['A.JPG'] = {'remote_path': '/photos/A.JPG', 'error': None}
+        assert jobs.get(job_id)['status'] == 'done'
+
+
+if __name__ == "__main__":
+    test_web_upload_hands_files_to_service()
+    print("✅ Upload web: réponse immédiate, transfert confié au service")
+    test_web_upload_evicted_before_upload_is_not_reported_done()
+    print("✅ Upload web: fichier retiré avant son transfert jamais signalé comme transféré")
+    sys.exit(0)
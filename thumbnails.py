@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Miniatures des photos pour la galerie de l'interface web
+La miniature est de préférence la vignette JPEG déjà présente dans le fichier
+(IFD1 du bloc EXIF d'un JPEG, plus petit aperçu intégré d'un RAW): elle est
+copiée sans décoder l'image. Pillow, s'il est installé, la réduit à la taille
+voulue et sert de secours pour les photos sans vignette. Chaque miniature est
+générée une seule fois par un groupe de threads et conservée dans un cache
+disque borné en taille (les moins récemment affichées sont supprimées).
+"""
+
+import io
+import os
+import struct
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Optional, Dict, Any, Iterable
+
+from raw_preview import is_raw, find_jpeg_candidates, read_ifd, is_displayable_jpeg
+from raw_preview import TAG_JPEG_OFFSET, TAG_JPEG_LENGTH
+
+# Import Pillow avec gestion d'erreur (réduction des vignettes, photos sans vignette)
+try:
+    from PIL import Image
+    PIL_SUPPORT = True
+except ImportError:
+    PIL_SUPPORT = False
+    Image = None
+
+logger = logging.getLogger('Thumbnails')
+
+THUMBNAIL_SUFFIX = '.jpg'
+# Côté le plus long des miniatures réduites par Pillow
+THUMBNAIL_SIZE = 320
+DEFAULT_CACHE_MB = 200
+# Octets d'en-tête lus pour trouver le bloc EXIF d'un JPEG
+MAX_HEADER_BYTES = 256 * 1024
+# Photos sans miniature mémorisées (pas de nouvel essai à chaque affichage)
+MAX_MISSING = 4096
+
+
+def _exif_thumbnail(f) -> Optional[bytes]:
+    """Vignette JPEG de l'IFD1 du bloc EXIF (APP1) d'un JPEG, sans lire l'image"""
+    head = f.read(MAX_HEADER_BYTES)
+    if head[:2] != b'\xff\xd8':
+        return None
+    position = 2
+    while position + 4 <= len(head):
+        if head[position] != 0xFF:
+            return None
+        marker = head[position + 1]
+        if marker in (0xDA, 0xD9):
+            # Début des données de l'image: pas de bloc EXIF
+            return None
+        length = struct.unpack('>H', head[position + 2:position + 4])[0]
+        segment = head[position + 4:position + 2 + length]
+        if marker == 0xE1 and segment[:6] == b'Exif\x00\x00':
+            tiff = segment[6:]
+            if tiff[:2] == b'II':
+                endian = '<'
+            elif tiff[:2] == b'MM':
+                endian = '>'
+            else:
+                return None
+            if len(tiff) < 8:
+                return None
+            # Offsets relatifs à l'en-tête TIFF du bloc: IFD0 puis IFD1 (vignette)
+            data = io.BytesIO(tiff)
+            _, ifd1_offset = read_ifd(data, struct.unpack(endian + 'I', tiff[4:8])[0], endian)
+            if not ifd1_offset:
+                return None
+            tags, _ = read_ifd(data, ifd1_offset, endian)
+            if TAG_JPEG_OFFSET not in tags or TAG_JPEG_LENGTH not in tags:
+                return None
+            start = tags[TAG_JPEG_OFFSET][0]
+            thumbnail = tiff[start:start + tags[TAG_JPEG_LENGTH][0]]
+            return thumbnail if thumbnail[:2] == b'\xff\xd8' else None
+        position += 2 + length
+    return None
+
+
+def _raw_thumbnail(f) -> Optional[bytes]:
+    """Plus petit aperçu JPEG affichable intégré à un RAW (NEF, CR2)"""
+    file_size = os.fstat(f.fileno()).st_size
+    best = None
+    for offset, length in find_jpeg_candidates(f):
+        if length <= 0 or offset + length > file_size:
+            continue
+        if best and length >= best[1]:
+            continue
+        f.seek(offset)
+        if is_displayable_jpeg(f.read(min(length, 65536))):
+            best = (offset, length)
+    if not best:
+        return None
+    f.seek(best[0])
+    return f.read(best[1])
+
+
+def embedded_thumbnail(path: str) -> Optional[bytes]:
+    """Vignette JPEG intégrée à la photo (None si elle n'en contient pas)"""
+    try:
+        with open(path, 'rb') as f:
+            return _raw_thumbnail(f) if is_raw(path) else _exif_thumbnail(f)
+    except (OSError, struct.error) as e:
+        logger.debug(f"Vignette illisible dans {os.path.basename(path)}: {e}")
+        return None
+
+
+def _resize(source, size: int) -> Optional[bytes]:
+    """Réduction par Pillow (décodage JPEG à l'échelle la plus proche, sans pleine résolution)"""
+    try:
+        with Image.open(source) as image:
+            image.draft('RGB', (size, size))
+            image = image.convert('RGB')
+            image.thumbnail((size, size))
+            output = io.BytesIO()
+            image.save(output, 'JPEG', quality=80)
+            return output.getvalue()
+    except Exception as e:
+        logger.debug(f"Réduction impossible: {e}")
+        return None
+
+
+def make_thumbnail(path: str, size: int = THUMBNAIL_SIZE) -> Optional[bytes]:
+    """Miniature JPEG d'une photo: vignette intégrée, réduite ou générée si Pillow est installé"""
+    thumbnail = embedded_thumbnail(path)
+    if not PIL_SUPPORT:
+        return thumbnail
+    if thumbnail:
+        return _resize(io.BytesIO(thumbnail), size) or thumbnail
+    if is_raw(path):
+        return None
+    return _resize(path, size)
+
+
+class ThumbnailCache:
+    """Cache disque LRU des miniatures, généré à la demande par un groupe de threads"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_CACHE_MB * 1024 * 1024,
+                 workers: int = 2, size: int = THUMBNAIL_SIZE, wait: float = 5.0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.workers = max(1, workers)
+        self.size = size
+        self.wait = wait
+        # Clé -> taille du fichier, du moins au plus récemment affiché
+        self.entries: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self.pending = {}
+        self.missing = set()
+        self.lock = threading.Lock()
+        self._executor = None
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Reprend les miniatures existantes, dans l'ordre de leur dernier affichage"""
+        files = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if not entry.name.endswith(THUMBNAIL_SUFFIX):
+                    # Écriture interrompue
+                    os.unlink(entry.path)
+                    continue
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-len(THUMBNAIL_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total_bytes += size
+        with self.lock:
+            self._evict_locked()
+
+    @staticmethod
+    def key_for(path: str) -> Optional[str]:
+        """Clé d'une photo: nom, taille et date (inchangés quand elle change d'état dans le spool)"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        identity = f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()[:24]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + THUMBNAIL_SUFFIX)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Miniature en cache (marquée comme récemment affichée), None si absente"""
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            # La date du fichier conserve l'ordre LRU après un redémarrage
+            os.utime(path)
+        except OSError:
+            with self.lock:
+                self.total_bytes -= self.entries.pop(key, 0)
+            return None
+        return path
+
+    def request(self, path: str):
+        """Planifie la génération d'une miniature absente; retourne sa tâche (None si inutile)"""
+        key = self.key_for(path)
+        if key is None:
+            return None
+        with self.lock:
+            if key in self.entries or key in self.missing:
+                return None
+            future = self.pending.get(key)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='thumbnail')
+                future = self._executor.submit(self._generate, key, path)
+                self.pending[key] = future
+        return future
+
+    def prefetch(self, paths: Iterable[str]):
+        """Génère en arrière-plan les miniatures d'une page avant que le navigateur les demande"""
+        for path in paths:
+            self.request(path)
+
+    def get(self, path: str, timeout: Optional[float] = None) -> Optional[str]:
+        """Fichier de la miniature d'une photo (attend sa génération au plus timeout secondes)"""
+        key = self.key_for(path)
+        if key is None:
+            return None
+        cached = self.lookup(key)
+        if cached:
+            return cached
+        future = self.request(path)
+        if future is None:
+            return self.lookup(key)
+        try:
+            return future.result(timeout=self.wait if timeout is None else timeout)
+        except FutureTimeout:
+            return None
+
+    def _generate(self, key: str, path: str) -> Optional[str]:
+        try:
+            data = make_thumbnail(path, self.size)
+            if not data:
+                logger.debug(f"Pas de miniature pour {os.path.basename(path)}")
+                with self.lock:
+                    if len(self.missing) >= MAX_MISSING:
+                        self.missing.clear()
+                    self.missing.add(key)
+                return None
+            target = self._path(key)
+            temp_path = target + '.part'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, target)
+            with self.lock:
+                self.total_bytes += len(data) - self.entries.pop(key, 0)
+                self.entries[key] = len(data)
+                self._evict_locked()
+            return target
+        except OSError as e:
+            logger.warning(f"Impossible d'écrire la miniature de {os.path.basename(path)}: {e}")
+            return None
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    def _evict_locked(self):
+        """Supprime les miniatures les moins récemment affichées au-delà de la taille maximale"""
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {'thumbnails': len(self.entries), 'bytes': self.total_bytes,
+                    'max_bytes': self.max_bytes, 'pending': len(self.pending)}
+
+    def close(self):
+        """Arrête le groupe de threads (les générations en cours se terminent)"""
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def create_thumbnail_cache(config: Dict[str, Any]) -> ThumbnailCache:
+    """Factory function pour le cache des miniatures de la galerie"""
+    system_config = config.get('system', {})
+    cache_dir = system_config.get('thumbnail_cache_dir', 'data/thumbnails')
+    if not os.path.isabs(cache_dir):
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), cache_dir)
+    return ThumbnailCache(cache_dir,
+                          max_bytes=system_config.get('thumbnail_cache_mb', DEFAULT_CACHE_MB) * 1024 * 1024,
+                          workers=system_config.get('thumbnail_workers', 2),
+                          size=system_config.get('thumbnail_size', THUMBNAIL_SIZE))
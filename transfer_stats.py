@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Statistiques persistantes des transferts (SQLite)
+Compteurs globaux et agrégats par minute, heure et jour: fichiers, octets,
+échecs, doublons, durée cumulée et histogramme des durées d'upload (les
+percentiles de latence en sont déduits), ainsi que les dernières photos et
+leur état dans le spool, pour la galerie. Les événements sont cumulés en
+mémoire puis écrits par lots par un thread dédié (jamais pendant un upload);
+chaque période ne conserve qu'un nombre borné d'agrégats. La base, en mode
+WAL, est partagée entre le service de transfert et l'interface web: les
+lectures ne bloquent pas l'écriture de l'autre processus.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+
+from photo_watch import is_photo
+from spool import DONE
+
+logger = logging.getLogger('TransferStats')
+
+MINUTE = 'minute'
+HOUR = 'hour'
+DAY = 'day'
+PERIODS = (MINUTE, HOUR, DAY)
+
+# Agrégats conservés par période: 2 jours de minutes, 90 jours d'heures, 5 ans de jours
+DEFAULT_RETENTION = {MINUTE: 2 * 24 * 60, HOUR: 90 * 24, DAY: 5 * 366}
+
+# Bornes supérieures (ms) des classes de l'histogramme des durées: x1.5 de 10 ms à ~10 min
+LATENCY_BOUNDS = [round(10 * 1.5 ** i) for i in range(28)]
+
+# Photos suivies pour la galerie (les plus anciennement modifiées sont oubliées)
+MAX_RECENT_PHOTOS = 10000
+
+_COLUMNS = ('files', 'bytes', 'failures', 'duplicates', 'duration', 'max_ms')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    period TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    files INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    duplicates INTEGER NOT NULL DEFAULT 0,
+    duration REAL NOT NULL DEFAULT 0,
+    max_ms INTEGER NOT NULL DEFAULT 0,
+    histogram TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (period, bucket)
+);
+CREATE TABLE IF NOT EXISTS photos (
+    name TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL,
+    present INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS photos_updated ON photos (updated);
+"""
+
+
+def bucket_start(period: str, timestamp: float) -> int:
+    """Début (epoch) de la minute, de l'heure ou du jour local contenant timestamp"""
+    if period == MINUTE:
+        return int(timestamp // 60 * 60)
+    if period == HOUR:
+        return int(timestamp // 3600 * 3600)
+    local = time.localtime(timestamp)
+    return int(time.mktime((local.tm_year, local.tm_mon, local.tm_mday, 0, 0, 0, 0, 0, -1)))
+
+
+def latency_class(duration_ms: float) -> int:
+    """Classe de l'histogramme d'une durée"""
+    for index, bound in enumerate(LATENCY_BOUNDS):
+        if duration_ms <= bound:
+            return index
+    return len(LATENCY_BOUNDS) - 1
+
+
+def percentile(histogram: List[int], fraction: float, max_ms: int = 0) -> Optional[int]:
+    """Percentile (ms) estimé par la borne de sa classe, sans dépasser le maximum observé"""
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = fraction * total
+    cumulative = 0
+    for index, count in enumerate(histogram):
+        cumulative += count
+        if count and cumulative >= rank:
+            bound = LATENCY_BOUNDS[index]
+            return min(bound, max_ms) if max_ms else bound
+    return max_ms or LATENCY_BOUNDS[-1]
+
+
+def _empty_row() -> Dict[str, Any]:
+    return {'files': 0, 'bytes': 0, 'failures': 0, 'duplicates': 0, 'duration': 0.0, 'max_ms': 0,
+            'histogram': [0] * len(LATENCY_BOUNDS)}
+
+
+def _merge(row: Dict[str, Any], other: Dict[str, Any]):
+    for column in ('files', 'bytes', 'failures', 'duplicates', 'duration'):
+        row[column] += other[column]
+    row['max_ms'] = max(row['max_ms'], other['max_ms'])
+    row['histogram'] = [a + b for a, b in zip(row['histogram'], other['histogram'])]
+
+
+def _decode_histogram(text: str) -> List[int]:
+    counts = [int(value) for value in text.split(',')] if text else []
+    return (counts + [0] * len(LATENCY_BOUNDS))[:len(LATENCY_BOUNDS)]
+
+
+class TransferStats:
+    """Compteurs et agrégats temporels des transferts, mémoire bornée"""
+
+    def __init__(self, db_path: str, flush_interval: float = 10.0,
+                 retention: Optional[Dict[str, int]] = None):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.retention = dict(DEFAULT_RETENTION, **(retention or {}))
+        # (période, début) -> agrégat pas encore écrit
+        self.pending: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        # Nom de photo -> colonnes modifiées (None: ligne à supprimer), pas encore écrites
+        self.pending_photos: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.max_photos = MAX_RECENT_PHOTOS
+        self._watched = None
+        # lock protège les agrégats en attente (tenu un instant par record),
+        # db_lock la connexion (tenu pendant les écritures et les lectures)
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.thread = None
+        self._stop = threading.Event()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+        self.db.commit()
+
+    def start(self):
+        """Démarre l'écriture périodique des agrégats"""
+        if self.thread:
+            return
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name='transfer-stats')
+        self.thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def record(self, size: int = 0, duration: float = 0.0, success: bool = True,
+               duplicate: bool = False, timestamp: Optional[float] = None, name: Optional[str] = None):
+        """
+        Enregistre un transfert (réussi, en échec ou doublon ignoré) et sa durée en secondes
+        name: photo transférée, marquée comme telle dans la galerie (même si elle est supprimée ensuite)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        if name and (success or duplicate):
+            self._update_photo(name, state=DONE, updated=timestamp, **({'size': size} if size else {}))
+        event = _empty_row()
+        if duplicate:
+            event['duplicates'] = 1
+        elif success:
+            duration_ms = round(duration * 1000)
+            event.update(files=1, bytes=size, duration=duration, max_ms=duration_ms)
+            event['histogram'][latency_class(duration_ms)] = 1
+        else:
+            event['failures'] = 1
+        with self.lock:
+            for period in PERIODS:
+                key = (period, bucket_start(period, timestamp))
+                _merge(self.pending.setdefault(key, _empty_row()), event)
+
+    def watch(self, spool):
+        """
+        Suit les déplacements du spool pour la galerie; la table est remplie une
+        seule fois à partir du contenu du spool si elle est vide
+        """
+        self.unwatch()
+        with self.db_lock:
+            empty = self.db.execute("SELECT 1 FROM photos LIMIT 1").fetchone() is None
+        if empty:
+            photos = spool.recent(limit=self.max_photos)
+            with self.db_lock, self.db:
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO photos (name, state, size, updated) VALUES (?, ?, ?, ?)",
+                    [(photo['name'], photo['state'], photo['size'], photo['mtime']) for photo in photos])
+
+        def on_move(old_path: str, new_path: Optional[str]):
+            old_name = os.path.basename(old_path)
+            if new_path is None:
+                # Fichier supprimé (après transfert, rétention): son état reste affiché
+                if is_photo(old_name):
+                    self._update_photo(old_name, present=0)
+                return
+            new_name = os.path.basename(new_path)
+            if not is_photo(new_name):
+                return
+            if old_name != new_name and is_photo(old_name):
+                self._forget_photo(old_name)
+            values = {'state': spool.state_of(new_path), 'updated': time.time(), 'present': 1}
+            try:
+                values['size'] = os.path.getsize(new_path)
+            except OSError:
+                pass
+            self._update_photo(new_name, **values)
+
+        spool.listeners.append(on_move)
+        self._watched = (spool, on_move)
+
+    def unwatch(self):
+        if self._watched:
+            spool, listener = self._watched
+            if listener in spool.listeners:
+                spool.listeners.remove(listener)
+            self._watched = None
+
+    def _forget_photo(self, name: str):
+        with self.lock:
+            self.pending_photos[name] = None
+
+    def _update_photo(self, name: str, **values):
+        with self.lock:
+            current = self.pending_photos.get(name)
+            if current is None and name in self.pending_photos and 'state' not in values:
+                # Ligne supprimée puis modifiée partiellement: rien à écrire
+                return
+            if current is None:
+                current = self.pending_photos[name] = {}
+            current.update(values)
+
+    def _write_photos(self, photos: Dict[str, Optional[Dict[str, Any]]]):
+        for name, values in photos.items():
+            if values is None:
+                self.db.execute("DELETE FROM photos WHERE name = ?", (name,))
+            elif 'state' in values:
+                row = dict({'size': 0, 'present': 1}, **values)
+                self.db.execute(
+                    "INSERT INTO photos (name, state, size, updated, present) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET state = excluded.state, updated = excluded.updated, "
+                    "present = excluded.present" + (", size = excluded.size" if 'size' in values else ''),
+                    (name, row['state'], row['size'], row['updated'], row['present']))
+            else:
+                columns = sorted(values)
+                self.db.execute(f"UPDATE photos SET {', '.join(f'{c} = ?' for c in columns)} WHERE name = ?",
+                                tuple(values[c] for c in columns) + (name,))
+        self.db.execute(
+            "DELETE FROM photos WHERE updated < "
+            "(SELECT updated FROM photos ORDER BY updated DESC LIMIT 1 OFFSET ?)", (self.max_photos - 1,))
+
+    def recent_photos(self, states: Optional[Iterable[str]] = None, limit: int = 60,
+                      offset: int = 0) -> List[Dict[str, Any]]:
+        """Dernières photos suivies (état le plus récemment modifié d'abord), sans lire le spool"""
+        states = list(states) if states else None
+        query = "SELECT name, state, size, updated, present FROM photos"
+        params: Tuple = ()
+        if states:
+            query += f" WHERE state IN ({', '.join('?' * len(states))})"
+            params += tuple(states)
+        query += " ORDER BY updated DESC LIMIT ?"
+        with self.db_lock:
+            with self.lock:
+                pending = {name: dict(values) if values is not None else None
+                           for name, values in self.pending_photos.items()}
+            params += (offset + limit + len(pending),)
+            rows = {row[0]: dict(zip(('name', 'state', 'size', 'updated', 'present'), row))
+                    for row in self.db.execute(query, params).fetchall()}
+            # Photos en attente d'écriture absentes du résultat: lues une à une
+            missing = [name for name, values in pending.items()
+                       if values is not None and name not in rows and 'state' not in values]
+            for name in missing:
+                row = self.db.execute("SELECT name, state, size, updated, present FROM photos WHERE name = ?",
+                                      (name,)).fetchone()
+                if row:
+                    rows[name] = dict(zip(('name', 'state', 'size', 'updated', 'present'), row))
+        for name, values in pending.items():
+            if values is None:
+                rows.pop(name, None)
+            elif name in rows:
+                rows[name].update(values)
+            elif 'state' in values:
+                rows[name] = dict({'name': name, 'size': 0, 'present': 1}, **values)
+        photos = [row for row in rows.values() if not states or row['state'] in states]
+        photos.sort(key=lambda row: row['updated'], reverse=True)
+        return photos[offset:offset + limit]
+
+    def flush(self):
+        """Écrit les agrégats en attente (une transaction) et purge les plus anciens"""
+        with self.db_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+                photos, self.pending_photos = self.pending_photos, {}
+            if not pending and not photos:
+                return
+            try:
+                with self.db:
+                    self.db.execute("BEGIN IMMEDIATE")
+                    self._write_photos(photos)
+                    totals = _empty_row()
+                    for (period, bucket), row in pending.items():
+                        if period == MINUTE:
+                            _merge(totals, row)
+                        self._merge_row(period, bucket, row)
+                    for column in ('files', 'bytes', 'failures', 'duplicates', 'duration'):
+                        self.db.execute(
+                            "INSERT INTO counters (name, value) VALUES (?, ?) "
+                            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                            (column, totals[column]))
+                    self._prune()
+            except sqlite3.Error as e:
+                logger.error(f"Écriture des statistiques impossible ({self.db_path}): {e}")
+                # Agrégats conservés pour la prochaine écriture
+                with self.lock:
+                    for key, row in pending.items():
+                        _merge(self.pending.setdefault(key, _empty_row()), row)
+                    for name, values in photos.items():
+                        if name not in self.pending_photos:
+                            self.pending_photos[name] = values
+
+    def _merge_row(self, period: str, bucket: int, row: Dict[str, Any]):
+        stored = self.db.execute(
+            "SELECT files, bytes, failures, duplicates, duration, max_ms, histogram FROM rollups "
+            "WHERE period = ? AND bucket = ?", (period, bucket)).fetchone()
+        merged = _empty_row()
+        if stored:
+            merged.update(zip(_COLUMNS, stored[:6]))
+            merged['histogram'] = _decode_histogram(stored[6])
+        _merge(merged, row)
+        self.db.execute(
+            "INSERT OR REPLACE INTO rollups (period, bucket, files, bytes, failures, duplicates, "
+            "duration, max_ms, histogram) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (period, bucket) + tuple(merged[column] for column in _COLUMNS) +
+            (','.join(map(str, merged['histogram'])),))
+
+    def _prune(self):
+        for period, keep in self.retention.items():
+            self.db.execute(
+                "DELETE FROM rollups WHERE period = ? AND bucket < "
+                "(SELECT bucket FROM rollups WHERE period = ? ORDER BY bucket DESC LIMIT 1 OFFSET ?)",
+                (period, period, keep - 1))
+
+    def _rows(self, period: str, since: Optional[int] = None,
+              limit: Optional[int] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """Agrégats écrits et en attente, du plus ancien au plus récent"""
+        query = ("SELECT bucket, files, bytes, failures, duplicates, duration, max_ms, histogram "
+                 "FROM rollups WHERE period = ? AND bucket >= ? ORDER BY bucket DESC")
+        params: Tuple = (period, since or 0)
+        if limit:
+            query += " LIMIT ?"
+            params += (limit,)
+        # Sous db_lock, aucune écriture en cours: chaque agrégat est soit en base, soit en attente
+        with self.db_lock:
+            rows = {}
+            for stored in self.db.execute(query, params).fetchall():
+                row = dict(zip(_COLUMNS, stored[1:7]))
+                row['histogram'] = _decode_histogram(stored[7])
+                rows[stored[0]] = row
+            with self.lock:
+                for (pending_period, bucket), row in self.pending.items():
+                    if pending_period == period and bucket >= (since or 0):
+                        _merge(rows.setdefault(bucket, _empty_row()), row)
+        buckets = sorted(rows)
+        if limit:
+            buckets = buckets[-limit:]
+        return [(bucket, rows[bucket]) for bucket in buckets]
+
+    @staticmethod
+    def _describe(row: Dict[str, Any]) -> Dict[str, Any]:
+        histogram, max_ms = row['histogram'], row['max_ms']
+        attempts = row['files'] + row['failures']
+        return {
+            'files': row['files'],
+            'bytes': row['bytes'],
+            'failures': row['failures'],
+            'duplicates': row['duplicates'],
+            'success_rate': round(100 * row['files'] / attempts, 1) if attempts else None,
+            'throughput_kbps': round(row['bytes'] / row['duration'] / 1024, 1) if row['duration'] else None,
+            'latency_ms': {'p50': percentile(histogram, 0.5, max_ms),
+                           'p90': percentile(histogram, 0.9, max_ms),
+                           'p99': percentile(histogram, 0.99, max_ms),
+                           'max': max_ms or None},
+        }
+
+    def series(self, period: str = HOUR, limit: int = 24) -> List[Dict[str, Any]]:
+        """Derniers agrégats d'une période (minute, hour, day) pour les graphiques"""
+        if period not in PERIODS:
+            raise ValueError(f"Période inconnue: {period}")
+        return [dict(self._describe(row), start=datetime.fromtimestamp(bucket).isoformat(timespec='minutes'))
+                for bucket, row in self._rows(period, limit=limit)]
+
+    def summary(self) -> Dict[str, Any]:
+        """Totaux depuis l'installation et activité des dernières 24 heures"""
+        with self.db_lock:
+            totals = _empty_row()
+            for name, value in self.db.execute("SELECT name, value FROM counters").fetchall():
+                if name in totals:
+                    totals[name] = value
+            with self.lock:
+                for (period, _), row in self.pending.items():
+                    if period == MINUTE:
+                        for column in ('files', 'bytes', 'failures', 'duplicates', 'duration'):
+                            totals[column] += row[column]
+        totals = {column: int(totals[column]) if column != 'duration' else totals[column]
+                  for column in ('files', 'bytes', 'failures', 'duplicates', 'duration')}
+        attempts = totals['files'] + totals['failures']
+
+        last_day = _empty_row()
+        for _, row in self._rows(HOUR, since=bucket_start(HOUR, time.time()) - 23 * 3600):
+            _merge(last_day, row)
+        return {
+            'total_files': totals['files'],
+            'total_bytes': totals['bytes'],
+            'total_failures': totals['failures'],
+            'total_duplicates': totals['duplicates'],
+            'success_rate': round(100 * totals['files'] / attempts, 1) if attempts else None,
+            'throughput_kbps': (round(totals['bytes'] / totals['duration'] / 1024, 1)
+                                if totals['duration'] else None),
+            'last_24h': self._describe(last_day),
+        }
+
+    def close(self):
+        """Arrête l'écriture périodique, écrit les agrégats en attente et ferme la base"""
+        self.unwatch()
+        self._stop.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=15)
+        self.thread = None
+        self.flush()
+        with self.db_lock:
+            self.db.close()
+
+
+def create_transfer_stats(config: Dict[str, Any]) -> Optional[TransferStats]:
+    """Factory function pour les statistiques de transfert (None si la base est inaccessible)"""
+    system_config = config.get('system', {})
+    db_path = system_config.get('stats_db_path', 'data/transfer_stats.db')
+    # Chemin relatif au projet: le service et l'interface web partagent la même base
+    if not os.path.isabs(db_path):
+        db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), db_path)
+    try:
+        stats = TransferStats(db_path, flush_interval=system_config.get('stats_flush_interval', 10))
+    except sqlite3.Error as e:
+        logger.error(f"Base de statistiques inaccessible ({db_path}): {e}")
+        return None
+    stats.start()
+    return stats
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Registre des contenus déjà transférés (déduplication par empreinte)
+Chaque photo est hachée une seule fois (SHA-256, mis en cache par inode,
+taille et date de modification: un renommage ne provoque pas de nouveau
+calcul). Le registre persistant associe chaque empreinte au chemin distant
+déjà transféré, pour ignorer les doublons avant qu'ils n'atteignent le réseau.
+"""
+
+import os
+import json
+import time
+import fcntl
+import hashlib
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger('UploadLedger')
+
+# Modes de déduplication (system.dedupe)
+DEDUPE_OFF = 'off'
+DEDUPE_SKIP = 'skip'
+DEDUPE_LINK = 'link'
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadLedger:
+    """Empreintes des contenus transférés et chemins distants correspondants"""
+
+    def __init__(self, ledger_path: str, mode: str = DEDUPE_SKIP):
+        self.ledger_path = ledger_path
+        self.mode = mode
+        self.entries = {}
+        self._hash_cache = {}
+        self._dirty = False
+        self.lock = threading.RLock()
+        self.load()
+
+    def _read_disk(self) -> Dict[str, Dict[str, Any]]:
+        """Lit le registre sauvegardé (vide si absent ou illisible)"""
+        try:
+            with open(self.ledger_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Registre des transferts illisible ({self.ledger_path}): {e}")
+            return {}
+
+    def load(self):
+        """Recharge le registre (partagé entre les scripts de transfert)"""
+        with self.lock:
+            for digest, disk_entry in self._read_disk().items():
+                entry = self.entries.get(digest)
+                if entry is None or disk_entry.get('uploaded', 0) > entry.get('uploaded', 0):
+                    self.entries[digest] = disk_entry
+
+    def save(self):
+        """Sauvegarde atomique, fusionnée avec les écritures des autres processus"""
+        with self.lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.ledger_path)), exist_ok=True)
+            temp_path = self.ledger_path + '.tmp'
+            try:
+                with open(self.ledger_path + '.lock', 'w') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    self.load()
+                    with open(temp_path, 'w', encoding='utf-8') as f:
+                        json.dump(self.entries, f)
+                    os.replace(temp_path, self.ledger_path)
+                self._dirty = False
+            except Exception as e:
+                logger.error(f"Erreur sauvegarde du registre des transferts: {e}")
+
+    def hash_file(self, path: str) -> Optional[str]:
+        """Empreinte SHA-256 du contenu (calculée une seule fois par fichier)"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            digest = self._hash_cache.get(key)
+        if digest:
+            return digest
+
+        sha = hashlib.sha256()
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    sha.update(chunk)
+        except OSError as e:
+            logger.warning(f"Impossible de calculer l'empreinte de {path}: {e}")
+            return None
+
+        digest = sha.hexdigest()
+        with self.lock:
+            self._hash_cache[key] = digest
+        return digest
+
+    def find_uploaded(self, path: str) -> Optional[str]:
+        """Chemin distant d'un contenu identique déjà transféré (None sinon)"""
+        digest = self.hash_file(path)
+        if not digest:
+            return None
+        with self.lock:
+            entry = self.entries.get(digest)
+        return entry['remote_path'] if entry else None
+
+    def record(self, path: str, remote_path: str):
+        """Enregistre le transfert d'un fichier"""
+        digest = self.hash_file(path)
+        if not digest:
+            return
+        self.record_digest(digest, remote_path,
+                           os.path.getsize(path) if os.path.exists(path) else None)
+
+    def record_digest(self, digest: str, remote_path: str, size: Optional[int] = None):
+        """Enregistre le transfert d'un contenu haché au fil de son envoi (sans fichier local)"""
+        with self.lock:
+            self.entries[digest] = {
+                'remote_path': remote_path,
+                'size': size,
+                'uploaded': time.time()
+            }
+            self._dirty = True
+
+
+def create_upload_ledger(config: Dict[str, Any]) -> Optional[UploadLedger]:
+    """Factory function pour créer le registre de déduplication (None si désactivé)"""
+    system_config = config.get('system', {})
+    mode = system_config.get('dedupe', DEDUPE_SKIP)
+    if mode == DEDUPE_OFF:
+        return None
+    if mode not in (DEDUPE_SKIP, DEDUPE_LINK):
+        logger.warning(f"Mode de déduplication invalide '{mode}', utilisation de '{DEDUPE_SKIP}'")
+        mode = DEDUPE_SKIP
+    ledger_path = system_config.get('dedupe_index_path', 'data/upload_ledger.json')
+    # Chemin relatif au projet: tous les scripts partagent le même registre
+    if not os.path.isabs(ledger_path):
+        ledger_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ledger_path)
+    return UploadLedger(ledger_path, mode)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+File d'attente des photos à transférer
+Partagée entre l'ingestion (caméra, dossier local) et le transfert
+Les chemins sont servis par priorité (aperçus avant photos, RAW en dernier)
+Les workers de transfert la vident; un chemin en échec n'est repris qu'après
+un délai croissant, et abandonné après un nombre maximal de tentatives
+"""
+
+import time
+import queue
+import logging
+import itertools
+import threading
+from typing import Optional, List, Callable, Dict
+
+logger = logging.getLogger('UploadQueue')
+
+# Priorités de transfert (la plus petite valeur passe en premier)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+# Délai maximal entre deux tentatives d'un même fichier (secondes)
+MAX_RETRY_DELAY = 600
+
+
+class UploadQueue:
+    """File d'attente thread-safe, par priorité, sans doublons de chemins"""
+
+    def __init__(self, maxsize: int = 0):
+        self._queue = queue.PriorityQueue(maxsize)
+        self._pending = set()
+        self._lock = threading.Lock()
+        # Ordre d'arrivée conservé à priorité égale
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def put(self, path: str, block: bool = True, timeout: Optional[float] = None,
+            priority: int = PRIORITY_NORMAL) -> bool:
+        """Ajoute un chemin; retourne False s'il est déjà en attente"""
+        with self._lock:
+            if path in self._pending:
+                return False
+            self._pending.add(path)
+        try:
+            self._queue.put((priority, next(self._counter), path), block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self._pending.discard(path)
+            raise
+        return True
+
+    def get(self, timeout: Optional[float] = None) -> str:
+        """Retire le prochain chemin (lève queue.Empty après timeout)"""
+        _, _, path = self._queue.get(timeout=timeout)
+        with self._lock:
+            self._pending.discard(path)
+        return path
+
+    def get_batch(self, timeout: Optional[float] = None, max_items: Optional[int] = None) -> List[str]:
+        """Attend au moins un chemin puis retire tous ceux déjà disponibles"""
+        try:
+            batch = [self.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        while max_items is None or len(batch) < max_items:
+            try:
+                batch.append(self.get(timeout=0))
+            except queue.Empty:
+                break
+        return batch
+
+    def get_urgent(self, max_priority: int = PRIORITY_HIGH) -> List[str]:
+        """Retire sans attendre les chemins de priorité au moins max_priority"""
+        urgent = []
+        while True:
+            with self._queue.mutex:
+                head = self._queue.queue[0] if self._queue.queue else None
+            if head is None or head[0] > max_priority:
+                return urgent
+            try:
+                urgent.append(self.get(timeout=0))
+            except queue.Empty:
+                return urgent
+
+
+class RetryBackoff:
+    """Tentatives par chemin: délai exponentiel entre les échecs, abandon après max_attempts"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 5.0,
+                 max_delay: float = MAX_RETRY_DELAY, clock: Callable[[], float] = time.monotonic):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        # chemin -> (échecs, prochaine tentative)
+        self._failures: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def due(self, path: str) -> bool:
+        """Le chemin peut-il être (re)tenté maintenant?"""
+        with self._lock:
+            state = self._failures.get(path)
+        return state is None or self.clock() >= state[1]
+
+    def failure(self, path: str) -> bool:
+        """Enregistre un échec; retourne True si le chemin doit être abandonné"""
+        with self._lock:
+            failures = self._failures.get(path, (0, 0))[0] + 1
+            if failures >= self.max_attempts:
+                self._failures.pop(path, None)
+                return True
+            delay = min(self.max_delay, self.base_delay * 2 ** (failures - 1))
+            self._failures[path] = (failures, self.clock() + delay)
+        logger.info(f"Échec {failures}/{self.max_attempts} pour {path}, "
+                    f"nouvelle tentative dans {delay:.0f}s")
+        return False
+
+    def success(self, path: str):
+        """Oublie les échecs d'un chemin transféré"""
+        with self._lock:
+            self._failures.pop(path, None)
+
+
+class UploadWorkers:
+    """
+    Groupe de workers qui vident une file bornée avec handle(chemin)
+    submit() bloque l'appelant tant que la file est pleine (contre-pression)
+    """
+
+    def __init__(self, upload_queue: UploadQueue, handle: Callable[[str], None], count: int = 2):
+        self.upload_queue = upload_queue
+        self.handle = handle
+        self.count = max(1, count)
+        self.running = False
+        self.workers = []
+
+    def submit(self, path: str, priority: int = PRIORITY_NORMAL) -> bool:
+        """Met un chemin en file (False s'il y est déjà ou si les workers sont arrêtés)"""
+        try:
+            return self.upload_queue.put(path, block=False, priority=priority)
+        except queue.Full:
+            logger.warning(f"File de transfert pleine ({len(self.upload_queue)}), en attente")
+        while self.running:
+            try:
+                return self.upload_queue.put(path, timeout=1.0, priority=priority)
+            except queue.Full:
+                continue
+        return False
+
+    def start(self):
+        """Démarre les workers"""
+        self.running = True
+        for i in range(self.count):
+            worker = threading.Thread(target=self._run, name=f"transfer-{i + 1}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        logger.info(f"{len(self.workers)} worker(s) de transfert démarré(s)")
+
+    def stop(self, timeout: float = 5.0):
+        """Arrête les workers (transferts en cours terminés)"""
+        self.running = False
+        for worker in self.workers:
+            worker.join(timeout=timeout)
+        self.workers = []
+
+    def _run(self):
+        while self.running:
+            try:
+                path = self.upload_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self.handle(path)
+            except Exception as e:
+                logger.error(f"Erreur lors du traitement de {path}: {e}")
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Uploads manuels de l'interface web, confiés au service de transfert
+Le corps de la requête est écrit directement dans le spool (fichier partiel
+dans incoming/), chaque fichier reçu y prend son nom final et est confié au
+service par le socket de contrôle: il suit la même ingestion que les photos de
+l'appareil (registre des empreintes, aperçu des RAW); la requête répond aussitôt
+avec un identifiant de travail. L'interface ne se connecte jamais au serveur:
+l'attente et l'envoi se lisent dans le spool et dans le transfert en cours du
+service; l'issue de chaque fichier est celle enregistrée par le service à la
+fin de son transfert, jamais déduite de la disparition du fichier local.
+"""
+
+import os
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+from file_types import EXTENSIONS, sniff
+from spool import INCOMING, READY, UPLOADING, DONE, QUARANTINE, PART_SUFFIX, UPLOAD_PART_PREFIX
+
+logger = logging.getLogger('WebUploads')
+
+# États d'un fichier
+QUEUED = 'queued'
+UPLOADING_FILE = 'uploading'
+UPLOADED = 'done'
+FAILED = 'failed'
+# Fichier sorti de la file sans issue enregistrée par le service
+UNKNOWN = 'unknown'
+
+# Travaux conservés pour la consultation de l'avancement
+MAX_JOBS = 100
+
+
+def safe_filename(filename: str) -> str:
+    """Nom de fichier sans chemin ni point initial (fichier caché)"""
+    name = os.path.basename((filename or '').replace('\\', '/')).strip().lstrip('.')
+    return name.replace('\0', '')
+
+
+class UploadJobs:
+    """Travaux d'upload manuel: réception dans le spool, transfert par le service"""
+
+    def __init__(self, service):
+        self.service = service
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def spool(self):
+        return self.service.spool
+
+    def open_part(self):
+        """Fichier partiel dans incoming/ où le corps de la requête est écrit au fil de l'eau"""
+        return tempfile.NamedTemporaryFile(dir=self.spool.dir(INCOMING), prefix=UPLOAD_PART_PREFIX,
+                                           suffix=PART_SUFFIX, delete=False)
+
+    def _final_name(self, filename: str, part_path: str) -> str:
+        """Nom final: extension ajoutée selon le type, suffixe en cas de homonyme"""
+        name = safe_filename(filename) or os.path.basename(part_path)[:-len(PART_SUFFIX)].lstrip('.')
+        stem, ext = os.path.splitext(name)
+        if not ext:
+            kind = sniff(part_path)
+            ext = EXTENSIONS[kind] if kind else ''
+        return self.spool.unique_name(stem + ext)
+
+    def submit(self, files: List[Tuple[str, str]]) -> str:
+        """
+        Crée un travail pour des fichiers reçus [(nom d'origine, fichier partiel)]
+        et les confie au service de transfert; retourne l'identifiant du travail
+        """
+        job = {'id': uuid.uuid4().hex[:12], 'created': time.time(), 'files': []}
+        received = []
+        for filename, part_path in files:
+            entry = {'index': len(job['files']), 'name': safe_filename(filename) or filename,
+                     'size': 0, 'sent': 0, 'status': QUEUED, 'error': None, 'remote_path': None}
+            job['files'].append(entry)
+            try:
+                entry['size'] = os.path.getsize(part_path)
+                entry['name'] = self._final_name(filename, part_path)
+                received.append(self.spool.move(part_path, INCOMING, name=entry['name']))
+            except OSError as e:
+                entry['status'] = FAILED
+                entry['error'] = f"Réception impossible: {e}"
+                logger.error(f"Upload web: réception de {filename} impossible: {e}")
+                try:
+                    os.unlink(part_path)
+                except OSError:
+                    pass
+
+        with self.lock:
+            self.jobs[job['id']] = job
+            while len(self.jobs) > MAX_JOBS:
+                self.jobs.popitem(last=False)
+        if received:
+            try:
+                self.service.enqueue(received)
+                logger.info(f"Upload web {job['id']}: {len(received)} fichier(s) confié(s) au service de transfert")
+            except Exception as e:
+                # Fichiers conservés dans incoming/: ingérés par la surveillance du service
+                logger.warning(f"Service de transfert injoignable, {len(received)} fichier(s) "
+                               f"en attente dans incoming/: {e}")
+        return job['id']
+
+    def _refresh(self, entry: Dict[str, Any], transfer: Optional[Dict[str, Any]],
+                 result: Optional[Dict[str, Any]]):
+        """Met à jour un fichier d'après l'issue enregistrée par le service, sinon son état dans le spool"""
+        if result:
+            if result.get('remote_path'):
+                entry['status'] = UPLOADED
+                entry['sent'] = entry['size']
+                entry['remote_path'] = result['remote_path']
+                entry['error'] = None
+            else:
+                entry['status'] = FAILED
+                entry['error'] = result.get('error') or "Échec du transfert"
+            return
+
+        path = self.spool.locate(entry['name'])
+        state = self.spool.state_of(path) if path else None
+        if state in (INCOMING, READY):
+            entry['status'] = QUEUED
+            entry['sent'] = 0
+        elif state == UPLOADING:
+            entry['status'] = UPLOADING_FILE
+            if transfer and transfer.get('file') == entry['name']:
+                entry['sent'] = transfer.get('sent', 0)
+        elif state == QUARANTINE:
+            entry['status'] = FAILED
+            entry['error'] = "Fichier invalide (mis en quarantaine)"
+        else:
+            # Retiré du dossier local (rétention, suppression) ou terminé sans issue connue
+            entry['status'] = UNKNOWN
+            entry['sent'] = 0
+            entry['error'] = ("Transfert non confirmé par le service" if state == DONE
+                              else "Fichier retiré du dossier local sans transfert confirmé")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Avancement d'un travail (None s'il est inconnu)"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return None
+            active = [entry for entry in job['files'] if entry['status'] in (QUEUED, UPLOADING_FILE, UNKNOWN)]
+        if active:
+            # Un seul appel au service: transfert en cours et issue des fichiers suivis
+            try:
+                results = self.service.upload_results([entry['name'] for entry in active])
+            except Exception as e:
+                # Service injoignable: l'état affiché reste le dernier connu
+                logger.debug(f"Avancement de l'upload web {job_id} indisponible: {e}")
+                results = None
+            if results is not None:
+                with self.lock:
+                    for entry in active:
+                        self._refresh(entry, results.get('transfer'),
+                                      results.get('files', {}).get(entry['name']))
+        with self.lock:
+            files = [dict(entry) for entry in job['files']]
+        total = sum(entry['size'] for entry in files)
+        sent = sum(entry['size'] if entry['status'] == UPLOADED else entry['sent'] for entry in files)
+        statuses = {entry['status'] for entry in files}
+        if statuses & {QUEUED, UPLOADING_FILE}:
+            status = 'running' if statuses - {QUEUED} else QUEUED
+        elif statuses & {FAILED, UNKNOWN}:
+            status = 'partial' if UPLOADED in statuses else FAILED
+        else:
+            status = UPLOADED
+        return {
+            'id': job_id,
+            'status': status,
+            'total_bytes': total,
+            'sent_bytes': sent,
+            'percent': round(100 * sent / total) if total else (100 if status == UPLOADED else 0),
+            'completed': sum(1 for entry in files if entry['status'] == UPLOADED),
+            'failed': sum(1 for entry in files if entry['status'] in (FAILED, UNKNOWN)),
+            'files': files,
+        }
+
+
+def create_upload_jobs(config: Dict[str, Any], service) -> UploadJobs:
+    """Factory function pour les uploads manuels de l'interface web"""
+    return UploadJobs(service)